@@ -0,0 +1,148 @@
+"""
+Benchmark: agent calls with fixed timeouts vs. the resilience layer
+
+Replays questions through the app's call_agent() and create_thread() from a
+thread pool, against tools/fake_snowflake.py with injected faults:
+
+- tail: slow_rate of :run calls take slow_factor times longer
+- outage: the endpoint hangs until the caller's timeout for a window in the
+  middle of the run; while the circuit is open, questions go to the SQL
+  fallback (FakeCortexSession)
+- flaky threads: thread_error_rate of /threads calls fail
+
+Questions are sent without a thread, like a session's first question, so
+hedging is allowed. Each scenario runs twice:
+
+- fixed: the old behaviour, fixed AGENT_RUN_TIMEOUT / THREAD_CREATE_TIMEOUT,
+  no retries, hedging or circuit breaker
+- resilient: the app's defaults (adaptive timeouts, jittered retries,
+  hedged :run, circuit breaker)
+
+The app's timeouts, backoff delays and circuit reset time are multiplied by
+--time-scale along with every simulated delay.
+
+Usage:
+    python benchmarks/bench_agent_resilience.py --requests 400 --concurrency 16 --time-scale 0.01
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_streaming import percentile
+from tools.app_loader import load_app, silence_bare_mode_warnings
+from tools.fake_snowflake import FakeCortexSession, FakeSnowflakeBackend, FakeSnowflakeConfig
+
+QUESTION_CORPUS = Path(__file__).resolve().parent / "data" / "question_corpus.jsonl"
+
+# App settings in seconds, scaled with the fake backend's delays
+SCALED_SETTINGS = ("AGENT_RUN_TIMEOUT", "THREAD_CREATE_TIMEOUT", "ADAPTIVE_TIMEOUT_FLOOR",
+                   "RETRY_BASE_DELAY", "RETRY_MAX_DELAY", "CIRCUIT_RESET_SECONDS")
+MODES = {
+    "fixed": {"RETRY_ATTEMPTS": 1, "ADAPTIVE_TIMEOUTS_ENABLED": False, "HEDGE_ENABLED": False,
+              "CIRCUIT_BREAKER_ENABLED": False},
+    "resilient": {},
+}
+
+
+def configure(app, defaults, mode, time_scale):
+    """Apply a mode's settings on top of the app defaults and install a fresh client."""
+    for name, value in defaults.items():
+        setattr(app, name, value * time_scale if name in SCALED_SETTINGS else value)
+    for name, value in MODES[mode].items():
+        setattr(app, name, value)
+    client = app.ResilientAgentClient()
+    app.get_agent_client = lambda: client
+    return client
+
+
+def run_questions(app, questions, concurrency):
+    def ask(question):
+        started = time.perf_counter()
+        result = app.call_agent(question)
+        return time.perf_counter() - started, result
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(ask, questions))
+
+
+def run_threads(app, count, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda _: app.create_thread(), range(count)))
+
+
+def print_row(label, mode, timings, errors, fallbacks, client, wall, time_scale):
+    stats = client.stats()
+    print(f"{label:<14}{mode:<11}"
+          + "".join(f"{percentile(timings, pct) / time_scale:>8.2f}" for pct in (50, 95, 99))
+          + f"{max(timings) / time_scale:>8.2f}{errors:>8}{fallbacks:>10}"
+          f"{stats['hedges']:>8}{stats['hedge_wins']:>6}{stats['retries']:>9}{stats['circuit_opened']:>8}"
+          f"{wall / time_scale:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400, help="Questions per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--run-median", type=float, default=1.5)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Share of :run calls in the slow tail")
+    parser.add_argument("--slow-factor", type=float, default=8.0)
+    parser.add_argument("--outage", type=float, nargs=2, default=(15.0, 45.0), metavar=("START", "END"),
+                        help="Simulated seconds during which the endpoint hangs")
+    parser.add_argument("--thread-error-rate", type=float, default=0.2)
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Multiply every simulated delay")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    app = load_app()
+    silence_bare_mode_warnings()
+    defaults = {name: getattr(app, name) for name in SCALED_SETTINGS + tuple(MODES["fixed"])}
+    app.st.session_state.session = FakeCortexSession(FakeSnowflakeConfig(
+        run_median=1.0, time_scale=args.time_scale, seed=args.seed))
+    with open(QUESTION_CORPUS) as f:
+        corpus = [json.loads(line)["question"] for line in f if line.strip()]
+    questions = [corpus[i % len(corpus)] for i in range(args.requests)]
+
+    scenarios = {
+        "tail": dict(slow_rate=args.slow_rate, slow_factor=args.slow_factor),
+        "outage": dict(outages=[tuple(args.outage)], outage_mode="hang"),
+    }
+
+    print(f"{args.requests} questions per run, concurrency {args.concurrency}, :run median {args.run_median}s; "
+          f"times in simulated seconds (x{args.time_scale})")
+    print(f"{'scenario':<14}{'mode':<11}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'errors':>8}{'fallback':>10}"
+          f"{'hedges':>8}{'won':>6}{'retries':>9}{'opened':>8}{'wall':>9}")
+    for scenario, faults in scenarios.items():
+        for mode in MODES:
+            client = configure(app, defaults, mode, args.time_scale)
+            backend = FakeSnowflakeBackend(FakeSnowflakeConfig(
+                run_median=args.run_median, time_scale=args.time_scale, seed=args.seed, **faults))
+            with backend.installed():
+                started = time.perf_counter()
+                outcomes = run_questions(app, questions, args.concurrency)
+                wall = time.perf_counter() - started
+            timings = [elapsed for elapsed, _ in outcomes]
+            errors = sum(not result.get("success") for _, result in outcomes)
+            fallbacks = sum(bool(result.get("circuit_open")) for _, result in outcomes)
+            print_row(scenario, mode, timings, errors, fallbacks, client, wall, args.time_scale)
+
+    print()
+    print(f"{'create_thread':<14}{'mode':<11}{'agent threads':>15}{'no thread':>11}{'retries':>9}")
+    for mode in MODES:
+        client = configure(app, defaults, mode, args.time_scale)
+        backend = FakeSnowflakeBackend(FakeSnowflakeConfig(
+            time_scale=args.time_scale, seed=args.seed, thread_error_rate=args.thread_error_rate))
+        with backend.installed():
+            thread_ids = run_threads(app, args.requests, args.concurrency)
+        issued = sum(thread_id in backend.issued_threads for thread_id in thread_ids)
+        print(f"{'flaky threads':<14}{mode:<11}{issued:>15}{len(thread_ids) - issued:>11}"
+              f"{client.stats()['retries']:>9}")
+
+
+if __name__ == "__main__":
+    main()
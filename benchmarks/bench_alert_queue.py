@@ -0,0 +1,184 @@
+"""
+Benchmark: one email per send_rcm_alert call vs. the alert queue and flusher
+
+Replays an hour of alerting: every --window minutes a denial-spike check
+raises an alert per spiking payer for each of that payer's owners (a spike
+usually persists into the next check), and the agent sends a few one-off
+alerts. Two ways of delivering them:
+
+- direct: the old send_rcm_alert, a blocking SYSTEM$SEND_EMAIL per alert
+- queued: send_rcm_alert's INSERT into rcm_alert_queue, then the real
+  flush_rcm_alerts handler (executed from setup/06_rcm_agent_setup.sql) at
+  the end of each window, as flush_rcm_alerts_task would run it
+
+The queued run uses AlertQueueSession, an in-memory rcm_alert_queue that
+answers the handler's statements. Times are simulated: --round-trip per
+statement and --send-seconds per SYSTEM$SEND_EMAIL call. --send-error-rate
+fails sends, to exercise the retries.
+
+Usage:
+    python benchmarks/bench_alert_queue.py --windows 12 --payers 10 --send-error-rate 0.1
+"""
+
+import argparse
+import json
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_streaming import percentile
+from tools.sql_udf_loader import exec_udf
+
+SQL_FILE = "06_rcm_agent_setup.sql"
+TEAM = ["denials.lead@example.org", "billing.manager@example.org", "rcm.director@example.org",
+        "payer.relations@example.org", "cfo@example.org"]
+PAYERS = ["Medicare", "Medicaid (Illinois)", "Blue Cross", "Aetna", "Cigna", "Humana",
+          "UnitedHealthcare", "Anthem", "Kaiser", "Self-Pay"]
+
+
+class Rows(list):
+    def collect(self):
+        return self
+
+
+class AlertQueueSession:
+    """rcm_alert_queue in memory, answering flush_rcm_alerts' statements; keeps a simulated clock."""
+
+    def __init__(self, handler, round_trip, send_seconds, send_error_rate, seed):
+        self.handler = handler
+        self.round_trip = round_trip
+        self.send_seconds = send_seconds
+        self.send_error_rate = send_error_rate
+        self.rng = random.Random(seed)
+        self.now = datetime(2025, 1, 6, 8, 0)
+        self.queue = []
+        self.new_alerts = 0
+        self.elapsed = 0.0
+        self.calls = {"statements": 0, "send_email": 0, "send_errors": 0, "delivered": 0}
+
+    def enqueue(self, recipient, subject, message):
+        """send_rcm_alert: one INSERT."""
+        self.elapsed += self.round_trip
+        self.calls["statements"] += 1
+        self.queue.append({"ALERT_ID": str(uuid.uuid4()), "RECIPIENT": recipient, "SUBJECT": subject,
+                           "MESSAGE": message, "ENQUEUED_AT": self.now, "STATUS": "queued", "FLUSH_ID": None,
+                           "CLAIMED_AT": None, "DIGEST_ID": None, "ATTEMPTS": 0, "SENT_AT": None, "ERROR": None})
+        self.new_alerts += 1
+        return self.round_trip
+
+    def sql(self, query, params=()):
+        self.elapsed += self.round_trip
+        self.calls["statements"] += 1
+        handler = self.handler
+        if query == handler["LOG_FLUSH_SQL"]:
+            self.new_alerts = 0
+        elif query == handler["CLAIM_SQL"]:
+            for row in self.queue:
+                if row["STATUS"] == "queued":
+                    row.update(STATUS="sending", FLUSH_ID=params[0], CLAIMED_AT=self.now)
+        elif query == handler["CLAIMED_SQL"]:
+            return Rows(row for row in self.queue if row["FLUSH_ID"] == params[0])
+        elif query == handler["RECENTLY_SENT_SQL"]:
+            since = self.now - timedelta(minutes=params[0])
+            return Rows({(row["RECIPIENT"], row["SUBJECT"], row["MESSAGE"]): row for row in self.queue
+                         if row["STATUS"] == "sent" and row["SENT_AT"] >= since}.values())
+        elif query == handler["RECORD_SQL"]:
+            by_id = {row["ALERT_ID"]: row for row in self.queue}
+            for update in json.loads(params[0]):
+                row = by_id[update["alert_id"]]
+                row.update(STATUS=update["status"], DIGEST_ID=update["digest_id"], ERROR=update["error"],
+                           ATTEMPTS=row["ATTEMPTS"] + update["attempted"],
+                           SENT_AT=self.now if update["status"] == "sent" else None)
+        elif query != handler["LOG_RESULT_SQL"]:
+            raise ValueError(f"Unexpected statement: {query}")
+        return Rows()
+
+    def call(self, procedure, integration, recipient, subject, body, mime_type):
+        self.elapsed += self.send_seconds
+        self.calls["send_email"] += 1
+        if self.rng.random() < self.send_error_rate:
+            self.calls["send_errors"] += 1
+            raise RuntimeError("Email delivery failed")
+        self.calls["delivered"] += 1
+
+    def flush(self, dedupe_minutes=60, max_attempts=3):
+        return self.handler["flush_rcm_alerts"](self, dedupe_minutes, max_attempts)
+
+
+def generate_alerts(windows, payers, seed):
+    """Alerts per window: spike-check alerts to each spiking payer's owners, plus agent one-offs."""
+    rng = random.Random(seed)
+    owners = {payer: rng.sample(TEAM, rng.randint(1, 3)) for payer in PAYERS[:payers]}
+    spiking = set(rng.sample(sorted(owners), 2))
+    schedule = []
+    for window in range(windows):
+        spiking = {payer for payer in sorted(spiking) if rng.random() < 0.8} | {
+            payer for payer in owners if rng.random() < 0.15}
+        alerts = [(owner, f"Denial rate spike: {payer}",
+                   f"{payer} denial rate is above the 15% threshold over the last 24 hours. "
+                   f"Review CO-16 and CO-50 denials before the next submission batch.")
+                  for payer in sorted(spiking) for owner in owners[payer]]
+        alerts += [(rng.choice(TEAM), f"Agent finding {window}-{n}",
+                    f"Clean claim rate dropped for a provider group in window {window}.")
+                   for n in range(rng.randint(0, 2))]
+        schedule.append(alerts)
+    return schedule
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, default=12, help="Spike checks / flushes")
+    parser.add_argument("--window", type=int, default=5, help="Minutes between checks")
+    parser.add_argument("--payers", type=int, default=10)
+    parser.add_argument("--round-trip", type=float, default=0.1, help="Seconds per SQL statement")
+    parser.add_argument("--send-seconds", type=float, default=1.5, help="Seconds per SYSTEM$SEND_EMAIL call")
+    parser.add_argument("--send-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    handler = exec_udf(SQL_FILE, "flush_rcm_alerts")
+    schedule = generate_alerts(args.windows, args.payers, args.seed)
+    raised = sum(map(len, schedule))
+
+    # direct: the caller waits on every email
+    rng = random.Random(args.seed)
+    direct_waits, direct_failed = [], 0
+    for alerts in schedule:
+        for _ in alerts:
+            direct_waits.append(args.round_trip + args.send_seconds)
+            direct_failed += rng.random() < args.send_error_rate
+
+    session = AlertQueueSession(handler, args.round_trip, args.send_seconds, args.send_error_rate, args.seed)
+    queued_waits, flush_seconds = [], []
+    for alerts in schedule:
+        queued_waits += [session.enqueue(*alert) for alert in alerts]
+        session.now += timedelta(minutes=args.window)
+        started = session.elapsed
+        session.flush()
+        flush_seconds.append(session.elapsed - started)
+    session.flush()  # Retry what the last window's failed sends left queued
+    statuses = [row["STATUS"] for row in session.queue]
+
+    print(f"{raised} alerts over {args.windows} x {args.window}-minute windows; "
+          f"{args.round_trip}s per statement, {args.send_seconds}s per SYSTEM$SEND_EMAIL, "
+          f"send error rate {args.send_error_rate:.0%}")
+    print(f"{'mode':<9}{'caller p50':>11}{'p95':>7}{'caller total':>14}{'email calls':>13}{'inboxed':>9}"
+          f"{'duplicates':>12}{'undelivered':>13}{'flush p95':>11}")
+    print(f"{'direct':<9}{percentile(direct_waits, 50):>10.2f}s{percentile(direct_waits, 95):>6.2f}s"
+          f"{sum(direct_waits):>13.1f}s{len(direct_waits):>13}{len(direct_waits) - direct_failed:>9}"
+          f"{0:>12}{direct_failed:>13}{'-':>11}")
+    print(f"{'queued':<9}{percentile(queued_waits, 50):>10.2f}s{percentile(queued_waits, 95):>6.2f}s"
+          f"{sum(queued_waits):>13.1f}s{session.calls['send_email']:>13}{session.calls['delivered']:>9}"
+          f"{statuses.count('duplicate'):>12}{statuses.count('failed') + statuses.count('queued'):>13}"
+          f"{percentile(flush_seconds, 95):>10.1f}s")
+    print()
+    print("Alert statuses after the last flush: "
+          + ", ".join(f"{status} {statuses.count(status)}" for status in sorted(set(statuses))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: one ever-growing agent thread vs. the token-budgeted context
+
+Replays a long analyst session (question_corpus.jsonl, cycled) through the
+app's ConversationContext. Answers are the fake agent's canned answers
+(tools/fake_agent_server.py), repeated to --answer-tokens to look like real
+analyst answers:
+
+- one thread: CONTEXT_MANAGEMENT_ENABLED off, every turn resends the whole
+  conversation
+- budgeted: the app's compaction at CONTEXT_TOKEN_BUDGET, continuing on a
+  fresh thread seeded with the local summary
+
+Reports the context tokens sent per turn, before and after each compaction,
+and how many of the session's payers, codes, metrics and date ranges the
+last summary still names. With --tokenizer-file (cl100k_base.tiktoken, plus
+the tiktoken package) it also compares len(text) // 4 and the app's local
+approximation with the real cl100k_base counts on questions and documents.
+
+Usage:
+    python benchmarks/bench_context_budget.py --turns 60 --budget 12000 --tokenizer-file cl100k_base.tiktoken
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_streaming import percentile
+from tools.app_loader import load_app, silence_bare_mode_warnings
+from tools.document_corpus import load_setup_documents
+from tools.fake_agent_server import route_query, tool_result_content
+
+QUESTION_CORPUS = Path(__file__).resolve().parent / "data" / "question_corpus.jsonl"
+# Follow-ups that keep the session on its entities, as analysts do
+FOLLOW_UPS = [
+    "What about Aetna for Q3 2024?",
+    "Break that down for Northwestern Memorial Hospital last quarter",
+    "How many of those were CO-45 or CO-16 denials?",
+    "Compare with Medicare for 2024-06",
+]
+
+
+def replay(app, questions, answer_tokens):
+    context = app.ConversationContext()
+    for question in questions:
+        tool = route_query(question)
+        answer = tool["answer"]
+        while app.count_tokens(answer) < answer_tokens:
+            answer += " " + route_query(question)["answer"]
+        # The tool call and its result stay in the thread like the answer does
+        tools_used = [{"tokens": app.payload_tokens({"query": question})
+                       + app.payload_tokens(tool_result_content(tool))}]
+        sent_query, compaction = context.prepare(question)
+        context.record(question, sent_query, {"response": answer, "tools_used": tools_used}, compaction)
+    return context
+
+
+def tokenizer_accuracy(app, texts):
+    name, count = app.get_tokenizer()
+    exact = [count(text) for text in texts]
+    print()
+    print(f"Token counts vs. {name} over {len(texts)} questions and documents ({sum(exact):,} tokens)")
+    print(f"{'estimate':<22}{'total':>10}{'mean error':>12}{'max error':>11}")
+    for label, estimate in (("len(text) // 4", lambda text: len(text) // 4),
+                            ("local approximation", app.approximate_token_count)):
+        counts = [estimate(text) for text in texts]
+        errors = [abs(got - want) / want for got, want in zip(counts, exact) if want]
+        print(f"{label:<22}{sum(counts) / sum(exact):>9.1%}{sum(errors) / len(errors):>12.1%}{max(errors):>11.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--budget", type=int, default=12000, help="CONTEXT_TOKEN_BUDGET")
+    parser.add_argument("--answer-tokens", type=int, default=400, help="Approximate tokens per answer")
+    parser.add_argument("--tokenizer-file", help="cl100k_base.tiktoken, to count with the real tokenizer")
+    args = parser.parse_args()
+
+    app = load_app()
+    silence_bare_mode_warnings()
+    if args.tokenizer_file:
+        app.TOKENIZER_FILE = str(Path(args.tokenizer_file).resolve())
+    app.CONTEXT_TOKEN_BUDGET = args.budget
+    with open(QUESTION_CORPUS) as f:
+        corpus = [json.loads(line)["question"] for line in f if line.strip()]
+    session = [item for pair in zip(corpus, FOLLOW_UPS * len(corpus)) for item in pair]
+    questions = [session[i % len(session)] for i in range(args.turns)]
+
+    runs = {}
+    for mode, enabled in (("one thread", False), ("budgeted", True)):
+        app.CONTEXT_MANAGEMENT_ENABLED = enabled
+        runs[mode] = replay(app, questions, args.answer_tokens)
+
+    print(f"{args.turns} turns, ~{args.answer_tokens} tokens per answer, budget {args.budget:,}, "
+          f"{app.get_tokenizer()[0]} tokenizer")
+    checkpoints = sorted({1, 5, 10, 20, 30, 40, 50, args.turns} & set(range(1, args.turns + 1)))
+    print(f"{'mode':<12}" + "".join(f"{f'turn {turn}':>10}" for turn in checkpoints)
+          + f"{'p95':>9}{'total':>11}{'compactions':>13}")
+    for mode, context in runs.items():
+        sent = [turn["sent_tokens"] for turn in context.turn_log]
+        print(f"{mode:<12}" + "".join(f"{sent[turn - 1]:>10,}" for turn in checkpoints)
+              + f"{percentile(sent, 95):>9,.0f}{sum(sent):>11,}{context.compactions:>13}")
+
+    budgeted = runs["budgeted"]
+    compactions = [(number, turn["compacted"]) for number, turn in enumerate(budgeted.turn_log, 1)
+                   if turn["compacted"]]
+    if compactions:
+        print()
+        print("Compactions (thread tokens before -> summary tokens): " + ", ".join(
+            f"turn {number}: {compaction['before']:,} -> {compaction['after']:,}"
+            for number, compaction in compactions))
+        mentioned = app.context_entities(budgeted.history)
+        summary = app.summarize_context(budgeted.history)
+        kept = sum(value in summary for values in mentioned.values() for value in values)
+        total = sum(map(len, mentioned.values()))
+        print(f"Last summary names {kept}/{total} of the session's most recent entities "
+              f"({', '.join(f'{kind.lower()} {len(values)}' for kind, values in mentioned.items())})")
+
+    if app.get_tokenizer()[0] != "approximate":
+        tokenizer_accuracy(app, corpus + FOLLOW_UPS + [row[3] for row in load_setup_documents()])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: chat history rerun time, full vs. windowed rendering
+
+Runs the history section of main() under Streamlit's AppTest harness with 10,
+50 and 500 messages (assistant answers carry a markdown table and agent
+metadata) and times a rerun:
+
+- full:     every message drawn, as main() did before windowing
+- windowed: render_chat_history(), which draws the last
+            HISTORY_WINDOW_MESSAGES and collapses the rest
+
+Usage:
+    python benchmarks/bench_history_render.py --reruns 5 --debug
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from streamlit.testing.v1 import AppTest
+
+from tools.app_loader import load_app, silence_bare_mode_warnings
+
+APP_MODULE = "rcm_streamlit_app"
+
+ANSWER_TABLE = "\n".join(
+    ["Denial rates by payer for the selected period:", "", "| Payer | Claims | Denied | Denial Rate |",
+     "|-------|-------:|-------:|------------:|"]
+    + [f"| Payer {row} | {1000 + row * 37:,} | {90 + row * 5} | {(90 + row * 5) / (1000 + row * 37):.1%} |"
+       for row in range(20)]
+)
+
+
+def build_messages(count: int):
+    messages = []
+    for index in range(count):
+        if index % 2 == 0:
+            messages.append({"role": "user", "content": f"Question {index}: which payers have the highest denial rates?",
+                             "timestamp": f"2024-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}.{index:06d}"})
+        else:
+            messages.append({
+                "role": "assistant", "content": ANSWER_TABLE,
+                "timestamp": f"2024-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}.{index:06d}",
+                "metadata": {"success": True, "agent_name": "RCM_Healthcare_Agent_Prod", "model": "auto",
+                             "usage": {"input_tokens": 1200, "output_tokens": 240, "total_tokens": 1440},
+                             "timings": {"time_to_first_token": 0.8, "total_time": 2.1}}
+            })
+    return messages
+
+
+def full_history_script():
+    import sys
+    import streamlit as st
+    app = sys.modules["rcm_streamlit_app"]
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+            if st.session_state.show_debug and message["role"] == "assistant" and "metadata" in message:
+                app.render_debug_panel(message["metadata"])
+
+
+def windowed_history_script():
+    import sys
+    sys.modules["rcm_streamlit_app"].render_chat_history()
+
+
+def time_reruns(script, messages, show_debug: bool, reruns: int, app):
+    test = AppTest.from_function(script, default_timeout=60)
+    test.session_state["messages"] = messages
+    test.session_state["show_debug"] = show_debug
+    test.session_state["history_visible"] = app.HISTORY_WINDOW_MESSAGES
+    test.session_state["metrics"] = app.MetricsRegistry()
+    test.run()  # first run warms caches and imports
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        test.run()
+        timings.append(time.perf_counter() - started)
+    if test.exception:
+        raise SystemExit(test.exception[0].message)
+    return statistics.median(timings), len(test.chat_message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 500])
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--debug", action="store_true", help="Render debug panels (Show Debug/Agent Info on)")
+    args = parser.parse_args()
+
+    app = load_app(APP_MODULE)
+    sys.modules[APP_MODULE] = app
+    silence_bare_mode_warnings()
+
+    print(f"show_debug={args.debug}  window={app.HISTORY_WINDOW_MESSAGES} messages  reruns={args.reruns}")
+    print(f"{'messages':>9}{'full ms':>10}{'bubbles':>9}{'windowed ms':>13}{'bubbles':>9}{'speedup':>9}")
+    for size in args.sizes:
+        full, full_bubbles = time_reruns(full_history_script, build_messages(size), args.debug, args.reruns, app)
+        windowed, windowed_bubbles = time_reruns(windowed_history_script, build_messages(size), args.debug,
+                                                 args.reruns, app)
+        print(f"{size:>9}{full * 1e3:>10.1f}{full_bubbles:>9}{windowed * 1e3:>13.1f}{windowed_bubbles:>9}"
+              f"{full / windowed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
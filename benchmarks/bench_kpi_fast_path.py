@@ -0,0 +1,144 @@
+"""
+Benchmark: KPI fast path routing, correctness and latency
+
+Runs the app's KPI router against a local stand-in session
+(tools/local_session.py: SQLite with the setup scripts' dimension rows,
+generated claims_fact/denials_fact and the KPI rollups):
+
+- routing: every question in benchmarks/data/kpi_questions.jsonl must route
+  to its expected metric and dimension, or (route null) fall through to the
+  agent; question_corpus.jsonl shows the share of everyday questions routed
+- correctness: each routed answer is compared with the same metric computed
+  from the fact tables the way the semantic views define it
+- latency: answer_kpi_question() p50/p95 against the equivalent aggregate
+  over the fact tables, the query Cortex Analyst would have to generate
+  (before any model time)
+
+Usage:
+    python benchmarks/bench_kpi_fast_path.py --claims 1000000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_streaming import percentile
+from tools.app_loader import load_app, silence_bare_mode_warnings
+from tools.local_session import build_local_session
+
+KPI_QUESTIONS = Path(__file__).resolve().parent / "data" / "kpi_questions.jsonl"
+QUESTION_CORPUS = Path(__file__).resolve().parent / "data" / "question_corpus.jsonl"
+
+# Metric definitions from CLAIMS_PROCESSING_VIEW / DENIALS_MANAGEMENT_VIEW, over the fact tables
+FACT_METRICS = {
+    "clean_claim_rate": ("claims_fact", "COUNT(CASE WHEN r.clean_claim_flag THEN 1 END) * 100.0 / COUNT(*)"),
+    "denial_rate": ("claims_fact", "COUNT(CASE WHEN r.denial_flag THEN 1 END) * 100.0 / COUNT(*)"),
+    "days_to_payment": ("claims_fact", "AVG(r.days_to_payment)"),
+    "appeal_success_rate": (
+        "denials_fact",
+        "COUNT(CASE WHEN r.appeal_outcome IN ('Approved', 'Partial') THEN 1 END) * 100.0"
+        " / COUNT(CASE WHEN r.days_to_appeal IS NOT NULL THEN 1 END)"
+    ),
+}
+
+
+def fact_query(app, route):
+    table, value = FACT_METRICS[route["metric"]]
+    dimension = app.KPI_DIMENSIONS.get(route["dimension"])
+    label = dimension["column"] if dimension else "'All'"
+    join = dimension["join"].format(database=app.DATABASE, schema=app.SCHEMA) if dimension else ""
+    return f"""
+    SELECT {label} AS label, ROUND({value}, 1) AS value
+    FROM {table} r
+    {join}
+    {"GROUP BY 1" if dimension else ""}
+    """
+
+
+def load_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=200_000, help="claims_fact rows in the stand-in")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per routed question")
+    args = parser.parse_args()
+
+    app = load_app()
+    silence_bare_mode_warnings()
+    started = time.perf_counter()
+    session = build_local_session(args.claims, args.seed)
+    print(f"Stand-in session with {args.claims:,} claims built in {time.perf_counter() - started:.1f}s")
+
+    # Routing
+    questions = load_jsonl(KPI_QUESTIONS)
+    mistakes = []
+    for item in questions:
+        route = app.route_kpi_question(item["question"])
+        actual = route and {"metric": route["metric"], "dimension": route["dimension"]}
+        if actual != item["route"]:
+            mistakes.append((item["question"], item["route"], actual))
+    expected_routes = sum(item["route"] is not None for item in questions)
+    corpus = load_jsonl(QUESTION_CORPUS)
+    corpus_routed = [item["question"] for item in corpus if app.route_kpi_question(item["question"])]
+    route_timings = timed(lambda: [app.route_kpi_question(item["question"]) for item in questions], 200)
+    print()
+    print(f"Routing: {len(questions) - len(mistakes)}/{len(questions)} as expected "
+          f"({expected_routes} routed, {len(questions) - expected_routes} to the agent); "
+          f"{percentile(route_timings, 50) / len(questions) * 1e6:.0f} us per question")
+    for question, expected, actual in mistakes:
+        print(f"  MISMATCH {question!r}: expected {expected}, got {actual}")
+    print(f"question_corpus.jsonl: {len(corpus_routed)}/{len(corpus)} routed: {corpus_routed}")
+
+    # Correctness and latency of routed answers
+    print()
+    print(f"{'question':<58}{'rows':>5}{'match':>7}{'rollup p50':>12}{'p95':>10}{'facts p50':>12}{'p95':>10}")
+    all_rollup, all_facts = [], []
+    for item in questions:
+        route = app.route_kpi_question(item["question"])
+        if route is None:
+            continue
+        result = app.answer_kpi_question(item["question"], session)
+        if result is None:
+            print(f"{item['question'][:56]:<58} no answer (rollups missing or empty)")
+            continue
+        rows = session.sql(app.kpi_query(route)).collect()
+        expected = {row["LABEL"]: row["VALUE"] for row in session.sql(fact_query(app, route)).collect()}
+        # None on both sides: no appealed denials in that group
+        matches = all(row["VALUE"] == expected[row["LABEL"]]
+                      or None not in (row["VALUE"], expected[row["LABEL"]])
+                      and abs(row["VALUE"] - expected[row["LABEL"]]) < 0.051
+                      for row in rows)
+
+        rollup = timed(lambda: app.answer_kpi_question(item["question"], session), args.repeat)
+        facts = timed(lambda: session.sql(fact_query(app, route)).collect(), max(3, args.repeat // 5))
+        all_rollup.extend(rollup)
+        all_facts.extend(facts)
+        print(f"{item['question'][:56]:<58}{len(rows):>5}{'yes' if matches else 'NO':>7}"
+              f"{percentile(rollup, 50) * 1e3:>10.1f}ms{percentile(rollup, 95) * 1e3:>8.1f}ms"
+              f"{percentile(facts, 50) * 1e3:>10.1f}ms{percentile(facts, 95) * 1e3:>8.1f}ms")
+
+    print()
+    print(f"All routed questions: rollups p50 {percentile(all_rollup, 50) * 1e3:.1f} ms / "
+          f"p95 {percentile(all_rollup, 95) * 1e3:.1f} ms; fact tables p50 {percentile(all_facts, 50) * 1e3:.1f} ms / "
+          f"p95 {percentile(all_facts, 95) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
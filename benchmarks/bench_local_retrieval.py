@@ -0,0 +1,144 @@
+"""
+Benchmark: local BM25 retrieval latency and recall
+
+Baseline for the RCM_*_DOCS_SEARCH services, measured with the app's
+DocumentIndex (the SQL fallback's retrieval path) over rcm_document_chunks
+rows built by CHUNK_RCM_DOCUMENT:
+
+- build, save and memory-mapped load time, and index file size
+- query latency p50/p95, in memory vs. loaded from disk, with and without
+  a category filter (the services' '/finance/%'-style prefixes)
+- incremental update: replacing one document's chunks and deleting a path
+- recall@k and MRR on benchmarks/data/retrieval_qrels.jsonl, unfiltered and
+  filtered to the question's category
+
+The corpus is the documents from 02_rcm_documents_setup.sql plus any
+ingest_documents.py change files. --scale copies it under
+/<category>/replica_NNNN/ paths to measure larger indexes; a copy of a
+relevant document counts as relevant.
+
+Usage:
+    python benchmarks/bench_local_retrieval.py --scale 200 --documents data/documents/rcm_document_changes.csv
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_streaming import percentile
+from tools.app_loader import load_app, silence_bare_mode_warnings
+from tools.build_search_index import chunk_rows
+from tools.document_corpus import load_document_changes, load_setup_documents
+from tools.sql_udf_loader import exec_udf
+
+QRELS = Path(__file__).resolve().parent / "data" / "retrieval_qrels.jsonl"
+REPLICA_PATTERN = re.compile(r"/replica_\d+")
+
+
+def replicate(rows, scale: int):
+    copies = list(rows)
+    for replica in range(1, scale):
+        for row in rows:
+            category, rest = row["relative_path"].strip("/").split("/", 1)
+            copies.append(dict(row, relative_path=f"/{category}/replica_{replica:04d}/{rest}"))
+    return copies
+
+
+def time_queries(index, questions, limit, filtered):
+    timings = []
+    for question in questions:
+        started = time.perf_counter()
+        index.search(question["question"], limit=limit, categories=[question["category"]] if filtered else None)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def quality(index, questions, limit, filtered):
+    """recall@limit and MRR, matching replica paths to their original."""
+    recalls, reciprocal_ranks = [], []
+    for question in questions:
+        hits = index.search(question["question"], limit=limit,
+                            categories=[question["category"]] if filtered else None)
+        ranks = [rank for rank, hit in enumerate(hits, 1)
+                 if REPLICA_PATTERN.sub("", hit["relative_path"]) in question["relevant"]]
+        recalls.append(1.0 if ranks else 0.0)
+        reciprocal_ranks.append(1.0 / ranks[0] if ranks else 0.0)
+    return statistics.mean(recalls), statistics.mean(reciprocal_ranks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", nargs="*", default=[], help="ingest_documents.py change files to add")
+    parser.add_argument("--qrels", type=Path, default=QRELS)
+    parser.add_argument("--scale", type=int, default=50, help="Copies of the corpus to index")
+    parser.add_argument("--limit", type=int, default=5, help="Results per query (max_results)")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the questions for latency")
+    args = parser.parse_args()
+
+    app = load_app()
+    silence_bare_mode_warnings()
+    chunker = exec_udf("05_rcm_cortex_search.sql", "CHUNK_RCM_DOCUMENT")["ChunkRcmDocument"]
+    documents = load_setup_documents()
+    for path in args.documents:
+        documents.extend(load_document_changes(path))
+    base_rows = chunk_rows(documents, chunker)
+    rows = replicate(base_rows, args.scale)
+    with open(args.qrels) as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+
+    started = time.perf_counter()
+    memory_index = app.DocumentIndex.build(rows)
+    build_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / "index.bm25")
+        started = time.perf_counter()
+        memory_index.save(path)
+        save_seconds = time.perf_counter() - started
+        size = Path(path).stat().st_size
+
+        load_timings = []
+        for _ in range(20):
+            started = time.perf_counter()
+            loaded_index = app.DocumentIndex.load(path)
+            load_timings.append(time.perf_counter() - started)
+
+        print(f"{len(rows):,} chunks ({len(documents)} documents x {args.scale}), {len(questions)} questions, "
+              f"limit={args.limit}")
+        print(f"build {build_seconds:.2f}s   save {save_seconds:.2f}s   file {size / 1e6:.1f} MB   "
+              f"load {statistics.median(load_timings) * 1e3:.2f} ms (mmap)")
+        print()
+        print(f"{'query latency':<26}{'p50 ms':>9}{'p95 ms':>9}")
+        for label, index, filtered in (("in memory", memory_index, False), ("in memory, filtered", memory_index, True),
+                                       ("mmap", loaded_index, False), ("mmap, filtered", loaded_index, True)):
+            timings = [t for _ in range(args.repeat) for t in time_queries(index, questions, args.limit, filtered)]
+            print(f"{label:<26}{percentile(timings, 50) * 1e3:>9.2f}{percentile(timings, 95) * 1e3:>9.2f}")
+
+        # Incremental update on the loaded index: re-add one document, then drop it
+        document_rows = [row for row in base_rows if row["relative_path"] == base_rows[0]["relative_path"]]
+        started = time.perf_counter()
+        loaded_index.add(document_rows)
+        add_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        removed = loaded_index.delete(base_rows[0]["relative_path"])
+        delete_seconds = time.perf_counter() - started
+        print()
+        print(f"replace {len(document_rows)} chunks of {base_rows[0]['relative_path']}: {add_seconds * 1e3:.2f} ms   "
+              f"delete {removed} chunks: {delete_seconds * 1e3:.2f} ms")
+
+        print()
+        print(f"{'quality':<26}{'recall@' + str(args.limit):>10}{'MRR':>8}")
+        for label, filtered in (("unfiltered", False), ("category filter", True)):
+            recall, mrr = quality(memory_index, questions, args.limit, filtered)
+            print(f"{label:<26}{recall:>10.2f}{mrr:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark: long Analyst answers as markdown vs. the paged result set mode
+
+Runs a claim-level list against a local stand-in session
+(tools/local_session.py: SQLite with generated claims_fact, 1M rows by
+default) two ways:
+
+- markdown: the old path, every row fetched and formatted into the answer's
+  markdown table, which is what st.markdown renders and what
+  st.session_state.messages keeps
+- result set: the app's attach_result_set() / ResultSetStore, the SQL run
+  once with collect_nowait(), the first page cut from the first pandas batch,
+  further pages read on demand
+
+For the result set it reports time to the first page, paging forward (from
+the batches), a jump far ahead and back (RESULT_SCAN), and the size of the
+message kept in session state. Every page is checked against the same rows
+fetched in one go.
+
+Usage:
+    python benchmarks/bench_result_sets.py --claims 1000000 --page-rows 500
+"""
+
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_streaming import percentile
+from tools.app_loader import load_app, silence_bare_mode_warnings
+from tools.fake_agent_server import CLAIM_LIST_SQL
+from tools.local_session import build_local_session
+
+ALL_CLAIMS_SQL = (
+    "SELECT c.claim_id, c.submission_date, p.payer_name, pr.provider_name, c.charge_amount, c.paid_amount,"
+    " c.claim_status\n"
+    "FROM RCM_AI_DEMO.RCM_SCHEMA.claims_fact c\n"
+    "JOIN RCM_AI_DEMO.RCM_SCHEMA.payers_dim p ON c.payer_key = p.payer_key\n"
+    "JOIN RCM_AI_DEMO.RCM_SCHEMA.healthcare_providers_dim pr ON c.provider_key = pr.provider_key\n"
+    "ORDER BY c.submission_date DESC, c.claim_id DESC"
+)
+QUERIES = {"all claims": ALL_CLAIMS_SQL, "Medicaid denials": CLAIM_LIST_SQL}
+
+
+def markdown_table(rows):
+    """The answer text the agent returns for a row-level question."""
+    columns = list(rows[0]) if rows else []
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    lines.extend("| " + " | ".join(str(value) for value in row.values()) + " |" for row in rows)
+    return "Here are the matching claims:\n\n" + "\n".join(lines)
+
+
+def assistant_message(result):
+    return {"role": "assistant", "content": result["response"], "metadata": result, "timestamp": "2025-12-31T00:00:00"}
+
+
+def agent_result(sql, response):
+    return {
+        "success": True,
+        "response": response,
+        "tools_used": [{"name": "Analyze Claims Processing Data", "type": "cortex_analyst_text_to_sql",
+                        "kind": "Cortex Analyst", "sql": sql, "rows": None}]
+    }
+
+
+def run_markdown(session, sql):
+    started = time.perf_counter()
+    rows = session.sql(sql).collect()
+    fetched = time.perf_counter()
+    text = markdown_table(rows)
+    finished = time.perf_counter()
+    message = assistant_message(agent_result(sql, text))
+    return {"rows": len(rows), "fetch": fetched - started, "format": finished - fetched,
+            "first paint": finished - started, "markdown bytes": len(text.encode("utf-8")),
+            "state bytes": len(pickle.dumps(message))}
+
+
+def check_page(expected, frame, number, page_rows):
+    want = expected.iloc[number * page_rows:(number + 1) * page_rows].reset_index(drop=True)
+    return frame.reset_index(drop=True).equals(want)
+
+
+def run_result_set(app, session, sql, forward_pages, expected):
+    store = app.ResultSetStore()
+    # A 40-row table in the answer; Analyst does not report the row count here
+    sample = session.sql(f"SELECT * FROM ({sql}) LIMIT 40").collect()
+    result = app.attach_result_set(agent_result(sql, markdown_table(sample)))
+    handle = result["result_set"]
+    page_rows = handle["page_rows"]
+
+    started = time.perf_counter()
+    first = store.page(session, handle, 0)
+    first_page = time.perf_counter() - started
+    ok = check_page(expected, first, 0, page_rows)
+
+    last = (len(expected) - 1) // page_rows
+    forward = []
+    for number in range(1, min(forward_pages, last) + 1):
+        started = time.perf_counter()
+        frame = store.page(session, handle, number)
+        forward.append(time.perf_counter() - started)
+        ok &= check_page(expected, frame, number, page_rows)
+
+    jumps = []
+    for number in (last, last // 2, min(forward_pages, last) // 2):
+        started = time.perf_counter()
+        frame = store.page(session, handle, number)
+        jumps.append((number, time.perf_counter() - started))
+        ok &= check_page(expected, frame, number, page_rows)
+
+    message = assistant_message(result)
+    return {"first page": first_page, "forward": forward, "jumps": jumps, "ok": ok, "handle": handle,
+            "state bytes": len(pickle.dumps(message)), "stats": store.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=1_000_000, help="claims_fact rows in the stand-in")
+    parser.add_argument("--page-rows", type=int, default=500, help="RESULT_PAGE_ROWS")
+    parser.add_argument("--forward-pages", type=int, default=20, help="Next-page clicks after the first page")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = load_app()
+    silence_bare_mode_warnings()
+    app.RESULT_PAGE_ROWS = args.page_rows
+    started = time.perf_counter()
+    session = build_local_session(args.claims, args.seed)
+    print(f"Stand-in session with {args.claims:,} claims built in {time.perf_counter() - started:.1f}s; "
+          f"pages of {args.page_rows} rows")
+
+    for label, sql in QUERIES.items():
+        expected = session.sql(sql).to_pandas()
+        markdown = run_markdown(session, sql)
+        paged = run_result_set(app, session, sql, args.forward_pages, expected)
+        stats = paged["stats"]
+        print()
+        print(f"{label}: {markdown['rows']:,} rows")
+        print(f"  markdown     first paint {markdown['first paint']:>7.2f}s (fetch {markdown['fetch']:.2f}s, "
+              f"format {markdown['format']:.2f}s), {markdown['markdown bytes'] / 1e6:,.1f} MB to st.markdown, "
+              f"message in session state {markdown['state bytes'] / 1e6:,.1f} MB")
+        print(f"  result set   first page  {paged['first page']:>7.2f}s, next page p50 "
+              f"{percentile(paged['forward'], 50) * 1e3:.1f} ms / p95 {percentile(paged['forward'], 95) * 1e3:.1f} ms, "
+              f"message in session state {paged['state bytes']:,} bytes")
+        print("               jumps: " + ", ".join(
+            f"page {number + 1} {seconds * 1e3:.0f} ms" for number, seconds in paged["jumps"]))
+        print(f"               {stats['queries']} query, {stats['batch_pages']} pages from batches, "
+              f"{stats['scan_pages']} from RESULT_SCAN, {stats['cache_hits']} cached; "
+              f"store holds {stats['rows']:,} rows; row count {paged['handle']['rows']}; "
+              f"pages match: {'yes' if paged['ok'] else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
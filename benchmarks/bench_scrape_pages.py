@@ -0,0 +1,217 @@
+"""
+Benchmark: scrape_healthcare_data one page at a time vs. scrape_healthcare_pages
+
+Serves generated payer bulletin pages from a local HTTP server (per-request
+latency, ETag / Last-Modified, 304 on a matching conditional GET) and scrapes
+them with both handlers, executed straight from setup/06_rcm_agent_setup.sql:
+
+- scalar: scrape_healthcare_data per URL, a new connection and a full
+  download and parse of every page
+- batch, cold: scrape_healthcare_pages over all URLs in one partition, no
+  cached validators
+- batch, warm: the same after --changed of the pages were updated, with the
+  ETag / Last-Modified the cold run returned (what refresh_healthcare_pages
+  reads from rcm_scraped_pages)
+
+Every page's text from the batch handler must match the scalar handler's.
+Bytes are counted as the server writes them, so a download the client stops
+early is only partly counted.
+
+Usage:
+    python benchmarks/bench_scrape_pages.py --pages 200 --page-kb 400 --latency 0.05
+"""
+
+import argparse
+import random
+import socket
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.sql_udf_loader import exec_udf
+
+SQL_FILE = "06_rcm_agent_setup.sql"
+MAX_CHARS = 10000
+WRITE_CHUNK_BYTES = 16384
+SEND_BUFFER_BYTES = 65536
+
+WORDS = ("prior authorization", "timely filing", "CO-16", "CO-50", "PR-1", "medical necessity",
+         "claim", "denial", "appeal", "remittance", "payer", "bulletin", "effective", "policy",
+         "coverage", "modifier", "CPT", "reimbursement", "the", "for", "and", "of", "with")
+
+
+def render_page(index, version, size_bytes, rng):
+    """A bulletin page with scripts, styles, inline markup and uneven whitespace."""
+    parts = [f"<!DOCTYPE html><html><head><title>Payer Bulletin {index} (rev {version})</title>",
+             "<style>body { font-family: sans-serif; }</style>",
+             "<script>window.analytics = {track: function () {}};</script></head><body>",
+             f"<h1>Provider bulletin {index}</h1>\n<!-- generated -->"]
+    length = sum(map(len, parts))
+    paragraph = 0
+    while length < size_bytes:
+        paragraph += 1
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 60)))
+        text = (f"<p>Update {paragraph} &amp; rev {version}:  <b>{words[:40]}</b>{words[40:]}\n"
+                f"   <a href='/bulletin/{paragraph}'>details</a></p>\n")
+        if paragraph % 7 == 0:
+            text += "<script>var x = '<p>not text</p>';</script>\n"
+        parts.append(text)
+        length += len(text)
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+class BulletinSite:
+    """Generated pages plus request counters for the handler."""
+
+    def __init__(self, pages, page_kb, latency, seed):
+        self.pages = pages
+        self.page_kb = page_kb
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.versions = [1] * pages
+        self.bodies = [render_page(i, 1, page_kb * 1024, self.rng) for i in range(pages)]
+        self.lock = threading.Lock()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.counters = {"requests": 0, "not_modified": 0, "bytes": 0, "connections": 0}
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def update(self, share):
+        changed = self.rng.sample(range(self.pages), int(self.pages * share))
+        for index in changed:
+            self.versions[index] += 1
+            self.bodies[index] = render_page(index, self.versions[index], self.page_kb * 1024, self.rng)
+        return len(changed)
+
+    def etag(self, index):
+        return f'"bulletin-{index}-v{self.versions[index]}"'
+
+    def last_modified(self, index):
+        return formatdate(1_700_000_000 + self.versions[index] * 86400, usegmt=True)
+
+
+def start_site(site):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            # A small send buffer so a page the client stops reading is not all
+            # written into the kernel anyway
+            self.request.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_BYTES)
+            super().setup()
+            site.count("connections")
+
+        def handle(self):
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The client stopped reading a page early
+
+        def do_GET(self):
+            site.count("requests")
+            time.sleep(site.latency)
+            try:
+                index = int(self.path.rsplit("/", 1)[-1])
+                body = site.bodies[index]
+            except (ValueError, IndexError):
+                self.send_error(404)
+                return
+            etag = site.etag(index)
+            if self.headers.get("If-None-Match") == etag:
+                site.count("not_modified")
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", site.last_modified(index))
+            self.end_headers()
+            try:
+                for offset in range(0, len(body), WRITE_CHUNK_BYTES):
+                    chunk = body[offset:offset + WRITE_CHUNK_BYTES]
+                    self.wfile.write(chunk)
+                    site.count("bytes", len(chunk))
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_batch(handler_class, rows):
+    handler = handler_class()
+    for row in rows:
+        handler.process(*row)
+    return list(handler.end_partition())
+
+
+def report(label, site, elapsed, pages, extra=""):
+    counters = site.counters
+    print(f"{label:<14}{elapsed:>8.2f}{pages / elapsed:>9.1f}{counters['requests']:>10}{counters['connections']:>13}"
+          f"{counters['not_modified']:>6}{counters['bytes'] / 1e6:>11.1f}   {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--page-kb", type=int, default=400, help="Size of each page's HTML")
+    parser.add_argument("--latency", type=float, default=0.05, help="Server seconds before each response")
+    parser.add_argument("--changed", type=float, default=0.1, help="Share of pages updated before the warm run")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    scrape_one = exec_udf(SQL_FILE, "scrape_healthcare_data")["scrape_healthcare_data"]
+    udtf = exec_udf(SQL_FILE, "scrape_healthcare_pages")
+    site = BulletinSite(args.pages, args.page_kb, args.latency, args.seed)
+    server, base_url = start_site(site)
+    urls = [f"{base_url}/bulletin/{index}" for index in range(args.pages)]
+
+    print(f"{args.pages} pages of {args.page_kb} KB, {args.latency * 1e3:.0f} ms server latency, "
+          f"{udtf['MAX_WORKERS']} workers")
+    print(f"{'mode':<14}{'wall s':>8}{'pages/s':>9}{'requests':>10}{'connections':>13}{'304s':>6}{'MB served':>11}")
+    try:
+        started = time.perf_counter()
+        expected = [scrape_one(url) for url in urls]
+        report("scalar", site, time.perf_counter() - started, args.pages)
+
+        site.reset_counters()
+        started = time.perf_counter()
+        cold = run_batch(udtf["ScrapeHealthcarePages"], [(url, None, None, MAX_CHARS) for url in urls])
+        elapsed = time.perf_counter() - started
+        matches = sum(row[5] == text for row, text in zip(cold, expected))
+        report("batch, cold", site, elapsed, args.pages, f"{matches}/{args.pages} texts match scalar")
+
+        changed = site.update(args.changed)
+        site.reset_counters()
+        started = time.perf_counter()
+        warm = run_batch(udtf["ScrapeHealthcarePages"], [(url, etag, last_modified, MAX_CHARS)
+                                                         for url, _, _, etag, last_modified, *_ in cold])
+        elapsed = time.perf_counter() - started
+        statuses = [row[1] for row in warm]
+        report("batch, warm", site, elapsed, args.pages,
+               f"{statuses.count('fetched')} fetched ({changed} changed), {statuses.count('not_modified')} not modified, "
+               f"{statuses.count('error')} errors")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
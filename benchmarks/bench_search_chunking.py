@@ -0,0 +1,144 @@
+"""
+Benchmark: retrieved tokens per query, whole documents vs. chunks
+
+RCM_KNOWLEDGE_BASE_SEARCH used to index each document as one row, wrapped in
+a category prefix and a fixed HEALTHCARE CONTEXT trailer, so every hit put a
+whole document into the agent prompt. It now indexes rcm_document_chunks,
+built by CHUNK_RCM_DOCUMENT in setup/05_rcm_cortex_search.sql (executed here
+from the SQL source).
+
+Cortex Search is not available offline, so retrieval is approximated with
+BM25 over each index's content column. For every knowledge-base style
+question in benchmarks/data/question_corpus.jsonl, the top --max-results rows
+(5, as in the agent's tool_resources) are taken from both indexes and their
+tokens counted the way ESTIMATE_TOKENS does. "Same top doc" is the share of
+questions whose best chunk comes from the best whole-document match.
+
+The corpus is the documents from 02_rcm_documents_setup.sql, plus any change
+files written by tools/ingest_documents.py.
+
+Usage:
+    python benchmarks/bench_search_chunking.py --documents data/documents/rcm_document_changes.csv
+"""
+
+import argparse
+import json
+import math
+import re
+import statistics
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.document_corpus import load_document_changes, load_setup_documents
+from tools.sql_udf_loader import exec_udf
+
+QUESTION_CORPUS = Path(__file__).resolve().parent / "data" / "question_corpus.jsonl"
+QUESTION_CATEGORIES = ("knowledge_base", "terminology", "multi_tool")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# RCM_KNOWLEDGE_BASE_SEARCH content before chunking
+CATEGORY_PREFIXES = {
+    "finance": "FINANCIAL POLICY AND PROCEDURES - ",
+    "operations": "OPERATIONS AND WORKFORCE MANAGEMENT - ",
+    "compliance": "COMPLIANCE AND AUDIT PROCEDURES - ",
+    "strategy": "STRATEGIC PLANNING AND MARKET ANALYSIS - ",
+}
+CONTEXT_TRAILER = (
+    " HEALTHCARE CONTEXT: This document relates to revenue cycle management, healthcare billing, claims "
+    "processing, denial management, payer relations, compliance requirements, operational efficiency, financial "
+    "performance, and client services in the healthcare industry."
+)
+
+
+def service_prefix(path: str) -> str:
+    category = path.split("/")[1]
+    return ("HEALTHCARE REVENUE CYCLE MANAGEMENT KNOWLEDGE BASE: "
+            + CATEGORY_PREFIXES.get(category, "GENERAL HEALTHCARE DOCUMENT - ") + path.rsplit("/", 1)[-1])
+
+
+def document_rows(documents):
+    return [(path, service_prefix(path) + " DOCUMENT CONTENT: " + content + CONTEXT_TRAILER)
+            for path, _, _, content in documents]
+
+
+def chunk_rows(documents, chunker):
+    return [(path, service_prefix(path) + " - " + heading + " DOCUMENT CONTENT: " + chunk)
+            for path, _, _, content in documents
+            for _, heading, chunk, _ in chunker().process(content)]
+
+
+class BM25:
+    """Okapi BM25 over (id, text) rows."""
+
+    def __init__(self, rows, k1=1.2, b=0.75):
+        self.rows = rows
+        self.k1, self.b = k1, b
+        self.term_counts = [Counter(WORD_PATTERN.findall(text.lower())) for _, text in rows]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = statistics.mean(self.lengths)
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        self.idf = {term: math.log(1 + (len(rows) - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def search(self, query, limit):
+        terms = WORD_PATTERN.findall(query.lower())
+        scores = []
+        for index, counts in enumerate(self.term_counts):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / self.average_length)
+            score = sum(self.idf[term] * counts[term] * (self.k1 + 1) / (counts[term] + norm)
+                        for term in terms if term in counts)
+            if score > 0:
+                scores.append((score, index))
+        return [self.rows[index] for _, index in sorted(scores, reverse=True)[:limit]]
+
+
+def load_questions(path):
+    with open(path) as f:
+        return [item["question"] for item in map(json.loads, filter(str.strip, f))
+                if item.get("category") in QUESTION_CATEGORIES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", nargs="*", default=[], help="ingest_documents.py change files to add")
+    parser.add_argument("--questions", type=Path, default=QUESTION_CORPUS)
+    parser.add_argument("--max-results", type=int, default=5)
+    args = parser.parse_args()
+
+    udf = exec_udf("05_rcm_cortex_search.sql", "CHUNK_RCM_DOCUMENT")
+    count_tokens = udf["count_tokens"]
+    documents = load_setup_documents()
+    for path in args.documents:
+        documents.extend(load_document_changes(path))
+    questions = load_questions(args.questions)
+
+    indexes = {"whole documents": document_rows(documents), "chunks": chunk_rows(documents, udf["ChunkRcmDocument"])}
+    results = {}
+    for label, rows in indexes.items():
+        bm25 = BM25(rows)
+        hits = [bm25.search(question, args.max_results) for question in questions]
+        results[label] = {
+            "rows": len(rows),
+            "row_tokens": statistics.mean(count_tokens(text) for _, text in rows),
+            "retrieved": [sum(count_tokens(text) for _, text in hit) for hit in hits],
+            "top_doc": [hit[0][0] if hit else None for hit in hits],
+        }
+
+    print(f"{len(documents)} documents, {len(questions)} questions, max_results={args.max_results}, "
+          f"chunks of <= {udf['CHUNK_MAX_TOKENS']} tokens with {udf['CHUNK_OVERLAP_TOKENS']} overlap")
+    print(f"{'index':<18}{'rows':>7}{'tokens/row':>12}{'tokens/query':>14}{'p95':>8}{'max':>8}")
+    for label, stats in results.items():
+        retrieved = sorted(stats["retrieved"])
+        print(f"{label:<18}{stats['rows']:>7}{stats['row_tokens']:>12.0f}{statistics.mean(retrieved):>14.0f}"
+              f"{retrieved[int(0.95 * (len(retrieved) - 1))]:>8}{retrieved[-1]:>8}")
+
+    before, after = (statistics.mean(results[label]["retrieved"]) for label in indexes)
+    same_top = sum(a == b for a, b in zip(*(results[label]["top_doc"] for label in indexes))) / len(questions)
+    print(f"Retrieved tokens per query: {before:.0f} -> {after:.0f} ({1 - after / before:.0%} fewer); "
+          f"same top doc for {same_top:.0%} of questions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark: search service refreshes, full rebuild vs. change-driven sources
+
+05_rcm_cortex_search.sql used to rebuild rcm_document_chunks from every
+document, and each *_DOCS_SEARCH service filtered it by path prefix, so a
+refresh re-embedded every chunk in the service's category. The services now
+index the source tables REFRESH_SEARCH_SOURCES maintains: documents queued
+by the stream are compared by content hash, and only chunks whose own hash
+changed are written.
+
+This replays a sequence of document changes through both, in Python. Chunks
+come from CHUNK_RCM_DOCUMENT and the source tables and path patterns from
+rcm_search_sources, both read from the SQL source. Each refresh reports the
+rows the services re-embed (rows_re_embedded in rcm_search_refresh_report)
+and their tokens.
+
+The corpus is the documents from 02_rcm_documents_setup.sql, repeated
+--copies times under numbered paths, plus any change files written by
+tools/ingest_documents.py.
+
+Usage:
+    python benchmarks/bench_search_refresh.py --copies 50
+    python benchmarks/bench_search_refresh.py --documents data/documents/rcm_document_changes.csv
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.document_corpus import load_document_changes, load_setup_documents
+from tools.sql_udf_loader import SETUP_DIR, exec_udf
+
+SEARCH_SQL = "05_rcm_cortex_search.sql"
+_SOURCE_ROW = re.compile(r"\('(\w+)', '(\w+)', '([^']*)'\)")
+
+
+def load_search_sources():
+    """{source_table: (search_service, compiled path pattern)} from the rcm_search_sources INSERT."""
+    sql = (SETUP_DIR / SEARCH_SQL).read_text()
+    values = sql.split("INSERT INTO rcm_search_sources VALUES", 1)[1].split(";", 1)[0]
+    return {table: (service, re.compile(
+                "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern),
+                re.IGNORECASE | re.DOTALL))
+            for table, service, pattern in _SOURCE_ROW.findall(values)}
+
+
+def sha256(*parts):
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+class SearchSources:
+    """The source tables as REFRESH_SEARCH_SOURCES maintains them: {table: {(path, ordinal): (hash, tokens)}}."""
+
+    def __init__(self, sources, chunker):
+        self.sources = sources
+        self.chunker = chunker
+        self.versions = {}
+        self.tables = {table: {} for table in sources}
+
+    def chunks(self, path, title, content):
+        file_url = "internal://" + path
+        return {(path, ordinal): (sha256(file_url, title, heading[:500], chunk), tokens)
+                for ordinal, heading, chunk, tokens in self.chunker().process(content)}
+
+    def refresh(self, documents, pending):
+        """Apply the queued paths; returns (documents changed, {table: (rows upserted, tokens)})."""
+        changed = {}
+        for path in pending:
+            title, content = documents.get(path, (None, None))
+            content_hash = sha256(title, content) if content is not None else None
+            if content_hash != self.versions.get(path):
+                changed[path] = self.chunks(path, title, content) if content is not None else {}
+                self.versions[path] = content_hash
+        upserts = {}
+        for table, (_, pattern) in self.sources.items():
+            rows = self.tables[table]
+            upserted = tokens = 0
+            for path, chunks in changed.items():
+                for key in [key for key in rows if key[0] == path and key not in chunks]:
+                    del rows[key]
+                if not pattern.fullmatch(path):
+                    continue
+                for key, (chunk_hash, chunk_tokens) in chunks.items():
+                    if rows.get(key, (None,))[0] != chunk_hash:
+                        rows[key] = (chunk_hash, chunk_tokens)
+                        upserted += 1
+                        tokens += chunk_tokens
+            upserts[table] = (upserted, tokens)
+        return len(changed), upserts
+
+
+def full_rebuild(documents, sources, chunker):
+    """{table: (rows, tokens)}: every chunk of every matching document, as the old rebuild re-embedded."""
+    chunks = {path: [tokens for _, _, _, tokens in chunker().process(content)]
+              for path, (_, content) in documents.items()}
+    return {table: (sum(len(chunks[path]) for path in chunks if pattern.fullmatch(path)),
+                    sum(sum(chunks[path]) for path in chunks if pattern.fullmatch(path)))
+            for table, (_, pattern) in sources.items()}
+
+
+def change_sequence(documents):
+    """[(label, {path: (title, content) or None})] applied in order; None deletes."""
+    paths = sorted(documents)
+    longest = max(paths, key=lambda path: len(documents[path][1]))
+    title, content = documents[longest]
+    paragraphs = content.split("\n\n")
+    middle = len(paragraphs) // 2
+    edited = "\n\n".join(paragraphs[:middle] + [paragraphs[middle] + " Updated for the 2025 payer policy."]
+                         + paragraphs[middle + 1:])
+    appended = edited + "\n\n## Payer Policy Update\n\nAppeals for CO-50 denials now need the signed order attached."
+    new_path = "/compliance/Payer_Contract_Addendum.md"
+    retitled = next(path for path in paths if path.startswith("/finance/"))
+    return [
+        ("initial load", {path: documents[path] for path in paths}),
+        ("re-upload, no edits", {path: documents[path] for path in paths}),
+        ("edit one paragraph", {longest: (title, edited)}),
+        ("append a section", {longest: (title, appended)}),
+        ("add a document", {new_path: ("Payer Contract Addendum", documents[paths[0]][1])}),
+        ("retitle a document", {retitled: ("Revised " + documents[retitled][0], documents[retitled][1])}),
+        ("delete a document", {new_path: None}),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", nargs="*", default=[], help="ingest_documents.py change files to add")
+    parser.add_argument("--copies", type=int, default=1, help="Copies of the setup documents under numbered paths")
+    args = parser.parse_args()
+
+    chunker = exec_udf(SEARCH_SQL, "CHUNK_RCM_DOCUMENT")["ChunkRcmDocument"]
+    sources = load_search_sources()
+    corpus = {}
+    for copy in range(args.copies):
+        for path, title, _, content in load_setup_documents():
+            numbered = path if copy == 0 else path.replace(".md", f"_{copy}.md")
+            corpus[numbered] = (title, content)
+    for path in args.documents:
+        corpus.update((path, (title, content)) for path, title, _, content in load_document_changes(path))
+
+    search = SearchSources(sources, chunker)
+    documents = {}
+    print(f"{len(corpus)} documents; rows re-embedded per refresh, summed over "
+          f"{len(sources)} services (tokens in thousands)")
+    short_names = {table: sources[table][0].replace("RCM_", "").replace("_SEARCH", "") for table in sources}
+    print(f"{'refresh':<22}{'docs':>6}{'full rows':>11}{'ktok':>7}{'incremental':>13}{'ktok':>7}  "
+          + "".join(f"{short_names[table]:>16}" for table in sources))
+    totals = [0, 0]
+    for label, changes in change_sequence(corpus):
+        for path, document in changes.items():
+            if document is None:
+                documents.pop(path, None)
+            else:
+                documents[path] = document
+        changed, upserts = search.refresh(documents, changes)
+        full = full_rebuild(documents, sources, chunker)
+        full_rows, full_tokens = (sum(values[i] for values in full.values()) for i in (0, 1))
+        rows, tokens = (sum(values[i] for values in upserts.values()) for i in (0, 1))
+        if label != "initial load":
+            totals[0] += full_rows
+            totals[1] += rows
+        print(f"{label:<22}{changed:>6}{full_rows:>11}{full_tokens / 1e3:>7.1f}{rows:>13}{tokens / 1e3:>7.1f}  "
+              + "".join(f"{upserts[table][0]:>16}" for table in sources))
+
+    consistent = all(set(search.tables[table]) == {
+        (path, ordinal) for path, (_, content) in documents.items() if pattern.fullmatch(path)
+        for ordinal, _, _, _ in chunker().process(content)} for table, (_, pattern) in sources.items())
+    print(f"After the initial load: {totals[0]} rows re-embedded by full rebuilds, {totals[1]} by change-driven "
+          f"refreshes; source tables match a full rebuild: {'yes' if consistent else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
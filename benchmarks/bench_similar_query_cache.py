@@ -0,0 +1,84 @@
+"""
+Benchmark: near-duplicate question cache hit rate vs. false matches
+
+Replays benchmarks/data/query_paraphrases.jsonl through the app's
+SimilarQueryCache at several thresholds. Each group holds rewordings of one
+question.
+
+- hits: the first question of every group is answered (put) and the others
+  are looked up; a hit from the question's own group saves an agent call
+- wrong: every question is looked up in a cache holding only the other
+  groups' answers, so any hit (lowest vs. highest, CO-45 vs. CO-97, Cigna
+  vs. Humana) would serve a wrong answer
+
+Usage:
+    python benchmarks/bench_similar_query_cache.py --thresholds 0.6 0.7 0.8 0.9 --verbose
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.app_loader import load_app, silence_bare_mode_warnings
+
+PARAPHRASES = Path(__file__).resolve().parent / "data" / "query_paraphrases.jsonl"
+
+
+def answered_cache(app, groups, threshold: float):
+    cache = app.SimilarQueryCache(threshold=threshold, ttl_seconds=3600, max_entries=1000)
+    for group in groups:
+        cache.put(group["questions"][0], "v1", {"response": group["group"]})
+    return cache
+
+
+def replay(app, groups, threshold: float, verbose: bool):
+    cache = answered_cache(app, groups, threshold)
+    hits = lookups = 0
+    timings = []
+    for group in groups:
+        for question in group["questions"][1:]:
+            started = time.perf_counter()
+            match = cache.get(question, "v1")
+            timings.append(time.perf_counter() - started)
+            lookups += 1
+            hits += match is not None and match[0]["response"] == group["group"]
+
+    wrong = 0
+    for group in groups:
+        others = answered_cache(app, [other for other in groups if other is not group], threshold)
+        for question in group["questions"]:
+            match = others.get(question, "v1")
+            if match is not None:
+                wrong += 1
+                if verbose:
+                    print(f"    wrong match at {threshold:.2f}: {question!r} -> {match[1]!r} ({match[2]:.2f})")
+    return hits, wrong, lookups, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paraphrases", type=Path, default=PARAPHRASES)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.4, 0.5, 0.6, 0.7, 0.8, 0.9])
+    parser.add_argument("--verbose", action="store_true", help="Print every wrong match")
+    args = parser.parse_args()
+
+    app = load_app()
+    silence_bare_mode_warnings()
+    with open(args.paraphrases) as f:
+        groups = [json.loads(line) for line in f if line.strip()]
+
+    results = [(threshold, replay(app, groups, threshold, args.verbose)) for threshold in args.thresholds]
+    print(f"{len(groups)} question groups, app threshold {app.SIMILAR_QUERY_THRESHOLD}")
+    questions = sum(len(group["questions"]) for group in groups)
+    print(f"{'threshold':>10}{'lookups':>9}{'hits':>6}{'hit rate':>10}{'wrong':>7}{'of':>5}{'lookup ms':>11}")
+    for threshold, (hits, wrong, lookups, median) in results:
+        print(f"{threshold:>10.2f}{lookups:>9}{hits:>6}{hits / lookups:>10.0%}{wrong:>7}{questions:>5}{median * 1e3:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: SQL fallback, one statement per question vs. batched completions
+
+Scores a question set through SNOWFLAKE.CORTEX.COMPLETE the way a bulk
+evaluation job would, against tools/fake_snowflake.py's FakeCortexSession
+(round trip and first-compile cost per statement, lognormal completion time
+per prompt):
+
+- inline: the old call_agent_sql_fallback, question text interpolated into
+  a new statement each time, blocking .collect() per question
+- bound, serial: the app's submit_completions() one question at a time
+- batched: submit_completions() with every question, FALLBACK_BATCH_SIZE
+  prompts per statement
+- batched, concurrent: smaller batches submitted together with
+  collect_nowait() and gathered
+
+Every mode must return each question's answer in order; the fake answers
+by keyword routing, so answers can be checked against the question.
+
+Usage:
+    python benchmarks/bench_sql_fallback_batch.py --copies 10 --batch-size 100 --concurrent-batch-size 25
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.app_loader import load_app, silence_bare_mode_warnings
+from tools.fake_agent_server import route_query
+from tools.fake_snowflake import FakeCortexSession, FakeSnowflakeConfig
+
+QUESTION_CORPUS = Path(__file__).resolve().parent / "data" / "question_corpus.jsonl"
+
+# call_agent_sql_fallback before batching
+INLINE_SQL = """
+SELECT PARSE_JSON(
+    SNOWFLAKE.CORTEX.COMPLETE(
+        '{model}',
+        [
+            {{
+                'role': 'user',
+                'content': '{prompt}'
+            }}
+        ]
+    )
+) as response
+"""
+
+
+def inline_results(app, session, questions):
+    results = []
+    for question in questions:
+        query = INLINE_SQL.format(model=app.AGENT_NAME, prompt=question.replace("'", "''"))
+        try:
+            rows = session.sql(query).collect()
+            results.append(app.parse_completion(rows[0]["RESPONSE"], []))
+        except Exception as e:
+            results.append({"success": False, "error": str(e)})
+    return results
+
+
+def run_mode(label, make_session, run):
+    session = make_session()
+    started = time.perf_counter()
+    results = run(session)
+    elapsed = time.perf_counter() - started
+    session.executor.shutdown()
+    return label, elapsed, session, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=Path, default=QUESTION_CORPUS)
+    parser.add_argument("--copies", type=int, default=10, help="Passes over the question set")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrent-batch-size", type=int, default=25)
+    parser.add_argument("--round-trip", type=float, default=0.08, help="Seconds per statement")
+    parser.add_argument("--compile", type=float, default=0.05, help="Seconds to compile a new statement text")
+    parser.add_argument("--completion-median", type=float, default=1.0, help="Median seconds per prompt")
+    parser.add_argument("--capacity", type=int, default=16, help="Prompts completed in parallel per statement")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="Shrinks every simulated delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of statements that fail")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    app = load_app()
+    silence_bare_mode_warnings()
+    with open(args.questions) as f:
+        questions = [json.loads(line)["question"] for line in f if line.strip()] * args.copies
+    expected = [route_query(question)["answer"] for question in questions]
+
+    def make_session():
+        return FakeCortexSession(FakeSnowflakeConfig(
+            run_median=args.completion_median, capacity=args.capacity, time_scale=args.time_scale,
+            error_rate=args.error_rate, seed=args.seed
+        ), round_trip=args.round_trip, compile_seconds=args.compile)
+
+    def batched(batch_size):
+        def run(session):
+            app.FALLBACK_BATCH_SIZE = batch_size
+            return app.submit_completions(session, questions).results()
+        return run
+
+    def serial(session):
+        app.FALLBACK_BATCH_SIZE = 1
+        return [app.submit_completions(session, [question]).results()[0] for question in questions]
+
+    modes = [
+        run_mode("inline, one per question", make_session, lambda session: inline_results(app, session, questions)),
+        run_mode("bound, one per question", make_session, serial),
+        run_mode(f"batched ({args.batch_size}/statement)", make_session, batched(args.batch_size)),
+        run_mode(f"batched, concurrent ({args.concurrent_batch_size}/statement)", make_session,
+                 batched(args.concurrent_batch_size)),
+    ]
+
+    print(f"{len(questions)} questions; simulated delays x{args.time_scale} "
+          f"(round trip {args.round_trip}s, compile {args.compile}s, completion median {args.completion_median}s)")
+    print(f"{'mode':<40}{'wall s':>8}{'q/s':>8}{'statements':>12}{'texts':>7}{'compiles':>10}{'ok':>6}{'in order':>10}")
+    baseline = modes[0][1]
+    for label, elapsed, session, results in modes:
+        ok = sum(result.get("success", False) for result in results)
+        in_order = all(result.get("response") == answer
+                       for result, answer in zip(results, expected) if result.get("success"))
+        print(f"{label:<40}{elapsed:>8.2f}{len(questions) / elapsed:>8.1f}{session.calls['statements']:>12}"
+              f"{len(session.statement_texts):>7}{session.calls['compiles']:>10}{ok:>6}{'yes' if in_order else 'NO':>10}"
+              f"   {baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Benchmark: cold start, session before first paint vs. the deferred startup path
+
+Opens the app (setup/08_streamlit_app.py, run by Streamlit's AppTest) in a
+fresh Python process per trial, so module imports and st.cache_resource
+start cold like a new viewer's app process, and asks one question after the
+viewer has read the welcome screen for --think-seconds. The backend is
+simulated:
+
+- get_active_session(): the real snowflake.snowpark import, then
+  --session-seconds
+- the warehouse: tools/fake_snowflake.py's FakeWarehouse, suspended when the
+  page opens; the first statement or agent :run waits --resume-seconds
+- SQL: tools/local_session.py's SQLite stand-in, run on that warehouse
+- the agent: FakeSnowflakeBackend (blocking :run, fixed latencies)
+
+Two startup paths:
+
+- eager: FAST_STARTUP_ENABLED = False, the session attached before anything
+  is drawn and no warm-up (the old startup)
+- deferred: the app's default, first paint first, then the session and a
+  background warm-up of the warehouse and agent endpoint
+
+Reports time to first paint (the welcome message sent to the browser), time
+until the script finished, and time to first answer from page open, with
+the answer's own latency.
+
+Usage:
+    python benchmarks/bench_startup.py --trials 3 --resume-seconds 2 --think-seconds 3
+"""
+
+import argparse
+import importlib.abc
+import importlib.machinery
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.app_loader import APP_PATH
+
+QUESTIONS = {
+    "kpi": "Which payers have the highest denial rates?",
+    "agent": "What can you help me with?",
+}
+MODES = {"eager": False, "deferred": True}
+
+
+class PatchOnImport(importlib.abc.MetaPathFinder):
+    """Swap snowflake.snowpark.context.get_active_session once the app imports the real module."""
+
+    def __init__(self, replacement):
+        self.replacement = replacement
+
+    def find_spec(self, name, path, target=None):
+        if name != "snowflake.snowpark.context":
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(name, path)
+        exec_module = spec.loader.exec_module
+
+        def patched(module):
+            exec_module(module)
+            module.get_active_session = self.replacement
+
+        spec.loader.exec_module = patched
+        return spec
+
+
+class WarehouseSession:
+    """Stand-in session whose statements run on a FakeWarehouse."""
+
+    def __init__(self, session, warehouse):
+        self._session = session
+        self._warehouse = warehouse
+
+    def sql(self, query, params=None):
+        return OnWarehouse(self._session.sql(query, params), self._warehouse)
+
+
+class OnWarehouse:
+    def __init__(self, frame, warehouse):
+        self._frame = frame
+        self._warehouse = warehouse
+
+    def __getattr__(self, name):
+        method = getattr(self._frame, name)
+
+        def run(*args, **kwargs):
+            self._warehouse.use()
+            return method(*args, **kwargs)
+        return run
+
+
+def child(args):
+    """One cold page open and first question; prints the timings as JSON."""
+    from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+    from streamlit.testing.v1 import AppTest
+
+    from tools.app_loader import silence_bare_mode_warnings
+    from tools.fake_snowflake import FakeSnowflakeBackend, FakeSnowflakeConfig, FakeWarehouse
+    from tools.local_session import build_local_session
+
+    warehouse = FakeWarehouse(resume_seconds=args.resume_seconds)
+    session = WarehouseSession(build_local_session(args.claims), warehouse)
+
+    def get_active_session():
+        time.sleep(args.session_seconds)
+        return session
+
+    sys.meta_path.insert(0, PatchOnImport(get_active_session))
+    backend = FakeSnowflakeBackend(FakeSnowflakeConfig(
+        distribution="fixed", run_median=args.run_seconds, thread_median=args.thread_seconds), warehouse=warehouse)
+
+    painted = []
+    enqueue = ScriptRunContext.enqueue
+
+    def recording_enqueue(self, msg):
+        if not painted and msg.HasField("delta") and b"Welcome to the RCM" in msg.SerializeToString():
+            painted.append(time.perf_counter())
+        return enqueue(self, msg)
+
+    ScriptRunContext.enqueue = recording_enqueue
+    source = APP_PATH.read_text().replace(
+        "FAST_STARTUP_ENABLED = True", f"FAST_STARTUP_ENABLED = {MODES[args.mode]}")
+
+    with backend.installed():
+        at = AppTest.from_string(source, default_timeout=120)
+        at.session_state["streaming"] = False
+        silence_bare_mode_warnings()
+        opened = time.perf_counter()
+        at.run()
+        ready = time.perf_counter()
+        first_paint = painted[0] if painted else ready
+
+        # The viewer reads the welcome screen, then asks
+        time.sleep(max(0.0, first_paint + args.think_seconds - time.perf_counter()))
+        asked = time.perf_counter()
+        at.chat_input[0].set_value(QUESTIONS[args.question]).run()
+        answered = time.perf_counter()
+        metadata = at.session_state["messages"][-1]["metadata"]
+
+    print(json.dumps({
+        "first_paint": first_paint - opened,
+        "ready": ready - opened,
+        "first_answer": answered - opened,
+        "answer": answered - asked,
+        "resumes": warehouse.resumes,
+        "describe": backend.calls["describe"],
+        "success": bool(metadata.get("success")) and not at.exception,
+    }))
+
+
+def run_child(args, mode, question):
+    command = [sys.executable, __file__, "--child", "--mode", mode, "--question", question]
+    for name in ("claims", "session_seconds", "resume_seconds", "run_seconds", "thread_seconds", "think_seconds"):
+        command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=3, help="Cold processes per mode and question")
+    parser.add_argument("--claims", type=int, default=20_000, help="claims_fact rows in the stand-in")
+    parser.add_argument("--session-seconds", type=float, default=0.3, help="get_active_session() after the import")
+    parser.add_argument("--resume-seconds", type=float, default=2.0, help="Warehouse resume time")
+    parser.add_argument("--run-seconds", type=float, default=1.0, help="Agent :run latency")
+    parser.add_argument("--thread-seconds", type=float, default=0.15, help="Thread creation latency")
+    parser.add_argument("--think-seconds", type=float, default=3.0, help="Time on the welcome screen")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--question", choices=QUESTIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    print(f"{args.trials} cold processes per row; warehouse resume {args.resume_seconds}s, get_active_session "
+          f"{args.session_seconds}s after import, agent :run {args.run_seconds}s, {args.think_seconds}s on the "
+          f"welcome screen; medians in seconds")
+    print(f"{'question':<10}{'mode':<10}{'first paint':>13}{'ready':>8}{'first answer':>14}{'answer':>9}"
+          f"{'resumes':>9}{'pings':>7}{'ok':>5}")
+    for question in QUESTIONS:
+        for mode in MODES:
+            trials = [run_child(args, mode, question) for _ in range(args.trials)]
+
+            def median(key):
+                values = sorted(trial[key] for trial in trials)
+                return values[len(values) // 2]
+
+            print(f"{question:<10}{mode:<10}{median('first_paint'):>13.2f}{median('ready'):>8.2f}"
+                  f"{median('first_answer'):>14.2f}{median('answer'):>9.2f}{median('resumes'):>9}"
+                  f"{median('describe'):>7}{'yes' if all(trial['success'] for trial in trials) else 'NO':>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: streaming vs. blocking agent responses
+
+Starts tools/fake_agent_server.py on an ephemeral port, points the app's
+streaming client at it and measures time-to-first-token against total latency.
+In the blocking path nothing is shown until the full answer arrives, so its
+time-to-first-paint equals its total latency.
+
+Usage:
+    python benchmarks/bench_streaming.py --runs 20 --token-delay 0.02
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.app_loader import load_app
+from tools.fake_agent_server import FakeAgentConfig, start_fake_agent_server
+
+QUESTIONS = [
+    "Which payers have the highest denial rates?",
+    "How do I resolve a Code 45 denial in ServiceNow?",
+    "What is the clean claim rate by provider?",
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_blocking(app, base_url, query):
+    """Time a non-streaming :run call against the fake endpoint."""
+    request = urllib.request.Request(
+        base_url + f"{app.AGENT_API_PATH}:run",
+        data=json.dumps({"query": query}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=app.AGENT_RUN_TIMEOUT) as response:
+        json.loads(response.read())
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--planning-delay", type=float, default=0.3)
+    parser.add_argument("--tool-delay", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    config = FakeAgentConfig(args.planning_delay, args.tool_delay, args.token_delay)
+    server, base_url = start_fake_agent_server(config=config)
+
+    app = load_app()
+    app.AGENT_HOST = base_url
+
+    ttft, stream_total, blocking_total = [], [], []
+    try:
+        for run in range(args.runs):
+            query = QUESTIONS[run % len(QUESTIONS)]
+
+            result = app.call_agent_streaming(query)
+            if not result["success"]:
+                raise SystemExit(f"Streaming call failed: {result.get('error')}")
+            ttft.append(result["timings"]["time_to_first_token"])
+            stream_total.append(result["timings"]["total_time"])
+
+            blocking_total.append(run_blocking(app, base_url, query))
+    finally:
+        server.shutdown()
+
+    print(f"Runs: {args.runs}  (planning={args.planning_delay}s tool={args.tool_delay}s token={args.token_delay}s)")
+    print(f"{'metric':<32}{'p50':>10}{'p95':>10}{'mean':>10}")
+    for label, values in [
+        ("streaming time-to-first-token", ttft),
+        ("streaming total latency", stream_total),
+        ("blocking time-to-first-paint", blocking_total),
+    ]:
+        print(f"{label:<32}{percentile(values, 50):>9.3f}s{percentile(values, 95):>9.3f}s"
+              f"{statistics.mean(values):>9.3f}s")
+
+
+if __name__ == "__main__":
+    main()
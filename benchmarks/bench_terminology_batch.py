@@ -0,0 +1,127 @@
+"""
+Benchmark: scalar terminology UDF chain vs ENHANCE_RCM_QUERY_BATCH
+
+Selecting GET_ENHANCED_QUERY, HAS_RCM_TERMS and GET_RCM_TERMS for a row used
+to run the scalar Python ENHANCE_RCM_QUERY three times; the chain is timed as
+three uncached per-question evaluations. ENHANCE_RCM_QUERY_BATCH gets
+the rows as pandas batches and returns all three outputs from one evaluation
+per distinct question. Both handlers are executed straight from
+setup/07_rcm_native_agent_production.sql against a generated question log
+(1M rows by default), processed in batches of the UDF's MAX_BATCH_SIZE the
+way the warehouse would hand them over.
+
+Usage:
+    python benchmarks/bench_terminology_batch.py --rows 1000000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_terminology_matcher import BASE_CODES, BASE_TERMS, load_trie_udf
+from tools.sql_udf_loader import exec_udf
+
+SQL_FILE = "07_rcm_native_agent_production.sql"
+
+TEMPLATES = [
+    "What is the denial rate for {code} remits from {payer}?",
+    "Show me clean claim rates for {payer} in {month}",
+    "How many days in AR for {payer} claims with timely filing denials?",
+    "Which providers get the most {code} adjustments on their ERA files?",
+    "Compare appeal success rates by denial code for {payer} in {month}",
+    "What is the average reimbursement for {payer} in {month}?",
+    "How do I appeal a {code} denial from {payer}?",
+    "Top denial reasons for {payer} last month",
+]
+PAYERS = ["Medicare", "Medicaid (Illinois)", "Blue Cross", "Aetna", "Cigna", "Humana",
+          "UnitedHealthcare", "Self-Pay", "Anthem", "Kaiser"]
+MONTHS = [f"2024-{month:02d}" for month in range(1, 13)]
+
+
+def generate_questions(rows: int, seed: int = 42) -> pd.Series:
+    """A question log with the repetition real usage has (templates x payers x codes x months)."""
+    rng = np.random.default_rng(seed)
+    codes = list(BASE_CODES) + ["N130", "MA01", "CO-97", "CO-197", "PR-2"]
+    template_idx = rng.integers(0, len(TEMPLATES), rows)
+    payer_idx = rng.integers(0, len(PAYERS), rows)
+    code_idx = rng.integers(0, len(codes), rows)
+    month_idx = rng.integers(0, len(MONTHS), rows)
+
+    # Render each distinct combination once, then index into it
+    keys = ((template_idx * len(PAYERS) + payer_idx) * len(codes) + code_idx) * len(MONTHS) + month_idx
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    rendered = []
+    for key in unique_keys:
+        key, month = divmod(int(key), len(MONTHS))
+        key, code = divmod(key, len(codes))
+        template, payer = divmod(key, len(PAYERS))
+        rendered.append(TEMPLATES[template].format(code=codes[code], payer=PAYERS[payer], month=MONTHS[month]))
+    return pd.Series(np.asarray(rendered, dtype=object)[inverse], name="question_text")
+
+
+def run_scalar_chain(enhance_query, questions: pd.Series):
+    """GET_ENHANCED_QUERY + HAS_RCM_TERMS + GET_RCM_TERMS: three scalar calls per row."""
+    results = []
+    for question in questions:
+        enhanced = enhance_query(question)["enhanced_query"]
+        has_terms = enhance_query(question)["has_enhancements"]
+        terms = enhance_query(question)["terms_detected"]
+        results.append((enhanced, has_terms, terms))
+    return results
+
+
+def run_batch(enhance_batch, questions: pd.Series, batch_size: int):
+    """ENHANCE_RCM_QUERY_BATCH over warehouse-sized pandas batches."""
+    results = []
+    for start in range(0, len(questions), batch_size):
+        batch = questions.iloc[start:start + batch_size].to_frame().set_axis([0], axis=1)
+        results.append(enhance_batch(batch))
+    return pd.concat(results, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the generated question log")
+    parser.add_argument("--scalar-rows", type=int, default=None,
+                        help="Time the scalar chain on a prefix and extrapolate (default: all rows)")
+    args = parser.parse_args()
+
+    questions = generate_questions(args.rows)
+    print(f"{len(questions):,} questions, {questions.nunique():,} distinct")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        enhance_query, _ = load_trie_udf(BASE_TERMS, BASE_CODES, Path(tmp))
+        batch_udf = exec_udf(SQL_FILE, "ENHANCE_RCM_QUERY_BATCH", tmp)
+
+    scalar_sample = questions.iloc[:args.scalar_rows] if args.scalar_rows else questions
+    started = time.perf_counter()
+    scalar_results = run_scalar_chain(enhance_query, scalar_sample)
+    scalar_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch_results = run_batch(batch_udf["enhance_batch"], questions, batch_udf["MAX_BATCH_SIZE"])
+    batch_seconds = time.perf_counter() - started
+
+    # Same three outputs for every row the scalar chain evaluated
+    for (enhanced, has_terms, terms), batch_result in zip(scalar_results, batch_results):
+        if (enhanced, has_terms, terms) != (batch_result["enhanced_query"], batch_result["has_enhancements"],
+                                             batch_result["terms_detected"]):
+            raise SystemExit(f"Mismatch for {batch_result['original_query']!r}")
+
+    scalar_rate = len(scalar_sample) / scalar_seconds
+    batch_rate = len(questions) / batch_seconds
+    print(f"{'mode':<28}{'rows':>12}{'seconds':>10}{'rows/sec':>14}")
+    print(f"{'scalar chain (3 calls/row)':<28}{len(scalar_sample):>12,}{scalar_seconds:>10.2f}{scalar_rate:>14,.0f}")
+    print(f"{'ENHANCE_RCM_QUERY_BATCH':<28}{len(questions):>12,}{batch_seconds:>10.2f}{batch_rate:>14,.0f}")
+    print(f"speedup: {batch_rate / scalar_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark: ENHANCE_RCM_QUERY terminology matcher
+
+Compares the original implementation (dictionaries rebuilt per call, one
+re.search per term) against the token-trie matcher shipped in
+setup/07_rcm_native_agent_production.sql, at the original 25 entries
+(20 terms + 5 codes) and padded to 500 and 5000 dictionary
+entries. The matcher is ENHANCE_RCM_QUERY_BATCH's per-question function,
+timed without its result cache and executed straight from the SQL script with
+a generated rcm_terminology.json standing in for the staged import.
+
+Usage:
+    python benchmarks/bench_terminology_matcher.py --calls 2000
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.sql_udf_loader import exec_udf
+
+# The original 20 terms and 5 denial codes from ENHANCE_RCM_QUERY
+BASE_TERMS = {
+    "remit": "remittance advice (ERA - Electronic Remittance Advice)",
+    "remits": "remittance advice documents",
+    "write-off": "contractual adjustment or bad debt write-off (adjustment codes CO-45, PR-1)",
+    "clean claim": "claim submitted without errors that is accepted on first submission",
+    "dirty claim": "claim requiring correction or additional information before processing",
+    "scrub": "automated claim validation and error checking before submission",
+    "aging": "accounts receivable aging - time since claim submission",
+    "a/r": "accounts receivable",
+    "ar": "accounts receivable",
+    "days in ar": "average days in accounts receivable (DSO - Days Sales Outstanding)",
+    "dso": "days sales outstanding",
+    "denial code": "claim adjustment reason code (CARC) or remittance advice remark code (RARC)",
+    "co": "contractual obligation (payer responsibility adjustment)",
+    "pr": "patient responsibility (patient owes amount)",
+    "timely filing": "claim submission deadline per payer contract",
+    "coordination of benefits": "COB - determining primary vs secondary payer responsibility",
+    "cob": "coordination of benefits",
+    "eob": "explanation of benefits",
+    "era": "electronic remittance advice",
+    "edi": "electronic data interchange"
+}
+BASE_CODES = {
+    "CO-45": "CO-45 (Contractual Obligation - charge exceeds fee schedule)",
+    "PR-1": "PR-1 (Patient Responsibility - deductible)",
+    "CO-16": "CO-16 (Claim/service lacks information)",
+    "CO-29": "CO-29 (Time limit for filing has expired)",
+    "CO-50": "CO-50 (Non-covered service)"
+}
+
+QUERIES = [
+    "What is the denial rate for CO-45 remits?",
+    "Show me clean claim rates by provider",
+    "How many days in AR for Medicaid claims with timely filing denials?",
+    "Which payers send the most PR-1 and CO16 adjustments on their ERA files?",
+    "Explain coordination of benefits and when a write-off is allowed",
+    "Compare appeal success rates by denial code for Blue Cross",
+    "What is our market strategy for 2025?",
+    "List the top N130 and MA01 remark codes on EOBs from last quarter",
+]
+
+
+def build_dictionary(size: int, seed: int = 7):
+    """Return (terms, codes) with the original entries padded to size with synthetic ones."""
+    rng = random.Random(seed)
+    terms = dict(BASE_TERMS)
+    codes = dict(BASE_CODES)
+
+    groups = ["CO", "PR", "OA", "PI", "CR"]
+    rarc_prefixes = ["M", "N", "MA"]
+    words = ["claim", "payer", "prior", "auth", "bundled", "modifier", "charge", "edit", "pended",
+             "adjustment", "secondary", "crossover", "capitation", "episode", "facility", "drg"]
+
+    while len(terms) + len(codes) < size:
+        kind = rng.random()
+        if kind < 0.45:
+            code = f"{rng.choice(groups)}-{rng.randint(1, 299)}"
+            codes.setdefault(code, f"{code} (synthetic CARC)")
+        elif kind < 0.8:
+            code = f"{rng.choice(rarc_prefixes)}{rng.randint(1, 999)}"
+            codes.setdefault(code, f"{code} (synthetic RARC)")
+        else:
+            phrase = " ".join(rng.sample(words, rng.randint(1, 3)))
+            terms.setdefault(phrase, f"{phrase} (synthetic term)")
+    return terms, codes
+
+
+def legacy_enhance_query(query, terms, codes):
+    """The original per-call algorithm, with the dictionaries passed in."""
+    # Original rebuilt both dicts on every call
+    terminology = dict(terms)
+    denial_codes = {
+        r'\b' + r'-?'.join(re.escape(part) for part in code.split("-")) + r'\b': description
+        for code, description in codes.items()
+    }
+
+    detected_terms = []
+    query_lower = query.lower()
+
+    for term, definition in terminology.items():
+        pattern = r'\b' + re.escape(term) + r'\b'
+        if re.search(pattern, query_lower, re.IGNORECASE):
+            detected_terms.append({"term": term, "definition": definition})
+
+    for pattern, description in denial_codes.items():
+        if re.search(pattern, query, re.IGNORECASE):
+            detected_terms.append({"term": pattern.replace(r'\b', ''), "definition": description})
+
+    if detected_terms:
+        context = "RCM Terminology Context:\n"
+        for item in detected_terms:
+            context += f"- {item['term']}: {item['definition']}\n"
+        return {"enhanced_query": f"{context}\n\nUser Query: {query}", "terms_detected": detected_terms}
+    return {"enhanced_query": query, "terms_detected": []}
+
+
+def load_trie_udf(terms, codes, workdir: Path):
+    """Write the dictionary as the staged JSON file and load the shipped UDF body."""
+    with open(workdir / "rcm_terminology.json", "w") as f:
+        for term, definition in terms.items():
+            f.write(json.dumps({"term": term, "definition": definition, "term_type": "TERM"}) + "\n")
+        for code, definition in codes.items():
+            code_type = "CARC" if "-" in code else "RARC"
+            f.write(json.dumps({"term": code, "definition": definition, "term_type": code_type}) + "\n")
+
+    started = time.perf_counter()
+    namespace = exec_udf("07_rcm_native_agent_production.sql", "ENHANCE_RCM_QUERY_BATCH", workdir)
+    return namespace["enhance_query"].__wrapped__, time.perf_counter() - started
+
+
+def time_calls(func, calls: int):
+    started = time.perf_counter()
+    for index in range(calls):
+        func(QUERIES[index % len(QUERIES)])
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000, help="Calls per implementation and size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[25, 500, 5000])
+    args = parser.parse_args()
+
+    print(f"{'entries':>8}{'legacy us/call':>16}{'trie us/call':>14}{'speedup':>10}{'trie build ms':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            terms, codes = build_dictionary(size)
+            trie_enhance, build_seconds = load_trie_udf(terms, codes, Path(tmp))
+
+            # Same detections on the shipped sample queries (order may differ)
+            for query in QUERIES:
+                legacy_terms = {item["definition"] for item in legacy_enhance_query(query, terms, codes)["terms_detected"]}
+                trie_terms = {item["definition"] for item in trie_enhance(query)["terms_detected"]}
+                if legacy_terms != trie_terms:
+                    raise SystemExit(f"Mismatch at {size} entries for {query!r}: {legacy_terms ^ trie_terms}")
+
+            legacy = time_calls(lambda q: legacy_enhance_query(q, terms, codes), args.calls)
+            trie = time_calls(trie_enhance, args.calls)
+            print(f"{len(terms) + len(codes):>8}{legacy * 1e6:>16.1f}{trie * 1e6:>14.1f}"
+                  f"{legacy / trie:>9.1f}x{build_seconds * 1e3:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: time-to-first-answer with and without thread prefetch
+
+Measures, from the moment the first question is submitted to the moment its
+answer is back, using the app's create_thread(), call_agent() and
+ThreadPrefetcher against the fake _snowflake backend:
+
+- serial:        create_thread() then call_agent(), as before prefetching
+- prefetch (0s): thread creation started at session start, question asked
+                 immediately; :run needs the thread id, so little is hidden
+- prefetch:      question asked after --think-time, thread already created
+- new session:   "New Session" with a warm spare pool
+
+Usage:
+    python benchmarks/bench_thread_prefetch.py --runs 10 --thread-latency 0.4 --run-latency 1.2
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_streaming import percentile
+from tools.app_loader import load_app, silence_bare_mode_warnings
+from tools.fake_snowflake import FakeSnowflakeBackend, FakeSnowflakeConfig
+
+QUESTION = "Which payers have the highest denial rates?"
+
+
+def time_serial(app):
+    started = time.perf_counter()
+    thread_id = app.create_thread()
+    app.call_agent(QUESTION, thread_id)
+    return time.perf_counter() - started
+
+
+def time_prefetched(app, prefetcher, think_time: float):
+    pending = prefetcher.take()  # init_session_state
+    time.sleep(think_time)  # user reads the welcome message and types
+    started = time.perf_counter()
+    app.call_agent(QUESTION, pending.result())
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--thread-latency", type=float, default=0.4, help="Seconds per threads call")
+    parser.add_argument("--run-latency", type=float, default=1.2, help="Seconds per :run call")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Seconds before the first question")
+    args = parser.parse_args()
+
+    backend = FakeSnowflakeBackend(FakeSnowflakeConfig(
+        distribution="fixed", run_median=args.run_latency, thread_median=args.thread_latency
+    ))
+    app = load_app()
+    silence_bare_mode_warnings()
+    app.st.session_state.session = None
+
+    results = {"serial": [], "prefetch (asked at once)": [], f"prefetch ({args.think_time:g}s think time)": [],
+               "new session (warm pool)": []}
+    with backend.installed():
+        for _ in range(args.runs):
+            results["serial"].append(time_serial(app))
+
+            # A cold prefetcher per run so the first take() has no spare to hand out
+            cold = app.ThreadPrefetcher(pool_size=0)
+            results["prefetch (asked at once)"].append(time_prefetched(app, cold, 0.0))
+            results[f"prefetch ({args.think_time:g}s think time)"].append(time_prefetched(app, cold, args.think_time))
+
+        warm = app.ThreadPrefetcher()
+        warm.take()
+        time.sleep(args.thread_latency * 2)  # let the spares finish
+        for _ in range(args.runs):
+            results["new session (warm pool)"].append(time_prefetched(app, warm, 0.0))
+            time.sleep(args.thread_latency * 1.5)  # pool refills between clicks
+
+    baseline = statistics.mean(results["serial"])
+    print(f"threads={args.thread_latency}s  :run={args.run_latency}s  runs={args.runs}")
+    print(f"{'time to first answer':<32}{'p50':>9}{'p95':>9}{'mean':>9}{'saved':>9}")
+    for label, values in results.items():
+        mean = statistics.mean(values)
+        print(f"{label:<32}{percentile(values, 50):>8.3f}s{percentile(values, 95):>8.3f}s{mean:>8.3f}s"
+              f"{baseline - mean:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark: trace export, one INSERT per question vs. the buffered span export
+
+Answers questions through the app's streaming path (call_agent_streaming
+against tools/fake_agent_server.py, so tool spans carry real timings) with a
+trace active, then exports the spans to a FakeCortexSession
+(tools/fake_snowflake.py) that pays a round trip per statement:
+
+- per question: spans inserted with a blocking .collect() after each answer,
+  the write round trip a naive exporter adds to every question
+- buffered: the app's finish_trace() / SpanBuffer, bulk INSERTs started with
+  collect_nowait() once TRACE_FLUSH_SPANS spans are waiting
+
+Reports the time each question spends exporting, statement counts, whether
+every span arrived (--error-rate fails inserts to exercise the retry), and
+the p95 views of 07_rcm_native_agent_production.sql computed over the
+exported rows.
+
+Usage:
+    python benchmarks/bench_trace_export.py --questions 400 --concurrency 8 --round-trip 0.05
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_streaming import percentile
+from tools.app_loader import load_app, silence_bare_mode_warnings
+from tools.fake_agent_server import FakeAgentConfig, start_fake_agent_server
+from tools.fake_snowflake import FakeCortexSession, FakeSnowflakeConfig
+
+QUESTION_CORPUS = Path(__file__).resolve().parent / "data" / "question_corpus.jsonl"
+
+
+def answer(app, question, session_id):
+    trace = app.start_trace(question, session_id)
+    result = app.call_agent_streaming(question)
+    return trace, result
+
+
+def run_mode(app, mode, questions, session, concurrency):
+    """Answer every question, exporting spans per mode; returns export timings and span count."""
+    buffer = app.SpanBuffer()
+    app.get_span_buffer = lambda: buffer
+
+    def ask(indexed_question):
+        index, question = indexed_question
+        trace, result = answer(app, question, f"session-{index % concurrency}")
+        started = time.perf_counter()
+        if mode == "per question":
+            app._active_trace.trace = None
+            spans = trace.finish(result)
+            try:
+                session.sql(app.TELEMETRY_INSERT_SQL, params=[json.dumps(spans, default=str)]).collect()
+            except Exception:
+                pass  # No buffer to retry from: these spans are lost
+        else:
+            app.finish_trace(trace, result, session)
+            spans = trace.spans
+        return time.perf_counter() - started, len(spans)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(ask, enumerate(questions)))
+    wall = time.perf_counter() - started
+
+    # Drain what is still buffered (retrying failed inserts) before checking
+    for _ in range(20):
+        if len(buffer) == 0:
+            break
+        buffer.flush(session, wait=True)
+    buffer.flush(session, wait=True)
+    return [seconds for seconds, _ in outcomes], sum(count for _, count in outcomes), wall, buffer
+
+
+def print_views(rows):
+    spans = pd.DataFrame(rows)
+    queries = spans[spans["kind"] == "query"]
+
+    def p95(values):
+        return values.quantile(0.95)
+
+    print()
+    print("rcm_latency_by_operation")
+    operations = spans[spans["kind"] == "operation"].groupby("name")["duration_ms"]
+    print(pd.DataFrame({"spans": operations.size(), "p50_ms": operations.median(), "p95_ms": operations.apply(p95)})
+          .round(1).to_string())
+
+    print()
+    print("rcm_latency_by_tool")
+    tools = spans[spans["kind"] == "tool"].merge(
+        queries[["trace_id", "duration_ms"]], on="trace_id", suffixes=("", "_question"))
+    grouped = tools.groupby(["tool_name", "tool_type"])
+    print(pd.DataFrame({"tool_calls": grouped.size(), "tool_p95_ms": grouped["duration_ms"].apply(p95),
+                        "question_p95_ms": grouped["duration_ms_question"].apply(p95)}).round(1).to_string())
+
+    print()
+    print("rcm_latency_by_category")
+    grouped = queries.groupby("question_category")
+    print(pd.DataFrame({"questions": grouped.size(), "p50_ms": grouped["duration_ms"].median(),
+                        "p95_ms": grouped["duration_ms"].apply(p95),
+                        "total_cost_usd": grouped["estimated_cost_usd"].sum()}).round(4).to_string())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--round-trip", type=float, default=0.05, help="Seconds per INSERT statement")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of INSERT statements that fail")
+    parser.add_argument("--flush-spans", type=int, default=200, help="TRACE_FLUSH_SPANS")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    app = load_app()
+    silence_bare_mode_warnings()
+    app.TRACE_FLUSH_SPANS = args.flush_spans
+    server, base_url = start_fake_agent_server(
+        config=FakeAgentConfig(planning_delay=0.01, tool_delay=0.02, token_delay=0.001))
+    app.AGENT_HOST = base_url
+    with open(QUESTION_CORPUS) as f:
+        corpus = [json.loads(line)["question"] for line in f if line.strip()]
+    questions = [corpus[i % len(corpus)] for i in range(args.questions)]
+
+    print(f"{args.questions} questions, concurrency {args.concurrency}, {args.round_trip * 1e3:.0f} ms per INSERT, "
+          f"insert error rate {args.error_rate:.0%}, TRACE_FLUSH_SPANS={args.flush_spans}")
+    print(f"{'mode':<16}{'export p50':>12}{'p95':>10}{'max':>10}{'statements':>12}{'failed':>8}"
+          f"{'spans':>8}{'stored':>8}{'wall s':>8}")
+    try:
+        for mode in ("per question", "buffered"):
+            session = FakeCortexSession(FakeSnowflakeConfig(error_rate=args.error_rate, seed=args.seed),
+                                        round_trip=args.round_trip, compile_seconds=0.0)
+            timings, spans, wall, buffer = run_mode(app, mode, questions, session, args.concurrency)
+            print(f"{mode:<16}{percentile(timings, 50) * 1e3:>10.2f}ms{percentile(timings, 95) * 1e3:>8.2f}ms"
+                  f"{max(timings) * 1e3:>8.2f}ms{session.calls['statements']:>12}{session.calls['errors']:>8}"
+                  f"{spans:>8}{len(session.inserted_rows):>8}{wall:>8.2f}")
+            session.executor.shutdown()
+    finally:
+        server.shutdown()
+
+    print_views(session.inserted_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Load test: concurrent analysts on the create_thread / call_agent path
+
+Replays a question corpus through the app's own create_thread() and
+call_agent() from a thread pool, one worker per simulated analyst session,
+with tools/fake_snowflake.py standing in for _snowflake. Reports throughput,
+latency percentiles, error rates and token usage per question category.
+--max-error-rate gates on the error rate over all agent requests: a category
+with a handful of requests swings past any threshold on one failure. With the
+same --seed the fake backend injects the same faults on every run.
+
+The corpus is the app's sample-question buttons plus any JSONL files given
+with --corpus (one {"question": ..., "category": ...} object per line;
+defaults to benchmarks/data/question_corpus.jsonl).
+
+Usage:
+    python benchmarks/load_test_agent.py --concurrency 50 --requests 500
+    python benchmarks/load_test_agent.py --time-scale 0.01 --error-rate 0.05 --max-error-rate 0.1   # CI
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_streaming import percentile
+from tools.app_loader import load_app, silence_bare_mode_warnings
+from tools.fake_snowflake import LATENCY_DISTRIBUTIONS, FakeSnowflakeBackend, FakeSnowflakeConfig
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "data" / "question_corpus.jsonl"
+
+# The sample-question buttons in main()
+SAMPLE_QUESTIONS = [
+    ("What is the clean claim rate by provider?", "analytics"),
+    ("Which payers have the highest denial rates?", "analytics"),
+    ("How do I resolve a Code 45 denial in ServiceNow?", "knowledge_base"),
+    ("Find our HIPAA compliance requirements for claims processing", "knowledge_base"),
+    ("What can you help me with?", "general"),
+    ("Explain the key RCM metrics I should focus on", "general"),
+]
+
+
+def load_corpus(paths):
+    """Sample questions plus every (question, category) pair in the JSONL files."""
+    corpus = list(SAMPLE_QUESTIONS)
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    corpus.append((item["question"], item.get("category", "uncategorized")))
+    return corpus
+
+
+def build_sessions(corpus, requests: int, questions_per_session: int, seed: int):
+    """Split the request budget into analyst sessions of consecutive questions."""
+    rng = random.Random(seed)
+    picks = [rng.choice(corpus) for _ in range(requests)]
+    return [picks[start:start + questions_per_session] for start in range(0, requests, questions_per_session)]
+
+
+def run_session(app, questions, think_time: float):
+    """One analyst: create a thread, then ask each question on it in turn."""
+    records = []
+    started = time.perf_counter()
+    thread_id = app.create_thread()
+    records.append({"category": "create_thread", "seconds": time.perf_counter() - started,
+                    "success": thread_id is not None, "usage": {}})
+
+    for index, (question, category) in enumerate(questions):
+        if index and think_time:
+            time.sleep(think_time)
+        started = time.perf_counter()
+        result = app.call_agent(question, thread_id)
+        records.append({"category": category, "seconds": time.perf_counter() - started,
+                        "success": result.get("success", False), "usage": result.get("usage") or {},
+                        "error": result.get("error")})
+        thread_id = result.get("thread_id") or thread_id
+    return records
+
+
+def summarize(records):
+    """Per-category latency, error and token statistics."""
+    by_category = defaultdict(list)
+    for record in records:
+        by_category[record["category"]].append(record)
+
+    summary = {}
+    for category, items in sorted(by_category.items()):
+        latencies = [item["seconds"] for item in items]
+        errors = sum(1 for item in items if not item["success"])
+        ok = [item for item in items if item["success"]]
+        summary[category] = {
+            "requests": len(items),
+            "errors": errors,
+            "error_rate": errors / len(items),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": statistics.mean(latencies),
+            "avg_input_tokens": statistics.mean([i["usage"].get("input_tokens", 0) for i in ok]) if ok else 0,
+            "avg_output_tokens": statistics.mean([i["usage"].get("output_tokens", 0) for i in ok]) if ok else 0,
+            "total_tokens": sum(i["usage"].get("total_tokens", 0) for i in ok),
+        }
+    return summary
+
+
+def overall_error_rate(records) -> float:
+    """Share of agent requests (not thread creations) that failed."""
+    agent_records = [record for record in records if record["category"] != "create_thread"]
+    return sum(1 for record in agent_records if not record["success"]) / max(len(agent_records), 1)
+
+
+def print_report(summary, wall_seconds, agent_requests, args, backend):
+    print(f"Concurrency {args.concurrency}, {agent_requests} agent requests in {wall_seconds:.2f}s "
+          f"-> {agent_requests / wall_seconds:.2f} req/s")
+    print(f"Backend: {args.distribution} run_median={args.run_median}s thread_median={args.thread_median}s "
+          f"capacity={args.capacity or 'unlimited'} time_scale={args.time_scale}  calls={backend.calls}")
+    print()
+    print(f"{'category':<16}{'reqs':>6}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'mean':>9}"
+          f"{'in tok':>9}{'out tok':>9}{'total tok':>11}")
+    for category, stats in summary.items():
+        print(f"{category:<16}{stats['requests']:>6}{stats['error_rate'] * 100:>6.1f}%"
+              f"{stats['p50']:>8.3f}s{stats['p95']:>8.3f}s{stats['p99']:>8.3f}s{stats['mean']:>8.3f}s"
+              f"{stats['avg_input_tokens']:>9.0f}{stats['avg_output_tokens']:>9.0f}{stats['total_tokens']:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", nargs="*", default=[DEFAULT_CORPUS], help="JSONL question files")
+    parser.add_argument("--concurrency", type=int, default=50, help="Simultaneous analyst sessions")
+    parser.add_argument("--requests", type=int, default=200, help="Total agent questions to replay")
+    parser.add_argument("--questions-per-session", type=int, default=3)
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between questions in a session")
+    parser.add_argument("--seed", type=int, default=7)
+    backend_args = parser.add_argument_group("fake _snowflake backend")
+    backend_args.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    backend_args.add_argument("--run-median", type=float, default=1.5)
+    backend_args.add_argument("--run-sigma", type=float, default=0.4)
+    backend_args.add_argument("--thread-median", type=float, default=0.15)
+    backend_args.add_argument("--error-rate", type=float, default=0.0)
+    backend_args.add_argument("--timeout-rate", type=float, default=0.0)
+    backend_args.add_argument("--empty-rate", type=float, default=0.0)
+    backend_args.add_argument("--capacity", type=int, default=None, help="Max concurrent :run calls")
+    backend_args.add_argument("--time-scale", type=float, default=1.0, help="Multiply every fake delay")
+    parser.add_argument("--json", type=Path, help="Also write the summary as JSON")
+    parser.add_argument("--max-error-rate", type=float, default=None,
+                        help="Exit non-zero if the error rate over all agent requests exceeds this")
+    args = parser.parse_args()
+
+    backend = FakeSnowflakeBackend(FakeSnowflakeConfig(
+        distribution=args.distribution, run_median=args.run_median, run_sigma=args.run_sigma,
+        thread_median=args.thread_median, error_rate=args.error_rate, timeout_rate=args.timeout_rate,
+        empty_rate=args.empty_rate, capacity=args.capacity, time_scale=args.time_scale, seed=args.seed
+    ))
+
+    app = load_app()
+    silence_bare_mode_warnings()
+    app.st.session_state.session = None  # call_agent reads it; the fake backend never needs it
+
+    sessions = build_sessions(load_corpus(args.corpus), args.requests, args.questions_per_session, args.seed)
+    records = []
+    with backend.installed():
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for session_records in pool.map(lambda questions: run_session(app, questions, args.think_time), sessions):
+                records.extend(session_records)
+        wall_seconds = time.perf_counter() - started
+
+    summary = summarize(records)
+    agent_requests = sum(1 for record in records if record["category"] != "create_thread")
+    error_rate = overall_error_rate(records)
+    print_report(summary, wall_seconds, agent_requests, args, backend)
+    print(f"\nOverall agent error rate: {error_rate:.1%}")
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            "wall_seconds": wall_seconds,
+            "throughput_rps": agent_requests / wall_seconds,
+            "backend_calls": backend.calls,
+            "error_rate": error_rate,
+            "categories": summary
+        }, indent=2))
+
+    if args.max_error_rate is not None and error_rate > args.max_error_rate:
+        raise SystemExit(f"Error rate {error_rate:.1%} exceeds --max-error-rate {args.max_error_rate:.1%}")
+
+
+if __name__ == "__main__":
+    main()
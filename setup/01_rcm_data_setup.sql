@@ -22,6 +22,8 @@ SET current_user_name = CURRENT_USER();
 -- Grant the role to current user
 GRANT ROLE SF_INTELLIGENCE_DEMO TO USER IDENTIFIER($current_user_name);
 GRANT CREATE DATABASE ON ACCOUNT TO ROLE SF_INTELLIGENCE_DEMO;
+-- Lets the role resume the refresh and alert tasks created in scripts 04-06
+GRANT EXECUTE TASK ON ACCOUNT TO ROLE SF_INTELLIGENCE_DEMO;
 
 -- Create a dedicated warehouse for the demo with auto-suspend/resume
 CREATE OR REPLACE WAREHOUSE RCM_INTELLIGENCE_WH 
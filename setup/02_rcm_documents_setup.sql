@@ -547,4 +547,44 @@ FROM rcm_document_content
 GROUP BY 1
 ORDER BY 1;
 
+-- ========================================================================
+-- OPTIONAL: INGEST THE FILES UNDER unstructured_docs/
+-- ========================================================================
+-- The inserts above are hand-written summaries. To index the real PDF, DOCX
+-- and PPTX files (or your own payer contracts and policies), parse them
+-- locally. Re-runs only re-parse files whose content hash changed:
+--
+--   python tools/ingest_documents.py --source unstructured_docs --out data/documents
+--
+-- Upload the change file with SnowSQL (PUT is not available in worksheets),
+-- then run the statements below. refresh_search_sources_task (05) re-chunks
+-- the changed documents within 5 minutes, and the search services re-embed
+-- the changed chunks on their next refresh.
+--
+-- PUT file://data/documents/rcm_document_changes.csv @RCM_DATA_STAGE/documents/ AUTO_COMPRESS = TRUE OVERWRITE = TRUE;
+--
+-- CREATE OR REPLACE TEMPORARY TABLE rcm_document_changes (
+--     document_path VARCHAR(500),
+--     document_title VARCHAR(200),
+--     document_type VARCHAR(100),
+--     content TEXT,
+--     content_hash VARCHAR(64),
+--     change_type VARCHAR(10)
+-- );
+--
+-- COPY INTO rcm_document_changes FROM @RCM_DATA_STAGE/documents/rcm_document_changes.csv.gz
+--     FILE_FORMAT = (FORMAT_NAME = 'CSV_FORMAT') FORCE = TRUE;
+--
+-- MERGE INTO rcm_document_content t
+-- USING rcm_document_changes s
+--     ON t.document_path = s.document_path
+-- WHEN MATCHED AND s.change_type = 'delete' THEN DELETE
+-- WHEN MATCHED THEN UPDATE SET
+--     document_title = s.document_title,
+--     document_type = s.document_type,
+--     content = s.content
+-- WHEN NOT MATCHED AND s.change_type = 'upsert' THEN
+--     INSERT (document_path, document_title, document_type, content)
+--     VALUES (s.document_path, s.document_title, s.document_type, s.content);
+
 SELECT 'RCM Documents Setup Complete - Part 2 of 5' as status;
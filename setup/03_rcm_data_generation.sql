@@ -285,4 +285,37 @@ SELECT
     'Procedures' as table_name, COUNT(*) as record_count 
 FROM procedures_dim;
 
+-- ========================================================================
+-- OPTIONAL: LOAD BENCHMARK-SCALE DATA FROM RCM_DATA_STAGE
+-- ========================================================================
+-- The inserts above draw every column independently with RANDOM(), so runs
+-- are not reproducible. For benchmarking at production volumes (50M+ claims),
+-- generate seeded, correlated data locally and load it instead:
+--
+--   python tools/generate_rcm_data.py --claims 50000000 --out data/rcm --compress
+--
+-- Upload with SnowSQL (PUT is not available in worksheets), then run the
+-- statements below. They replace the generated patients and fact rows.
+--
+-- PUT file://data/rcm/patients_dim/*.csv.gz @RCM_DATA_STAGE/synthetic/patients_dim/ AUTO_COMPRESS = FALSE PARALLEL = 16;
+-- PUT file://data/rcm/claims_fact/*.csv.gz @RCM_DATA_STAGE/synthetic/claims_fact/ AUTO_COMPRESS = FALSE PARALLEL = 16;
+-- PUT file://data/rcm/denials_fact/*.csv.gz @RCM_DATA_STAGE/synthetic/denials_fact/ AUTO_COMPRESS = FALSE PARALLEL = 16;
+-- PUT file://data/rcm/payments_fact/*.csv.gz @RCM_DATA_STAGE/synthetic/payments_fact/ AUTO_COMPRESS = FALSE PARALLEL = 16;
+-- PUT file://data/rcm/patient_encounters_fact/*.csv.gz @RCM_DATA_STAGE/synthetic/patient_encounters_fact/ AUTO_COMPRESS = FALSE PARALLEL = 16;
+--
+-- TRUNCATE TABLE denials_fact;
+-- TRUNCATE TABLE payments_fact;
+-- TRUNCATE TABLE patient_encounters_fact;
+-- TRUNCATE TABLE claims_fact;
+-- TRUNCATE TABLE patients_dim;
+--
+-- COPY INTO patients_dim FROM @RCM_DATA_STAGE/synthetic/patients_dim/ FILE_FORMAT = (FORMAT_NAME = 'CSV_FORMAT');
+-- COPY INTO claims_fact FROM @RCM_DATA_STAGE/synthetic/claims_fact/ FILE_FORMAT = (FORMAT_NAME = 'CSV_FORMAT');
+-- COPY INTO denials_fact FROM @RCM_DATA_STAGE/synthetic/denials_fact/ FILE_FORMAT = (FORMAT_NAME = 'CSV_FORMAT');
+-- COPY INTO payments_fact FROM @RCM_DATA_STAGE/synthetic/payments_fact/ FILE_FORMAT = (FORMAT_NAME = 'CSV_FORMAT');
+-- COPY INTO patient_encounters_fact FROM @RCM_DATA_STAGE/synthetic/patient_encounters_fact/ FILE_FORMAT = (FORMAT_NAME = 'CSV_FORMAT');
+--
+-- Parquet output (--format parquet) loads with
+--   FILE_FORMAT = (TYPE = 'PARQUET') MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+
 SELECT 'RCM Data Generation Complete - Part 1.5 of 4' as status;
@@ -168,6 +168,166 @@ metrics (
         WITH SYNONYMS = ('appeal success rate', 'win rate for appeals')
 );
 
+-- ========================================================================
+-- KPI ROLLUPS (FAST PATH)
+-- ========================================================================
+
+-- Monthly rollups of the headline KPIs, along the semantic views' provider,
+-- payer and denial reason dimensions. The app's KPI fast path answers
+-- "clean claim rate by provider", "denial rate by payer", "days to payment"
+-- and "appeal success by denial code" from these tables instead of running
+-- the agent and Cortex Analyst.
+--
+-- Every column is additive (counts and sums; rates are computed at query
+-- time), so the rollups are maintained incrementally: streams on the fact
+-- tables feed signed deltas (+1 per inserted row, -1 per deleted row; an
+-- update is one of each) into a MERGE. The streams start with
+-- SHOW_INITIAL_ROWS, so the first refresh loads the existing data.
+CREATE OR REPLACE TABLE claims_kpi_rollup (
+    submission_month DATE,
+    provider_key INT,
+    payer_key INT,
+    total_claims INT,
+    clean_claims INT,
+    denied_claims INT,
+    appealed_claims INT,
+    total_charges DECIMAL(18,2),
+    total_paid DECIMAL(18,2),
+    paid_claims INT, -- Claims with a days_to_payment value
+    days_to_payment_total INT
+);
+
+CREATE OR REPLACE TABLE denials_kpi_rollup (
+    denial_month DATE,
+    provider_key INT,
+    payer_key INT,
+    denial_reason_key INT,
+    total_denials INT,
+    appealed_denials INT,
+    successful_appeals INT, -- Appeal outcome Approved or Partial
+    denied_amount DECIMAL(18,2),
+    recovered_amount DECIMAL(18,2)
+);
+
+CREATE OR REPLACE STREAM claims_fact_kpi_stream ON TABLE claims_fact SHOW_INITIAL_ROWS = TRUE;
+CREATE OR REPLACE STREAM denials_fact_kpi_stream ON TABLE denials_fact SHOW_INITIAL_ROWS = TRUE;
+
+-- Applies pending fact table changes to the rollups. Each MERGE consumes its
+-- stream; groups whose rows were all deleted are dropped afterwards.
+CREATE OR REPLACE PROCEDURE REFRESH_KPI_ROLLUPS()
+RETURNS STRING
+LANGUAGE SQL
+AS
+$$
+DECLARE
+    claim_groups INT;
+    denial_groups INT;
+BEGIN
+    MERGE INTO claims_kpi_rollup r
+    USING (
+        SELECT
+            DATE_TRUNC('month', submission_date) AS submission_month,
+            provider_key,
+            payer_key,
+            SUM(sign) AS total_claims,
+            SUM(IFF(clean_claim_flag, sign, 0)) AS clean_claims,
+            SUM(IFF(denial_flag, sign, 0)) AS denied_claims,
+            SUM(IFF(appeal_flag, sign, 0)) AS appealed_claims,
+            COALESCE(SUM(sign * charge_amount), 0) AS total_charges,
+            COALESCE(SUM(sign * paid_amount), 0) AS total_paid,
+            SUM(IFF(days_to_payment IS NOT NULL, sign, 0)) AS paid_claims,
+            COALESCE(SUM(sign * days_to_payment), 0) AS days_to_payment_total
+        FROM (
+            SELECT *, IFF(METADATA$ACTION = 'INSERT', 1, -1) AS sign
+            FROM claims_fact_kpi_stream
+        )
+        GROUP BY 1, 2, 3
+    ) d
+    ON EQUAL_NULL(r.submission_month, d.submission_month)
+        AND EQUAL_NULL(r.provider_key, d.provider_key)
+        AND EQUAL_NULL(r.payer_key, d.payer_key)
+    WHEN MATCHED THEN UPDATE SET
+        total_claims = r.total_claims + d.total_claims,
+        clean_claims = r.clean_claims + d.clean_claims,
+        denied_claims = r.denied_claims + d.denied_claims,
+        appealed_claims = r.appealed_claims + d.appealed_claims,
+        total_charges = r.total_charges + d.total_charges,
+        total_paid = r.total_paid + d.total_paid,
+        paid_claims = r.paid_claims + d.paid_claims,
+        days_to_payment_total = r.days_to_payment_total + d.days_to_payment_total
+    WHEN NOT MATCHED THEN INSERT VALUES (
+        d.submission_month, d.provider_key, d.payer_key, d.total_claims, d.clean_claims, d.denied_claims,
+        d.appealed_claims, d.total_charges, d.total_paid, d.paid_claims, d.days_to_payment_total
+    );
+    claim_groups := SQLROWCOUNT;
+
+    MERGE INTO denials_kpi_rollup r
+    USING (
+        SELECT
+            DATE_TRUNC('month', denial_date) AS denial_month,
+            provider_key,
+            payer_key,
+            denial_reason_key,
+            SUM(sign) AS total_denials,
+            SUM(IFF(days_to_appeal IS NOT NULL, sign, 0)) AS appealed_denials,
+            SUM(IFF(appeal_outcome IN ('Approved', 'Partial'), sign, 0)) AS successful_appeals,
+            COALESCE(SUM(sign * denied_amount), 0) AS denied_amount,
+            COALESCE(SUM(sign * recovered_amount), 0) AS recovered_amount
+        FROM (
+            SELECT *, IFF(METADATA$ACTION = 'INSERT', 1, -1) AS sign
+            FROM denials_fact_kpi_stream
+        )
+        GROUP BY 1, 2, 3, 4
+    ) d
+    ON EQUAL_NULL(r.denial_month, d.denial_month)
+        AND EQUAL_NULL(r.provider_key, d.provider_key)
+        AND EQUAL_NULL(r.payer_key, d.payer_key)
+        AND EQUAL_NULL(r.denial_reason_key, d.denial_reason_key)
+    WHEN MATCHED THEN UPDATE SET
+        total_denials = r.total_denials + d.total_denials,
+        appealed_denials = r.appealed_denials + d.appealed_denials,
+        successful_appeals = r.successful_appeals + d.successful_appeals,
+        denied_amount = r.denied_amount + d.denied_amount,
+        recovered_amount = r.recovered_amount + d.recovered_amount
+    WHEN NOT MATCHED THEN INSERT VALUES (
+        d.denial_month, d.provider_key, d.payer_key, d.denial_reason_key, d.total_denials,
+        d.appealed_denials, d.successful_appeals, d.denied_amount, d.recovered_amount
+    );
+    denial_groups := SQLROWCOUNT;
+
+    DELETE FROM claims_kpi_rollup WHERE total_claims = 0;
+    DELETE FROM denials_kpi_rollup WHERE total_denials = 0;
+    RETURN 'Merged ' || claim_groups || ' claim groups, ' || denial_groups || ' denial groups';
+END;
+$$;
+
+-- Initial load (from SHOW_INITIAL_ROWS)
+CALL REFRESH_KPI_ROLLUPS();
+
+-- Keep the rollups current as fact data loads. Runs only when a stream has
+-- changes, so an idle schedule costs no warehouse time. Resuming the task
+-- needs the EXECUTE TASK grant from script 01.
+CREATE OR REPLACE TASK refresh_kpi_rollups_task
+    WAREHOUSE = RCM_INTELLIGENCE_WH
+    SCHEDULE = '5 MINUTE'
+    WHEN SYSTEM$STREAM_HAS_DATA('claims_fact_kpi_stream') OR SYSTEM$STREAM_HAS_DATA('denials_fact_kpi_stream')
+AS
+    CALL REFRESH_KPI_ROLLUPS();
+
+ALTER TASK refresh_kpi_rollups_task RESUME;
+
+-- Rollups agree with the semantic view metric definitions
+SELECT
+    'Clean claim rate' AS kpi,
+    (SELECT ROUND(SUM(clean_claims) * 100.0 / SUM(total_claims), 2) FROM claims_kpi_rollup) AS from_rollup,
+    (SELECT ROUND(COUNT(CASE WHEN clean_claim_flag THEN 1 END) * 100.0 / COUNT(*), 2) FROM claims_fact) AS from_facts
+UNION ALL
+SELECT
+    'Appeal success rate',
+    (SELECT ROUND(SUM(successful_appeals) * 100.0 / SUM(appealed_denials), 2) FROM denials_kpi_rollup),
+    (SELECT ROUND(COUNT(CASE WHEN appeal_outcome IN ('Approved', 'Partial') THEN 1 END) * 100.0
+            / COUNT(CASE WHEN days_to_appeal IS NOT NULL THEN 1 END), 2) FROM denials_fact);
+
 -- Show semantic views creation completion
 SHOW SEMANTIC VIEWS;
 
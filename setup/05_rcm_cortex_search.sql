@@ -21,33 +21,369 @@ SELECT
     content
 FROM rcm_document_content;
 
+-- ========================================================================
+-- DOCUMENT CHUNKING
+-- ========================================================================
+
+-- Split each document into search-sized chunks. Sections start at Markdown
+-- headings (and ALL-CAPS heading lines in text extracted from PDF/DOCX);
+-- small neighbouring sections are packed together, long ones are cut into
+-- windows of CHUNK_MAX_TOKENS with CHUNK_OVERLAP_TOKENS carried over, so a
+-- search hit brings a few hundred tokens into the agent prompt instead of a
+-- whole SOP. Tokens are estimated like ESTIMATE_TOKENS (1 token ≈ 4 characters).
+CREATE OR REPLACE FUNCTION CHUNK_RCM_DOCUMENT(content STRING)
+RETURNS TABLE (chunk_ordinal INTEGER, section_heading STRING, chunk STRING, token_count INTEGER)
+LANGUAGE PYTHON
+RUNTIME_VERSION = '3.11'
+HANDLER = 'ChunkRcmDocument'
+COMMENT = 'Splits document content into heading-aligned, token-bounded chunks with overlap'
+AS $$
+import re
+
+CHUNK_MAX_TOKENS = 350
+CHUNK_OVERLAP_TOKENS = 40
+HEADING_PATTERN = re.compile(r"^(?:#{1,6}\s+(?P<markdown>.+?)\s*#*|(?P<caps>[A-Z0-9][A-Z0-9 &/:,()'-]{3,79}))$")
+
+
+def count_tokens(text):
+    return (len(text) + 3) // 4
+
+
+def split_sections(content):
+    """[(heading, body)] split at heading lines; text before the first heading has heading ''."""
+    sections = [["", []]]
+    for line in content.splitlines():
+        match = HEADING_PATTERN.match(line.strip())
+        if match and re.search("[A-Za-z]", line):
+            sections.append([(match.group("markdown") or match.group("caps")).strip(), [line]])
+        else:
+            sections[-1][1].append(line)
+    return [(heading, "\n".join(lines).strip()) for heading, lines in sections if "\n".join(lines).strip()]
+
+
+def split_units(text, max_tokens):
+    """Paragraphs, with any paragraph over max_tokens cut into word runs."""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            yield paragraph
+            continue
+        run, run_tokens = [], 0
+        for word in paragraph.split():
+            word_tokens = count_tokens(word) + 1
+            if run and run_tokens + word_tokens > max_tokens:
+                yield " ".join(run)
+                run, run_tokens = [], 0
+            run.append(word)
+            run_tokens += word_tokens
+        if run:
+            yield " ".join(run)
+
+
+def overlap_tail(text, overlap_tokens):
+    """Last words of a chunk, about overlap_tokens long, to start the next one."""
+    tail, tail_tokens = [], 0
+    for word in reversed(text.split()):
+        tail_tokens += count_tokens(word) + 1
+        if tail_tokens > overlap_tokens:
+            break
+        tail.append(word)
+    return " ".join(reversed(tail))
+
+
+def chunk_document(content, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """[(section_heading, chunk, token_count)] in document order."""
+    chunks = []
+    heading, parts = "", []
+
+    def flush():
+        if parts:
+            text = "\n\n".join(parts)
+            chunks.append((heading, text, count_tokens(text)))
+
+    for section_heading, body in split_sections(content or ""):
+        # Pack small sections together; a new heading that does not fit starts a chunk
+        if parts and count_tokens("\n\n".join(parts + [body])) > max_tokens:
+            flush()
+            parts = []
+        if not parts:
+            heading = section_heading
+        for unit in split_units(body, max_tokens - overlap_tokens):
+            if parts and count_tokens("\n\n".join(parts + [unit])) > max_tokens:
+                flush()
+                # Overlap only within a section, so a chunk never starts mid-way into the previous one
+                tail = overlap_tail(parts[-1], overlap_tokens) if heading == section_heading else ""
+                parts = [tail] if tail else []
+                heading = section_heading
+            parts.append(unit)
+    flush()
+    return chunks
+
+
+class ChunkRcmDocument:
+    def process(self, content):
+        for ordinal, (heading, chunk, tokens) in enumerate(chunk_document(content)):
+            yield (ordinal, heading, chunk, tokens)
+$$;
+
+-- ========================================================================
+-- CHANGE-DRIVEN SEARCH SOURCES
+-- ========================================================================
+
+-- Each search service indexes its own source table, one row per chunk keyed
+-- by (relative_path, chunk_ordinal): rcm_document_chunks holds every
+-- category, and a table per category holds the rows its *_DOCS_SEARCH service
+-- used to filter out of it with LIKE. The tables are never rebuilt. A stream
+-- on rcm_document_content queues the paths that were inserted, updated or
+-- deleted; REFRESH_SEARCH_SOURCES re-chunks only those whose content hash
+-- changed, and writes only chunks whose own hash changed. The services'
+-- incremental refresh then re-embeds just those rows, so they can run on a
+-- short TARGET_LAG. Re-run this script after re-running 02, which replaces
+-- rcm_document_content and leaves the stream stale.
+CREATE OR REPLACE TABLE rcm_search_sources (
+    source_table VARCHAR(100),
+    search_service VARCHAR(100),
+    path_pattern VARCHAR(100), -- relative_path ILIKE path_pattern
+    PRIMARY KEY (source_table)
+);
+
+INSERT INTO rcm_search_sources VALUES
+    ('rcm_document_chunks', 'RCM_KNOWLEDGE_BASE_SEARCH', '%'),
+    ('rcm_finance_chunks', 'RCM_FINANCE_DOCS_SEARCH', '/finance/%'),
+    ('rcm_operations_chunks', 'RCM_OPERATIONS_DOCS_SEARCH', '/operations/%'),
+    ('rcm_compliance_chunks', 'RCM_COMPLIANCE_DOCS_SEARCH', '/compliance/%'),
+    ('rcm_strategy_chunks', 'RCM_STRATEGY_DOCS_SEARCH', '%/marketing/%');
+
+CREATE OR REPLACE TABLE rcm_document_chunks (
+    relative_path VARCHAR(500),
+    chunk_ordinal INTEGER,
+    file_url VARCHAR(520),
+    title VARCHAR(200),
+    section_heading VARCHAR(500),
+    chunk TEXT,
+    token_count INTEGER,
+    chunk_hash VARCHAR(64), -- SHA-256 of every indexed column, so unchanged rows are never rewritten
+    PRIMARY KEY (relative_path, chunk_ordinal)
+);
+
+CREATE OR REPLACE TABLE rcm_finance_chunks LIKE rcm_document_chunks;
+CREATE OR REPLACE TABLE rcm_operations_chunks LIKE rcm_document_chunks;
+CREATE OR REPLACE TABLE rcm_compliance_chunks LIKE rcm_document_chunks;
+CREATE OR REPLACE TABLE rcm_strategy_chunks LIKE rcm_document_chunks;
+
+-- Content hash of each document as last chunked into the source tables
+CREATE OR REPLACE TABLE rcm_document_versions (
+    relative_path VARCHAR(500),
+    content_hash VARCHAR(64),
+    refreshed_at TIMESTAMP_NTZ,
+    PRIMARY KEY (relative_path)
+);
+
+-- Paths read from the stream but not yet applied. Reading the stream moves
+-- its offset, so the paths are kept here until the refresh that read them
+-- succeeds; a failed refresh is picked up by the next one.
+CREATE OR REPLACE TABLE rcm_search_pending_paths (
+    relative_path VARCHAR(500)
+);
+
+-- Has data while queued paths are waiting on a successful refresh, so the
+-- task below retries a failed refresh even when no new changes arrive.
+-- Append-only: the refresh's own DELETE does not show up here.
+CREATE OR REPLACE STREAM rcm_search_pending_stream ON TABLE rcm_search_pending_paths APPEND_ONLY = TRUE;
+
+-- One row per source table per refresh
+CREATE OR REPLACE TABLE rcm_search_refresh_log (
+    refreshed_at TIMESTAMP_NTZ,
+    source_table VARCHAR(100),
+    documents_changed INT,
+    chunks_upserted INT, -- Rows the service re-embeds
+    chunks_deleted INT,
+    chunks_total INT
+);
+
+-- SHOW_INITIAL_ROWS: the first refresh loads the existing documents
+CREATE OR REPLACE STREAM rcm_document_content_stream ON TABLE rcm_document_content SHOW_INITIAL_ROWS = TRUE;
+
+-- Applies queued document changes to every source table. Safe to re-run:
+-- a document is re-chunked until its version is recorded, and rows whose
+-- chunk_hash already matches are left alone.
+CREATE OR REPLACE PROCEDURE REFRESH_SEARCH_SOURCES()
+RETURNS STRING
+LANGUAGE SQL
+AS
+$$
+DECLARE
+    refreshed_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()::TIMESTAMP_NTZ;
+    documents_changed INT;
+    chunks_upserted INT;
+    chunks_deleted INT;
+    summary STRING DEFAULT '';
+    sources CURSOR FOR SELECT source_table, path_pattern FROM rcm_search_sources ORDER BY source_table;
+BEGIN
+    INSERT INTO rcm_search_pending_paths
+    SELECT DISTINCT document_path FROM rcm_document_content_stream;
+
+    -- Queued paths whose title or content differs from what was chunked; a
+    -- deleted document has a NULL hash, a rewrite with the same text drops out
+    CREATE OR REPLACE TEMPORARY TABLE rcm_changed_documents AS
+    SELECT p.relative_path, d.file_url, d.title, d.content, d.content_hash
+    FROM (SELECT DISTINCT relative_path FROM rcm_search_pending_paths) p
+    LEFT JOIN (
+        SELECT
+            relative_path,
+            file_url,
+            title,
+            content,
+            SHA2(COALESCE(title, '') || '|' || COALESCE(content, ''), 256) AS content_hash
+        FROM rcm_parsed_content
+    ) d ON d.relative_path = p.relative_path
+    LEFT JOIN rcm_document_versions v ON v.relative_path = p.relative_path
+    WHERE NOT EQUAL_NULL(d.content_hash, v.content_hash);
+
+    SELECT COUNT(*) INTO :documents_changed FROM rcm_changed_documents;
+
+    CREATE OR REPLACE TEMPORARY TABLE rcm_changed_chunks AS
+    SELECT
+        d.relative_path,
+        c.chunk_ordinal,
+        d.file_url,
+        d.title,
+        LEFT(c.section_heading, 500) AS section_heading,
+        c.chunk,
+        c.token_count,
+        SHA2(d.file_url || '|' || COALESCE(d.title, '') || '|' || LEFT(c.section_heading, 500) || '|' || c.chunk, 256)
+            AS chunk_hash
+    FROM rcm_changed_documents d,
+        TABLE(CHUNK_RCM_DOCUMENT(d.content)) c
+    WHERE d.content_hash IS NOT NULL;
+
+    FOR search_source IN sources DO
+        LET source_table STRING := search_source.source_table;
+        LET path_pattern STRING := search_source.path_pattern;
+
+        -- Chunks past the new end of a changed document, or of a deleted one
+        DELETE FROM IDENTIFIER(:source_table) t
+        USING rcm_changed_documents d
+        WHERE t.relative_path = d.relative_path
+            AND NOT EXISTS (
+                SELECT 1 FROM rcm_changed_chunks c
+                WHERE c.relative_path = t.relative_path AND c.chunk_ordinal = t.chunk_ordinal
+            );
+        chunks_deleted := SQLROWCOUNT;
+
+        MERGE INTO IDENTIFIER(:source_table) t
+        USING (SELECT * FROM rcm_changed_chunks WHERE relative_path ILIKE :path_pattern) c
+        ON t.relative_path = c.relative_path AND t.chunk_ordinal = c.chunk_ordinal
+        WHEN MATCHED AND t.chunk_hash IS DISTINCT FROM c.chunk_hash THEN UPDATE SET
+            file_url = c.file_url,
+            title = c.title,
+            section_heading = c.section_heading,
+            chunk = c.chunk,
+            token_count = c.token_count,
+            chunk_hash = c.chunk_hash
+        WHEN NOT MATCHED THEN INSERT VALUES (
+            c.relative_path, c.chunk_ordinal, c.file_url, c.title, c.section_heading, c.chunk, c.token_count,
+            c.chunk_hash
+        );
+        chunks_upserted := SQLROWCOUNT;
+
+        INSERT INTO rcm_search_refresh_log
+        SELECT
+            :refreshed_at,
+            :source_table,
+            (SELECT COUNT(*) FROM rcm_changed_documents WHERE relative_path ILIKE :path_pattern),
+            :chunks_upserted,
+            :chunks_deleted,
+            COUNT(*)
+        FROM IDENTIFIER(:source_table);
+        summary := summary || ', ' || source_table || ' ' || chunks_upserted;
+    END FOR;
+
+    MERGE INTO rcm_document_versions v
+    USING rcm_changed_documents d
+    ON v.relative_path = d.relative_path
+    WHEN MATCHED AND d.content_hash IS NULL THEN DELETE
+    WHEN MATCHED THEN UPDATE SET content_hash = d.content_hash, refreshed_at = :refreshed_at
+    WHEN NOT MATCHED THEN INSERT VALUES (d.relative_path, d.content_hash, :refreshed_at);
+
+    DELETE FROM rcm_search_pending_paths;
+    -- Reading the stream in DML moves its offset; nothing is inserted
+    INSERT INTO rcm_search_pending_paths SELECT relative_path FROM rcm_search_pending_stream WHERE FALSE;
+    RETURN 'Re-chunked ' || documents_changed || ' documents; rows re-embedded' || summary;
+END;
+$$;
+
+-- Initial load (from SHOW_INITIAL_ROWS)
+CALL REFRESH_SEARCH_SOURCES();
+
+-- Apply document changes as they land. Runs only when the document stream
+-- has changes or a failed refresh left paths queued, so an idle schedule
+-- costs no warehouse time. WHEN accepts only stream checks, not queries on
+-- rcm_search_pending_paths itself. Resuming the task needs the EXECUTE TASK
+-- grant from script 01.
+CREATE OR REPLACE TASK refresh_search_sources_task
+    WAREHOUSE = RCM_INTELLIGENCE_WH
+    SCHEDULE = '5 MINUTE'
+    WHEN SYSTEM$STREAM_HAS_DATA('rcm_document_content_stream')
+        OR SYSTEM$STREAM_HAS_DATA('rcm_search_pending_stream')
+AS
+    CALL REFRESH_SEARCH_SOURCES();
+
+ALTER TASK refresh_search_sources_task RESUME;
+
+-- Rows each service re-embedded per refresh, against the size of its source
+CREATE OR REPLACE VIEW rcm_search_refresh_report AS
+SELECT
+    l.refreshed_at,
+    s.search_service,
+    l.source_table,
+    l.documents_changed,
+    l.chunks_upserted AS rows_re_embedded,
+    l.chunks_deleted AS rows_removed,
+    l.chunks_total AS source_rows,
+    ROUND(l.chunks_upserted * 100.0 / NULLIF(l.chunks_total, 0), 1) AS pct_re_embedded
+FROM rcm_search_refresh_log l
+JOIN rcm_search_sources s ON s.source_table = l.source_table;
+
 -- ========================================================================
 -- HEALTHCARE DOCUMENT SEARCH SERVICES
 -- ========================================================================
 
+-- Every service indexes a chunk table from rcm_search_sources, one row per
+-- chunk, so max_results bounds the prompt by chunks rather than whole
+-- documents. Those tables change only where documents did, so a refresh
+-- re-embeds only the changed chunks, and TARGET_LAG can be an hour rather
+-- than a month. The content
+-- prefix names the document and section; the fixed keyword lists appended to
+-- every row were dropped, since they would now be repeated on each chunk.
+
 -- Search service for RCM financial documents
 -- Covers: Financial reports, expense policies, vendor contracts
 CREATE OR REPLACE CORTEX SEARCH SERVICE RCM_FINANCE_DOCS_SEARCH
     ON content
     ATTRIBUTES relative_path, file_url, title
     WAREHOUSE = RCM_INTELLIGENCE_WH
-    TARGET_LAG = '30 day'
+    TARGET_LAG = '1 hour'
     EMBEDDING_MODEL = 'snowflake-arctic-embed-l-v2.0'
     AS (
         SELECT
             relative_path,
             file_url,
             REGEXP_SUBSTR(relative_path, '[^/]+$') as title,
+            chunk_ordinal,
+            section_heading,
             -- Enhance content with RCM-specific context
             CONCAT(
                 'HEALTHCARE REVENUE CYCLE MANAGEMENT DOCUMENT: ',
                 REGEXP_SUBSTR(relative_path, '[^/]+$'),
+                ' - ',
+                section_heading,
                 ' CONTENT: ',
-                content,
-                ' KEYWORDS: revenue cycle, claims processing, denial management, payer contracts, reimbursement, financial performance, healthcare billing, medical coding, accounts receivable, cash flow'
+                chunk
             ) as content
-        FROM rcm_parsed_content
-        WHERE relative_path LIKE '/finance/%'
+        FROM rcm_finance_chunks
     );
 
 -- Search service for RCM operations and HR documents  
@@ -56,23 +392,25 @@ CREATE OR REPLACE CORTEX SEARCH SERVICE RCM_OPERATIONS_DOCS_SEARCH
     ON content
     ATTRIBUTES relative_path, file_url, title
     WAREHOUSE = RCM_INTELLIGENCE_WH
-    TARGET_LAG = '30 day'
+    TARGET_LAG = '1 hour'
     EMBEDDING_MODEL = 'snowflake-arctic-embed-l-v2.0'
     AS (
         SELECT
             relative_path,
             file_url,
             REGEXP_SUBSTR(relative_path, '[^/]+$') as title,
+            chunk_ordinal,
+            section_heading,
             -- Enhance content with healthcare operations context
             CONCAT(
                 'HEALTHCARE OPERATIONS DOCUMENT: ',
                 REGEXP_SUBSTR(relative_path, '[^/]+$'),
+                ' - ',
+                section_heading,
                 ' CONTENT: ',
-                content,
-                ' KEYWORDS: healthcare operations, RCM staffing, claims analysts, denial specialists, appeals coordinators, workforce management, productivity metrics, performance standards, training procedures, compliance requirements'
+                chunk
             ) as content
-        FROM rcm_parsed_content
-        WHERE relative_path LIKE '/operations/%'
+        FROM rcm_operations_chunks
     );
 
 -- Search service for RCM compliance and sales documents
@@ -81,23 +419,25 @@ CREATE OR REPLACE CORTEX SEARCH SERVICE RCM_COMPLIANCE_DOCS_SEARCH
     ON content
     ATTRIBUTES relative_path, file_url, title
     WAREHOUSE = RCM_INTELLIGENCE_WH
-    TARGET_LAG = '30 day'
+    TARGET_LAG = '1 hour'
     EMBEDDING_MODEL = 'snowflake-arctic-embed-l-v2.0'
     AS (
         SELECT
             relative_path,
             file_url,
             REGEXP_SUBSTR(relative_path, '[^/]+$') as title,
+            chunk_ordinal,
+            section_heading,
             -- Enhance content with compliance and sales context
             CONCAT(
                 'HEALTHCARE COMPLIANCE AND SALES DOCUMENT: ',
                 REGEXP_SUBSTR(relative_path, '[^/]+$'),
+                ' - ',
+                section_heading,
                 ' CONTENT: ',
-                content,
-                ' KEYWORDS: healthcare compliance, HIPAA, billing regulations, audit requirements, CMS guidelines, payer policies, client success, case studies, implementation, ROI, revenue optimization, cost reduction'
+                chunk
             ) as content
-        FROM rcm_parsed_content
-        WHERE relative_path LIKE '/compliance/%'
+        FROM rcm_compliance_chunks
     );
 
 -- Search service for RCM strategy and marketing documents
@@ -106,23 +446,25 @@ CREATE OR REPLACE CORTEX SEARCH SERVICE RCM_STRATEGY_DOCS_SEARCH
     ON content
     ATTRIBUTES relative_path, file_url, title
     WAREHOUSE = RCM_INTELLIGENCE_WH
-    TARGET_LAG = '30 day'
+    TARGET_LAG = '1 hour'
     EMBEDDING_MODEL = 'snowflake-arctic-embed-l-v2.0'
     AS (
         SELECT
             relative_path,
             file_url,
             REGEXP_SUBSTR(relative_path, '[^/]+$') as title,
+            chunk_ordinal,
+            section_heading,
             -- Enhance content with strategic and market context
             CONCAT(
                 'HEALTHCARE STRATEGY DOCUMENT: ',
                 REGEXP_SUBSTR(relative_path, '[^/]+$'),
+                ' - ',
+                section_heading,
                 ' CONTENT: ',
-                content,
-                ' KEYWORDS: healthcare strategy, market analysis, competitive landscape, revenue cycle trends, industry benchmarks, payer mix analysis, specialty markets, growth opportunities, digital transformation, AI automation'
+                chunk
             ) as content
-        FROM rcm_parsed_content
-        WHERE relative_path ILIKE '%/marketing/%'
+        FROM rcm_strategy_chunks
     );
 
 -- ========================================================================
@@ -135,13 +477,15 @@ CREATE OR REPLACE CORTEX SEARCH SERVICE RCM_KNOWLEDGE_BASE_SEARCH
     ON content
     ATTRIBUTES relative_path, file_url, title, document_type
     WAREHOUSE = RCM_INTELLIGENCE_WH
-    TARGET_LAG = '30 day'
+    TARGET_LAG = '1 hour'
     EMBEDDING_MODEL = 'snowflake-arctic-embed-l-v2.0'
     AS (
         SELECT
             relative_path,
             file_url,
             REGEXP_SUBSTR(relative_path, '[^/]+$') as title,
+            chunk_ordinal,
+            section_heading,
             CASE 
                 WHEN relative_path LIKE '/finance/%' THEN 'Financial Policy'
                 WHEN relative_path LIKE '/operations/%' THEN 'Operations Manual'
@@ -160,11 +504,12 @@ CREATE OR REPLACE CORTEX SEARCH SERVICE RCM_KNOWLEDGE_BASE_SEARCH
                     ELSE 'GENERAL HEALTHCARE DOCUMENT - '
                 END,
                 REGEXP_SUBSTR(relative_path, '[^/]+$'),
+                ' - ',
+                section_heading,
                 ' DOCUMENT CONTENT: ',
-                content,
-                ' HEALTHCARE CONTEXT: This document relates to revenue cycle management, healthcare billing, claims processing, denial management, payer relations, compliance requirements, operational efficiency, financial performance, and client services in the healthcare industry.'
+                chunk
             ) as content
-        FROM rcm_parsed_content
+        FROM rcm_document_chunks
     );
 
 -- ========================================================================
@@ -204,4 +549,20 @@ FROM rcm_parsed_content
 GROUP BY 1
 ORDER BY document_count DESC;
 
+-- Chunk sizes per document category
+SELECT 
+    SPLIT_PART(relative_path, '/', 2) as document_category,
+    COUNT(DISTINCT relative_path) as document_count,
+    COUNT(*) as chunk_count,
+    ROUND(AVG(token_count), 0) as avg_chunk_tokens,
+    MAX(token_count) as max_chunk_tokens
+FROM rcm_document_chunks
+GROUP BY 1
+ORDER BY chunk_count DESC;
+
+-- Rows re-embedded by the latest refreshes
+SELECT * FROM rcm_search_refresh_report
+ORDER BY refreshed_at DESC, search_service
+LIMIT 20;
+
 SELECT 'RCM Cortex Search Setup Complete - Part 5 of 6' as status;
@@ -57,7 +57,102 @@ USE ROLE SF_INTELLIGENCE_DEMO;
 -- HEALTHCARE UTILITY FUNCTIONS
 -- ========================================================================
 
--- Create stored procedure to generate presigned URLs for RCM documents
+-- Presigned URLs already handed out, reused while most of the lifetime a
+-- caller asks for remains.
+-- Keyed by role as well as path: a cached URL is a bearer link, so it is only
+-- shared with callers holding the role that minted it. Two first calls for
+-- the same path can both insert it (nothing enforces the key), so readers
+-- take the latest-expiring row per path and role.
+CREATE TABLE IF NOT EXISTS rcm_document_url_cache (
+    relative_path STRING NOT NULL,
+    role_name STRING NOT NULL,
+    url STRING NOT NULL,
+    expires_at TIMESTAMP_LTZ NOT NULL
+)
+COMMENT = 'Presigned RCM document URLs cached by Get_RCM_Document_URLs';
+
+-- Create stored procedure to generate presigned URLs for many RCM documents at once
+-- Returns an object mapping each relative path to its URL; NULL and empty
+-- paths are skipped. When every path has a cached URL with at least 80% of the
+-- requested lifetime left, the call costs one statement after the paths are
+-- read; otherwise the missing URLs are minted together in one MERGE. Paths are
+-- bound, never spliced into SQL text.
+CREATE OR REPLACE PROCEDURE Get_RCM_Document_URLs(
+    RELATIVE_FILE_PATHS ARRAY,
+    EXPIRATION_MINS INTEGER DEFAULT 60
+)
+RETURNS OBJECT
+LANGUAGE SQL
+COMMENT = 'Generates presigned URLs for a list of RCM documents in the internal stage, reusing cached URLs that are not about to expire. Input is an array of relative file paths.'
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+    paths ARRAY;
+    urls OBJECT;
+    missing INTEGER;
+    expiration_seconds INTEGER;
+    min_remaining_seconds INTEGER;
+BEGIN
+    SELECT ARRAY_AGG(DISTINCT p.value::STRING)
+    INTO :paths
+    FROM TABLE(FLATTEN(INPUT => :RELATIVE_FILE_PATHS)) p
+    WHERE TRIM(p.value::STRING) <> '';
+    IF (ARRAY_SIZE(paths) = 0) THEN
+        RETURN OBJECT_CONSTRUCT();
+    END IF;
+    expiration_seconds := EXPIRATION_MINS * 60;
+    -- A link asked for 24 hours must not come back with minutes left
+    min_remaining_seconds := CEIL(expiration_seconds * 0.8);
+
+    SELECT OBJECT_AGG(p.value::STRING, c.url::VARIANT), COUNT(*) - COUNT(c.url)
+    INTO :urls, :missing
+    FROM TABLE(FLATTEN(INPUT => :paths)) p
+    LEFT JOIN (
+        SELECT relative_path, url
+        FROM rcm_document_url_cache
+        WHERE role_name = CURRENT_ROLE()
+          AND expires_at >= DATEADD(second, :min_remaining_seconds, CURRENT_TIMESTAMP())
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY relative_path, role_name ORDER BY expires_at DESC) = 1
+    ) c
+        ON c.relative_path = p.value::STRING;
+
+    IF (missing = 0) THEN
+        RETURN urls;
+    END IF;
+
+    MERGE INTO rcm_document_url_cache c
+    USING (
+        SELECT
+            p.value::STRING AS relative_path,
+            GET_PRESIGNED_URL(@RCM_AI_DEMO.RCM_SCHEMA.RCM_DATA_STAGE, p.value::STRING, :expiration_seconds) AS url
+        FROM TABLE(FLATTEN(INPUT => :paths)) p
+        WHERE GET(COALESCE(:urls, OBJECT_CONSTRUCT()), p.value::STRING) IS NULL
+    ) s
+    ON c.relative_path = s.relative_path
+   AND c.role_name = CURRENT_ROLE()
+    WHEN MATCHED THEN UPDATE SET
+        c.url = s.url,
+        c.expires_at = DATEADD(second, :expiration_seconds, CURRENT_TIMESTAMP())
+    WHEN NOT MATCHED THEN INSERT (relative_path, role_name, url, expires_at)
+        VALUES (s.relative_path, CURRENT_ROLE(), s.url, DATEADD(second, :expiration_seconds, CURRENT_TIMESTAMP()));
+
+    SELECT OBJECT_AGG(relative_path, url::VARIANT)
+    INTO :urls
+    FROM (
+        SELECT relative_path, url
+        FROM rcm_document_url_cache
+        WHERE role_name = CURRENT_ROLE()
+          AND ARRAY_CONTAINS(relative_path::VARIANT, :paths)
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY relative_path, role_name ORDER BY expires_at DESC) = 1
+    );
+
+    RETURN urls;
+END;
+$$;
+
+-- Create stored procedure to generate a presigned URL for one RCM document
+-- (the single-path case of Get_RCM_Document_URLs, sharing its cache)
 CREATE OR REPLACE PROCEDURE Get_RCM_Document_URL(
     RELATIVE_FILE_PATH STRING, 
     EXPIRATION_MINS INTEGER DEFAULT 60
@@ -69,46 +164,230 @@ EXECUTE AS CALLER
 AS
 $$
 DECLARE
-    presigned_url STRING;
-    sql_stmt STRING;
-    expiration_seconds INTEGER;
-    stage_name STRING DEFAULT '@RCM_AI_DEMO.RCM_SCHEMA.RCM_DATA_STAGE';
+    urls OBJECT;
 BEGIN
-    expiration_seconds := EXPIRATION_MINS * 60;
-
-    sql_stmt := 'SELECT GET_PRESIGNED_URL(' || stage_name || ', ' || '''' || RELATIVE_FILE_PATH || '''' || ', ' || expiration_seconds || ') AS url';
-    
-    EXECUTE IMMEDIATE :sql_stmt;
-    
-    SELECT "URL"
-    INTO :presigned_url
-    FROM TABLE(RESULT_SCAN(LAST_QUERY_ID()));
-    
-    RETURN :presigned_url;
+    CALL Get_RCM_Document_URLs(ARRAY_CONSTRUCT(:RELATIVE_FILE_PATH), :EXPIRATION_MINS) INTO :urls;
+    RETURN GET(urls, RELATIVE_FILE_PATH)::STRING;
 END;
 $$;
 
+-- Alerts waiting for flush_rcm_alerts. status moves from 'queued' to
+-- 'sending' (claimed by a flush), then to 'sent', 'duplicate' or, after
+-- repeated send failures, 'failed'.
+CREATE TABLE IF NOT EXISTS rcm_alert_queue (
+    alert_id STRING DEFAULT UUID_STRING(),
+    recipient STRING NOT NULL,
+    subject STRING,
+    message STRING,
+    enqueued_at TIMESTAMP_LTZ DEFAULT CURRENT_TIMESTAMP(),
+    status STRING DEFAULT 'queued',
+    flush_id STRING,
+    claimed_at TIMESTAMP_LTZ,
+    digest_id STRING,
+    attempts INTEGER DEFAULT 0,
+    sent_at TIMESTAMP_LTZ,
+    error STRING
+)
+COMMENT = 'RCM alert emails queued by send_rcm_alert and delivered as digests by flush_rcm_alerts';
+
+-- Queues created before claims were timestamped
+ALTER TABLE rcm_alert_queue ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP_LTZ;
+
+-- One row per flush: alerts claimed and what became of them
+CREATE TABLE IF NOT EXISTS rcm_alert_flushes (
+    flush_id STRING,
+    started_at TIMESTAMP_LTZ,
+    new_alerts INTEGER,
+    alerts INTEGER,
+    duplicates INTEGER,
+    digests INTEGER,
+    emails INTEGER,
+    failed INTEGER
+)
+COMMENT = 'Delivery log of flush_rcm_alerts runs';
+
+CREATE OR REPLACE STREAM rcm_alert_queue_stream ON TABLE rcm_alert_queue APPEND_ONLY = TRUE;
+
 -- Create procedure to send RCM alert emails
+-- Queues the alert and returns at once; flush_rcm_alerts delivers it with any
+-- other alerts for the same recipient as one digest email.
 CREATE OR REPLACE PROCEDURE send_rcm_alert(recipient TEXT, subject TEXT, message TEXT)
 RETURNS TEXT
+LANGUAGE SQL
+AS
+$$
+BEGIN
+    INSERT INTO rcm_alert_queue (recipient, subject, message)
+    VALUES (:recipient, :subject, :message);
+    RETURN 'RCM alert queued for ' || recipient || ' with subject: ' || subject;
+END;
+$$;
+
+-- Deliver queued alerts. Alerts identical to one already in this flush, or to
+-- one sent in the last DEDUPE_MINUTES, are marked 'duplicate' instead of being
+-- sent again. The rest are coalesced into one digest per recipient, sent as
+-- its own SYSTEM$SEND_EMAIL so no recipient sees another's address. A failed
+-- send leaves its alerts queued for the next flush, up to
+-- MAX_ATTEMPTS tries.
+CREATE OR REPLACE PROCEDURE flush_rcm_alerts(DEDUPE_MINUTES INTEGER DEFAULT 60, MAX_ATTEMPTS INTEGER DEFAULT 3)
+RETURNS TEXT
 LANGUAGE PYTHON
 RUNTIME_VERSION = '3.11'
 PACKAGES = ('snowflake-snowpark-python')
-HANDLER = 'send_rcm_alert'
+HANDLER = 'flush_rcm_alerts'
 AS
 $$
-def send_rcm_alert(session, recipient, subject, message):
-    session.call(
-        'SYSTEM$SEND_EMAIL',
-        'rcm_email_notifications',
-        recipient,
-        subject,
-        message,
-        'text/plain'
-    )
-    return f"RCM alert sent to {recipient} with subject: {subject}"
+import json
+import uuid
+
+# Logging the flush reads the stream, which moves its offset: alerts queued
+# after this statement trigger the next run even if this one claims them
+LOG_FLUSH_SQL = """
+INSERT INTO rcm_alert_flushes (flush_id, started_at, new_alerts)
+SELECT ?, CURRENT_TIMESTAMP(), COUNT(*) FROM rcm_alert_queue_stream
+"""
+# Also reclaims alerts left 'sending' by a flush that died an hour ago
+CLAIM_SQL = """
+UPDATE rcm_alert_queue SET status = 'sending', flush_id = ?, claimed_at = CURRENT_TIMESTAMP()
+WHERE status = 'queued'
+   OR (status = 'sending' AND claimed_at < DATEADD(hour, -1, CURRENT_TIMESTAMP()))
+"""
+CLAIMED_SQL = """
+SELECT alert_id, recipient, subject, message, enqueued_at, attempts
+FROM rcm_alert_queue
+WHERE flush_id = ?
+ORDER BY enqueued_at
+"""
+RECENTLY_SENT_SQL = """
+SELECT DISTINCT recipient, subject, message
+FROM rcm_alert_queue
+WHERE status = 'sent' AND sent_at >= DATEADD(minute, -?, CURRENT_TIMESTAMP())
+"""
+RECORD_SQL = """
+UPDATE rcm_alert_queue q
+SET status = u.value:status::STRING,
+    digest_id = u.value:digest_id::STRING,
+    attempts = q.attempts + u.value:attempted::INTEGER,
+    sent_at = IFF(u.value:status::STRING = 'sent', CURRENT_TIMESTAMP(), NULL),
+    error = u.value:error::STRING
+FROM TABLE(FLATTEN(INPUT => PARSE_JSON(?))) u
+WHERE q.alert_id = u.value:alert_id::STRING
+"""
+LOG_RESULT_SQL = """
+UPDATE rcm_alert_flushes
+SET alerts = ?, duplicates = ?, digests = ?, emails = ?, failed = ?
+WHERE flush_id = ?
+"""
+
+
+def alert_key(recipient, subject, message):
+    return ((recipient or "").strip().lower(), (subject or "").strip(), (message or "").strip())
+
+
+def render_digest(alerts):
+    """Subject and body for one recipient's alerts: the alert itself, or a digest of all of them."""
+    if len(alerts) == 1 and alerts[0]["count"] == 1:
+        return alerts[0]["subject"], alerts[0]["message"]
+    total = sum(alert["count"] for alert in alerts)
+    lines = [f"{total} RCM alerts since {alerts[0]['enqueued_at']:%Y-%m-%d %H:%M}:", ""]
+    for number, alert in enumerate(alerts, 1):
+        repeated = f" (raised {alert['count']} times)" if alert["count"] > 1 else ""
+        lines += [f"{number}. [{alert['enqueued_at']:%H:%M}] {alert['subject']}{repeated}", alert["message"], ""]
+    return f"RCM alert digest: {total} alerts", "\n".join(lines).rstrip()
+
+
+def coalesce_alerts(alerts, recently_sent):
+    """
+    Group claimed alerts into digests.
+
+    alerts: dicts with alert_id, recipient, subject, message, enqueued_at, oldest first.
+    recently_sent: alert_key()s delivered within the dedupe window.
+    Returns (digests, duplicates): one digest per recipient, with its
+    subject, body and alert_ids; duplicates maps a skipped alert_id to the
+    alert it repeats (None when that one was sent by an earlier flush).
+    """
+    kept = {}
+    duplicates = {}
+    by_recipient = {}
+    for alert in alerts:
+        key = alert_key(alert["recipient"], alert["subject"], alert["message"])
+        if key in recently_sent:
+            duplicates[alert["alert_id"]] = None
+        elif key in kept:
+            kept[key]["count"] += 1
+            duplicates[alert["alert_id"]] = kept[key]["alert_id"]
+        else:
+            kept[key] = dict(alert, count=1)
+            by_recipient.setdefault(key[0], []).append(kept[key])
+
+    digests = []
+    for recipient, recipient_alerts in by_recipient.items():
+        subject, body = render_digest(recipient_alerts)
+        digests.append({"recipient": recipient, "subject": subject, "body": body,
+                        "alert_ids": [alert["alert_id"] for alert in recipient_alerts]})
+    return digests, duplicates
+
+
+def flush_rcm_alerts(session, dedupe_minutes, max_attempts):
+    flush_id = str(uuid.uuid4())
+    session.sql(LOG_FLUSH_SQL, params=[flush_id]).collect()
+    session.sql(CLAIM_SQL, params=[flush_id]).collect()
+    alerts = [
+        {"alert_id": row["ALERT_ID"], "recipient": row["RECIPIENT"], "subject": row["SUBJECT"],
+         "message": row["MESSAGE"], "enqueued_at": row["ENQUEUED_AT"], "attempts": row["ATTEMPTS"]}
+        for row in session.sql(CLAIMED_SQL, params=[flush_id]).collect()
+    ]
+    if not alerts:
+        session.sql(LOG_RESULT_SQL, params=[0, 0, 0, 0, 0, flush_id]).collect()
+        return "No RCM alerts queued"
+    recently_sent = {
+        alert_key(row["RECIPIENT"], row["SUBJECT"], row["MESSAGE"])
+        for row in session.sql(RECENTLY_SENT_SQL, params=[dedupe_minutes]).collect()
+    }
+    digests, duplicates = coalesce_alerts(alerts, recently_sent)
+
+    attempts = {alert["alert_id"]: alert["attempts"] for alert in alerts}
+    updates = [
+        {"alert_id": alert_id, "status": "duplicate", "digest_id": None, "attempted": 0, "error": None}
+        for alert_id in duplicates
+    ]
+    emails = failed = 0
+    for digest in digests:
+        digest_id = str(uuid.uuid4())
+        try:
+            session.call('SYSTEM$SEND_EMAIL', 'rcm_email_notifications', digest["recipient"], digest["subject"],
+                         digest["body"], 'text/plain')
+            emails += 1
+            updates += [{"alert_id": alert_id, "status": "sent", "digest_id": digest_id, "attempted": 1,
+                         "error": None} for alert_id in digest["alert_ids"]]
+        except Exception as e:
+            failed += len(digest["alert_ids"])
+            updates += [{"alert_id": alert_id,
+                         "status": "queued" if attempts[alert_id] + 1 < max_attempts else "failed",
+                         "digest_id": digest_id, "attempted": 1, "error": str(e)}
+                        for alert_id in digest["alert_ids"]]
+
+    session.sql(RECORD_SQL, params=[json.dumps(updates)]).collect()
+    session.sql(LOG_RESULT_SQL, params=[len(alerts), len(duplicates), len(digests), emails, failed,
+                                        flush_id]).collect()
+    return (f"Flushed {len(alerts)} RCM alerts: {len(duplicates)} duplicates, "
+            f"{emails} of {len(digests)} digest emails sent, {failed} alerts not delivered")
 $$;
 
+-- Flush whenever alerts are queued. Alerts queued within one 5-minute
+-- schedule interval reach each recipient as one digest; an idle queue costs no
+-- warehouse time. Alerts left queued after a failed send go out with the next
+-- flush, or CALL flush_rcm_alerts() to retry them now. Resuming the task
+-- needs the EXECUTE TASK grant from script 01.
+CREATE OR REPLACE TASK flush_rcm_alerts_task
+    WAREHOUSE = RCM_INTELLIGENCE_WH
+    SCHEDULE = '5 MINUTE'
+    WHEN SYSTEM$STREAM_HAS_DATA('rcm_alert_queue_stream')
+AS
+    CALL flush_rcm_alerts();
+
+ALTER TASK flush_rcm_alerts_task RESUME;
+
 -- Create healthcare web scraping function for market intelligence
 CREATE OR REPLACE FUNCTION scrape_healthcare_data(weburl TEXT)
 RETURNS TEXT
@@ -153,6 +432,214 @@ def scrape_healthcare_data(weburl):
         return f"Error scraping healthcare data: {str(e)}"
 $$;
 
+-- Pages fetched by refresh_healthcare_pages, with the validators needed for
+-- conditional GETs so unchanged pages are not downloaded again
+CREATE TABLE IF NOT EXISTS rcm_scraped_pages (
+    url STRING NOT NULL,
+    etag STRING,
+    last_modified STRING,
+    http_status INTEGER,
+    content STRING,
+    error STRING,
+    fetched_at TIMESTAMP_LTZ,
+    checked_at TIMESTAMP_LTZ
+)
+COMMENT = 'Healthcare web pages scraped for market intelligence, refreshed by refresh_healthcare_pages';
+
+-- Batch form of scrape_healthcare_data for monitoring many payer bulletin pages.
+-- Rows are collected per partition and fetched concurrently over one pooled
+-- requests session (at most MAX_WORKERS at a time). Each row may carry the
+-- ETag / Last-Modified seen last time; the page is then requested
+-- conditionally and a 304 comes back as status 'not_modified' with no content.
+-- Text is extracted while the body streams in, and the download stops once
+-- max_chars characters of text have been read.
+CREATE OR REPLACE FUNCTION scrape_healthcare_pages(
+    weburl TEXT, etag TEXT, last_modified TEXT, max_chars INTEGER
+)
+RETURNS TABLE (
+    url TEXT, status TEXT, http_status INTEGER, etag TEXT, last_modified TEXT,
+    content TEXT, error TEXT, elapsed_ms FLOAT
+)
+LANGUAGE PYTHON
+RUNTIME_VERSION = '3.11'
+PACKAGES = ('requests')
+HANDLER = 'ScrapeHealthcarePages'
+EXTERNAL_ACCESS_INTEGRATIONS = (rcm_intelligence_external_access)
+AS
+$$
+import codecs
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+import requests
+from requests.adapters import HTTPAdapter
+
+MAX_WORKERS = 8
+TIMEOUT = 30
+READ_CHUNK_BYTES = 16384
+SKIPPED_TAGS = {"script", "style"}
+
+
+class TextExtractor(HTMLParser):
+    """Visible text with whitespace collapsed, stopping once max_chars are collected."""
+
+    def __init__(self, max_chars):
+        super().__init__()
+        self.max_chars = max_chars
+        self.parts = []
+        self.length = 0
+        self.skip_depth = 0
+        self.pending_space = False
+
+    @property
+    def done(self):
+        return self.length >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth or self.done:
+            return
+        words = data.split()
+        if not words:
+            self.pending_space = self.pending_space or bool(data)
+            return
+        if self.length and (self.pending_space or data[0].isspace()):
+            self._append(" ")
+        self._append(" ".join(words))
+        self.pending_space = data[-1].isspace()
+
+    def _append(self, text):
+        self.parts.append(text)
+        self.length += len(text)
+
+    def text(self):
+        return "".join(self.parts)[:self.max_chars]
+
+
+def response_encoding(response):
+    """The declared charset, else UTF-8 (requests' ISO-8859-1 default for text/* mangles most pages)."""
+    if "charset" in response.headers.get("Content-Type", "").lower():
+        return response.encoding
+    return "utf-8"
+
+
+def extract_text(response, max_chars):
+    parser = TextExtractor(max_chars)
+    decoder = codecs.getincrementaldecoder(response_encoding(response))(errors="replace")
+    for chunk in response.iter_content(chunk_size=READ_CHUNK_BYTES):
+        parser.feed(decoder.decode(chunk))
+        if parser.done:
+            break
+    else:
+        parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+    return parser.text()
+
+
+class ScrapeHealthcarePages:
+    def __init__(self):
+        self.rows = []
+
+    def process(self, weburl, etag, last_modified, max_chars):
+        self.rows.append((weburl, etag, last_modified, max_chars or 10000))
+
+    def end_partition(self):
+        if not self.rows:
+            return
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        try:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(self.rows))) as pool:
+                yield from pool.map(lambda row: self.fetch(session, *row), self.rows)
+        finally:
+            session.close()
+
+    def fetch(self, session, weburl, etag, last_modified, max_chars):
+        started = time.perf_counter()
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        try:
+            with session.get(weburl, headers=headers, timeout=TIMEOUT, stream=True) as response:
+                if response.status_code == 304:
+                    response.content  # Nothing to read; lets the connection go back to the pool
+                    return (weburl, "not_modified", 304, etag, last_modified, None, None,
+                            (time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+                content = extract_text(response, max_chars)
+                return (weburl, "fetched", response.status_code, response.headers.get("ETag"),
+                        response.headers.get("Last-Modified"), content, None,
+                        (time.perf_counter() - started) * 1000)
+        except Exception as e:
+            status_code = getattr(getattr(e, "response", None), "status_code", None)
+            return (weburl, "error", status_code, etag, last_modified, None,
+                    f"Error scraping healthcare data: {str(e)}", (time.perf_counter() - started) * 1000)
+$$;
+
+-- Fetch a list of pages through scrape_healthcare_pages, using and updating
+-- the validators in rcm_scraped_pages. Unchanged and failed pages keep their
+-- last good content; every page's row is returned.
+-- Usage: CALL refresh_healthcare_pages(ARRAY_CONSTRUCT('https://...', 'https://...'));
+CREATE OR REPLACE PROCEDURE refresh_healthcare_pages(
+    URLS ARRAY,
+    MAX_CHARS INTEGER DEFAULT 10000
+)
+RETURNS TABLE (url STRING, http_status INTEGER, content STRING, error STRING, fetched_at TIMESTAMP_LTZ, checked_at TIMESTAMP_LTZ)
+LANGUAGE SQL
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+    pages RESULTSET;
+BEGIN
+    MERGE INTO rcm_scraped_pages c
+    USING (
+        SELECT s.url, s.status, s.http_status, s.etag, s.last_modified, s.content, s.error
+        FROM (
+            SELECT DISTINCT u.value::STRING AS page_url, p.etag AS page_etag, p.last_modified AS page_last_modified
+            FROM TABLE(FLATTEN(INPUT => :URLS)) u
+            LEFT JOIN rcm_scraped_pages p ON p.url = u.value::STRING AND p.content IS NOT NULL
+        ) r,
+        TABLE(scrape_healthcare_pages(r.page_url, r.page_etag, r.page_last_modified, :MAX_CHARS) OVER (PARTITION BY 1)) s
+    ) s
+    ON c.url = s.url
+    WHEN MATCHED AND s.status = 'fetched' THEN UPDATE SET
+        c.etag = s.etag,
+        c.last_modified = s.last_modified,
+        c.http_status = s.http_status,
+        c.content = s.content,
+        c.error = NULL,
+        c.fetched_at = CURRENT_TIMESTAMP(),
+        c.checked_at = CURRENT_TIMESTAMP()
+    WHEN MATCHED THEN UPDATE SET
+        c.http_status = s.http_status,
+        c.error = s.error,
+        c.checked_at = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN INSERT (url, etag, last_modified, http_status, content, error, fetched_at, checked_at)
+        VALUES (s.url, s.etag, s.last_modified, s.http_status, s.content, s.error,
+                IFF(s.status = 'fetched', CURRENT_TIMESTAMP(), NULL), CURRENT_TIMESTAMP());
+
+    pages := (
+        SELECT url, http_status, content, error, fetched_at, checked_at
+        FROM rcm_scraped_pages
+        WHERE ARRAY_CONTAINS(url::VARIANT, :URLS)
+    );
+    RETURN TABLE(pages);
+END;
+$$;
+
 -- ========================================================================
 -- RCM SNOWFLAKE INTELLIGENCE AGENT
 -- ========================================================================
@@ -171,7 +658,7 @@ FROM SPECIFICATION $$
   },
   "instructions": {
     "response": "You are a healthcare revenue cycle management (RCM) analyst with deep expertise in claims processing, denial management, payer relations, and healthcare financial operations. You have access to comprehensive healthcare provider data, payer performance metrics, claims and denials data, and healthcare industry documents. When answering questions, focus on RCM-specific KPIs like clean claim rates, denial rates, net collection rates, days in A/R, appeal success rates, and payer performance metrics. Provide visualizations when possible and always relate insights back to revenue cycle optimization and healthcare financial performance. Use healthcare terminology throughout your responses.",
-    "orchestration": "Use Cortex Search to find relevant healthcare documents and policies, then use Cortex Analyst to analyze claims, denials, and financial data. For questions about providers, payers, or operational metrics, prioritize the Claims Processing and Denials Management datamarts. Always consider healthcare industry context and RCM best practices. When discussing financial performance, focus on revenue cycle metrics like clean claim rates, net collection rates, and payer performance. For document searches, look for policies, procedures, compliance requirements, and strategic planning documents.",
+    "orchestration": "Use Cortex Search to find relevant healthcare documents and policies, then use Cortex Analyst to analyze claims, denials, and financial data. For questions about providers, payers, or operational metrics, prioritize the Claims Processing and Denials Management datamarts. Always consider healthcare industry context and RCM best practices. When discussing financial performance, focus on revenue cycle metrics like clean claim rates, net collection rates, and payer performance. For document searches, look for policies, procedures, compliance requirements, and strategic planning documents. When an answer links documents, request all of the links in a single 'Generate Document Download Links' call.",
     "sample_questions": [
       {
         "question": "How many healthcare provider clients are growing YOY vs. shrinking in revenue?"
@@ -263,7 +750,7 @@ FROM SPECIFICATION $$
       "tool_spec": {
         "type": "generic",
         "name": "Generate Document Download Link",
-        "description": "Generate secure download links for RCM documents and reports. Use when users need to access or download specific healthcare policy documents, reports, or procedures found through document searches.",
+        "description": "Generate a secure download link for one RCM document or report. Use when users need to access or download a specific healthcare policy document, report, or procedure found through document searches. To link more than one document, use 'Generate Document Download Links' instead.",
         "input_schema": {
           "type": "object",
           "properties": {
@@ -282,11 +769,37 @@ FROM SPECIFICATION $$
         }
       }
     },
+    {
+      "tool_spec": {
+        "type": "generic",
+        "name": "Generate Document Download Links",
+        "description": "Generate secure download links for several RCM documents in one call, e.g. every document cited in an answer. Returns an object mapping each relative file path to its link. Always prefer this over calling 'Generate Document Download Link' once per document.",
+        "input_schema": {
+          "type": "object",
+          "properties": {
+            "relative_file_paths": {
+              "description": "The relative file paths from document search results (the 'relative_path' values returned from Cortex Search tools).",
+              "type": "array",
+              "items": {
+                "type": "string"
+              }
+            },
+            "expiration_minutes": {
+              "description": "Number of minutes until the download links expire. Default is 60 minutes.",
+              "type": "integer"
+            }
+          },
+          "required": [
+            "relative_file_paths"
+          ]
+        }
+      }
+    },
     {
       "tool_spec": {
         "type": "generic",
         "name": "Send RCM Alert",
-        "description": "Send email alerts for critical RCM issues like high denial rates, payment delays, or compliance concerns. Use when analysis reveals issues that require immediate attention.",
+        "description": "Send email alerts for critical RCM issues like high denial rates, payment delays, or compliance concerns. Use when analysis reveals issues that require immediate attention. Alerts are queued and delivered within a few minutes, combined with any other alerts for the same recipient.",
         "input_schema": {
           "type": "object",
           "properties": {
@@ -369,6 +882,16 @@ FROM SPECIFICATION $$
       "name": "GET_RCM_DOCUMENT_URL(VARCHAR, DEFAULT INTEGER)",
       "type": "procedure"
     },
+    "Generate Document Download Links": {
+      "execution_environment": {
+        "query_timeout": 30,
+        "type": "warehouse",
+        "warehouse": "RCM_INTELLIGENCE_WH"
+      },
+      "identifier": "RCM_AI_DEMO.RCM_SCHEMA.GET_RCM_DOCUMENT_URLS",
+      "name": "GET_RCM_DOCUMENT_URLS(ARRAY, DEFAULT INTEGER)",
+      "type": "procedure"
+    },
     "Send RCM Alert": {
       "execution_environment": {
         "query_timeout": 30,
@@ -16,90 +16,228 @@ USE SCHEMA RCM_SCHEMA;
 -- These replace the Python rcm_terminology.py module
 -- Runs inside Snowflake for zero data movement
 
--- Main terminology enhancement function
-CREATE OR REPLACE FUNCTION ENHANCE_RCM_QUERY(query STRING)
+-- RCM terminology dictionary
+-- Source of truth for the terms and CARC/RARC codes ENHANCE_RCM_QUERY detects.
+-- Load your full code dictionary here; the UDF cost per query does not grow
+-- with the number of entries.
+CREATE OR REPLACE TABLE rcm_terminology_dim (
+    term VARCHAR(100) NOT NULL,
+    definition VARCHAR(1000) NOT NULL,
+    term_type VARCHAR(20) NOT NULL -- TERM, CARC, RARC
+);
+
+INSERT INTO rcm_terminology_dim VALUES
+('remit', 'remittance advice (ERA - Electronic Remittance Advice)', 'TERM'),
+('remits', 'remittance advice documents', 'TERM'),
+('write-off', 'contractual adjustment or bad debt write-off (adjustment codes CO-45, PR-1)', 'TERM'),
+('clean claim', 'claim submitted without errors that is accepted on first submission', 'TERM'),
+('dirty claim', 'claim requiring correction or additional information before processing', 'TERM'),
+('scrub', 'automated claim validation and error checking before submission', 'TERM'),
+('aging', 'accounts receivable aging - time since claim submission', 'TERM'),
+('a/r', 'accounts receivable', 'TERM'),
+('ar', 'accounts receivable', 'TERM'),
+('days in ar', 'average days in accounts receivable (DSO - Days Sales Outstanding)', 'TERM'),
+('dso', 'days sales outstanding', 'TERM'),
+('denial code', 'claim adjustment reason code (CARC) or remittance advice remark code (RARC)', 'TERM'),
+('co', 'contractual obligation (payer responsibility adjustment)', 'TERM'),
+('pr', 'patient responsibility (patient owes amount)', 'TERM'),
+('timely filing', 'claim submission deadline per payer contract', 'TERM'),
+('coordination of benefits', 'COB - determining primary vs secondary payer responsibility', 'TERM'),
+('cob', 'coordination of benefits', 'TERM'),
+('eob', 'explanation of benefits', 'TERM'),
+('era', 'electronic remittance advice', 'TERM'),
+('edi', 'electronic data interchange', 'TERM'),
+('CO-45', 'CO-45 (Contractual Obligation - charge exceeds fee schedule)', 'CARC'),
+('PR-1', 'PR-1 (Patient Responsibility - deductible)', 'CARC'),
+('CO-16', 'CO-16 (Claim/service lacks information)', 'CARC'),
+('CO-29', 'CO-29 (Time limit for filing has expired)', 'CARC'),
+('CO-50', 'CO-50 (Non-covered service)', 'CARC');
+
+-- Add the remaining denial codes from the denial reasons dimension
+INSERT INTO rcm_terminology_dim
+SELECT denial_code, denial_code || ' (' || denial_description || ')', 'CARC'
+FROM denial_reasons_dim
+WHERE denial_code NOT IN (SELECT term FROM rcm_terminology_dim);
+
+-- Publish the dictionary to the stage file the UDF imports
+-- Re-run this procedure after editing rcm_terminology_dim. Staged IMPORTS are
+-- copied when a function is created, so once ENHANCE_RCM_QUERY_BATCH exists the
+-- procedure re-creates it from its own DDL to pick up the new file.
+CREATE OR REPLACE PROCEDURE REFRESH_RCM_TERMINOLOGY()
+RETURNS STRING
+LANGUAGE SQL
+COMMENT = 'Unloads rcm_terminology_dim to @RCM_DATA_STAGE/terminology/ for ENHANCE_RCM_QUERY'
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+    entry_count INTEGER;
+    function_count INTEGER;
+    function_ddl STRING;
+BEGIN
+    COPY INTO @RCM_AI_DEMO.RCM_SCHEMA.RCM_DATA_STAGE/terminology/rcm_terminology.json
+    FROM (
+        SELECT OBJECT_CONSTRUCT('term', term, 'definition', definition, 'term_type', term_type)
+        FROM RCM_AI_DEMO.RCM_SCHEMA.rcm_terminology_dim
+    )
+    FILE_FORMAT = (TYPE = JSON COMPRESSION = NONE)
+    SINGLE = TRUE
+    OVERWRITE = TRUE;
+
+    SELECT COUNT(*) INTO :entry_count FROM RCM_AI_DEMO.RCM_SCHEMA.rcm_terminology_dim;
+
+    -- Skipped on the first run below, before the function has been created
+    SELECT COUNT(*) INTO :function_count
+    FROM RCM_AI_DEMO.INFORMATION_SCHEMA.FUNCTIONS
+    WHERE function_schema = 'RCM_SCHEMA' AND function_name = 'ENHANCE_RCM_QUERY_BATCH';
+    IF (function_count > 0) THEN
+        SELECT GET_DDL('FUNCTION', 'RCM_AI_DEMO.RCM_SCHEMA.ENHANCE_RCM_QUERY_BATCH(STRING)', TRUE)
+        INTO :function_ddl;
+        EXECUTE IMMEDIATE :function_ddl;
+        -- CREATE OR REPLACE drops grants on the old function
+        GRANT USAGE ON FUNCTION RCM_AI_DEMO.RCM_SCHEMA.ENHANCE_RCM_QUERY_BATCH(STRING) TO ROLE SF_INTELLIGENCE_DEMO;
+        RETURN 'Published ' || entry_count || ' RCM terminology entries and reloaded ENHANCE_RCM_QUERY_BATCH';
+    END IF;
+    RETURN 'Published ' || entry_count || ' RCM terminology entries';
+END;
+$$;
+
+CALL REFRESH_RCM_TERMINOLOGY();
+
+-- Main terminology enhancement function (vectorized)
+-- The dictionary is read from the imported stage file and compiled into a
+-- token trie once per UDF process; each call tokenizes the query once and
+-- walks the trie, so cost depends on query length, not dictionary size.
+-- Rows arrive in pandas batches and each distinct question is evaluated once,
+-- so bulk tagging (e.g. months of logged questions) pays one Python call per
+-- question for all three outputs. ENHANCE_RCM_QUERY below wraps this function
+-- for single-question use; the matcher lives only here.
+CREATE OR REPLACE FUNCTION ENHANCE_RCM_QUERY_BATCH(query STRING)
 RETURNS OBJECT
 LANGUAGE PYTHON
 RUNTIME_VERSION = '3.11'
-PACKAGES = ('snowflake-snowpark-python')
-HANDLER = 'enhance_query'
-COMMENT = 'Enhances user queries with RCM domain terminology definitions'
+PACKAGES = ('snowflake-snowpark-python', 'pandas')
+IMPORTS = ('@RCM_DATA_STAGE/terminology/rcm_terminology.json')
+HANDLER = 'enhance_batch'
+COMMENT = 'Enhances user queries with RCM domain terminology definitions, one evaluation per distinct question'
 AS $$
+import functools
+import json
+import os
+import re
+import sys
+
+import pandas
+from _snowflake import vectorized
+
+TERMINOLOGY_FILE = "rcm_terminology.json"
+CODE_TYPES = ("CARC", "RARC")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[^a-z0-9\s]")
+TERMINAL = None  # Trie key marking the end of a term
+MAX_BATCH_SIZE = 10000
+QUERY_CACHE_SIZE = 50000  # Distinct questions remembered across batches
+
+
+def tokenize(text):
+    """Lowercase word and punctuation tokens; 'CO-45' -> ['co', '-', '45']."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def load_entries():
+    """Read the dictionary published by REFRESH_RCM_TERMINOLOGY()."""
+    import_dir = sys._xoptions["snowflake_import_directory"]
+    with open(os.path.join(import_dir, TERMINOLOGY_FILE)) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_matcher(entries):
+    """
+    Compile dictionary entries into a token trie.
+
+    Codes are also indexed without their hyphen so 'CO45' matches like the
+    old CO-?45 patterns did. Returns (trie, max_depth).
+    """
+    trie = {}
+    max_depth = 0
+    for entry in entries:
+        term = entry["term"]
+        variants = [tokenize(term)]
+        if entry.get("term_type") in CODE_TYPES and "-" in term:
+            variants.append(tokenize(term.replace("-", "")))
+
+        for tokens in variants:
+            node = trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node.setdefault(TERMINAL, (term, entry["definition"]))
+            max_depth = max(max_depth, len(tokens))
+    return trie, max_depth
+
+
+MATCHER, MAX_DEPTH = build_matcher(load_entries())
+
+
+def find_terms(query):
+    """Single pass over the query tokens, reporting every dictionary term once."""
+    tokens = tokenize(query)
+    detected_terms = []
+    seen = set()
+
+    for start in range(len(tokens)):
+        node = MATCHER
+        for index in range(start, min(start + MAX_DEPTH, len(tokens))):
+            node = node.get(tokens[index])
+            if node is None:
+                break
+            match = node.get(TERMINAL)
+            if match and match[0] not in seen:
+                seen.add(match[0])
+                detected_terms.append({"term": match[0], "definition": match[1]})
+    return detected_terms
+
+
+@functools.lru_cache(maxsize=QUERY_CACHE_SIZE)
 def enhance_query(query):
     """
     Detect RCM terminology in queries and add context.
     Replaces rcm_terminology.py for SiS deployment.
     """
-    import re
-    
-    # RCM terminology mappings
-    terminology = {
-        "remit": "remittance advice (ERA - Electronic Remittance Advice)",
-        "remits": "remittance advice documents",
-        "write-off": "contractual adjustment or bad debt write-off (adjustment codes CO-45, PR-1)",
-        "clean claim": "claim submitted without errors that is accepted on first submission",
-        "dirty claim": "claim requiring correction or additional information before processing",
-        "scrub": "automated claim validation and error checking before submission",
-        "aging": "accounts receivable aging - time since claim submission",
-        "a/r": "accounts receivable",
-        "ar": "accounts receivable",
-        "days in ar": "average days in accounts receivable (DSO - Days Sales Outstanding)",
-        "dso": "days sales outstanding",
-        "denial code": "claim adjustment reason code (CARC) or remittance advice remark code (RARC)",
-        "co": "contractual obligation (payer responsibility adjustment)",
-        "pr": "patient responsibility (patient owes amount)",
-        "timely filing": "claim submission deadline per payer contract",
-        "coordination of benefits": "COB - determining primary vs secondary payer responsibility",
-        "cob": "coordination of benefits",
-        "eob": "explanation of benefits",
-        "era": "electronic remittance advice",
-        "edi": "electronic data interchange"
-    }
-    
-    # Denial code patterns
-    denial_codes = {
-        r'\bCO-?45\b': "CO-45 (Contractual Obligation - charge exceeds fee schedule)",
-        r'\bPR-?1\b': "PR-1 (Patient Responsibility - deductible)",
-        r'\bCO-?16\b': "CO-16 (Claim/service lacks information)",
-        r'\bCO-?29\b': "CO-29 (Time limit for filing has expired)",
-        r'\bCO-?50\b': "CO-50 (Non-covered service)"
-    }
-    
-    detected_terms = []
-    query_lower = query.lower()
-    
-    # Detect terminology
-    for term, definition in terminology.items():
-        pattern = r'\b' + re.escape(term) + r'\b'
-        if re.search(pattern, query_lower, re.IGNORECASE):
-            detected_terms.append({"term": term, "definition": definition})
-    
-    # Detect denial codes
-    for pattern, description in denial_codes.items():
-        if re.search(pattern, query, re.IGNORECASE):
-            detected_terms.append({"term": pattern.replace(r'\b', ''), "definition": description})
-    
-    # Build enhanced query
+    detected_terms = find_terms(query)
+
     if detected_terms:
-        context = "RCM Terminology Context:\n"
-        for item in detected_terms:
-            context += f"- {item['term']}: {item['definition']}\n"
-        
-        enhanced_query = f"{context}\n\nUser Query: {query}"
-        
+        context_lines = ["RCM Terminology Context:"]
+        context_lines.extend(f"- {item['term']}: {item['definition']}" for item in detected_terms)
         return {
-            "enhanced_query": enhanced_query,
+            "enhanced_query": "\n".join(context_lines) + f"\n\n\nUser Query: {query}",
             "original_query": query,
             "terms_detected": detected_terms,
             "has_enhancements": True
         }
-    else:
-        return {
-            "enhanced_query": query,
-            "original_query": query,
-            "terms_detected": [],
-            "has_enhancements": False
-        }
+    return {
+        "enhanced_query": query,
+        "original_query": query,
+        "terms_detected": [],
+        "has_enhancements": False
+    }
+
+
+@vectorized(input=pandas.DataFrame, max_batch_size=MAX_BATCH_SIZE)
+def enhance_batch(df):
+    """Evaluate each distinct question in the batch once and fan results back out."""
+    queries = df[0]
+    distinct = queries.dropna().drop_duplicates()
+    results = dict(zip(distinct, map(enhance_query, distinct)))
+    # NULL questions have no key in results and map back to NULL
+    return queries.map(results).astype(object).where(queries.notna(), None)
+$$;
+
+-- Scalar entry point for single questions; the helpers below call the batch function directly
+CREATE OR REPLACE FUNCTION ENHANCE_RCM_QUERY(query STRING)
+RETURNS OBJECT
+LANGUAGE SQL
+COMMENT = 'Enhances user queries with RCM domain terminology definitions'
+AS $$
+    SELECT ENHANCE_RCM_QUERY_BATCH(query)
 $$;
 
 -- Get just the enhanced query text (for agent use)
@@ -107,7 +245,7 @@ CREATE OR REPLACE FUNCTION GET_ENHANCED_QUERY(query STRING)
 RETURNS STRING
 LANGUAGE SQL
 AS $$
-    SELECT ENHANCE_RCM_QUERY(query):enhanced_query::STRING
+    SELECT ENHANCE_RCM_QUERY_BATCH(query):enhanced_query::STRING
 $$;
 
 -- Check if query has RCM terminology
@@ -115,7 +253,7 @@ CREATE OR REPLACE FUNCTION HAS_RCM_TERMS(query STRING)
 RETURNS BOOLEAN
 LANGUAGE SQL
 AS $$
-    SELECT ENHANCE_RCM_QUERY(query):has_enhancements::BOOLEAN
+    SELECT ENHANCE_RCM_QUERY_BATCH(query):has_enhancements::BOOLEAN
 $$;
 
 -- Get detected terms as array
@@ -123,12 +261,31 @@ CREATE OR REPLACE FUNCTION GET_RCM_TERMS(query STRING)
 RETURNS VARIANT
 LANGUAGE SQL
 AS $$
-    SELECT ENHANCE_RCM_QUERY(query):terms_detected
+    SELECT ENHANCE_RCM_QUERY_BATCH(query):terms_detected
 $$;
 
 -- Test the UDF
 SELECT ENHANCE_RCM_QUERY('What is the denial rate for CO-45 remits?') as enhancement_result;
 
+-- Bulk tagging pattern: one Python evaluation per row for all three outputs
+-- SELECT
+--     question_id,
+--     tags:enhanced_query::STRING AS enhanced_query,
+--     tags:has_enhancements::BOOLEAN AS has_rcm_terms,
+--     tags:terms_detected AS rcm_terms
+-- FROM (
+--     SELECT question_id, ENHANCE_RCM_QUERY_BATCH(question_text) AS tags
+--     FROM <question_log_table>
+-- );
+SELECT
+    tags:enhanced_query::STRING AS enhanced_query,
+    tags:has_enhancements::BOOLEAN AS has_rcm_terms,
+    tags:terms_detected AS rcm_terms
+FROM (
+    SELECT ENHANCE_RCM_QUERY_BATCH(column1) AS tags
+    FROM VALUES ('What is the denial rate for CO-45 remits?'), ('Show me clean claim rates by provider')
+);
+
 -- ========================================================================
 -- STEP 2: CREATE COST TRACKING FUNCTIONS
 -- ========================================================================
@@ -470,6 +627,7 @@ GRANT USAGE ON FUNCTION RCM_AI_DEMO.RCM_SCHEMA.ENHANCE_RCM_QUERY(STRING) TO ROLE
 GRANT USAGE ON FUNCTION RCM_AI_DEMO.RCM_SCHEMA.GET_ENHANCED_QUERY(STRING) TO ROLE SF_INTELLIGENCE_DEMO;
 GRANT USAGE ON FUNCTION RCM_AI_DEMO.RCM_SCHEMA.HAS_RCM_TERMS(STRING) TO ROLE SF_INTELLIGENCE_DEMO;
 GRANT USAGE ON FUNCTION RCM_AI_DEMO.RCM_SCHEMA.GET_RCM_TERMS(STRING) TO ROLE SF_INTELLIGENCE_DEMO;
+GRANT USAGE ON FUNCTION RCM_AI_DEMO.RCM_SCHEMA.ENHANCE_RCM_QUERY_BATCH(STRING) TO ROLE SF_INTELLIGENCE_DEMO;
 GRANT USAGE ON FUNCTION RCM_AI_DEMO.RCM_SCHEMA.ESTIMATE_TOKENS(STRING) TO ROLE SF_INTELLIGENCE_DEMO;
 GRANT USAGE ON FUNCTION RCM_AI_DEMO.RCM_SCHEMA.ESTIMATE_COST(INTEGER, INTEGER, STRING) TO ROLE SF_INTELLIGENCE_DEMO;
 
@@ -485,12 +643,101 @@ GRANT USAGE ON FUNCTION RCM_AI_DEMO.RCM_SCHEMA.ESTIMATE_COST(INTEGER, INTEGER, S
 -- ALTER SNOWFLAKE INTELLIGENCE SNOWFLAKE_INTELLIGENCE_OBJECT_DEFAULT 
 --   ADD AGENT SNOWFLAKE_INTELLIGENCE.AGENTS.RCM_Healthcare_Agent_Prod;
 
+-- ========================================================================
+-- STEP 5: QUERY TELEMETRY
+-- ========================================================================
+-- The Streamlit app traces every question: a root 'query' span (question,
+-- category, model, tokens, cost priced like ESTIMATE_COST), one span per
+-- operation (create_thread, call_agent, render_response, ...) and one per
+-- tool the agent used. Spans are buffered in the app and written here with
+-- one INSERT per batch. Kept with CREATE IF NOT EXISTS so re-running this
+-- script does not drop collected traces.
+CREATE TABLE IF NOT EXISTS rcm_query_spans (
+    trace_id STRING NOT NULL,
+    span_id STRING NOT NULL,
+    parent_span_id STRING,            -- NULL for the root 'query' span
+    name STRING,                      -- query, call_agent, tool, render_response, ...
+    kind STRING,                      -- query | operation | tool
+    started_at TIMESTAMP_NTZ,         -- UTC
+    duration_ms FLOAT,
+    success BOOLEAN,
+    session_id STRING,
+    question STRING,                  -- root span only
+    question_category STRING,         -- root span only: analytics, knowledge_base, multi_tool, general
+    tool_name STRING,                 -- tool spans only
+    tool_type STRING,
+    model STRING,                     -- root span only
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    estimated_cost_usd FLOAT,
+    attributes VARIANT,               -- cached, fast_path, circuit_open, error
+    inserted_at TIMESTAMP_LTZ DEFAULT CURRENT_TIMESTAMP()
+)
+COMMENT = 'Per-question trace spans exported in bulk by the RCM Intelligence Hub app';
+
+-- p50/p95 per phase of answering a question
+CREATE OR REPLACE VIEW rcm_latency_by_operation AS
+SELECT
+    name AS operation,
+    COUNT(*) AS spans,
+    COUNT_IF(NOT success) AS errors,
+    APPROX_PERCENTILE(duration_ms, 0.5) AS p50_ms,
+    APPROX_PERCENTILE(duration_ms, 0.95) AS p95_ms
+FROM rcm_query_spans
+WHERE kind = 'operation'
+GROUP BY name;
+
+-- p95 of the tool call itself (timed on streamed answers) and of the
+-- questions that used the tool
+CREATE OR REPLACE VIEW rcm_latency_by_tool AS
+SELECT
+    t.tool_name,
+    t.tool_type,
+    COUNT(*) AS tool_calls,
+    COUNT_IF(NOT t.success) AS errors,
+    APPROX_PERCENTILE(t.duration_ms, 0.95) AS tool_p95_ms,
+    APPROX_PERCENTILE(q.duration_ms, 0.95) AS question_p95_ms
+FROM rcm_query_spans t
+JOIN rcm_query_spans q
+    ON q.trace_id = t.trace_id
+   AND q.kind = 'query'
+WHERE t.kind = 'tool'
+GROUP BY t.tool_name, t.tool_type;
+
+-- p50/p95, tokens and cost per question category
+CREATE OR REPLACE VIEW rcm_latency_by_category AS
+SELECT
+    question_category,
+    COUNT(*) AS questions,
+    COUNT_IF(NOT success) AS errors,
+    COUNT_IF(attributes:cached::BOOLEAN OR attributes:fast_path::BOOLEAN) AS answered_without_agent,
+    APPROX_PERCENTILE(duration_ms, 0.5) AS p50_ms,
+    APPROX_PERCENTILE(duration_ms, 0.95) AS p95_ms,
+    AVG(input_tokens + output_tokens) AS avg_tokens,
+    SUM(estimated_cost_usd) AS total_cost_usd
+FROM rcm_query_spans
+WHERE kind = 'query'
+GROUP BY question_category;
+
+-- Slowest questions of the last day:
+-- SELECT started_at, question, question_category, duration_ms, estimated_cost_usd
+-- FROM rcm_query_spans
+-- WHERE kind = 'query' AND started_at >= DATEADD(day, -1, SYSDATE())
+-- ORDER BY duration_ms DESC
+-- LIMIT 20;
+
+GRANT SELECT, INSERT ON TABLE RCM_AI_DEMO.RCM_SCHEMA.rcm_query_spans TO ROLE SF_INTELLIGENCE_DEMO;
+GRANT SELECT ON VIEW RCM_AI_DEMO.RCM_SCHEMA.rcm_latency_by_operation TO ROLE SF_INTELLIGENCE_DEMO;
+GRANT SELECT ON VIEW RCM_AI_DEMO.RCM_SCHEMA.rcm_latency_by_tool TO ROLE SF_INTELLIGENCE_DEMO;
+GRANT SELECT ON VIEW RCM_AI_DEMO.RCM_SCHEMA.rcm_latency_by_category TO ROLE SF_INTELLIGENCE_DEMO;
+
 -- ========================================================================
 -- VERIFICATION
 -- ========================================================================
 
 -- Show created UDFs
 SHOW FUNCTIONS LIKE 'ENHANCE%' IN SCHEMA RCM_AI_DEMO.RCM_SCHEMA;
+SELECT term_type, COUNT(*) AS entries FROM rcm_terminology_dim GROUP BY term_type;
 SHOW FUNCTIONS LIKE 'GET%' IN SCHEMA RCM_AI_DEMO.RCM_SCHEMA;
 SHOW FUNCTIONS LIKE 'ESTIMATE%' IN SCHEMA RCM_AI_DEMO.RCM_SCHEMA;
 
@@ -6,7 +6,7 @@ Production deployment with Native Cortex Agent orchestration following
 official Snowflake standards: https://docs.snowflake.com/en/user-guide/snowflake-cortex/cortex-agents
 
 Key features:
-- Uses get_active_session() for native Snowflake integration
+- Uses get_active_session() for native Snowflake integration, after first paint
 - Calls Cortex Agent via REST API (_snowflake module)
 - Thread-based conversation context management
 - RCM domain intelligence with 50+ healthcare terms
@@ -16,9 +16,21 @@ Key features:
 
 import streamlit as st
 import json
-from datetime import datetime
-from snowflake.snowpark.context import get_active_session
-from snowflake.snowpark import functions as F
+import os
+import functools
+import math
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timezone
+
+# Uploaded next to this file (see "Create Streamlit in Snowflake App")
+from rcm_document_index import STOPWORDS, DocumentIndex
 
 # ========================================================================
 # PAGE CONFIGURATION
@@ -40,9 +52,327 @@ AGENT_NAME = "RCM_Healthcare_Agent_Prod"
 AGENT_SCHEMA = "SNOWFLAKE_INTELLIGENCE.AGENTS"
 DATABASE = "RCM_AI_DEMO"
 SCHEMA = "RCM_SCHEMA"
+AGENT_API_PATH = f"/api/v2/databases/{DATABASE}/schemas/{SCHEMA}/agents/{AGENT_NAME}"
+
+# Streaming configuration
+# CORTEX_AGENT_HOST points the streaming client at an HTTP endpoint directly
+# (local testing with a PAT, or tools/fake_agent_server.py). Inside SiS it is
+# unset and the stream is read through the _snowflake module instead.
+STREAMING_ENABLED = True
+AGENT_HOST = os.environ.get("CORTEX_AGENT_HOST")
+AGENT_PAT = os.environ.get("CORTEX_AGENT_PAT")
+AGENT_RUN_TIMEOUT = 60
+STREAM_RENDER_INTERVAL = 0.05  # Seconds between markdown repaints while streaming
+
+# Thread prefetch configuration
+# Agent threads are created in the background when a session starts, and a few
+# spares are kept ready so "New Session" never waits on the threads endpoint.
+THREAD_PREFETCH_ENABLED = True
+THREAD_POOL_SIZE = 2
+THREAD_POOL_MAX_AGE_SECONDS = 1800  # Discard spares older than this
+THREAD_WAIT_TIMEOUT = 30
+
+# Agent resilience configuration
+# Timeouts follow each endpoint's observed p99 (times the multiplier, between
+# the floor and the fixed ceilings AGENT_RUN_TIMEOUT / THREAD_CREATE_TIMEOUT)
+# once enough calls have been seen. Thread creation is retried with jittered
+# backoff; a first question that outlasts the :run p95 gets a duplicate
+# request on a spare thread. While the endpoint keeps failing the circuit
+# breaker opens and questions go to the SQL fallback.
+THREAD_CREATE_TIMEOUT = 30
+ADAPTIVE_TIMEOUTS_ENABLED = True
+ADAPTIVE_TIMEOUT_MULTIPLIER = 2.0
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20
+ADAPTIVE_TIMEOUT_FLOOR = 5.0
+RETRY_ATTEMPTS = 3  # Per idempotent call, including the first
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+HEDGE_ENABLED = True
+HEDGE_PERCENTILE = 95
+HEDGE_MAX_SHARE = 0.1  # Hedged requests as a share of :run calls
+CIRCUIT_BREAKER_ENABLED = True
+CIRCUIT_WINDOW = 20  # Most recent calls considered
+CIRCUIT_FAILURE_THRESHOLD = 5  # Failures in the window (and at least half of it) that open the circuit
+CIRCUIT_RESET_SECONDS = 30  # Time open before one probe call is let through
+
+# Tool types reported by the agent, mapped to (icon, label) for status display
+TOOL_KINDS = {
+    "cortex_analyst_text_to_sql": ("📊", "Cortex Analyst"),
+    "cortex_search": ("📚", "Cortex Search"),
+    "generic": ("🔧", "Custom Tool"),
+}
+
+# Response cache configuration (shared across sessions)
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_TTL_SECONDS = 3600
+RESPONSE_CACHE_MAX_ENTRIES = 500
+RESPONSE_CACHE_MAX_BYTES = 20 * 1024 * 1024
+DATA_VERSION_TTL_SECONDS = 300  # How often to re-check fact table load timestamps
+DATA_VERSION_TABLES = ("CLAIMS_FACT", "DENIALS_FACT")
+
+# Near-duplicate question cache (shared across sessions, same toggle and TTL)
+# A reworded question reuses a recent answer when the character-shingle
+# Jaccard similarity of the canonical questions reaches the threshold.
+SIMILAR_QUERY_CACHE_ENABLED = True
+SIMILAR_QUERY_THRESHOLD = 0.8
+SIMILAR_QUERY_MAX_ENTRIES = 500
+SIMILAR_QUERY_SHINGLE_SIZE = 3
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # 4 rows per band: candidates from about 0.5 similarity upward
+ADJUSTMENT_CODE_PATTERN = re.compile(r"\b(co|pr|oa|pi|cr)\s*-?\s*(\d+)\b")
+RCM_QUERY_SYNONYMS = {
+    "remit": "remittance", "era": "remittance", "eob": "remittance",
+    "deny": "denial", "denies": "denial", "denied": "denial", "denying": "denial",
+    "insurer": "payer", "carrier": "payer", "payor": "payer",
+    "physician": "provider", "doctor": "provider", "clinician": "provider",
+    "most": "highest", "top": "highest", "greatest": "highest",
+    "least": "lowest", "fewest": "lowest", "bottom": "lowest",
+}
+QUERY_FILLER_WORDS = frozenset("has have had did was were there list give tell find get please per all each by".split())
+# Questions differing in any of these (or in codes and numbers) never match
+SIMILAR_QUERY_STRICT_TERMS = frozenset(
+    "highest lowest not no without increase decrease before after".split()
+)
+
+# Questions that lean on earlier turns in the thread are never served from cache
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(and|also|what about|how about|same|now|then|instead)\b"
+    r"|\b(it|its|that|those|these|them|they|above|previous|earlier|same)\b",
+    re.IGNORECASE
+)
+
+# Local retrieval configuration
+# The SQL fallback grounds its answer in the top BM25 matches from
+# rcm_document_chunks. RCM_LOCAL_INDEX points at an index file built with
+# tools/build_search_index.py instead (local development, no account).
+LOCAL_INDEX_PATH = os.environ.get("RCM_LOCAL_INDEX")
+FALLBACK_CONTEXT_RESULTS = 3
+FALLBACK_CONTEXT_CHARS = 1500  # Per excerpt added to the prompt
+FALLBACK_BATCH_SIZE = 100  # Prompts per COMPLETE statement
+DOCUMENT_INDEX_RETRY_SECONDS = 300  # Before retrying an index that failed to load
+
+# KPI fast path configuration
+# Headline KPI questions ("clean claim rate by provider") are answered from
+# the rollup tables in 04_rcm_semantic_views.sql without calling the agent.
+# A question routes only when every word is accounted for by one metric, at
+# most one dimension, a sort order or filler; anything else (filters, time
+# ranges, follow-ups) goes to the agent.
+KPI_FAST_PATH_ENABLED = True
+KPI_RESULT_LIMIT = 10
+KPI_METRICS = {
+    "clean_claim_rate": {
+        "pattern": r"clean claim rates?|first pass rates?|acceptance rates?",
+        "label": "Clean claim rate",
+        "table": "claims_kpi_rollup",
+        "value": "SUM(r.clean_claims) * 100.0 / NULLIF(SUM(r.total_claims), 0)",
+        "volume": ("SUM(r.total_claims)", "Claims"),
+        "unit": "%",
+    },
+    "denial_rate": {
+        "pattern": r"denial rates?|rejection rates?",
+        "label": "Denial rate",
+        "table": "claims_kpi_rollup",
+        "value": "SUM(r.denied_claims) * 100.0 / NULLIF(SUM(r.total_claims), 0)",
+        "volume": ("SUM(r.total_claims)", "Claims"),
+        "unit": "%",
+    },
+    "days_to_payment": {
+        "pattern": r"days to (?:payment|pay)|days in ar|payment cycle times?",
+        "label": "Average days to payment",
+        "table": "claims_kpi_rollup",
+        "value": "SUM(r.days_to_payment_total) * 1.0 / NULLIF(SUM(r.paid_claims), 0)",
+        "volume": ("SUM(r.paid_claims)", "Paid claims"),
+        "unit": " days",
+    },
+    "appeal_success_rate": {
+        "pattern": r"appeal success(?: rates?)?|win rates? for appeals|appeal win rates?",
+        "label": "Appeal success rate",
+        "table": "denials_kpi_rollup",
+        "value": "SUM(r.successful_appeals) * 100.0 / NULLIF(SUM(r.appealed_denials), 0)",
+        "volume": ("SUM(r.appealed_denials)", "Appeals"),
+        "unit": "%",
+    },
+}
+# Checked in order; a dimension's words are consumed before the next is tried
+KPI_DIMENSIONS = {
+    "payer_type": {
+        "pattern": r"payer types?|payer categor(?:y|ies)",
+        "label": "Payer type",
+        "join": "JOIN {database}.{schema}.payers_dim d ON d.payer_key = r.payer_key",
+        "column": "d.payer_type",
+        "tables": ("claims_kpi_rollup", "denials_kpi_rollup"),
+    },
+    "payer": {
+        "pattern": r"payers?|payors?|insurers?|insurance companies",
+        "label": "Payer",
+        "join": "JOIN {database}.{schema}.payers_dim d ON d.payer_key = r.payer_key",
+        "column": "d.payer_name",
+        "tables": ("claims_kpi_rollup", "denials_kpi_rollup"),
+    },
+    "specialty": {
+        "pattern": r"specialt(?:y|ies)",
+        "label": "Specialty",
+        "join": "JOIN {database}.{schema}.healthcare_providers_dim d ON d.provider_key = r.provider_key",
+        "column": "d.specialty",
+        "tables": ("claims_kpi_rollup", "denials_kpi_rollup"),
+    },
+    "provider": {
+        "pattern": r"providers?|hospitals?|health systems?",
+        "label": "Provider",
+        "join": "JOIN {database}.{schema}.healthcare_providers_dim d ON d.provider_key = r.provider_key",
+        "column": "d.provider_name",
+        "tables": ("claims_kpi_rollup", "denials_kpi_rollup"),
+    },
+    "denial_category": {
+        "pattern": r"denial categor(?:y|ies)",
+        "label": "Denial category",
+        "join": "JOIN {database}.{schema}.denial_reasons_dim d ON d.denial_reason_key = r.denial_reason_key",
+        "column": "d.category",
+        "tables": ("denials_kpi_rollup",),
+    },
+    "denial_code": {
+        "pattern": r"(?:denial |reason |carc )?codes?|denial reasons?",
+        "label": "Denial code",
+        "join": "JOIN {database}.{schema}.denial_reasons_dim d ON d.denial_reason_key = r.denial_reason_key",
+        "column": "d.denial_code || ': ' || d.denial_description",
+        "tables": ("denials_kpi_rollup",),
+    },
+}
+KPI_DESCENDING_WORDS = frozenset("highest top most greatest largest longest slowest".split())
+KPI_ASCENDING_WORDS = frozenset("lowest bottom least fewest smallest shortest fastest".split())
+KPI_FILLER_WORDS = frozenset(
+    "a across all an are average avg by claim claims compare current currently do does each every for give "
+    "has have healthcare in is list me of our overall per please rank ranked s show tell the their what "
+    "which who whose with".split()
+)
+
+# Latency instrumentation configuration
+# Histogram buckets grow geometrically from 1 ms to ~10 minutes
+LATENCY_BUCKET_START = 0.001
+LATENCY_BUCKET_GROWTH = 1.15
+LATENCY_BUCKET_COUNT = 95
+INSTRUMENTED_OPERATIONS = (
+    "get_session",
+    "warm_up",
+    "create_thread",
+    "thread_wait",
+    "time_to_first_answer",
+    "call_agent",
+    "call_agent_streaming",
+    "time_to_first_token",
+    "call_agent_sql_fallback",
+    "local_retrieval",
+    "kpi_fast_path",
+    "render_history",
+    "render_response",
+    "result_page",
+)
+
+# Query tracing configuration
+# Every question produces a trace: a root span with usage, estimated cost and
+# question category, plus one span per instrumented operation and per tool
+# the agent used. Finished spans are buffered per process and written to
+# TELEMETRY_TABLE in one INSERT once TRACE_FLUSH_SPANS are waiting or
+# TRACE_FLUSH_SECONDS have passed; the question never waits on the write.
+TRACING_ENABLED = True
+TELEMETRY_TABLE = "rcm_query_spans"
+TRACE_FLUSH_SPANS = 200
+TRACE_FLUSH_SECONDS = 60
+TRACE_BUFFER_MAX_SPANS = 5000  # Oldest spans are dropped beyond this if inserts keep failing
+TRACE_QUESTION_CHARS = 1000
+# Per million tokens (input, output); keep in sync with ESTIMATE_COST in 07_rcm_native_agent_production.sql
+MODEL_PRICING = {
+    "auto": (2.00, 6.00),
+    "mistral-large": (2.00, 6.00),
+    "llama3.1-70b": (0.90, 0.90),
+    "llama3-70b": (0.90, 0.90),
+    "llama3.2-3b": (0.20, 0.20),
+    "claude-sonnet-4": (3.00, 15.00),
+}
+
+# Conversation context configuration
+# Each agent turn's tokens are counted locally. When a question would push the
+# thread past CONTEXT_TOKEN_BUDGET, earlier turns are compacted into a short
+# summary of what was discussed (payers, providers, denial codes, metrics,
+# date ranges, recent questions) and the question starts a fresh thread
+# seeded with that summary and the last CONTEXT_KEEP_TURNS turns.
+CONTEXT_MANAGEMENT_ENABLED = True
+CONTEXT_TOKEN_BUDGET = 12000
+CONTEXT_KEEP_TURNS = 1
+CONTEXT_KEPT_ANSWER_TOKENS = 300  # Kept answers are cut to about this many tokens
+CONTEXT_SUMMARY_QUESTIONS = 6  # Most recent earlier questions listed in the summary
+CONTEXT_SUMMARY_ENTITIES = 8  # Per entity kind, most recent first
+# Tokens are counted with tiktoken's cl100k_base when tiktoken is installed and
+# TOKENIZER_FILE is uploaded next to the app (SiS cannot download it);
+# otherwise with a local pre-tokenizer that counts word pieces the same way,
+# within about 10% of cl100k_base on RCM questions and documents.
+TOKENIZER_FILE = os.environ.get("RCM_TOKENIZER_FILE", "cl100k_base.tiktoken")
+TOKENIZER_FILE_SHA256 = "223921b76ee99bde995b7ff738513eef100fb51d18c93597a113bcffe865b2a7"
+CL100K_PATTERN = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|"""
+    r"""\s*[\r\n]|\s+(?!\S)|\s"""
+)
+CONTEXT_ENTITY_PATTERNS = {
+    "Payers": r"Blue Cross(?: Blue Shield)?(?: of Illinois)?|BCBS|United ?Healthcare|UHC|Cigna(?: Healthcare)?"
+              r"|Medicare(?: Advantage)?|Medicaid(?: \(Illinois\))?|Aetna|Humana|TRICARE|Self-Pay"
+              r"|Workers'? Comp(?:ensation)?|Anthem|Kaiser(?: Permanente)?",
+    "Providers": r"(?:[A-Z][\w'&.]*\s+){1,5}(?:Hospital|Medical Center|Medical Group|Health|Institute|Associates"
+                 r"|Clinic|Surgery Center|Orthopedic Center|Radiology|Dermatology|Gastroenterology)\b",
+    "Denial codes": r"\b(?:CO|PR|OA|PI|CR)[- ]?\d{1,3}\b|\bM?A?N\d{2,3}\b|\bMA\d{2,3}\b",
+    "Metrics": "|".join(metric["pattern"] for metric in KPI_METRICS.values())
+               + r"|net collection rates?|a/r days|days in a/?r|write-offs?|denied amounts?|recovery rates?",
+    "Date ranges": r"\bQ[1-4](?: ?(?:FY ?)?\d{4})?\b|\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.? \d{4}\b"
+                   r"|\b\d{4}-\d{2}(?:-\d{2})?\b|\b(?:last|this|previous|past|prior) (?:\d+ )?"
+                   r"(?:days?|weeks?|months?|quarters?|years?)\b|\b(?:YTD|year[- ]to[- ]date|FY ?\d{2,4})\b|\b20\d{2}\b",
+}
+
+# Result set configuration
+# An Analyst answer whose table runs past RESULT_INLINE_ROWS rows is shown as a
+# paged result set instead of markdown: the SQL the agent generated runs again
+# as one async Snowpark query, the first page is cut from its first pandas
+# batch and later pages are fetched on demand (from the same batches while
+# paging forward, otherwise from RESULT_SCAN of the query id). Messages keep
+# only a handle; fetched pages are shared across sessions in an LRU of at most
+# RESULT_CACHE_ROWS rows.
+RESULT_SET_ENABLED = True
+RESULT_INLINE_ROWS = 20
+RESULT_PAGE_ROWS = 500
+RESULT_CACHE_ROWS = 200_000
+RESULT_OPEN_READERS = 16  # Result sets with batches still being read
+RESULT_PAGE_SQL = "SELECT * FROM TABLE(RESULT_SCAN('{query_id}')) LIMIT {limit} OFFSET {offset}"
+ANALYST_TOOL_TYPES = ("cortex_analyst_text_to_sql",)
+# Agent SQL is only run again when it is a single SELECT (or WITH ... SELECT)
+_SQL_LITERALS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|//[^\n]*|/\*.*?\*/", re.DOTALL)
+_SELECT_STATEMENT = re.compile(r"\s*\(*\s*(?:select|with)\b[^;]*;?\s*", re.IGNORECASE)
+_WRITE_KEYWORDS = re.compile(
+    r"\b(?:insert|update|delete|merge|create|alter|drop|truncate|undrop|grant|revoke|call|execute)\b|\bsystem\$",
+    re.IGNORECASE
+)
+
+# Startup configuration
+# A new viewer's first paint waits only on the page itself: snowflake.snowpark
+# is imported and the session attached once the welcome screen is drawn. The
+# session, header logo and terminology patterns are built once per process.
+# While the welcome screen shows, a warm-up query resumes WARM_UP_WAREHOUSE
+# (AUTO_SUSPEND = 300) and the agent endpoint is pinged, at most once per
+# WARM_UP_INTERVAL_SECONDS per process, so the first question pays for neither.
+FAST_STARTUP_ENABLED = True
+WARM_UP_WAREHOUSE = "RCM_INTELLIGENCE_WH"  # The app's query warehouse
+WARM_UP_INTERVAL_SECONDS = 240
+# RANDOM() keeps the result cache from answering without the warehouse.
+# claims_fact comes from script 01, so the warm-up compiles (and resumes the
+# warehouse) even before the KPI rollups from script 04 exist
+WARM_UP_SQL = f"SELECT 1 AS warm FROM {DATABASE}.{SCHEMA}.claims_fact WHERE RANDOM() IS NOT NULL LIMIT 1"
+# The logo is served by the app when HEADER_LOGO_FILE is uploaded next to it;
+# otherwise the browser fetches HEADER_LOGO_URL (None: no logo)
+HEADER_LOGO_FILE = os.environ.get("RCM_HEADER_LOGO", "snowflake_logo.svg")
+HEADER_LOGO_URL = "https://www.snowflake.com/wp-content/themes/snowflake/assets/img/brand-guidelines/logo-sno-blue-example.svg"
 
 # UI configuration
 MAX_CHAT_HISTORY = 50
+HISTORY_WINDOW_MESSAGES = 20  # Most recent messages drawn in full on every rerun
+HISTORY_PAGE_MESSAGES = 20  # Older messages revealed per "show earlier" click
+HISTORY_PREVIEW_CHARS = 120
 WELCOME_MESSAGE = """
 👋 **Welcome to the RCM Intelligence Hub!**
 
@@ -78,268 +408,2428 @@ I can help you with:
 - **Orchestration**: Planning → Tool Use → Reflection → Response
 """
 
-# ========================================================================
-# SESSION STATE INITIALIZATION
-# ========================================================================
+# ========================================================================
+# SESSION STATE INITIALIZATION
+# ========================================================================
+
+def init_session_state():
+    """Initialize Streamlit session state variables."""
+    if "messages" not in st.session_state:
+        st.session_state.messages = []
+    
+    if "thread_id" not in st.session_state:
+        # Create new thread for conversation context
+        st.session_state.thread_id = None
+    
+    if "pending_thread" not in st.session_state:
+        # Start creating the thread now so the first question doesn't wait on it
+        st.session_state.pending_thread = prefetch_thread()
+    
+    if "show_debug" not in st.session_state:
+        st.session_state.show_debug = False
+    
+    if "query_count" not in st.session_state:
+        st.session_state.query_count = 0
+    
+    if "history_visible" not in st.session_state:
+        st.session_state.history_visible = HISTORY_WINDOW_MESSAGES
+    
+    if "context" not in st.session_state:
+        st.session_state.context = ConversationContext()
+    
+    if "streaming" not in st.session_state:
+        st.session_state.streaming = STREAMING_ENABLED
+    
+    if "use_response_cache" not in st.session_state:
+        st.session_state.use_response_cache = RESPONSE_CACHE_ENABLED
+    
+    if "metrics" not in st.session_state:
+        st.session_state.metrics = MetricsRegistry()
+    
+    if "session_id" not in st.session_state:
+        # Groups this session's traces in the telemetry table
+        st.session_state.session_id = uuid.uuid4().hex
+    
+    if not FAST_STARTUP_ENABLED:
+        # Attach the session before anything is drawn
+        ensure_session()
+
+
+def get_active_session():
+    """The app's Snowpark session; snowflake.snowpark is imported on first use."""
+    from snowflake.snowpark.context import get_active_session as active_session
+    return active_session()
+
+
+@st.cache_resource(show_spinner=False)
+def get_session():
+    """Return the Snowpark session shared by all sessions in this process."""
+    return get_active_session()
+
+
+def ensure_session():
+    """Attach the process-wide Snowpark session to this browser session and return it."""
+    if "session" not in st.session_state:
+        with measure("get_session"):
+            st.session_state.session = get_session()
+    return st.session_state.session
+
+# ========================================================================
+# IN-PROCESS LATENCY INSTRUMENTATION
+# ========================================================================
+# Agent latency is measured inside the app rather than read back from
+# QUERY_HISTORY, so the sidebar costs no warehouse queries and reports only
+# this app's calls.
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with error and token counters."""
+    
+    def __init__(self):
+        self.bounds = [
+            LATENCY_BUCKET_START * LATENCY_BUCKET_GROWTH ** i
+            for i in range(LATENCY_BUCKET_COUNT)
+        ]
+        self.buckets = [0] * (LATENCY_BUCKET_COUNT + 1)  # Last bucket is overflow
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.tokens = 0
+    
+    def record(self, seconds: float, success: bool = True, tokens: int = 0):
+        if seconds <= LATENCY_BUCKET_START:
+            index = 0
+        else:
+            index = min(
+                LATENCY_BUCKET_COUNT,
+                int(math.ceil(math.log(seconds / LATENCY_BUCKET_START, LATENCY_BUCKET_GROWTH)))
+            )
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.tokens += tokens
+        if not success:
+            self.errors += 1
+    
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th percentile sample."""
+        if self.count == 0:
+            return 0.0
+        target = pct / 100 * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.buckets):
+            cumulative += bucket_count
+            if cumulative >= target:
+                if index >= LATENCY_BUCKET_COUNT:
+                    return self.max_seconds
+                return min(self.bounds[index], self.max_seconds)
+        return self.max_seconds
+    
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": (self.total_seconds / self.count) if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max_seconds,
+            "tokens_per_second": (self.tokens / self.total_seconds) if self.total_seconds else 0.0
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe collection of latency histograms keyed by operation name."""
+    
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+    
+    def record(self, operation: str, seconds: float, success: bool = True, tokens: int = 0):
+        with self._lock:
+            histogram = self._histograms.setdefault(operation, LatencyHistogram())
+            histogram.record(seconds, success, tokens)
+    
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                operation: histogram.summary()
+                for operation, histogram in self._histograms.items()
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_process_metrics():
+    """Return the metrics registry shared by all sessions in this process."""
+    return MetricsRegistry()
+
+
+def record_latency(operation: str, seconds: float, success: bool = True, tokens: int = 0):
+    """Record one timing in both registries, and as a span of the active trace."""
+    get_process_metrics().record(operation, seconds, success, tokens)
+    trace = getattr(_active_trace, "trace", None)
+    if trace is not None:
+        trace.span(operation, "operation", seconds, success)
+    try:
+        session_metrics = st.session_state.metrics
+    except (AttributeError, KeyError):
+        # Called outside a Streamlit session (benchmarks, tools)
+        return
+    session_metrics.record(operation, seconds, success, tokens)
+
+
+def instrumented(operation: str):
+    """
+    Decorator that times a call and records it under operation.
+    
+    Agent calls report failure through {"success": False} rather than raising,
+    so dict results are inspected for success and output token usage.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                record_latency(operation, time.perf_counter() - started, success=False)
+                raise
+            
+            elapsed = time.perf_counter() - started
+            if isinstance(result, dict):
+                record_latency(
+                    operation,
+                    elapsed,
+                    success=result.get("success", True),
+                    tokens=result.get("usage", {}).get("output_tokens", 0)
+                )
+            else:
+                record_latency(operation, elapsed, success=result is not None)
+            return result
+        return wrapper
+    return decorator
+
+
+class measure:
+    """Context manager that records the duration of a block under operation."""
+    
+    def __init__(self, operation: str):
+        self.operation = operation
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        record_latency(self.operation, time.perf_counter() - self.started, success=exc_type is None)
+        return False
+
+# ========================================================================
+# QUERY TRACING
+# ========================================================================
+# Spans outlive the session in TELEMETRY_TABLE, so slow questions and tools
+# can be found after the fact (see the p95 views in 07). Timings come from
+# record_latency(); tools come from the agent's response.
+
+_active_trace = threading.local()
+
+# One row per span from a bound JSON array, like COMPLETE_BATCH_SQL
+TELEMETRY_INSERT_SQL = f"""
+INSERT INTO {DATABASE}.{SCHEMA}.{TELEMETRY_TABLE} (
+    trace_id, span_id, parent_span_id, name, kind, started_at, duration_ms, success,
+    session_id, question, question_category, tool_name, tool_type, model,
+    input_tokens, output_tokens, estimated_cost_usd, attributes
+)
+SELECT s.value:trace_id::STRING, s.value:span_id::STRING, s.value:parent_span_id::STRING,
+       s.value:name::STRING, s.value:kind::STRING, s.value:started_at::TIMESTAMP_NTZ,
+       s.value:duration_ms::FLOAT, s.value:success::BOOLEAN, s.value:session_id::STRING,
+       s.value:question::STRING, s.value:question_category::STRING, s.value:tool_name::STRING,
+       s.value:tool_type::STRING, s.value:model::STRING, s.value:input_tokens::INTEGER,
+       s.value:output_tokens::INTEGER, s.value:estimated_cost_usd::FLOAT, s.value:attributes
+FROM TABLE(FLATTEN(INPUT => PARSE_JSON(?))) s
+"""
+
+
+def estimate_cost(input_tokens: int, output_tokens: int, model: str) -> float:
+    """Estimated USD cost of a call, priced like the ESTIMATE_COST function."""
+    input_price, output_price = MODEL_PRICING.get(model, MODEL_PRICING["auto"])
+    return input_tokens / 1_000_000 * input_price + output_tokens / 1_000_000 * output_price
+
+
+def question_category(result: dict) -> str:
+    """Category of an answered question, from the tools used to answer it."""
+    if result.get("fast_path"):
+        return "analytics"
+    types = {tool.get("type") for tool in result.get("tools_used", [])}
+    analyst = "cortex_analyst_text_to_sql" in types
+    search = "cortex_search" in types
+    if analyst and search:
+        return "multi_tool"
+    if analyst:
+        return "analytics"
+    if search:
+        return "knowledge_base"
+    return "general"
+
+
+def _utc_timestamp(epoch_seconds: float) -> str:
+    return datetime.fromtimestamp(epoch_seconds, timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+class Trace:
+    """
+    Spans recorded while answering one question.
+    
+    While active (start_trace() until finish_trace() on the same thread),
+    every record_latency() call becomes a child span of the root.
+    """
+    
+    def __init__(self, question: str, session_id: str = None):
+        self.trace_id = uuid.uuid4().hex
+        self.root_id = uuid.uuid4().hex[:16]
+        self.question = question[:TRACE_QUESTION_CHARS]
+        self.session_id = session_id
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.spans = []
+    
+    def span(self, name: str, kind: str, seconds, success: bool = True, started_at: float = None,
+             parent_span_id: str = None, **fields) -> str:
+        """Add a span that ended now (or started at started_at) and return its id."""
+        if started_at is None and seconds is not None:
+            started_at = time.time() - seconds
+        span_id = uuid.uuid4().hex[:16]
+        row = {
+            "trace_id": self.trace_id,
+            "span_id": span_id,
+            "parent_span_id": parent_span_id or self.root_id,
+            "name": name,
+            "kind": kind,
+            "started_at": _utc_timestamp(started_at) if started_at is not None else None,
+            "duration_ms": seconds * 1000 if seconds is not None else None,
+            "success": success,
+            "session_id": self.session_id,
+            "question": None,
+            "question_category": None,
+            "tool_name": None,
+            "tool_type": None,
+            "model": None,
+            "input_tokens": None,
+            "output_tokens": None,
+            "estimated_cost_usd": None,
+            "attributes": {}
+        }
+        row.update(fields)
+        self.spans.append(row)
+        return span_id
+    
+    def finish(self, result: dict) -> list:
+        """Add tool spans and the root span for result, and return every span."""
+        agent_span = next((span["span_id"] for span in self.spans
+                           if span["name"] in ("call_agent", "call_agent_streaming", "call_agent_sql_fallback")),
+                          None)
+        # Cached and fast-path answers made no tool or model calls
+        served_locally = result.get("cached") or result.get("fast_path")
+        for tool in [] if served_locally else result.get("tools_used", []):
+            self.span("tool", "tool", tool.get("seconds"), success=tool.get("success", True),
+                      started_at=tool.get("started_at"), parent_span_id=agent_span,
+                      tool_name=tool.get("name"), tool_type=tool.get("type"))
+        
+        usage = {} if served_locally else result.get("usage", {})
+        model = result.get("model", "auto")
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        self.spans.append({
+            "trace_id": self.trace_id,
+            "span_id": self.root_id,
+            "parent_span_id": None,
+            "name": "query",
+            "kind": "query",
+            "started_at": _utc_timestamp(self.started_at),
+            "duration_ms": (time.perf_counter() - self._started) * 1000,
+            "success": bool(result.get("success", False)),
+            "session_id": self.session_id,
+            "question": self.question,
+            "question_category": question_category(result),
+            "tool_name": None,
+            "tool_type": None,
+            "model": model,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "estimated_cost_usd": estimate_cost(input_tokens, output_tokens, model),
+            "attributes": {
+                "agent_name": result.get("agent_name"),
+                "cached": bool(result.get("cached")),
+                "fast_path": bool(result.get("fast_path")),
+                "circuit_open": bool(result.get("circuit_open")),
+                "error": result.get("error")
+            }
+        })
+        return self.spans
+
+
+class SpanBuffer:
+    """
+    Finished spans waiting to be written to TELEMETRY_TABLE.
+    
+    add() never waits on Snowflake: when a flush is due, all buffered spans
+    go out as one bound JSON array in a single INSERT started with
+    collect_nowait(). Spans from a failed insert are put back for the next
+    flush; beyond TRACE_BUFFER_MAX_SPANS the oldest spans are dropped.
+    """
+    
+    def __init__(self, max_spans: int = TRACE_BUFFER_MAX_SPANS):
+        self._spans = deque(maxlen=max_spans)
+        self._in_flight = None  # (job, spans) of the insert last started
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.counters = {"spans": 0, "flushes": 0, "failed_flushes": 0, "dropped": 0}
+    
+    def __len__(self):
+        return len(self._spans)
+    
+    def add(self, spans: list, session):
+        with self._lock:
+            overflow = max(0, len(self._spans) + len(spans) - self._spans.maxlen)
+            self._spans.extend(spans)
+            self.counters["spans"] += len(spans)
+            self.counters["dropped"] += overflow
+            due = (len(self._spans) >= TRACE_FLUSH_SPANS
+                   or time.monotonic() - self._last_flush >= TRACE_FLUSH_SECONDS)
+        if due:
+            self.flush(session)
+    
+    def _settle(self, wait: bool) -> bool:
+        """Collect the last insert's outcome; False while it is still running."""
+        if self._in_flight is None:
+            return True
+        job, spans = self._in_flight
+        if not wait and not job.is_done():
+            return False
+        self._in_flight = None
+        try:
+            job.result()
+        except Exception:
+            self.counters["failed_flushes"] += 1
+            self._requeue(spans)
+        return True
+    
+    def _requeue(self, spans: list):
+        """Put unsent spans back ahead of newer ones, dropping the oldest beyond max_spans."""
+        requeued = list(spans) + list(self._spans)
+        overflow = max(0, len(requeued) - self._spans.maxlen)
+        self._spans.clear()
+        self._spans.extend(requeued[overflow:])
+        self.counters["dropped"] += overflow
+    
+    def flush(self, session, wait: bool = False) -> int:
+        """Start one INSERT for every buffered span and return how many were sent."""
+        with self._lock:
+            if not self._settle(wait) or not self._spans:
+                return 0
+            spans = list(self._spans)
+            self._spans.clear()
+            self._last_flush = time.monotonic()
+            try:
+                job = session.sql(TELEMETRY_INSERT_SQL, params=[json.dumps(spans, default=str)]).collect_nowait()
+            except Exception:
+                self.counters["failed_flushes"] += 1
+                self._requeue(spans)
+                return 0
+            self._in_flight = (job, spans)
+            self.counters["flushes"] += 1
+            if wait:
+                self._settle(True)
+        return len(spans)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, pending=len(self._spans))
+
+
+@st.cache_resource(show_spinner=False)
+def get_span_buffer():
+    """Return the span buffer shared by all sessions in this process."""
+    return SpanBuffer()
+
+
+def start_trace(user_query: str, session_id: str = None):
+    """Begin tracing a question on this thread; None when tracing is off."""
+    if not TRACING_ENABLED:
+        return None
+    trace = Trace(user_query, session_id)
+    _active_trace.trace = trace
+    return trace
+
+
+def finish_trace(trace, result: dict, session):
+    """Stop tracing, complete the spans from result and hand them to the span buffer."""
+    _active_trace.trace = None
+    if trace is None:
+        return
+    get_span_buffer().add(trace.finish(result), session)
+
+# ========================================================================
+# AGENT RESILIENCE
+# ========================================================================
+# All agent REST calls made through _snowflake go through one client per
+# process, so timeouts, hedging and the circuit breaker see every session's
+# traffic.
+
+class CircuitBreaker:
+    """
+    Circuit breaker over the most recent agent calls.
+    
+    Closed: calls go through; CIRCUIT_FAILURE_THRESHOLD failures among the
+    last CIRCUIT_WINDOW calls, making up at least half of them, open it.
+    Open: calls are refused for CIRCUIT_RESET_SECONDS, then a single probe is
+    let through (half-open) and its outcome closes or reopens the circuit.
+    """
+    
+    def __init__(self):
+        self.failure_threshold = CIRCUIT_FAILURE_THRESHOLD
+        self.reset_seconds = CIRCUIT_RESET_SECONDS
+        self.state = "closed"
+        self.opened = 0  # Times the circuit has opened
+        self._outcomes = deque(maxlen=CIRCUIT_WINDOW)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    def current(self) -> str:
+        """The state ("closed", "open" or "half_open"), read under the lock."""
+        with self._lock:
+            return self.state
+    
+    def _open(self):
+        self.state = "open"
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+    
+    def allow(self) -> bool:
+        """Whether a call may be made now."""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return self.state != "open"
+    
+    def record(self, success: bool):
+        with self._lock:
+            if self.state == "half_open":
+                if success:
+                    self.state = "closed"
+                    self._outcomes.clear()
+                    self._probe_in_flight = False
+                else:
+                    self._open()
+            elif self.state == "closed":
+                self._outcomes.append(success)
+                failures = self._outcomes.count(False)
+                if failures >= self.failure_threshold and failures * 2 >= len(self._outcomes):
+                    self._open()
+
+
+class AgentRateLimited(RuntimeError):
+    """The agent service answered HTTP 429: the request was not processed."""
+
+
+class ResilientAgentClient:
+    """
+    Wraps _snowflake.send_snow_api_request for the agent endpoints.
+    
+    Each endpoint's timeout adapts to its observed latency, idempotent (and
+    rate-limited) calls are retried with jittered exponential backoff,
+    hedgeable :run calls get a duplicate request once they outlast the p95
+    (first response wins), and every outcome feeds the circuit breaker.
+    Callers check available() first. "stream" is a :run call that asks for
+    the event stream; its latency is the time until the stream opens.
+    """
+    
+    ENDPOINTS = {"threads": "/threads", "run": ":run", "stream": ":run"}
+    
+    def __init__(self, max_workers: int = 32):
+        self.breaker = CircuitBreaker()
+        self._latency = {endpoint: LatencyHistogram() for endpoint in self.ENDPOINTS}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-hedge")
+        self._lock = threading.Lock()
+        self.counters = {"threads": 0, "run": 0, "stream": 0, "failures": 0, "timeouts": 0,
+                         "rate_limited": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "hedge_losers": 0,
+                         "hedge_loser_failures": 0, "short_circuited": 0}
+    
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+    
+    def available(self) -> bool:
+        """False while the circuit is open; the caller should not call the agent."""
+        if not CIRCUIT_BREAKER_ENABLED or self.breaker.allow():
+            return True
+        self._count("short_circuited")
+        return False
+    
+    def record(self, success: bool):
+        """Report the outcome of a call made outside request(), e.g. a stream."""
+        if CIRCUIT_BREAKER_ENABLED:
+            self.breaker.record(success)
+    
+    def timeout_for(self, endpoint: str) -> float:
+        ceiling = THREAD_CREATE_TIMEOUT if endpoint == "threads" else AGENT_RUN_TIMEOUT
+        with self._lock:
+            histogram = self._latency[endpoint]
+            if not ADAPTIVE_TIMEOUTS_ENABLED or histogram.count < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+                return ceiling
+            observed = histogram.percentile(99) * ADAPTIVE_TIMEOUT_MULTIPLIER
+        return min(ceiling, max(ADAPTIVE_TIMEOUT_FLOOR, observed))
+    
+    def hedge_delay(self, endpoint: str = "run"):
+        """Seconds to wait before hedging a :run call, or None to send it alone."""
+        if not HEDGE_ENABLED or self.breaker.current() != "closed":
+            return None
+        with self._lock:
+            histogram = self._latency[endpoint]
+            if histogram.count < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+                return None
+            if self.counters["hedges"] >= HEDGE_MAX_SHARE * (self.counters["run"] + self.counters["stream"]):
+                return None
+            return histogram.percentile(HEDGE_PERCENTILE)
+    
+    def _send(self, send, endpoint: str, body: dict, timeout: float):
+        started = time.perf_counter()
+        response = send(
+            method="POST",
+            url=f"{AGENT_API_PATH}{self.ENDPOINTS[endpoint]}",
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream" if endpoint == "stream" else "application/json"
+            },
+            body=json.dumps(body),
+            timeout=timeout
+        )
+        status = (response or {}).get("status", 200)
+        if status == 429:
+            raise AgentRateLimited("Agent service returned HTTP 429")
+        if status >= 400:
+            raise RuntimeError(f"Agent service returned HTTP {status}")
+        with self._lock:
+            self._latency[endpoint].record(time.perf_counter() - started)
+        return response
+    
+    def _send_hedged(self, send, endpoint: str, body: dict, hedge_body, timeout: float, delay: float):
+        primary = self._executor.submit(self._send, send, endpoint, body, timeout)
+        done, _ = wait([primary], timeout=delay)
+        duplicate = None if done else hedge_body()
+        if duplicate is None:
+            return primary.result()
+        
+        self._count("hedges")
+        hedge = self._executor.submit(self._send, send, endpoint, duplicate, timeout)
+        error = None
+        for future in as_completed((primary, hedge)):
+            try:
+                response = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if future is hedge:
+                self._count("hedge_wins")
+            self._abandon(primary if future is hedge else hedge)
+            return response
+        raise error
+    
+    def _abandon(self, loser):
+        """
+        Cancel the losing request of a hedged pair, or count how it ends.
+        
+        A request already sent cannot be recalled; it runs to completion and
+        its failure is counted. Its thread is not reused: a spare taken for
+        the hedge is never returned to the pool.
+        """
+        self._count("hedge_losers")
+        if loser.cancel():
+            return
+        
+        def finished(future):
+            if future.exception() is not None:
+                self._count("hedge_loser_failures")
+        loser.add_done_callback(finished)
+    
+    def request(self, send, endpoint: str, body: dict, idempotent: bool = False, hedge_body=None,
+                record_success: bool = True):
+        """
+        POST body to an agent endpoint ("threads", "run" or "stream") and return the response.
+        
+        send is _snowflake.send_snow_api_request (or send_agent_http). A call
+        is retried while the circuit stays closed if it is idempotent or was
+        turned away with HTTP 429. hedge_body() returns the duplicate request
+        to send if the call is slow, or None when none is safe. Failures are
+        recorded with the breaker here; with record_success=False the caller
+        records the outcome itself once the response has been consumed.
+        Raises the last error once attempts are exhausted.
+        """
+        attempts = max(1, RETRY_ATTEMPTS)
+        for attempt in range(attempts):
+            self._count(endpoint)
+            timeout = self.timeout_for(endpoint)
+            delay = self.hedge_delay(endpoint) if hedge_body is not None else None
+            try:
+                if delay is None:
+                    response = self._send(send, endpoint, body, timeout)
+                else:
+                    response = self._send_hedged(send, endpoint, body, hedge_body, timeout, delay)
+            except Exception as e:
+                rate_limited = isinstance(e, AgentRateLimited)
+                self._count("timeouts" if isinstance(e, TimeoutError) else
+                            "rate_limited" if rate_limited else "failures")
+                self.record(False)
+                retryable = idempotent or rate_limited
+                if not retryable or attempt + 1 >= attempts or self.breaker.current() != "closed":
+                    raise
+                # Full jitter keeps retrying sessions from arriving in lockstep
+                self._count("retries")
+                time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+                continue
+            if record_success:
+                self.record(True)
+            return response
+    
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(
+            counters,
+            circuit=self.breaker.current(),
+            circuit_opened=self.breaker.opened,
+            run_timeout=self.timeout_for("run"),
+            thread_timeout=self.timeout_for("threads")
+        )
+
+
+@st.cache_resource(show_spinner=False)
+def get_agent_client():
+    """Return the agent client shared by all sessions in this process."""
+    return ResilientAgentClient()
+
+# ========================================================================
+# SNOWFLAKE AGENT INTERACTION
+# ========================================================================
+
+def request_thread(client):
+    """
+    Create an agent thread through client; returns its id, or None when the service created none.
+    
+    Makes no Streamlit calls, so it can run on the prefetch workers. Raises
+    when the request fails; a caller without a thread id sends its question
+    without one.
+    """
+    try:
+        import _snowflake
+    except ImportError:
+        # Local development: no agent threads
+        return None
+    
+    if not client.available():
+        # Agent endpoint unhealthy; questions go to the SQL fallback anyway
+        return None
+    
+    # Create thread using native REST API (empty body). Retrying is safe:
+    # at worst an unused thread is left behind
+    response = client.request(_snowflake.send_snow_api_request, "threads", {}, idempotent=True)
+    return ((response or {}).get("data") or {}).get("thread_id")
+
+
+@instrumented("create_thread")
+def create_thread():
+    """Create a new conversation thread with the agent using REST API; None if none was created."""
+    try:
+        return request_thread(get_agent_client())
+    except Exception as e:
+        st.error(f"Error creating thread: {e}")
+        return None
+
+
+class ThreadPrefetcher:
+    """
+    Creates agent threads ahead of time on a small worker pool.
+    
+    take() hands out a future for a thread id, preferring an already-created
+    spare, and tops the pool back up in the background. A future resolves to
+    None (or raises) when the service created no thread; such spares are
+    dropped, never handed out again.
+    
+    Workers make no Streamlit calls: the agent client and process metrics
+    are resolved when the prefetcher is created.
+    """
+    
+    def __init__(self, pool_size: int = THREAD_POOL_SIZE, max_age_seconds: float = THREAD_POOL_MAX_AGE_SECONDS):
+        self.pool_size = pool_size
+        self.max_age_seconds = max_age_seconds
+        self.client = get_agent_client()
+        self.metrics = get_process_metrics()
+        self._executor = ThreadPoolExecutor(max_workers=max(pool_size, 1), thread_name_prefix="agent-thread")
+        self._spares = deque()  # (created_at, future)
+        self._lock = threading.Lock()
+    
+    def _create(self):
+        started = time.perf_counter()
+        thread_id = None
+        try:
+            thread_id = request_thread(self.client)
+            return thread_id
+        finally:
+            self.metrics.record("create_thread", time.perf_counter() - started, success=thread_id is not None)
+    
+    def _submit(self):
+        return time.time(), self._executor.submit(self._create)
+    
+    @staticmethod
+    def _failed(future) -> bool:
+        return future.done() and (future.exception() is not None or future.result() is None)
+    
+    def take(self):
+        """Return a future resolving to a fresh thread id, or None if the service created none."""
+        with self._lock:
+            now = time.time()
+            self._spares = deque(
+                (created_at, future) for created_at, future in self._spares
+                if now - created_at <= self.max_age_seconds and not self._failed(future)
+            )
+            
+            _, future = self._spares.popleft() if self._spares else self._submit()
+            
+            while len(self._spares) < self.pool_size:
+                self._spares.append(self._submit())
+            return future
+    
+    def take_ready(self):
+        """Return an already-created spare thread id without waiting, or None."""
+        with self._lock:
+            for index, (_, future) in enumerate(self._spares):
+                if future.done() and not self._failed(future):
+                    del self._spares[index]
+                    self._spares.append(self._submit())
+                    return future.result()
+        return None
+    
+    def spares_ready(self) -> int:
+        with self._lock:
+            return sum(1 for _, future in self._spares if future.done())
+
+
+@st.cache_resource(show_spinner=False)
+def get_thread_prefetcher():
+    """Return the thread prefetcher shared by all sessions in this process."""
+    return ThreadPrefetcher()
+
+
+def prefetch_thread():
+    """Future for the next session's thread, or None when prefetching is off."""
+    if not THREAD_PREFETCH_ENABLED:
+        return None
+    return get_thread_prefetcher().take()
+
+
+def ensure_thread():
+    """Return the session's thread id, waiting on the prefetched thread if needed."""
+    if st.session_state.thread_id is None:
+        pending = st.session_state.pending_thread
+        st.session_state.pending_thread = None
+        if pending is None:
+            st.session_state.thread_id = create_thread()
+        else:
+            with measure("thread_wait"):
+                try:
+                    thread_id = pending.result(timeout=THREAD_WAIT_TIMEOUT)
+                except Exception:
+                    thread_id = None
+            # No thread from the prefetch: try once more here, where errors can be shown
+            st.session_state.thread_id = thread_id if thread_id is not None else create_thread()
+    return st.session_state.thread_id
+
+
+def parse_agent_message(message: dict):
+    """
+    Response text and tools used from a blocking :run message.
+    
+    content is either the answer text or a list of content items (text,
+    tool_use, tool_results) in the order the agent produced them.
+    """
+    content = message.get('content', 'No response generated')
+    if isinstance(content, str):
+        return content, []
+    
+    text_parts = []
+    tools_used = []
+    tools_by_id = {}
+    for item in content:
+        if item.get("type") == "text":
+            text_parts.append(item.get("text", ""))
+        elif item.get("type") == "tool_use":
+            tool = item.get("tool_use", {})
+            _, kind = TOOL_KINDS.get(tool.get("type"), TOOL_KINDS["generic"])
+            tools_used.append({
+                "name": tool.get("name", "unknown"),
+                "type": tool.get("type", "generic"),
+                "kind": kind,
+                "tokens": payload_tokens(tool.get("input"))
+            })
+            tools_by_id[tool.get("tool_use_id")] = tools_used[-1]
+        elif item.get("type") == "tool_results":
+            results = item.get("tool_results", {})
+            if results.get("tool_use_id") in tools_by_id:
+                tool = tools_by_id[results["tool_use_id"]]
+                tool.update(analyst_query(results))
+                tool["tokens"] += payload_tokens(results.get("content"))
+    return "".join(text_parts) or "No response generated", tools_used
+
+
+def payload_tokens(payload) -> int:
+    """Tokens a tool call's input or result content adds to the agent's thread, counted as JSON."""
+    return count_tokens(json.dumps(payload, default=str)) if payload else 0
+
+
+def analyst_query(tool_results: dict) -> dict:
+    """
+    SQL Cortex Analyst generated, from a tool result's JSON content.
+    
+    Returns {"sql", "rows"} (rows from the result set metadata, None when not
+    reported), or {} when the result carries no SQL.
+    """
+    for item in tool_results.get("content") or []:
+        payload = item.get("json") if isinstance(item, dict) else None
+        if isinstance(payload, dict) and payload.get("sql"):
+            metadata = (payload.get("result_set") or {}).get("resultSetMetaData") or {}
+            return {"sql": payload["sql"], "rows": metadata.get("numRows")}
+    return {}
+
+
+def hedge_request(request_payload: dict, thread_id: str = None):
+    """
+    Return hedge_body() for a :run request with no earlier turns in its thread.
+    
+    A duplicate must not land in a thread with earlier turns: with no thread
+    the same request is sent again, otherwise it goes to a spare thread if one
+    is ready.
+    """
+    def hedge_body():
+        if thread_id is None:
+            return request_payload
+        spare = get_thread_prefetcher().take_ready() if THREAD_PREFETCH_ENABLED else None
+        return dict(request_payload, thread_id=spare) if spare else None
+    return hedge_body
+
+
+@instrumented("call_agent")
+def call_agent(user_query: str, thread_id: str = None, fresh_thread: bool = False):
+    """
+    Call the native Cortex Agent using the REST API pattern.
+    
+    This follows Snowflake's recommended approach for calling agents from
+    Streamlit in Snowflake (SiS) applications.
+    
+    The agent handles:
+    - Intent classification
+    - RCM terminology enhancement (via UDF)
+    - Routing to Cortex Analyst or Cortex Search
+    - Response generation
+    
+    A question with no earlier turns (no thread, or fresh_thread) may be
+    hedged with a duplicate request on a spare thread. While the circuit
+    breaker is open the question goes to the SQL fallback instead.
+    """
+    session = st.session_state.session
+    
+    try:
+        import _snowflake
+        
+        # Build request payload per Snowflake standards
+        request_payload = {
+            "query": user_query
+        }
+        
+        # Add thread_id if maintaining conversation context
+        if thread_id:
+            request_payload["thread_id"] = thread_id
+        
+        client = get_agent_client()
+        if not client.available():
+            return dict(call_agent_sql_fallback(user_query, thread_id), circuit_open=True)
+        
+        # Call agent using native REST API from SiS
+        # This is the recommended pattern per official docs
+        response = client.request(
+            _snowflake.send_snow_api_request,
+            "run",
+            request_payload,
+            hedge_body=hedge_request(request_payload, thread_id) if thread_id is None or fresh_thread else None
+        )
+        
+        # Parse the streaming response
+        if response and 'data' in response:
+            response_data = response['data']
+            
+            # Extract message content
+            if 'message' in response_data:
+                response_text, tools_used = parse_agent_message(response_data['message'])
+                
+                # Get usage info for cost tracking
+                usage = response_data.get('usage', {})
+                
+                return {
+                    "success": True,
+                    "response": response_text,
+                    "model": response_data.get('model', 'auto'),
+                    "usage": {
+                        "input_tokens": usage.get('prompt_tokens', 0),
+                        "output_tokens": usage.get('completion_tokens', 0),
+                        "total_tokens": usage.get('total_tokens', 0)
+                    },
+                    "agent_name": AGENT_NAME,
+                    "thread_id": response_data.get('thread_id'),
+                    "tools_used": tools_used
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": "Unexpected response format",
+                    "response": "I apologize, but I couldn't generate a response. Please try again."
+                }
+        else:
+            return {
+                "success": False,
+                "error": "No response from agent",
+                "response": "I apologize, but I couldn't generate a response. Please try again."
+            }
+            
+    except ImportError:
+        # Fallback to SQL-based approach if _snowflake module not available
+        # This can happen in local development or older SiS versions
+        return call_agent_sql_fallback(user_query, thread_id)
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "response": f"I encountered an error: {str(e)}"
+        }
+
+
+@instrumented("call_agent_sql_fallback")
+def call_agent_sql_fallback(user_query: str, thread_id: str = None):
+    """
+    Fallback method using SQL when REST API is not available.
+    Used for local development or older SiS versions.
+    """
+    session = st.session_state.session
+    
+    # Ground the answer in local retrieval, since no search tool runs here
+    sources = retrieve_document_context(user_query)
+    return submit_completions(session, [user_query], [sources]).results()[0]
+
+# ========================================================================
+# STARTUP WARM-UP
+# ========================================================================
+# The warehouse auto-suspends after 5 idle minutes, so the first question
+# after a quiet spell also waits for it to resume. A new viewer spends a few
+# seconds on the welcome screen; the resume (and a ping to the agent
+# endpoint) happens then instead.
+
+def warm_warehouse(session):
+    """Run WARM_UP_SQL on the app's warehouse, resuming it if suspended."""
+    session.sql(WARM_UP_SQL).collect()
+
+
+def ping_agent_endpoint():
+    """Describe the agent with a GET on its REST path; no thread or run is created."""
+    if AGENT_HOST:
+        import urllib.request
+        
+        headers = {"Accept": "application/json"}
+        if AGENT_PAT:
+            headers["Authorization"] = f"Bearer {AGENT_PAT}"
+        request = urllib.request.Request(AGENT_HOST.rstrip("/") + AGENT_API_PATH, headers=headers)
+        with urllib.request.urlopen(request, timeout=THREAD_CREATE_TIMEOUT) as response:
+            return response.status
+    
+    try:
+        import _snowflake
+    except ImportError:
+        # Local development without an agent endpoint: nothing to warm
+        return None
+    response = _snowflake.send_snow_api_request(
+        method="GET",
+        url=AGENT_API_PATH,
+        headers={"Accept": "application/json"},
+        body=None,
+        timeout=THREAD_CREATE_TIMEOUT
+    )
+    status = (response or {}).get("status", 200)
+    if status >= 400:
+        raise RuntimeError(f"Agent endpoint returned HTTP {status}")
+    return status
+
+
+class StartupWarmer:
+    """
+    Warms the warehouse and the agent endpoint in the background.
+    
+    warm() returns at once. One warm-up runs per interval for the whole
+    process, so a burst of new viewers sends one; a failed warm-up is only
+    counted, and the first question then pays the cold start as before.
+    """
+    
+    def __init__(self, interval_seconds: float = None):
+        self.interval_seconds = WARM_UP_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="warm-up")
+        self._lock = threading.Lock()
+        self._started_at = None
+        self.counts = {"warm_ups": 0, "skipped": 0, "failures": 0}
+        self.last = {}  # "warehouse" / "agent" -> seconds taken, or the error
+    
+    def warm(self, session):
+        """Start a warm-up unless one started within the interval; returns its futures."""
+        with self._lock:
+            now = time.time()
+            if self._started_at is not None and now - self._started_at < self.interval_seconds:
+                self.counts["skipped"] += 1
+                return []
+            self._started_at = now
+            self.counts["warm_ups"] += 1
+        return [
+            self._executor.submit(self._run, "warehouse", warm_warehouse, session),
+            self._executor.submit(self._run, "agent", ping_agent_endpoint)
+        ]
+    
+    def _run(self, target: str, func, *args):
+        started = time.perf_counter()
+        try:
+            func(*args)
+        except Exception as e:
+            record_latency("warm_up", time.perf_counter() - started, success=False)
+            with self._lock:
+                self.counts["failures"] += 1
+                self.last[target] = str(e)
+            return
+        seconds = time.perf_counter() - started
+        record_latency("warm_up", seconds)
+        with self._lock:
+            self.last[target] = seconds
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts, last=dict(self.last))
+
+
+@st.cache_resource(show_spinner=False)
+def get_startup_warmer():
+    """Return the startup warmer shared by all sessions in this process."""
+    return StartupWarmer()
+
+# ========================================================================
+# BATCHED SQL COMPLETIONS
+# ========================================================================
+# The SQL fallback sends prompts to SNOWFLAKE.CORTEX.COMPLETE as one bound
+# JSON array per statement. The statement text never changes (no user text
+# is interpolated), N prompts cost ceil(N / FALLBACK_BATCH_SIZE) round trips,
+# and batches are submitted with collect_nowait() so they run concurrently.
+
+COMPLETE_BATCH_SQL = """
+SELECT
+    p.index AS prompt_index,
+    SNOWFLAKE.CORTEX.COMPLETE(
+        ?,
+        ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', p.value::STRING))
+    ) AS response
+FROM TABLE(FLATTEN(INPUT => PARSE_JSON(?))) p
+ORDER BY p.index
+"""
+
+
+def fallback_prompt(user_query: str, sources: list) -> str:
+    """The question, with retrieved excerpts to cite when there are any."""
+    if not sources:
+        return user_query
+    excerpts = "\n\n".join(
+        f"[{number}] {source['title']} ({source['relative_path']}):\n"
+        f"{source['content'][:FALLBACK_CONTEXT_CHARS]}"
+        for number, source in enumerate(sources, 1)
+    )
+    return (
+        f"{user_query}\n\nWhere relevant, answer from these RCM knowledge base excerpts "
+        f"and cite them by number:\n\n{excerpts}"
+    )
+
+
+def parse_completion(response_data, sources: list) -> dict:
+    """Result dict (same shape as call_agent) for one COMPLETE response."""
+    if isinstance(response_data, str):
+        response_data = json.loads(response_data)
+    
+    if response_data and 'choices' in response_data and len(response_data['choices']) > 0:
+        message = response_data['choices'][0].get('message', {})
+        response_text = message.get('content', 'No response generated')
+        usage = response_data.get('usage', {})
+        
+        return {
+            "success": True,
+            "response": response_text,
+            "model": response_data.get('model', 'auto'),
+            "usage": {
+                "input_tokens": usage.get('prompt_tokens', 0),
+                "output_tokens": usage.get('completion_tokens', 0),
+                "total_tokens": usage.get('total_tokens', 0)
+            },
+            "agent_name": AGENT_NAME,
+            "sources": [
+                {key: source[key] for key in ("relative_path", "title", "score")}
+                for source in sources
+            ]
+        }
+    
+    return {
+        "success": False,
+        "error": "No response from agent",
+        "response": "I apologize, but I couldn't generate a response. Please try again."
+    }
+
+
+class CompletionJob:
+    """
+    Completions submitted by submit_completions(), one async query per batch.
+    
+    results() blocks until every batch has finished and returns one result
+    dict per question, in submission order. A failed batch yields error
+    results for its questions only.
+    """
+    
+    def __init__(self, batches: list):
+        self._batches = batches  # (async job or submission error, sources per prompt)
+    
+    def done(self) -> bool:
+        return all(isinstance(job, Exception) or job.is_done() for job, _ in self._batches)
+    
+    def results(self) -> list:
+        results = []
+        for job, batch_sources in self._batches:
+            try:
+                if isinstance(job, Exception):
+                    raise job
+                rows = {row['PROMPT_INDEX']: row['RESPONSE'] for row in job.result()}
+                results.extend(
+                    parse_completion(rows.get(index), sources)
+                    for index, sources in enumerate(batch_sources)
+                )
+            except Exception as e:
+                results.extend(
+                    {
+                        "success": False,
+                        "error": str(e),
+                        "response": f"I encountered an error: {str(e)}"
+                    }
+                    for _ in batch_sources
+                )
+        return results
+
+
+def submit_completions(session, user_queries: list, sources: list = None) -> CompletionJob:
+    """
+    Submit questions to COMPLETE without waiting for the answers.
+    
+    sources holds the retrieved excerpts for each question (None for none).
+    Every batch of FALLBACK_BATCH_SIZE prompts is one statement with bound
+    parameters, started with collect_nowait(); call results() to gather.
+    """
+    sources = sources or [None] * len(user_queries)
+    batches = []
+    for start in range(0, len(user_queries), FALLBACK_BATCH_SIZE):
+        batch_sources = [items or [] for items in sources[start:start + FALLBACK_BATCH_SIZE]]
+        prompts = [
+            fallback_prompt(user_query, items)
+            for user_query, items in zip(user_queries[start:start + FALLBACK_BATCH_SIZE], batch_sources)
+        ]
+        try:
+            job = session.sql(COMPLETE_BATCH_SQL, params=[AGENT_NAME, json.dumps(prompts)]).collect_nowait()
+        except Exception as e:
+            job = e
+        batches.append((job, batch_sources))
+    return CompletionJob(batches)
+
+# ========================================================================
+# STREAMING AGENT RESPONSES
+# ========================================================================
+
+def parse_sse_events(lines):
+    """
+    Parse server-sent event lines into (event, data) tuples.
+    
+    Accepts any iterable of str or bytes lines (an HTTP response body, a list
+    of strings). JSON payloads are decoded; anything else (e.g. "[DONE]") is
+    passed through as a string.
+    """
+    event, data_lines = "message", []
+    
+    for raw_line in lines:
+        line = raw_line.decode("utf-8") if isinstance(raw_line, bytes) else raw_line
+        line = line.rstrip("\r\n")
+        
+        # Blank line terminates the current event
+        if not line:
+            if data_lines:
+                yield event, _decode_sse_data("\n".join(data_lines))
+            event, data_lines = "message", []
+            continue
+        
+        # Comment / keep-alive line
+        if line.startswith(":"):
+            continue
+        
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        
+        if field == "event":
+            event = value
+        elif field == "data":
+            data_lines.append(value)
+    
+    # Stream closed without a trailing blank line
+    if data_lines:
+        yield event, _decode_sse_data("\n".join(data_lines))
+
+
+def _decode_sse_data(data: str):
+    """Decode an SSE data field as JSON when possible."""
+    try:
+        return json.loads(data)
+    except ValueError:
+        return data
+
+
+def send_agent_http(method, url, headers=None, params=None, body=None, request_guid=None, timeout=None):
+    """
+    send_snow_api_request over plain HTTP to CORTEX_AGENT_HOST, with the PAT.
+    
+    Returns {"status", "content"}; on success "content" is the open response,
+    which the caller reads (e.g. as an event stream) and closes.
+    """
+    import urllib.error
+    import urllib.request
+    
+    headers = dict(headers or {})
+    if AGENT_PAT:
+        headers["Authorization"] = f"Bearer {AGENT_PAT}"
+    request = urllib.request.Request(
+        AGENT_HOST.rstrip("/") + url,
+        data=body.encode("utf-8") if body else None,
+        headers=headers,
+        method=method
+    )
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        return {"status": e.code, "content": e.read().decode("utf-8", "replace")}
+    return {"status": response.status, "content": response}
+
+
+def _read_sse_response(response):
+    with response:
+        yield from parse_sse_events(response)
+
+
+def open_agent_stream(user_query: str, thread_id: str = None, fresh_thread: bool = False):
+    """
+    Open the agent's :run event stream; returns an iterator of (event, data) tuples.
+    
+    The request goes through the shared agent client (adaptive timeout, status
+    check, retry on HTTP 429), which records failures to open the stream; the
+    caller records the outcome once the events have been read. When
+    CORTEX_AGENT_HOST is set the SSE stream is read incrementally over HTTP.
+    Inside SiS the _snowflake module buffers the stream and returns the events
+    as a JSON array, which is replayed through the same interface; only that
+    buffered call is hedged, like call_agent's.
+    """
+    request_payload = {
+        "query": user_query,
+        "stream": True
+    }
+    if thread_id:
+        request_payload["thread_id"] = thread_id
+    client = get_agent_client()
+    
+    if AGENT_HOST:
+        response = client.request(send_agent_http, "stream", request_payload, record_success=False)
+        return _read_sse_response(response["content"])
+    
+    import _snowflake
+    
+    response = client.request(
+        _snowflake.send_snow_api_request,
+        "stream",
+        request_payload,
+        hedge_body=hedge_request(request_payload, thread_id) if thread_id is None or fresh_thread else None,
+        record_success=False
+    )
+    
+    events = (response or {}).get("content", (response or {}).get("data", []))
+    if isinstance(events, str):
+        events = json.loads(events)
+    
+    return ((item.get("event", "message"), item.get("data", {})) for item in events or [])
+
+
+@instrumented("call_agent_streaming")
+def call_agent_streaming(user_query: str, thread_id: str = None, on_event=None, fresh_thread: bool = False):
+    """
+    Call the Cortex Agent in streaming mode.
+    
+    on_event(event, data, text) is invoked for every event as it arrives, with
+    the response text accumulated so far, so the caller can render deltas and
+    tool status incrementally. Returns the same result dict as call_agent plus
+    the tools used and time-to-first-token / total latency. If the stream
+    cannot be opened or fails part-way, the question goes to the SQL fallback
+    and the result carries the agent's error as agent_error.
+    """
+    started = time.perf_counter()
+    first_token_at = None
+    text_parts = []
+    tools_used = []
+    usage = {}
+    model = "auto"
+    new_thread_id = None
+    tool_started = {}  # tool_use_id -> (perf_counter, tools_used entry)
+    stream_opened = False
+    client = get_agent_client()
+    if not client.available():
+        return dict(call_agent_sql_fallback(user_query, thread_id), circuit_open=True)
+    
+    try:
+        events = open_agent_stream(user_query, thread_id, fresh_thread)
+        stream_opened = True
+        for event, data in events:
+            data = data if isinstance(data, dict) else {}
+            
+            if event == "response.text.delta":
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                text_parts.append(data.get("text", ""))
+            
+            elif event == "response.tool_use":
+                icon, kind = TOOL_KINDS.get(data.get("type"), TOOL_KINDS["generic"])
+                tools_used.append({
+                    "name": data.get("name", "unknown"),
+                    "type": data.get("type", "generic"),
+                    "kind": kind,
+                    "tokens": payload_tokens(data.get("input")),
+                    "started_at": time.time()
+                })
+                tool_started[data.get("tool_use_id")] = (time.perf_counter(), tools_used[-1])
+            
+            elif event == "response.tool_result":
+                if data.get("tool_use_id") in tool_started:
+                    tool_at, tool = tool_started.pop(data["tool_use_id"])
+                    tool["seconds"] = time.perf_counter() - tool_at
+                    tool["success"] = data.get("status", "success") == "success"
+                    tool.update(analyst_query(data))
+                    tool["tokens"] += payload_tokens(data.get("content"))
+            
+            elif event == "response":
+                # Final aggregated response carries the usage block
+                usage = data.get("usage", usage)
+                model = data.get("model", model)
+            
+            elif event == "metadata":
+                metadata = data.get("metadata", data)
+                new_thread_id = metadata.get("thread_id", new_thread_id)
+            
+            elif event == "error":
+                raise RuntimeError(data.get("message", "Agent stream returned an error"))
+            
+            if on_event:
+                on_event(event, data, "".join(text_parts))
+    
+    except ImportError:
+        # Neither an HTTP endpoint nor _snowflake is available
+        return call_agent(user_query, thread_id, fresh_thread)
+    except Exception as e:
+        # A failure to open the stream was recorded by the client already
+        if stream_opened:
+            client.record(False)
+        return dict(call_agent_sql_fallback(user_query, thread_id), agent_error=str(e))
+    
+    finished = time.perf_counter()
+    client.record(True)
+    response_text = "".join(text_parts) or "No response generated"
+    if first_token_at is not None:
+        record_latency("time_to_first_token", first_token_at - started)
+    
+    return {
+        "success": bool(text_parts),
+        "response": response_text,
+        "model": model,
+        "usage": {
+            "input_tokens": usage.get('prompt_tokens', 0),
+            "output_tokens": usage.get('completion_tokens', 0),
+            "total_tokens": usage.get('total_tokens', 0)
+        },
+        "agent_name": AGENT_NAME,
+        "thread_id": new_thread_id,
+        "tools_used": tools_used,
+        "timings": {
+            "time_to_first_token": (first_token_at - started) if first_token_at else None,
+            "total_time": finished - started
+        }
+    }
+
+
+# ========================================================================
+# SHARED RESPONSE CACHE
+# ========================================================================
+
+class ResponseCache:
+    """
+    Process-wide LRU + TTL cache of agent responses.
+    
+    Held via st.cache_resource so every session shares one instance. Entries
+    are bounded by count and by approximate serialized size; hit/miss counters
+    are surfaced in the debug panel.
+    """
+    
+    def __init__(self, ttl_seconds: int, max_entries: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, result)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """Return a cached result, or None on miss/expiry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            expires_at, size, result = entry
+            if expires_at < time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+    
+    def put(self, key, result: dict):
+        """Store a result, evicting least-recently-used entries past the caps."""
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            
+            self._entries[key] = (time.time() + self.ttl_seconds, size, result)
+            self._bytes += size
+            
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+    
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0
+            }
+    
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    """Return the response cache shared by all sessions in this process."""
+    return ResponseCache(
+        ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes=RESPONSE_CACHE_MAX_BYTES
+    )
+
+
+@st.cache_data(ttl=DATA_VERSION_TTL_SECONDS, show_spinner=False)
+def get_data_version(_session) -> str:
+    """
+    Version string for the claims data, from the fact tables' last load time.
+    
+    Cached for DATA_VERSION_TTL_SECONDS so the metadata query runs at most
+    once per interval, not once per question.
+    """
+    try:
+        table_list = ", ".join(f"'{table}'" for table in DATA_VERSION_TABLES)
+        rows = _session.sql(f"""
+        SELECT TABLE_NAME, LAST_ALTERED
+        FROM {DATABASE}.INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = '{SCHEMA}'
+        AND TABLE_NAME IN ({table_list})
+        ORDER BY TABLE_NAME
+        """).collect()
+        return "|".join(f"{row['TABLE_NAME']}={row['LAST_ALTERED']}" for row in rows)
+    except Exception:
+        # Unknown version still gets TTL-bounded caching
+        return "unknown"
+
+
+def normalize_query(user_query: str) -> str:
+    """Normalize a question for cache keying (case, whitespace, trailing punctuation)."""
+    return " ".join(user_query.lower().split()).rstrip("?.! ")
+
+
+def is_follow_up(user_query: str, messages: list) -> bool:
+    """True when the question likely depends on earlier turns in the thread."""
+    has_history = any(message["role"] == "assistant" for message in messages)
+    return has_history and bool(FOLLOW_UP_PATTERN.search(user_query))
+
+
+def response_cache_key(user_query: str, data_version: str):
+    return (normalize_query(user_query), data_version)
+
+# Near-duplicate questions ("denial rate by payer" / "denial rates per payer")
+# are matched by MinHash/LSH over character shingles of the canonical query,
+# then confirmed by exact Jaccard similarity of both shingles and words.
+
+def canonical_query(user_query: str) -> str:
+    """
+    Order-independent form of a question for similarity matching.
+    
+    Adjustment codes are joined (CO-45, CO 45 -> co45), RCM synonyms are
+    mapped to one term, plurals and stopwords are dropped, and the remaining
+    tokens are sorted.
+    """
+    text = ADJUSTMENT_CODE_PATTERN.sub(lambda match: match.group(1) + match.group(2), user_query.lower())
+    tokens = set()
+    for token in re.findall(r"[a-z0-9]+", text):
+        token = RCM_QUERY_SYNONYMS.get(token, token)
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = RCM_QUERY_SYNONYMS.get(token[:-1], token[:-1])
+        if token not in STOPWORDS and token not in QUERY_FILLER_WORDS:
+            tokens.add(token)
+    return " ".join(sorted(tokens))
+
+
+def query_shingles(canonical: str) -> frozenset:
+    size = SIMILAR_QUERY_SHINGLE_SIZE
+    if len(canonical) <= size:
+        return frozenset([canonical])
+    return frozenset(canonical[i:i + size] for i in range(len(canonical) - size + 1))
+
+
+def strict_terms(canonical: str) -> frozenset:
+    """Tokens that must match exactly: codes, numbers and direction words."""
+    return frozenset(
+        token for token in canonical.split()
+        if token in SIMILAR_QUERY_STRICT_TERMS or any(char.isdigit() for char in token)
+    )
+
+
+class SimilarQueryCache:
+    """
+    Process-wide cache of agent answers looked up by question similarity.
+    
+    Each entry's MinHash signature is split into LSH bands; questions that
+    share a band with an entry are candidates, and a candidate is served only
+    if both its shingle and word Jaccard similarity reach the threshold and
+    its codes, numbers and direction words match. Entries expire after the TTL and are
+    evicted least-recently-used past max_entries.
+    """
+    
+    HASH_PRIME = (1 << 61) - 1
+    
+    def __init__(self, threshold: float, ttl_seconds: int, max_entries: int,
+                 permutations: int = MINHASH_PERMUTATIONS, bands: int = LSH_BANDS):
+        if permutations % bands:
+            raise ValueError("permutations must be a multiple of bands")
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows_per_band = permutations // bands
+        generator = random.Random(42)
+        self._permutations = [
+            (generator.randrange(1, self.HASH_PRIME), generator.randrange(0, self.HASH_PRIME))
+            for _ in range(permutations)
+        ]
+        self._entries = OrderedDict()  # key -> (expires_at, question, shingles, strict, band keys, result)
+        self._buckets = {}  # (data_version, band, band hash) -> set of entry keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def signature(self, shingles: frozenset) -> list:
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+        return [min((a * value + b) % self.HASH_PRIME for value in hashes) for a, b in self._permutations]
+    
+    def _band_keys(self, shingles: frozenset, data_version: str) -> list:
+        signature = self.signature(shingles)
+        rows = self.rows_per_band
+        return [(data_version, band, hash(tuple(signature[band * rows:(band + 1) * rows])))
+                for band in range(self.bands)]
+    
+    def get(self, user_query: str, data_version: str):
+        """Return (result, the earlier question it answered, similarity) or None."""
+        canonical = canonical_query(user_query)
+        shingles = query_shingles(canonical)
+        strict = strict_terms(canonical)
+        words = frozenset(canonical.split())
+        band_keys = self._band_keys(shingles, data_version)
+        
+        with self._lock:
+            now = time.time()
+            best = None
+            candidates = set().union(*(self._buckets.get(band_key, ()) for band_key in band_keys))
+            for key in candidates:
+                expires_at, question, entry_shingles, entry_strict, _, result = self._entries[key]
+                entry_words = frozenset(key[1].split())
+                if expires_at < now:
+                    self._remove(key)
+                    continue
+                if entry_strict != strict:
+                    continue
+                # Shingles tolerate typos and inflections; words catch swapped
+                # names ("Medicaid" vs. "Medicare") that share most shingles
+                similarity = min(
+                    len(shingles & entry_shingles) / len(shingles | entry_shingles),
+                    len(words & entry_words) / len(words | entry_words)
+                )
+                if similarity >= self.threshold and (best is None or similarity > best[2]):
+                    best = (key, question, similarity, result)
+            
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best[0])
+            self.hits += 1
+            return best[3], best[1], best[2]
+    
+    def put(self, user_query: str, data_version: str, result: dict):
+        canonical = canonical_query(user_query)
+        if not canonical:
+            return
+        shingles = query_shingles(canonical)
+        key = (data_version, canonical)
+        band_keys = self._band_keys(shingles, data_version)
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl_seconds, user_query, shingles,
+                                  strict_terms(canonical), band_keys, result)
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(key)
+            
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+    
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0
+            }
+    
+    def _remove(self, key):
+        band_keys = self._entries.pop(key)[4]
+        for band_key in band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+
+@st.cache_resource(show_spinner=False)
+def get_similar_query_cache():
+    """Return the near-duplicate answer cache shared by all sessions in this process."""
+    return SimilarQueryCache(
+        threshold=SIMILAR_QUERY_THRESHOLD,
+        ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+        max_entries=SIMILAR_QUERY_MAX_ENTRIES
+    )
+
+# ========================================================================
+# LOCAL DOCUMENT RETRIEVAL
+# ========================================================================
+# The SQL fallback grounds answers in BM25 matches from rcm_document_chunks,
+# served by DocumentIndex from rcm_document_index.py (shipped next to this
+# file). The index is built once per process; when it cannot be, that is
+# remembered for DOCUMENT_INDEX_RETRY_SECONDS.
+
+class DocumentIndexLoader:
+    """
+    Fallback retrieval index shared by all sessions.
+    
+    Memory-maps the file at RCM_LOCAL_INDEX when set (local development),
+    otherwise indexes rcm_document_chunks once per app process. A failed load
+    (e.g. the table does not exist yet) is kept for
+    DOCUMENT_INDEX_RETRY_SECONDS, so questions in the meantime get None
+    instead of re-running the query.
+    """
+    
+    def __init__(self, retry_seconds: float = DOCUMENT_INDEX_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self._index = None
+        self._failed_at = None
+        self._lock = threading.Lock()
+    
+    def get(self, session):
+        """The index, or None while the last failed load is within retry_seconds."""
+        with self._lock:
+            if self._index is None and (self._failed_at is None
+                                        or time.monotonic() - self._failed_at >= self.retry_seconds):
+                try:
+                    self._index = self._load(session)
+                    self._failed_at = None
+                except Exception:
+                    self._failed_at = time.monotonic()
+            return self._index
+    
+    @staticmethod
+    def _load(session):
+        if LOCAL_INDEX_PATH and os.path.exists(LOCAL_INDEX_PATH):
+            return DocumentIndex.load(LOCAL_INDEX_PATH)
+        rows = session.sql(f"""
+        SELECT relative_path, chunk_ordinal, title, chunk
+        FROM {DATABASE}.{SCHEMA}.rcm_document_chunks
+        """).collect()
+        return DocumentIndex.build(
+            {"relative_path": row["RELATIVE_PATH"], "chunk_ordinal": row["CHUNK_ORDINAL"],
+             "title": row["TITLE"], "content": row["CHUNK"]}
+            for row in rows
+        )
+
+
+@st.cache_resource(show_spinner=False)
+def get_document_index_loader():
+    """Return the document index loader shared by all sessions in this process."""
+    return DocumentIndexLoader()
+
+
+def get_document_index(session):
+    """The fallback retrieval index, or None when it cannot be loaded right now."""
+    return get_document_index_loader().get(session)
+
+
+def retrieve_document_context(user_query: str, limit: int = FALLBACK_CONTEXT_RESULTS) -> list:
+    """Top document chunks for a question, or [] when no index can be loaded."""
+    try:
+        with measure("local_retrieval"):
+            index = get_document_index(st.session_state.session)
+            return index.search(user_query, limit=limit) if index is not None else []
+    except Exception:
+        return []
+
+# ========================================================================
+# KPI FAST PATH
+# ========================================================================
+# Deterministic routing of headline KPI questions to the rollup tables. No
+# model is involved, so a routed question costs one small query instead of
+# agent orchestration and Cortex Analyst text-to-SQL.
+
+@st.cache_resource(show_spinner=False)
+def get_terminology():
+    """
+    RCM vocabulary patterns, compiled once per process.
+    
+    The KPI router's metric and dimension patterns (matched against
+    normalized, space-padded text, in dictionary order) and the entity
+    patterns conversation summaries pick payers, codes and metrics out with.
+    """
+    return {
+        "kpi_metrics": {
+            name: re.compile(rf" (?:{metric['pattern']}) ") for name, metric in KPI_METRICS.items()
+        },
+        "kpi_dimensions": {
+            name: re.compile(rf" (?:{dimension['pattern']}) ") for name, dimension in KPI_DIMENSIONS.items()
+        },
+        "context_entities": {
+            kind: re.compile(pattern, re.IGNORECASE if kind in ("Payers", "Metrics", "Date ranges") else 0)
+            for kind, pattern in CONTEXT_ENTITY_PATTERNS.items()
+        }
+    }
+
+def route_kpi_question(user_query: str):
+    """
+    Match a question to a KPI rollup query, or return None.
+    
+    Returns {"metric", "dimension", "descending", "limit"}. Every word of the
+    question has to be consumed by the metric, dimension or sort patterns, or
+    be filler, so questions with filters or extra asks fall through.
+    """
+    text = " " + re.sub(r"[^a-z0-9]+", " ", user_query.lower()) + " "
+    terminology = get_terminology()
+    
+    def consume(pattern):
+        nonlocal text
+        text, count = pattern.subn("  ", text)
+        return count
+    
+    metrics = [name for name, pattern in terminology["kpi_metrics"].items() if consume(pattern)]
+    if len(metrics) != 1:
+        return None
+    metric = metrics[0]
+    
+    dimensions = [name for name, pattern in terminology["kpi_dimensions"].items() if consume(pattern)]
+    if len(dimensions) > 1:
+        return None
+    dimension = dimensions[0] if dimensions else None
+    if dimension and KPI_METRICS[metric]["table"] not in KPI_DIMENSIONS[dimension]["tables"]:
+        return None
+    
+    descending = True
+    limit = KPI_RESULT_LIMIT
+    sort_words = KPI_DESCENDING_WORDS | KPI_ASCENDING_WORDS
+    words = text.split()
+    for position, word in enumerate(words):
+        if word in sort_words:
+            descending = word in KPI_DESCENDING_WORDS
+        elif word.isdigit() and position and words[position - 1] in sort_words:
+            # "top 5"; any other number (a year, a code) falls through
+            limit = max(1, min(int(word), KPI_RESULT_LIMIT))
+        elif word not in KPI_FILLER_WORDS:
+            return None
+    
+    return {"metric": metric, "dimension": dimension, "descending": descending, "limit": limit}
+
+
+def kpi_query(route: dict) -> str:
+    """SQL over the rollup tables for a route from route_kpi_question()."""
+    metric = KPI_METRICS[route["metric"]]
+    volume, _ = metric["volume"]
+    dimension = KPI_DIMENSIONS.get(route["dimension"])
+    label = dimension["column"] if dimension else "'All'"
+    join = dimension["join"].format(database=DATABASE, schema=SCHEMA) if dimension else ""
+    group_by = "GROUP BY 1" if dimension else ""
+    return f"""
+    SELECT {label} AS label, {volume} AS volume, ROUND({metric["value"]}, 1) AS value
+    FROM {DATABASE}.{SCHEMA}.{metric["table"]} r
+    {join}
+    {group_by}
+    ORDER BY value {"DESC" if route["descending"] else "ASC"} NULLS LAST, label
+    LIMIT {route["limit"]}
+    """
+
+
+def format_kpi_answer(route: dict, rows: list) -> str:
+    """Markdown answer for rollup rows (LABEL, VOLUME, VALUE)."""
+    metric = KPI_METRICS[route["metric"]]
+    _, volume_label = metric["volume"]
+    
+    def value_text(value):
+        return "n/a" if value is None else f"{float(value):,.1f}{metric['unit']}"
+    
+    if route["dimension"] is None:
+        row = rows[0]
+        return (
+            f"**{metric['label']}**: {value_text(row['VALUE'])} "
+            f"across {int(row['VOLUME'] or 0):,} {volume_label.lower()}."
+        )
+    
+    dimension = KPI_DIMENSIONS[route["dimension"]]
+    order = "highest" if route["descending"] else "lowest"
+    lines = [
+        f"**{metric['label']} by {dimension['label'].lower()}** ({order} first):",
+        "",
+        f"| {dimension['label']} | {metric['label']} | {volume_label} |",
+        "|---|---:|---:|",
+    ]
+    lines.extend(
+        f"| {row['LABEL']} | {value_text(row['VALUE'])} | {int(row['VOLUME'] or 0):,} |"
+        for row in rows
+    )
+    return "\n".join(lines)
+
+
+def answer_kpi_question(user_query: str, session):
+    """
+    Answer a headline KPI question from the rollups, or return None.
+    
+    None means the agent should answer: the question did not route, or the
+    rollup query failed or came back empty (e.g. rollups not created yet).
+    """
+    route = route_kpi_question(user_query)
+    if route is None:
+        return None
+    
+    try:
+        with measure("kpi_fast_path"):
+            rows = session.sql(kpi_query(route)).collect()
+    except Exception:
+        return None
+    if not rows:
+        return None
+    
+    return {
+        "success": True,
+        "response": format_kpi_answer(route, rows),
+        "model": "none (KPI rollups)",
+        "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+        "agent_name": "KPI fast path",
+        "fast_path": dict(route, table=KPI_METRICS[route["metric"]]["table"], rows=len(rows))
+    }
+
+# ========================================================================
+# CONVERSATION CONTEXT
+# ========================================================================
+# The agent sees every earlier turn of its thread, so prompt tokens (and
+# latency) grow with the conversation. Turns are counted as they happen and
+# the thread is replaced by a seeded fresh one before it passes the budget.
+
+# Word pieces split like CL100K_PATTERN (stdlib re has no \p{L}): a letter run
+# with its leading space or mark, up to 3 digits, a punctuation run, whitespace
+_APPROX_PIECES = re.compile(
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\w]?[^\W\d_]+|\d{1,3}| ?[^\s\w]+[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s|_+"""
+)
+
+
+def approximate_token_count(text: str) -> int:
+    """cl100k-style count without the vocabulary: words up to 8 letters are one token, then one per 4 letters."""
+    tokens = 0
+    for match in _APPROX_PIECES.finditer(text):
+        letters = len(match.group().strip(" \t\r\n'-.,;:!?()[]{}\"/"))
+        tokens += 1 + (letters - 5) // 4 if letters > 8 else 1
+    return tokens
+
+
+@st.cache_resource(show_spinner=False)
+def get_tokenizer():
+    """(name, count function): cl100k_base through tiktoken, or the local approximation."""
+    path = TOKENIZER_FILE
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    try:
+        import tiktoken
+        from tiktoken.load import load_tiktoken_bpe
+        
+        ranks = load_tiktoken_bpe(path, expected_hash=TOKENIZER_FILE_SHA256)
+        encoding = tiktoken.Encoding("cl100k_base", pat_str=CL100K_PATTERN, mergeable_ranks=ranks,
+                                     special_tokens={})
+        return "cl100k_base", lambda text: len(encoding.encode_ordinary(text))
+    except Exception:
+        return "approximate", approximate_token_count
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in text with the app's local tokenizer."""
+    return get_tokenizer()[1](text or "") if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text at a word boundary once it reaches about max_tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle])) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]) + " …"
+
+
+def context_entities(turns: list) -> dict:
+    """Entities mentioned in (question, answer) turns per kind, most recent first, deduplicated."""
+    entities = {}
+    for kind, pattern in get_terminology()["context_entities"].items():
+        seen = OrderedDict()
+        for question, answer in reversed(turns):
+            for text in (question, answer):
+                for match in pattern.finditer(text):
+                    value = " ".join(match.group().split())
+                    seen.setdefault(value.lower(), value)
+        if seen:
+            entities[kind] = list(seen.values())[:CONTEXT_SUMMARY_ENTITIES]
+    return entities
+
+
+def summarize_context(turns: list, keep_turns: int = CONTEXT_KEEP_TURNS) -> str:
+    """
+    Short local summary of a conversation's (question, answer) turns.
+    
+    Lists the entities discussed and the most recent questions, then repeats
+    the last keep_turns turns with their answers cut down. No model call.
+    """
+    lines = ["Context from earlier in this conversation (summarized):"]
+    for kind, values in context_entities(turns).items():
+        lines.append(f"- {kind}: {', '.join(values)}")
+    earlier = turns[:len(turns) - keep_turns] if keep_turns else turns
+    if earlier:
+        questions = [question for question, _ in earlier[-CONTEXT_SUMMARY_QUESTIONS:]]
+        lines.append("- Earlier questions: " + "; ".join(f'"{question}"' for question in questions))
+    for question, answer in (turns[-keep_turns:] if keep_turns else []):
+        lines.append(f"Previous question: {question}")
+        lines.append(f"Previous answer: {truncate_to_tokens(answer, CONTEXT_KEPT_ANSWER_TOKENS)}")
+    return "\n".join(lines)
+
 
-def init_session_state():
-    """Initialize Streamlit session state variables."""
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+class ConversationContext:
+    """
+    Token accounting for a session's agent thread.
     
-    if "thread_id" not in st.session_state:
-        # Create new thread for conversation context
-        st.session_state.thread_id = None
+    prepare() is called before each agent question: when the thread would
+    pass the budget it compacts, and the returned query carries the summary
+    until a turn on the fresh thread is answered. record() adds each answered
+    turn, counting the question, the answer and the tool calls and results
+    the agent kept in the thread; turn_log keeps the context tokens sent per
+    turn for reporting.
+    record_outside() adds a turn answered without the agent, which the thread
+    never saw; it rides along with the next agent question.
+    """
     
-    if "show_debug" not in st.session_state:
-        st.session_state.show_debug = False
+    def __init__(self):
+        self.budget = CONTEXT_TOKEN_BUDGET
+        self.history = []  # Every (question, answer) turn, across compactions
+        self.thread_tokens = []  # Tokens per turn on the current thread
+        self.seed = None  # Summary still to be sent on the fresh thread
+        self.unsent = []  # Turns answered outside the thread, not yet sent to it
+        self.compactions = 0
+        self.turn_log = []
     
-    if "query_count" not in st.session_state:
-        st.session_state.query_count = 0
+    @property
+    def tokens(self) -> int:
+        """Tokens the agent already holds for the current thread."""
+        return sum(self.thread_tokens)
     
-    if "session" not in st.session_state:
-        st.session_state.session = get_active_session()
+    def prepare(self, user_query: str):
+        """(query to send, compaction or None); a compaction means the caller must start a fresh thread."""
+        compaction = None
+        if (CONTEXT_MANAGEMENT_ENABLED and self.thread_tokens
+                and self.tokens + count_tokens(user_query) > self.budget):
+            self.seed = summarize_context(self.history)
+            compaction = {"before": self.tokens, "after": count_tokens(self.seed)}
+            self.thread_tokens = []
+            self.unsent = []  # The summary covers them
+            self.compactions += 1
+        context = [self.seed] if self.seed else []
+        if self.unsent:
+            context.append("Answered earlier in this conversation:\n" + "\n".join(
+                f"Question: {question}\nAnswer: {truncate_to_tokens(answer, CONTEXT_KEPT_ANSWER_TOKENS)}"
+                for question, answer in self.unsent
+            ))
+        if context:
+            return "\n\n".join(context + [f"Current question: {user_query}"]), compaction
+        return user_query, compaction
+    
+    def record(self, user_query: str, sent_query: str, result: dict, compaction: dict = None) -> dict:
+        """Add an answered turn; returns the turn's context report for the message metadata."""
+        response = result.get("response", "")
+        sent_tokens = self.tokens + count_tokens(sent_query)
+        tool_tokens = sum(tool.get("tokens", 0) for tool in result.get("tools_used", []))
+        self.history.append((user_query, response))
+        self.thread_tokens.append(count_tokens(sent_query) + count_tokens(response) + tool_tokens)
+        self.seed = None
+        self.unsent = []
+        report = {
+            "sent_tokens": sent_tokens,
+            "thread_tokens": self.tokens,
+            "tool_tokens": tool_tokens,
+            "budget": self.budget,
+            "tokenizer": get_tokenizer()[0],
+            "compacted": compaction,
+        }
+        self.turn_log.append(report)
+        return report
+    
+    def record_outside(self, user_query: str, result: dict):
+        """Add a turn answered without the agent (KPI fast path, cache) so a follow-up keeps its context."""
+        self.history.append((user_query, result.get("response", "")))
+        self.unsent.append(self.history[-1])
+
 
 # ========================================================================
-# SNOWFLAKE AGENT INTERACTION
+# RESULT SETS
 # ========================================================================
+# A claim-level list can run to hundreds of thousands of rows. Rendered as the
+# agent's markdown it is one huge st.markdown call and a copy in every rerun's
+# session state; here the rows stay in Snowflake's query result and only the
+# page on screen is fetched.
+
+def long_markdown_tables(text: str):
+    """
+    Answer text with tables over RESULT_INLINE_ROWS rows replaced by a note.
+    
+    Returns (text, rows) where rows is the largest table's row count.
+    """
+    lines = text.split("\n")
+    kept, largest, start = [], 0, None
+    for index, line in enumerate(lines + [""]):
+        if line.lstrip().startswith("|"):
+            if start is None:
+                start = index
+            continue
+        if start is not None:
+            table = lines[start:index]
+            rows = max(0, len(table) - 2)  # Header and separator lines
+            largest = max(largest, rows)
+            kept.extend(table if rows <= RESULT_INLINE_ROWS else
+                        [f"_{rows:,}-row table: see the paged result set below._"])
+            start = None
+        if index < len(lines):
+            kept.append(line)
+    return "\n".join(kept), largest
 
-def create_thread():
-    """Create a new conversation thread with the agent using REST API."""
-    try:
-        import _snowflake
-        
-        # Create thread using native REST API
-        response = _snowflake.send_snow_api_request(
-            method="POST",
-            url=f"/api/v2/databases/{DATABASE}/schemas/{SCHEMA}/agents/{AGENT_NAME}/threads",
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            },
-            body=json.dumps({}),  # Empty body for new thread
-            timeout=30
-        )
-        
-        if response and 'data' in response:
-            thread_id = response['data'].get('thread_id')
-            return thread_id
-        else:
-            # Fallback to UUID if API doesn't return thread_id
-            import uuid
-            return str(uuid.uuid4())
-            
-    except ImportError:
-        # Fallback for local development
-        import uuid
-        return str(uuid.uuid4())
-    except Exception as e:
-        st.error(f"Error creating thread: {e}")
-        import uuid
-        return str(uuid.uuid4())
 
+def is_read_only_sql(sql: str) -> bool:
+    """True when sql is one SELECT statement; string literals and comments are ignored."""
+    statement = _SQL_LITERALS.sub(" ", sql or "")
+    return bool(_SELECT_STATEMENT.fullmatch(statement)) and not _WRITE_KEYWORDS.search(statement)
 
-def call_agent(user_query: str, thread_id: str = None):
+
+def attach_result_set(result: dict) -> dict:
     """
-    Call the native Cortex Agent using the REST API pattern.
-    
-    This follows Snowflake's recommended approach for calling agents from
-    Streamlit in Snowflake (SiS) applications.
+    Turn an Analyst answer with a long table into a paged result set.
     
-    The agent handles:
-    - Intent classification
-    - RCM terminology enhancement (via UDF)
-    - Routing to Cortex Analyst or Cortex Search
-    - Response generation
+    Applies when an Analyst tool reported a read-only SQL statement and either
+    its row count or the answer's largest table exceeds RESULT_INLINE_ROWS. The long tables are
+    dropped from the response text and result["result_set"] gets a handle:
+    the SQL, the query id once it has run, the row count once known and the
+    page size. Rows are never stored on the result.
     """
-    session = st.session_state.session
-    
-    try:
-        import _snowflake
-        
-        # Build request payload per Snowflake standards
-        request_payload = {
-            "query": user_query
-        }
-        
-        # Add thread_id if maintaining conversation context
-        if thread_id:
-            request_payload["thread_id"] = thread_id
-        
-        # Call agent using native REST API from SiS
-        # This is the recommended pattern per official docs
-        response = _snowflake.send_snow_api_request(
-            method="POST",
-            url=f"/api/v2/databases/{DATABASE}/schemas/{SCHEMA}/agents/{AGENT_NAME}:run",
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            },
-            body=json.dumps(request_payload),
-            timeout=60
-        )
-        
-        # Parse the streaming response
-        if response and 'data' in response:
-            response_data = response['data']
-            
-            # Extract message content
-            if 'message' in response_data:
-                message = response_data['message']
-                response_text = message.get('content', 'No response generated')
-                
-                # Get usage info for cost tracking
-                usage = response_data.get('usage', {})
-                
-                return {
-                    "success": True,
-                    "response": response_text,
-                    "model": response_data.get('model', 'auto'),
-                    "usage": {
-                        "input_tokens": usage.get('prompt_tokens', 0),
-                        "output_tokens": usage.get('completion_tokens', 0),
-                        "total_tokens": usage.get('total_tokens', 0)
-                    },
-                    "agent_name": AGENT_NAME,
-                    "thread_id": response_data.get('thread_id')
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": "Unexpected response format",
-                    "response": "I apologize, but I couldn't generate a response. Please try again."
-                }
-        else:
-            return {
-                "success": False,
-                "error": "No response from agent",
-                "response": "I apologize, but I couldn't generate a response. Please try again."
-            }
-            
-    except ImportError:
-        # Fallback to SQL-based approach if _snowflake module not available
-        # This can happen in local development or older SiS versions
-        return call_agent_sql_fallback(user_query, thread_id)
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "response": f"I encountered an error: {str(e)}"
-        }
+    if not RESULT_SET_ENABLED or not result.get("success"):
+        return result
+    tool = next((tool for tool in result.get("tools_used", [])
+                 if tool.get("type") in ANALYST_TOOL_TYPES and is_read_only_sql(tool.get("sql"))), None)
+    if tool is None:
+        return result
+    text, table_rows = long_markdown_tables(result.get("response", ""))
+    rows = tool.get("rows")
+    if (table_rows if rows is None else rows) <= RESULT_INLINE_ROWS:
+        return result
+    result["response"] = text
+    result["result_set"] = {
+        "result_id": uuid.uuid4().hex,
+        "sql": tool["sql"],
+        "query_id": None,
+        "rows": rows,
+        "page_rows": RESULT_PAGE_ROWS
+    }
+    return result
 
 
-def call_agent_sql_fallback(user_query: str, thread_id: str = None):
+class ResultSetStore:
     """
-    Fallback method using SQL when REST API is not available.
-    Used for local development or older SiS versions.
+    Pages of result sets, shared by all sessions in the process.
+    
+    A result set's SQL runs once with collect_nowait(); pages are cut in order
+    from the query's pandas batches by a reader kept per result set, so paging
+    forward costs no extra statements. Any other page (behind the reader, far
+    ahead of it, or once it is gone) is one RESULT_SCAN of the query id with
+    LIMIT / OFFSET. When the query result can no longer be scanned (results expire
+    after 24 hours) the SQL runs again, provided it is a single SELECT. Fetched
+    pages are kept in an LRU of at most max_rows rows; a result set's lock is
+    dropped once none of its pages or its reader are left.
+    
+    The handle is updated in place with the query id and, once the last page
+    has been seen, the row count.
     """
-    session = st.session_state.session
     
-    try:
-        # SQL-based agent call (fallback)
-        agent_query = f"""
-        SELECT PARSE_JSON(
-            SNOWFLAKE.CORTEX.COMPLETE(
-                '{AGENT_NAME}',
-                [
-                    {{
-                        'role': 'user',
-                        'content': '{user_query.replace("'", "''")}'
-                    }}
-                ]
-            )
-        ) as response
-        """
-        
-        result = session.sql(agent_query).collect()
-        
-        if result and len(result) > 0:
-            response_data = result[0]['RESPONSE']
-            
-            if isinstance(response_data, str):
-                response_data = json.loads(response_data)
-            
-            if 'choices' in response_data and len(response_data['choices']) > 0:
-                message = response_data['choices'][0].get('message', {})
-                response_text = message.get('content', 'No response generated')
-                usage = response_data.get('usage', {})
+    def __init__(self, max_rows: int = None, max_readers: int = None):
+        self.max_rows = RESULT_CACHE_ROWS if max_rows is None else max_rows
+        self.max_readers = RESULT_OPEN_READERS if max_readers is None else max_readers
+        self._pages = OrderedDict()  # (result_id, page) -> DataFrame
+        self._rows = 0
+        self._readers = OrderedDict()  # result_id -> {"batches", "buffer", "next_page"}
+        self._result_locks = {}  # result_id -> [lock, callers]
+        self._lock = threading.Lock()
+        self.counts = {"queries": 0, "batch_pages": 0, "scan_pages": 0, "cache_hits": 0, "evictions": 0}
+    
+    def page(self, session, handle: dict, number: int):
+        """Rows of page `number` (0-based) as a DataFrame; empty past the end."""
+        key = (handle["result_id"], number)
+        with self._lock:
+            entry = self._result_locks.setdefault(handle["result_id"], [threading.Lock(), 0])
+            entry[1] += 1  # Callers using or waiting on the lock
+        try:
+            with entry[0]:
+                with self._lock:
+                    if key in self._pages:
+                        self._pages.move_to_end(key)
+                        self.counts["cache_hits"] += 1
+                        return self._pages[key]
                 
-                return {
-                    "success": True,
-                    "response": response_text,
-                    "model": response_data.get('model', 'auto'),
-                    "usage": {
-                        "input_tokens": usage.get('prompt_tokens', 0),
-                        "output_tokens": usage.get('completion_tokens', 0),
-                        "total_tokens": usage.get('total_tokens', 0)
-                    },
-                    "agent_name": AGENT_NAME
-                }
+                if handle.get("query_id") is None:
+                    self._run(session, handle)
+                # The next page, or one already in the reader's current batch, is cut
+                # from the batches; a jump further ahead is cheaper as a RESULT_SCAN
+                reader = self._readers.get(handle["result_id"])
+                buffered = 0 if reader is None or reader["buffer"] is None else len(reader["buffer"])
+                if reader is not None and 0 <= number - reader["next_page"] <= buffered // handle["page_rows"]:
+                    return self._read_to(handle, reader, number)
+                
+                try:
+                    frame = session.sql(RESULT_PAGE_SQL.format(
+                        query_id=handle["query_id"], limit=handle["page_rows"], offset=number * handle["page_rows"]
+                    )).to_pandas()
+                except Exception:
+                    # The query result has expired: run the SQL again and read forward
+                    self._run(session, handle)
+                    return self._read_to(handle, self._readers[handle["result_id"]], number)
+                if 0 < len(frame) < handle["page_rows"] or (number == 0 and frame.empty):
+                    handle["rows"] = number * handle["page_rows"] + len(frame)
+                with self._lock:
+                    self.counts["scan_pages"] += 1
+                self._keep(key, frame)
+                return frame
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                self._release(handle["result_id"])
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts, pages=len(self._pages), rows=self._rows, readers=len(self._readers),
+                        locks=len(self._result_locks))
+    
+    def _run(self, session, handle: dict):
+        if not is_read_only_sql(handle["sql"]):
+            raise ValueError("the result set's SQL is not a single SELECT statement")
+        job = session.sql(handle["sql"]).collect_nowait()
+        handle["query_id"] = job.query_id
+        with self._lock:
+            self.counts["queries"] += 1
+            self._readers[handle["result_id"]] = {
+                "batches": iter(job.result("pandas_batches")),
+                "buffer": None,
+                "next_page": 0
+            }
+            while len(self._readers) > self.max_readers:
+                result_id, _ = self._readers.popitem(last=False)
+                self._release(result_id)
+    
+    def _read_to(self, handle: dict, reader: dict, number: int):
+        """Cut pages from the reader's batches up to and including `number`."""
+        import pandas as pd
         
-        return {
-            "success": False,
-            "error": "No response from agent",
-            "response": "I apologize, but I couldn't generate a response. Please try again."
-        }
+        page_rows = handle["page_rows"]
+        while reader["next_page"] <= number:
+            parts, wanted = [], page_rows
+            while wanted:
+                if reader["buffer"] is None or reader["buffer"].empty:
+                    reader["buffer"] = next(reader["batches"], None)
+                    if reader["buffer"] is None:
+                        break
+                parts.append(reader["buffer"].iloc[:wanted])
+                reader["buffer"] = reader["buffer"].iloc[wanted:]
+                wanted -= len(parts[-1])
+            frame = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
             
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "response": f"I encountered an error: {str(e)}"
-        }
+            page = reader["next_page"]
+            reader["next_page"] += 1
+            with self._lock:
+                self.counts["batch_pages"] += 1
+            if parts and page == number:
+                self._keep((handle["result_id"], page), frame)
+            if wanted:
+                # Batches exhausted: the row count is now known
+                handle["rows"] = page * page_rows + len(frame)
+                with self._lock:
+                    self._readers.pop(handle["result_id"], None)
+                    self._release(handle["result_id"])
+                return frame if page == number else pd.DataFrame()
+        return frame
+    
+    def _keep(self, key, frame):
+        with self._lock:
+            if key in self._pages:
+                return
+            self._pages[key] = frame
+            self._rows += len(frame)
+            while self._rows > self.max_rows and len(self._pages) > 1:
+                (result_id, _), evicted = self._pages.popitem(last=False)
+                self._rows -= len(evicted)
+                self.counts["evictions"] += 1
+                self._release(result_id)
+    
+    def _release(self, result_id):
+        """Drop an idle result set's lock once it has no pages or reader left (caller holds _lock)."""
+        entry = self._result_locks.get(result_id)
+        if entry is None or entry[1] or result_id in self._readers:
+            return
+        if any(key[0] == result_id for key in self._pages):
+            return
+        del self._result_locks[result_id]
 
 
-def get_session_statistics():
-    """Get session statistics from query history."""
-    session = st.session_state.session
-    
-    try:
-        # Query recent history for this session
-        # This is a simplified version - in production, would track by session ID
-        stats_query = """
-        SELECT 
-            COUNT(*) as query_count,
-            SUM(TOTAL_ELAPSED_TIME) / 1000 as total_time_seconds,
-            AVG(TOTAL_ELAPSED_TIME) / 1000 as avg_time_seconds
-        FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY())
-        WHERE QUERY_TYPE = 'SELECT'
-        AND START_TIME > DATEADD(hour, -1, CURRENT_TIMESTAMP())
-        LIMIT 100
-        """
-        
-        result = session.sql(stats_query).collect()
-        
-        if result and len(result) > 0:
-            row = result[0]
-            return {
-                "total_queries": row['QUERY_COUNT'],
-                "total_time": row['TOTAL_TIME_SECONDS'],
-                "avg_time": row['AVG_TIME_SECONDS']
-            }
-        else:
-            return {
-                "total_queries": 0,
-                "total_time": 0,
-                "avg_time": 0
-            }
-    except:
-        return {
-            "total_queries": st.session_state.query_count,
-            "total_time": 0,
-            "avg_time": 0
-        }
+@st.cache_resource(show_spinner=False)
+def get_result_store():
+    """Return the result set store shared by all sessions in this process."""
+    return ResultSetStore()
+
 
 # ========================================================================
 # UI COMPONENTS
 # ========================================================================
 
+@st.cache_resource(show_spinner=False)
+def get_static_assets():
+    """Page assets read once per process: the header logo as SVG markup, else its URL."""
+    path = HEADER_LOGO_FILE
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    try:
+        with open(path, encoding="utf-8") as f:
+            logo = f.read()
+    except OSError:
+        logo = HEADER_LOGO_URL
+    return {"logo": logo}
+
+
 def render_header():
     """Render the application header."""
     col1, col2, col3 = st.columns([1, 3, 1])
     
     with col1:
-        st.image("https://www.snowflake.com/wp-content/themes/snowflake/assets/img/brand-guidelines/logo-sno-blue-example.svg", width=150)
+        logo = get_static_assets()["logo"]
+        if logo:
+            st.image(logo, width=150)
     
     with col2:
         st.title("🏥 RCM Intelligence Hub")
@@ -349,18 +2839,28 @@ def render_header():
         if st.button("🔄 New Session", use_container_width=True):
             st.session_state.messages = []
             st.session_state.thread_id = None
+            st.session_state.pending_thread = prefetch_thread()
             st.session_state.query_count = 0
+            st.session_state.history_visible = HISTORY_WINDOW_MESSAGES
+            st.session_state.context = ConversationContext()
             st.rerun()
 
 
 def render_welcome_message():
-    """Display welcome message on first load."""
+    """Display welcome message on first load; returns its placeholder."""
+    placeholder = st.empty()
     if len(st.session_state.messages) == 0:
-        st.info(WELCOME_MESSAGE)
+        placeholder.info(WELCOME_MESSAGE)
+    return placeholder
 
 
 def render_sidebar():
-    """Render sidebar with session controls and statistics."""
+    """
+    Render sidebar with session controls.
+    
+    Returns the placeholder for session statistics, which main() fills in
+    after the query is processed so the numbers include it without a rerun.
+    """
     with st.sidebar:
         st.header("⚙️ Session Controls")
         
@@ -371,6 +2871,20 @@ def render_sidebar():
             help="Display agent reasoning and cost estimates"
         )
         
+        # Response cache toggle
+        st.session_state.use_response_cache = st.checkbox(
+            "Use Shared Response Cache",
+            value=st.session_state.use_response_cache,
+            help="Reuse answers to repeat questions until the claims data is reloaded"
+        )
+        
+        # Streaming toggle
+        st.session_state.streaming = st.checkbox(
+            "Stream Responses",
+            value=st.session_state.streaming,
+            help="Render the answer and tool activity as the agent produces them"
+        )
+        
         st.divider()
         
         # Deployment info
@@ -382,13 +2896,8 @@ def render_sidebar():
         
         st.divider()
         
-        # Session statistics
-        st.subheader("📊 Session Statistics")
-        stats = get_session_statistics()
-        
-        st.metric("Queries Processed", st.session_state.query_count)
-        if stats['total_queries'] > 0:
-            st.metric("Avg Response Time", f"{stats['avg_time']:.2f}s")
+        # Session statistics (in-process timings, no SQL issued)
+        stats_placeholder = st.empty()
         
         st.divider()
         
@@ -433,6 +2942,53 @@ def render_sidebar():
             - **CO-29**: Timely filing deadline
             - **CO-50**: Non-covered service
             """)
+    
+    return stats_placeholder
+
+
+def render_session_statistics():
+    """Render query count and latency percentiles from the in-process metrics."""
+    st.subheader("📊 Session Statistics")
+    session_stats = st.session_state.metrics.summary()
+    
+    st.metric("Queries Processed", st.session_state.query_count)
+    agent_stats = session_stats.get("call_agent_streaming") or session_stats.get("call_agent")
+    if agent_stats and agent_stats["count"] > 0:
+        col1, col2 = st.columns(2)
+        col1.metric("p50 Response", f"{agent_stats['p50']:.2f}s")
+        col2.metric("p95 Response", f"{agent_stats['p95']:.2f}s")
+        st.caption(
+            f"p99 {agent_stats['p99']:.2f}s • {agent_stats['tokens_per_second']:.0f} tokens/s • "
+            f"{agent_stats['errors']} errors"
+        )
+    
+    with st.expander("⏱️ Latency Breakdown"):
+        render_latency_table("This session", session_stats)
+        render_latency_table("All sessions (this app process)", get_process_metrics().summary())
+        if THREAD_PREFETCH_ENABLED:
+            st.caption(f"{get_thread_prefetcher().spares_ready()} spare agent threads ready")
+
+
+def render_latency_table(title: str, stats: dict):
+    """Render p50/p95/p99 per instrumented operation."""
+    st.markdown(f"**{title}**")
+    rows = [
+        {
+            "Operation": operation,
+            "Calls": stats[operation]["count"],
+            "Errors": stats[operation]["errors"],
+            "p50 (s)": round(stats[operation]["p50"], 3),
+            "p95 (s)": round(stats[operation]["p95"], 3),
+            "p99 (s)": round(stats[operation]["p99"], 3),
+            "Tokens/s": round(stats[operation]["tokens_per_second"], 1)
+        }
+        for operation in INSTRUMENTED_OPERATIONS
+        if operation in stats
+    ]
+    if rows:
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+    else:
+        st.caption("No calls recorded yet")
 
 
 def render_debug_panel(metadata: dict):
@@ -451,6 +3007,9 @@ def render_debug_panel(metadata: dict):
                 st.metric("Input Tokens", f"{usage.get('input_tokens', 0):,}")
                 st.metric("Output Tokens", f"{usage.get('output_tokens', 0):,}")
                 st.metric("Total Tokens", f"{usage.get('total_tokens', 0):,}")
+                cost = estimate_cost(usage.get('input_tokens', 0), usage.get('output_tokens', 0),
+                                     metadata.get('model', 'auto'))
+                st.metric("Estimated Cost", f"${cost:.4f}")
         
         with col2:
             st.markdown("### 📊 Performance")
@@ -460,6 +3019,81 @@ def render_debug_panel(metadata: dict):
             st.write("✅ Tool routing")
             st.write("✅ Response generation")
             
+            # Tools reported by the streaming path
+            for tool in metadata.get('tools_used', []):
+                icon, _ = TOOL_KINDS.get(tool.get('type'), TOOL_KINDS["generic"])
+                seconds = f" ({tool['seconds']:.2f}s)" if tool.get('seconds') is not None else ""
+                st.write(f"{icon} {tool.get('kind')}: {tool.get('name')}{seconds}")
+            
+            # Shared response cache
+            cache_stats = get_response_cache().stats()
+            similar_stats = get_similar_query_cache().stats()
+            cache_match = metadata.get('cache_match')
+            if cache_match:
+                st.success(
+                    f"⚡ Served from cache: similar to \"{cache_match['query']}\" "
+                    f"({cache_match['similarity']:.0%} match)"
+                )
+            elif metadata.get('cached'):
+                st.success("⚡ Served from shared response cache")
+            fast_path = metadata.get('fast_path')
+            if fast_path:
+                st.success(f"⚡ Answered from {fast_path['table']} without the agent ({fast_path['rows']} rows)")
+            if metadata.get('circuit_open'):
+                st.warning("⚠️ Agent endpoint unhealthy (circuit open): answered by the SQL fallback")
+            elif metadata.get('agent_error'):
+                st.warning(f"⚠️ Agent stream failed ({metadata['agent_error']}): answered by the SQL fallback")
+            if metadata.get('result_set'):
+                result_stats = get_result_store().stats()
+                st.caption(
+                    f"Result set: query {metadata['result_set']['query_id']}, pages of "
+                    f"{metadata['result_set']['page_rows']} rows; store holds {result_stats['pages']} pages "
+                    f"({result_stats['rows']:,} rows), {result_stats['batch_pages']} read from batches, "
+                    f"{result_stats['scan_pages']} from RESULT_SCAN"
+                )
+            context = metadata.get('context')
+            if context:
+                if context.get('compacted'):
+                    st.info(
+                        f"🗜️ Conversation compacted: {context['compacted']['before']:,} → "
+                        f"{context['compacted']['after']:,} tokens, continued on a fresh thread"
+                    )
+                st.caption(
+                    f"Context: {context['sent_tokens']:,} tokens sent, thread holds {context['thread_tokens']:,} "
+                    f"of {context['budget']:,}, {context.get('tool_tokens', 0):,} from this turn's tool calls "
+                    f"({context['tokenizer']} tokenizer)"
+                )
+            if metadata.get('trace_id'):
+                span_stats = get_span_buffer().stats()
+                st.caption(
+                    f"Trace {metadata['trace_id']} → {TELEMETRY_TABLE}: {span_stats['pending']} spans pending, "
+                    f"{span_stats['flushes']} bulk inserts, {span_stats['failed_flushes']} failed"
+                )
+            agent_stats = get_agent_client().stats()
+            st.caption(
+                f"Agent endpoint: circuit {agent_stats['circuit']}, timeouts {agent_stats['run_timeout']:.1f}s :run / "
+                f"{agent_stats['thread_timeout']:.1f}s threads, {agent_stats['retries']} retries, "
+                f"{agent_stats['hedges']} hedges ({agent_stats['hedge_wins']} won, "
+                f"{agent_stats['hedge_loser_failures']} losing requests failed)"
+            )
+            st.caption(
+                f"Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                f"({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['bypasses']} follow-up bypasses, "
+                f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 1024:.0f} KB"
+            )
+            st.caption(
+                f"Similar-question cache: {similar_stats['hits']} hits / {similar_stats['misses']} misses, "
+                f"{similar_stats['entries']} entries, {similar_stats['evictions']} evictions "
+                f"(threshold {SIMILAR_QUERY_THRESHOLD:.0%})"
+            )
+            
+            # Streaming latency
+            timings = metadata.get('timings')
+            if timings:
+                if timings.get('time_to_first_token') is not None:
+                    st.metric("Time to First Token", f"{timings['time_to_first_token']:.2f}s")
+                st.metric("Total Latency", f"{timings['total_time']:.2f}s")
+            
             # Cost warning if high usage
             if 'usage' in metadata:
                 total_tokens = metadata['usage'].get('total_tokens', 0)
@@ -469,8 +3103,161 @@ def render_debug_panel(metadata: dict):
                     st.info("ℹ️ Moderate token usage")
 
 
+def message_preview(message: dict) -> str:
+    """One-line summary of a message for the collapsed history, memoized on the message."""
+    if "preview" not in message:
+        text = " ".join(message["content"].split())
+        if len(text) > HISTORY_PREVIEW_CHARS:
+            text = text[:HISTORY_PREVIEW_CHARS].rstrip() + "…"
+        icon = "🧑" if message["role"] == "user" else "🤖"
+        message["preview"] = f"{icon} {text}"
+    return message["preview"]
+
+
+def collapsed_history_markdown(messages: list) -> str:
+    """Markdown for the collapsed older messages, rebuilt only when the range changes."""
+    key = (messages[0].get("timestamp"), len(messages))
+    cached = st.session_state.get("collapsed_history")
+    if cached is None or cached[0] != key:
+        markdown = "\n".join(f"- {message_preview(message)}" for message in messages)
+        cached = (key, markdown)
+        st.session_state.collapsed_history = cached
+    return cached[1]
+
+
+def show_earlier_messages():
+    """Callback for the history loader: reveal one more page of older messages."""
+    st.session_state.history_visible += HISTORY_PAGE_MESSAGES
+
+
+# Lets the history loader rerun on its own, without the rest of the page;
+# older Streamlit versions without fragments rerun the whole script instead
+history_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+@history_fragment
+def render_chat_history():
+    """
+    Draw the most recent messages in full and collapse older ones.
+    
+    Only the last st.session_state.history_visible messages get chat bubbles,
+    markdown and debug panels; earlier ones are listed as one-line previews
+    behind a loader that reveals HISTORY_PAGE_MESSAGES more per click.
+    
+    Only the previews are memoized. Streamlit cannot reuse an element across
+    reruns, so the visible messages are drawn again each time; windowing is
+    what bounds that cost.
+    """
+    with measure("render_history"):
+        messages = st.session_state.messages
+        hidden = max(0, len(messages) - st.session_state.history_visible)
+        
+        if hidden:
+            with st.expander(f"🕘 {hidden} earlier messages"):
+                st.markdown(collapsed_history_markdown(messages[:hidden]))
+            st.button(
+                f"Show {min(hidden, HISTORY_PAGE_MESSAGES)} earlier messages in full",
+                on_click=show_earlier_messages,
+                use_container_width=True
+            )
+        
+        for index, message in enumerate(messages[hidden:], start=hidden):
+            with st.chat_message(message["role"]):
+                st.markdown(message["content"])
+                if message.get("metadata", {}).get("result_set"):
+                    render_result_set(message["metadata"]["result_set"], key=str(index))
+                
+                # Show debug info if enabled and available
+                if (st.session_state.show_debug and 
+                    message["role"] == "assistant" and 
+                    "metadata" in message):
+                    render_debug_panel(message["metadata"])
+
+
+def turn_result_page(state_key: str, step: int):
+    """Callback for the result set pager."""
+    st.session_state[state_key] = max(0, st.session_state.get(state_key, 0) + step)
+
+
+def render_result_set(handle: dict, key: str):
+    """
+    Draw the current page of a result set with previous/next controls.
+    
+    The page number lives in session state per result set; the rows come
+    from the process-wide ResultSetStore. key tells apart widgets of messages
+    that share a handle (an answer served again from the response cache).
+    """
+    state_key = f"result_page_{handle['result_id']}"
+    number = st.session_state.get(state_key, 0)
+    try:
+        with measure("result_page"):
+            frame = get_result_store().page(st.session_state.session, handle, number)
+    except Exception as e:
+        st.warning(f"Couldn't load the result set: {e}")
+        return
+    
+    page_rows = handle["page_rows"]
+    first = number * page_rows
+    if frame.empty:
+        st.caption("No more rows")
+    else:
+        st.dataframe(frame, hide_index=True, use_container_width=True)
+    total = f" of {handle['rows']:,}" if handle.get("rows") is not None else ""
+    has_next = len(frame) == page_rows and (handle.get("rows") is None or first + page_rows < handle["rows"])
+    
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        st.button("◀ Previous", key=f"{state_key}_{key}_previous", disabled=number == 0,
+                  on_click=turn_result_page, args=(state_key, -1), use_container_width=True)
+    with col2:
+        st.caption(f"Rows {first + 1:,}–{first + len(frame):,}{total}" if len(frame) else f"Page {number + 1}")
+    with col3:
+        st.button("Next ▶", key=f"{state_key}_{key}_next", disabled=not has_next,
+                  on_click=turn_result_page, args=(state_key, 1), use_container_width=True)
+
+
+def render_streaming_response(user_query: str, thread_id: str = None, fresh_thread: bool = False):
+    """Stream the agent's answer, repainting text and tool status as events arrive."""
+    status_placeholder = st.empty()
+    text_placeholder = st.empty()
+    status_placeholder.caption("🤔 Native agent planning your query...")
+    last_paint = [0.0]
+    paint_seconds = [0.0]
+    
+    def on_event(event, data, text):
+        if event == "response.status":
+            status_placeholder.caption(f"⏳ {data.get('message', data.get('status', 'Working...'))}")
+        elif event == "response.tool_use":
+            icon, kind = TOOL_KINDS.get(data.get("type"), TOOL_KINDS["generic"])
+            status_placeholder.caption(f"{icon} {kind}: {data.get('name', 'running tool')}...")
+        elif event == "response.text.delta":
+            # Throttle repaints so long answers don't flood the frontend
+            now = time.perf_counter()
+            if now - last_paint[0] >= STREAM_RENDER_INTERVAL:
+                text_placeholder.markdown(text + "▌")
+                last_paint[0] = time.perf_counter()
+                paint_seconds[0] += last_paint[0] - now
+    
+    result = attach_result_set(call_agent_streaming(user_query, thread_id, on_event=on_event,
+                                                    fresh_thread=fresh_thread))
+    
+    started = time.perf_counter()
+    text_placeholder.markdown(result.get("response", "I apologize, but I couldn't generate a response."))
+    record_latency("render_response", paint_seconds[0] + time.perf_counter() - started)
+    if result.get("tools_used"):
+        status_placeholder.caption("Tools used: " + ", ".join(
+            f"{TOOL_KINDS.get(tool['type'], TOOL_KINDS['generic'])[0]} {tool['name']}"
+            for tool in result["tools_used"]
+        ))
+    else:
+        status_placeholder.empty()
+    
+    return result
+
+
 def process_user_query(user_query: str):
     """Process user query through the native Cortex Agent."""
+    ensure_session()
     
     # Add user message to chat
     st.session_state.messages.append({
@@ -483,24 +3270,111 @@ def process_user_query(user_query: str):
     with st.chat_message("user"):
         st.markdown(user_query)
     
-    # Process query through agent
-    with st.chat_message("assistant"):
-        with st.spinner("🤔 Native agent analyzing and routing your query..."):
-            
-            # Create thread if needed
-            if st.session_state.thread_id is None:
-                st.session_state.thread_id = create_thread()
+    started = time.perf_counter()
+    first_in_thread = st.session_state.thread_id is None
+    trace = start_trace(user_query, st.session_state.get("session_id"))
+    result = None
+    try:
+        # Headline KPI questions are answered straight from the rollup tables
+        kpi_result = None
+        if KPI_FAST_PATH_ENABLED:
+            kpi_result = answer_kpi_question(user_query, st.session_state.session)
+        
+        # Check the shared response cache unless this is a thread-dependent follow-up
+        cache = get_response_cache()
+        cache_key = None
+        cached_result = None
+        if st.session_state.use_response_cache and kpi_result is None:
+            if is_follow_up(user_query, st.session_state.messages[:-1]):
+                cache.record_bypass()
+            else:
+                data_version = get_data_version(st.session_state.session)
+                cache_key = response_cache_key(user_query, data_version)
+                cached_result = cache.get(cache_key)
+                
+                # Fall back to a reworded question answered recently
+                if cached_result is None and SIMILAR_QUERY_CACHE_ENABLED:
+                    similar = get_similar_query_cache().get(user_query, data_version)
+                    if similar is not None:
+                        similar_result, matched_query, similarity = similar
+                        cached_result = dict(similar_result, cache_match={
+                            "query": matched_query,
+                            "similarity": similarity
+                        })
+        
+        # A thread about to pass the token budget is compacted: the question goes
+        # to a fresh thread, prefixed with a summary of the conversation so far
+        agent_query, compaction = user_query, None
+        uses_agent = kpi_result is None and cached_result is None
+        if uses_agent:
+            agent_query, compaction = st.session_state.context.prepare(user_query)
+            if compaction:
+                st.session_state.thread_id = None
+                st.session_state.pending_thread = prefetch_thread()
+                first_in_thread = True
+        
+        # Process query through agent
+        with st.chat_message("assistant"):
+            if kpi_result is not None:
+                # Answered from the rollups: no thread creation or agent call
+                result = kpi_result
+                response_text = result["response"]
+                with measure("render_response"):
+                    st.markdown(response_text)
+            elif cached_result is not None:
+                # Served from cache: no thread creation or agent call
+                result = dict(cached_result, cached=True)
+                response_text = result.get("response", "I apologize, but I couldn't generate a response.")
+                with measure("render_response"):
+                    st.markdown(response_text)
+            elif st.session_state.streaming:
+                # Stream the answer; rendering happens as events arrive
+                result = render_streaming_response(agent_query, ensure_thread(), fresh_thread=first_in_thread)
+                response_text = result.get("response", "I apologize, but I couldn't generate a response.")
+            else:
+                with st.spinner("🤔 Native agent analyzing and routing your query..."):
+                    
+                    # Call agent (on the prefetched thread for a new conversation)
+                    result = attach_result_set(call_agent(agent_query, ensure_thread(), fresh_thread=first_in_thread))
+                    
+                    # Display response
+                    response_text = result.get("response", "I apologize, but I couldn't generate a response.")
+                    with measure("render_response"):
+                        st.markdown(response_text)
             
-            # Call agent
-            result = call_agent(user_query, st.session_state.thread_id)
+            # Long Analyst results: first page now, the rest on demand
+            if result.get("result_set"):
+                render_result_set(result["result_set"], key="live")
             
             # Update thread_id if agent returned one
             if result.get("thread_id"):
                 st.session_state.thread_id = result["thread_id"]
             
-            # Display response
-            response_text = result.get("response", "I apologize, but I couldn't generate a response.")
-            st.markdown(response_text)
+            if first_in_thread and not result.get("cached") and not result.get("fast_path"):
+                record_latency("time_to_first_answer", time.perf_counter() - started, success=result.get("success", False))
+            
+            # Answers from the agent's thread add to its context; fast path and
+            # cached answers are sent to the thread with the next agent question
+            agent_answered = result.get("success") and not result.get("circuit_open") and not result.get("agent_error")
+            if uses_agent and agent_answered:
+                result["context"] = st.session_state.context.record(user_query, agent_query, result, compaction)
+            elif not uses_agent:
+                st.session_state.context.record_outside(user_query, result)
+            
+            # Spans are buffered and written in bulk; this never waits on the insert
+            finish_trace(trace, result, st.session_state.session)
+            if trace is not None:
+                result["trace_id"] = trace.trace_id
+            
+            # Cache successful agent answers (not SQL fallbacks) without their thread-specific fields
+            if cache_key is not None and cached_result is None and agent_answered:
+                cacheable = {
+                    key: value for key, value in result.items()
+                    if key not in ("thread_id", "timings", "trace_id", "context")
+                }
+                cache.put(cache_key, cacheable)
+                if SIMILAR_QUERY_CACHE_ENABLED:
+                    get_similar_query_cache().put(user_query, cache_key[1], cacheable)
             
             # Show debug panel if enabled
             if st.session_state.show_debug:
@@ -520,6 +3394,11 @@ def process_user_query(user_query: str):
             # Trim chat history if too long
             if len(st.session_state.messages) > MAX_CHAT_HISTORY:
                 st.session_state.messages = st.session_state.messages[-MAX_CHAT_HISTORY:]
+    finally:
+        # An exception must not leave this question's trace active on the thread
+        if trace is not None and getattr(_active_trace, "trace", None) is trace:
+            finish_trace(trace, result or {"success": False, "error": "Query processing failed"},
+                         st.session_state.session)
 
 
 # ========================================================================
@@ -536,28 +3415,24 @@ def main():
     render_header()
     
     # Render sidebar
-    render_sidebar()
+    stats_placeholder = render_sidebar()
     
     # Display welcome message
-    render_welcome_message()
+    welcome_placeholder = render_welcome_message()
     
-    # Display chat history
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
-            
-            # Show debug info if enabled and available
-            if (st.session_state.show_debug and 
-                message["role"] == "assistant" and 
-                "metadata" in message):
-                render_debug_panel(message["metadata"])
+    # Display chat history (windowed)
+    render_chat_history()
     
-    # Chat input
-    if prompt := st.chat_input("Ask me anything about RCM analytics, policies, or procedures..."):
+    # Chat input, or a sample question clicked on the previous run.
+    # The new turn is drawn in place below the history, so no rerun is needed.
+    prompt = st.chat_input("Ask me anything about RCM analytics, policies, or procedures...")
+    prompt = prompt or st.session_state.pop("pending_query", None)
+    if prompt:
+        welcome_placeholder.empty()
         process_user_query(prompt)
-        st.rerun()
     
-    # Sample questions (for first-time users)
+    # Sample questions (for first-time users); a click queues the question
+    # for the next run, where it goes through the chat flow above
     if len(st.session_state.messages) == 0:
         st.markdown("### 💡 Try These Sample Questions")
         
@@ -566,29 +3441,40 @@ def main():
         with col1:
             st.markdown("**📊 Analytics**")
             if st.button("Clean claim rate by provider?", use_container_width=True):
-                process_user_query("What is the clean claim rate by provider?")
+                st.session_state.pending_query = "What is the clean claim rate by provider?"
                 st.rerun()
             if st.button("Which payers have high denials?", use_container_width=True):
-                process_user_query("Which payers have the highest denial rates?")
+                st.session_state.pending_query = "Which payers have the highest denial rates?"
                 st.rerun()
         
         with col2:
             st.markdown("**📚 Knowledge Base**")
             if st.button("How to resolve Code 45?", use_container_width=True):
-                process_user_query("How do I resolve a Code 45 denial in ServiceNow?")
+                st.session_state.pending_query = "How do I resolve a Code 45 denial in ServiceNow?"
                 st.rerun()
             if st.button("HIPAA compliance requirements?", use_container_width=True):
-                process_user_query("Find our HIPAA compliance requirements for claims processing")
+                st.session_state.pending_query = "Find our HIPAA compliance requirements for claims processing"
                 st.rerun()
         
         with col3:
             st.markdown("**💬 General**")
             if st.button("What can you help with?", use_container_width=True):
-                process_user_query("What can you help me with?")
+                st.session_state.pending_query = "What can you help me with?"
                 st.rerun()
             if st.button("Explain RCM metrics", use_container_width=True):
-                process_user_query("Explain the key RCM metrics I should focus on")
+                st.session_state.pending_query = "Explain the key RCM metrics I should focus on"
                 st.rerun()
+    
+    # Session statistics last, so they include the query processed on this run
+    with stats_placeholder.container():
+        render_session_statistics()
+    
+    # After first paint: attach the session, and warm the warehouse and agent
+    # endpoint while the welcome screen is being read
+    if FAST_STARTUP_ENABLED:
+        session = ensure_session()
+        if len(st.session_state.messages) == 0:
+            get_startup_warmer().warm(session)
 
 
 # ========================================================================
@@ -0,0 +1,299 @@
+"""
+RCM Intelligence Hub - Local Document Index
+
+BM25 over rcm_parsed_content-shaped rows (relative_path, title, content),
+used by the app's SQL fallback to ground answers when the agent API is not
+available, and the offline baseline for the RCM_*_DOCS_SEARCH services.
+Saved indexes are memory-mapped, so loading one reads only a small header
+whatever the corpus size.
+
+Ships next to 08_streamlit_app.py, which imports it; tools/build_search_index.py
+writes the files DocumentIndex.load() reads.
+"""
+
+import array
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or our show the this "
+    "to we what when where which who why with you".split()
+)
+
+
+class DocumentIndex:
+    """
+    Inverted index with BM25 scoring and category filters.
+    
+    Rows are keyed by (relative_path, chunk_ordinal). A row's category is the
+    first path segment, like the search services' LIKE '/finance/%' filters.
+    A loaded file is an immutable base segment: add() and delete() go to an
+    in-memory delta and tombstones, and save() writes a compacted file.
+    """
+    
+    MAGIC = b"RCMBM25\x01"
+    # Name and array typecode of each section of the file, in file order
+    SECTIONS = (
+        ("doc_lengths", "I"), ("doc_ordinals", "I"), ("doc_categories", "H"),
+        ("path_offsets", "Q"), ("title_offsets", "Q"), ("content_offsets", "Q"),
+        ("term_offsets", "Q"), ("posting_offsets", "Q"), ("posting_docs", "I"), ("posting_tfs", "H"),
+        ("paths", "B"), ("titles", "B"), ("contents", "B"), ("terms", "B"),
+    )
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.categories = []  # Category id -> first path segment
+        self._base = {}  # Section name -> memoryview into the mapped file
+        self._base_docs = 0
+        self._base_terms = 0
+        self._mmap = None
+        self._added = []  # Delta rows: (relative_path, chunk_ordinal, title, content, category id, length)
+        self._added_postings = {}  # Term -> [(delta index, tf)]
+        self._deleted = set()  # Doc ids: base rows first, then base_docs + delta index
+        self._path_ids = None  # relative_path -> live doc ids, built on first add/delete
+        self._total_length = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def tokenize(text: str) -> list:
+        return [token for token in re.findall(r"[a-z0-9]+", (text or "").lower()) if token not in STOPWORDS]
+    
+    @staticmethod
+    def category_of(relative_path: str) -> str:
+        parts = relative_path.strip("/").split("/")
+        return parts[0] if len(parts) > 1 else ""
+    
+    @classmethod
+    def build(cls, rows, **kwargs):
+        """In-memory index over dicts with relative_path, title, content and optional chunk_ordinal."""
+        index = cls(**kwargs)
+        index.add(rows)
+        return index
+    
+    def __len__(self):
+        return self._base_docs + len(self._added) - len(self._deleted)
+    
+    # -- Incremental updates ------------------------------------------------
+    
+    def add(self, rows):
+        """Index rows. Each relative_path in rows replaces that path's existing rows."""
+        rows = list(rows)
+        with self._lock:
+            for path in {row["relative_path"] for row in rows}:
+                self._delete_path(path)
+            paths = self._path_lookup()
+            for row in rows:
+                path = row["relative_path"]
+                category = self.category_of(path)
+                if category not in self.categories:
+                    self.categories.append(category)
+                counts = {}
+                for token in self.tokenize(row.get("content")):
+                    counts[token] = counts.get(token, 0) + 1
+                length = sum(counts.values())
+                delta_index = len(self._added)
+                self._added.append((path, int(row.get("chunk_ordinal") or 0), row.get("title") or "",
+                                    row.get("content") or "", self.categories.index(category), length))
+                for term, tf in counts.items():
+                    self._added_postings.setdefault(term, []).append((delta_index, min(tf, 65535)))
+                paths.setdefault(path, []).append(self._base_docs + delta_index)
+                self._total_length += length
+    
+    def delete(self, relative_path: str) -> int:
+        """Remove every row of relative_path; returns how many were removed."""
+        with self._lock:
+            return self._delete_path(relative_path)
+    
+    def _delete_path(self, relative_path: str) -> int:
+        doc_ids = self._path_lookup().pop(relative_path, [])
+        for doc_id in doc_ids:
+            self._deleted.add(doc_id)
+            self._total_length -= self._doc_length(doc_id)
+        return len(doc_ids)
+    
+    def _path_lookup(self) -> dict:
+        if self._path_ids is None:
+            self._path_ids = {}
+            for doc_id in range(self._base_docs):
+                if doc_id not in self._deleted:
+                    self._path_ids.setdefault(self._base_text("paths", "path_offsets", doc_id), []).append(doc_id)
+        return self._path_ids
+    
+    # -- Row and posting access ---------------------------------------------
+    
+    def _base_text(self, blob: str, offsets: str, item: int) -> str:
+        starts = self._base[offsets]
+        return bytes(self._base[blob][starts[item]:starts[item + 1]]).decode("utf-8")
+    
+    def _find_term(self, term: str):
+        """Binary search of the base segment's sorted terms; returns the term id or None."""
+        key = term.encode("utf-8")
+        starts, terms = self._base["term_offsets"], self._base["terms"]
+        low, high = 0, self._base_terms
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(terms[starts[middle]:starts[middle + 1]]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._base_terms and bytes(terms[starts[low]:starts[low + 1]]) == key:
+            return low
+        return None
+    
+    def _postings(self, term: str):
+        """(doc id, tf) pairs for a term across the base segment and the delta, tombstones included."""
+        term_id = self._find_term(term) if self._base_terms else None
+        if term_id is not None:
+            start, end = self._base["posting_offsets"][term_id], self._base["posting_offsets"][term_id + 1]
+            yield from zip(self._base["posting_docs"][start:end], self._base["posting_tfs"][start:end])
+        for delta_index, tf in self._added_postings.get(term, ()):
+            yield self._base_docs + delta_index, tf
+    
+    def _doc_length(self, doc_id: int) -> int:
+        if doc_id < self._base_docs:
+            return self._base["doc_lengths"][doc_id]
+        return self._added[doc_id - self._base_docs][5]
+    
+    def _doc_category(self, doc_id: int) -> int:
+        if doc_id < self._base_docs:
+            return self._base["doc_categories"][doc_id]
+        return self._added[doc_id - self._base_docs][4]
+    
+    def document(self, doc_id: int) -> dict:
+        if doc_id < self._base_docs:
+            return {
+                "relative_path": self._base_text("paths", "path_offsets", doc_id),
+                "chunk_ordinal": self._base["doc_ordinals"][doc_id],
+                "title": self._base_text("titles", "title_offsets", doc_id),
+                "content": self._base_text("contents", "content_offsets", doc_id)
+            }
+        path, ordinal, title, content = self._added[doc_id - self._base_docs][:4]
+        return {"relative_path": path, "chunk_ordinal": ordinal, "title": title, "content": content}
+    
+    # -- Search -------------------------------------------------------------
+    
+    def search(self, query: str, limit: int = 5, categories=None) -> list:
+        """
+        Top rows by BM25 score, as document() dicts plus score.
+        
+        categories restricts results to path prefixes, e.g. ["finance"] or
+        ["/compliance/"].
+        """
+        with self._lock:
+            documents = len(self)
+            if not documents:
+                return []
+            average_length = self._total_length / documents or 1.0
+            allowed = None
+            if categories:
+                wanted = {category.strip("/") for category in categories}
+                allowed = {index for index, category in enumerate(self.categories) if category in wanted}
+            
+            scores = {}
+            for term in set(self.tokenize(query)):
+                postings = [(doc_id, tf) for doc_id, tf in self._postings(term) if doc_id not in self._deleted]
+                if not postings:
+                    continue
+                idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings:
+                    if allowed is not None and self._doc_category(doc_id) not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_length(doc_id) / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [dict(self.document(doc_id), score=score) for doc_id, score in top]
+    
+    # -- On-disk format -----------------------------------------------------
+    # MAGIC, u64 header length, JSON header (counts, categories, section
+    # offsets), then each SECTIONS array padded to 8 bytes. Arrays are in
+    # native byte order; load() refuses a file written with the other one.
+    
+    def save(self, path: str):
+        """Write the live rows (base minus deletes, plus delta) as a compacted index file."""
+        with self._lock:
+            live = [doc_id for doc_id in range(self._base_docs + len(self._added)) if doc_id not in self._deleted]
+            new_ids = {doc_id: new_id for new_id, doc_id in enumerate(live)}
+            arrays = {name: array.array(typecode) for name, typecode in self.SECTIONS}
+            blobs = {"paths": [], "titles": [], "contents": []}
+            for blob in ("path_offsets", "title_offsets", "content_offsets", "term_offsets", "posting_offsets"):
+                arrays[blob].append(0)
+            
+            for doc_id in live:
+                row = self.document(doc_id)
+                arrays["doc_lengths"].append(self._doc_length(doc_id))
+                arrays["doc_ordinals"].append(row["chunk_ordinal"])
+                arrays["doc_categories"].append(self._doc_category(doc_id))
+                for blob, offsets, key in (("paths", "path_offsets", "relative_path"),
+                                           ("titles", "title_offsets", "title"),
+                                           ("contents", "content_offsets", "content")):
+                    encoded = row[key].encode("utf-8")
+                    blobs[blob].append(encoded)
+                    arrays[offsets].append(arrays[offsets][-1] + len(encoded))
+            
+            terms = set(self._added_postings)
+            terms.update(self._base_text("terms", "term_offsets", term_id) for term_id in range(self._base_terms))
+            term_blob = []
+            for term in sorted(terms, key=lambda value: value.encode("utf-8")):
+                postings = [(new_ids[doc_id], tf) for doc_id, tf in self._postings(term) if doc_id in new_ids]
+                if not postings:
+                    continue
+                encoded = term.encode("utf-8")
+                term_blob.append(encoded)
+                arrays["term_offsets"].append(arrays["term_offsets"][-1] + len(encoded))
+                arrays["posting_docs"].extend(doc_id for doc_id, _ in postings)
+                arrays["posting_tfs"].extend(tf for _, tf in postings)
+                arrays["posting_offsets"].append(len(arrays["posting_docs"]))
+            
+            sections = {name: arrays[name].tobytes() for name, _ in self.SECTIONS if name not in blobs}
+            sections.update({name: b"".join(parts) for name, parts in blobs.items()})
+            sections["terms"] = b"".join(term_blob)
+            header = {"byteorder": sys.byteorder, "documents": len(live), "terms": len(term_blob),
+                      "total_length": self._total_length, "categories": self.categories,
+                      "k1": self.k1, "b": self.b, "sections": {}}
+            offset = 0
+            for name, _ in self.SECTIONS:
+                header["sections"][name] = [offset, len(sections[name])]
+                offset += len(sections[name]) + (-len(sections[name]) % 8)
+        
+        header_bytes = json.dumps(header).encode("utf-8")
+        header_bytes += b" " * (-len(header_bytes) % 8)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(self.MAGIC + len(header_bytes).to_bytes(8, "little") + header_bytes)
+            for name, _ in self.SECTIONS:
+                f.write(sections[name] + b"\0" * (-len(sections[name]) % 8))
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def load(cls, path: str):
+        """Memory-map an index written by save()."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:8] != cls.MAGIC:
+            mapped.close()
+            raise ValueError(f"{path} is not a document index file")
+        header_length = int.from_bytes(mapped[8:16], "little")
+        header = json.loads(mapped[16:16 + header_length])
+        if header["byteorder"] != sys.byteorder:
+            mapped.close()
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+        
+        index = cls(k1=header["k1"], b=header["b"])
+        index.categories = header["categories"]
+        index._mmap = mapped
+        index._base_docs = header["documents"]
+        index._base_terms = header["terms"]
+        index._total_length = header["total_length"]
+        data = memoryview(mapped)[16 + header_length:]
+        for name, typecode in cls.SECTIONS:
+            offset, size = header["sections"][name]
+            index._base[name] = data[offset:offset + size].cast(typecode)
+        return index
@@ -0,0 +1,23 @@
+"""
+Shared fixtures: the Streamlit app loaded as a module, outside `streamlit run`.
+
+Tests run against the same offline stand-ins the benchmarks use
+(tools/fake_snowflake.py, tools/local_session.py, tools/sql_udf_loader.py).
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.app_loader import load_app, silence_bare_mode_warnings
+
+
+@pytest.fixture
+def app():
+    """A freshly loaded app module; settings changed on it stay with the test."""
+    module = load_app()
+    silence_bare_mode_warnings()
+    return module
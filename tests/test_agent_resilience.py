@@ -0,0 +1,199 @@
+"""ResilientAgentClient and the circuit breaker against the fault-injecting fake backend."""
+
+import json
+import time
+
+import pytest
+
+from tools.fake_snowflake import FakeCortexSession, FakeSnowflakeBackend, FakeSnowflakeConfig
+
+QUESTION = "Which payers have the highest denial rates?"
+
+
+@pytest.fixture
+def client(app):
+    """A fresh agent client with short delays, installed as the app's shared client."""
+    app.RETRY_BASE_DELAY = 0.01
+    app.RETRY_MAX_DELAY = 0.05
+    app.CIRCUIT_RESET_SECONDS = 0.05
+    app.ADAPTIVE_TIMEOUT_MIN_SAMPLES = 3
+    app.THREAD_PREFETCH_ENABLED = False
+    client = app.ResilientAgentClient()
+    app.get_agent_client = lambda: client
+    return client
+
+
+def fake_backend(**overrides):
+    settings = dict(distribution="fixed", run_median=0.01, thread_median=0.01, seed=7)
+    settings.update(overrides)
+    return FakeSnowflakeBackend(FakeSnowflakeConfig(**settings))
+
+
+def run(client, backend, **kwargs):
+    return client.request(backend.send_snow_api_request, "run", {"query": QUESTION}, **kwargs)
+
+
+def test_breaker_opens_after_failures_then_half_opens_and_closes(app, client):
+    backend = fake_backend(error_rate=1.0)
+
+    for _ in range(app.CIRCUIT_FAILURE_THRESHOLD):
+        assert client.breaker.current() == "closed"
+        with pytest.raises(RuntimeError, match="HTTP 503"):
+            run(client, backend)
+    assert client.breaker.current() == "open"
+    assert client.breaker.opened == 1
+    assert not client.available()
+    assert client.stats()["short_circuited"] == 1
+
+    # After the reset period a single probe goes through; a failure reopens
+    time.sleep(app.CIRCUIT_RESET_SECONDS)
+    assert client.available()
+    assert client.breaker.current() == "half_open"
+    assert not client.available()
+    with pytest.raises(RuntimeError):
+        run(client, backend)
+    assert client.breaker.current() == "open"
+    assert client.breaker.opened == 2
+
+    # ...and a successful probe closes the circuit
+    time.sleep(app.CIRCUIT_RESET_SECONDS)
+    backend.config.error_rate = 0.0
+    assert client.available()
+    assert run(client, backend)["status"] == 200
+    assert client.breaker.current() == "closed"
+    assert client.available()
+
+
+def test_successes_in_the_window_keep_the_breaker_closed(app, client):
+    backend = fake_backend()
+    for _ in range(app.CIRCUIT_WINDOW):
+        run(client, backend)
+    backend.config.error_rate = 1.0
+    for _ in range(app.CIRCUIT_FAILURE_THRESHOLD):
+        with pytest.raises(RuntimeError):
+            run(client, backend)
+    # 5 failures out of the last 20 calls is not half of them
+    assert client.breaker.current() == "closed"
+
+
+def test_slow_request_is_hedged_and_the_second_copy_wins(app, client):
+    backend = fake_backend()
+    for _ in range(app.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+        run(client, backend)
+
+    def send(**kwargs):
+        # The primary stalls well past the observed p95; the duplicate does not
+        if json.loads(kwargs["body"]).get("thread_id") == "primary":
+            time.sleep(0.5)
+        return backend.send_snow_api_request(**kwargs)
+
+    started = time.perf_counter()
+    response = client.request(send, "run", {"query": QUESTION, "thread_id": "primary"},
+                              hedge_body=lambda: {"query": QUESTION, "thread_id": "spare"})
+    assert time.perf_counter() - started < 0.5
+    assert response["data"]["thread_id"] == "spare"
+
+    stats = client.stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+    assert stats["hedge_losers"] == 1
+    assert client.breaker.current() == "closed"
+
+
+def test_no_hedge_without_a_safe_duplicate(app, client):
+    backend = fake_backend()
+    for _ in range(app.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+        run(client, backend)
+    backend.config.run_median = 0.1
+
+    response = run(client, backend, hedge_body=lambda: None)
+    assert response["status"] == 200
+    assert client.stats()["hedges"] == 0
+
+
+def test_rate_limited_run_is_retried_with_backoff(app, client, monkeypatch):
+    backend = fake_backend(rate_limit_rate=1.0)
+    caps = []
+
+    def uniform(low, high):
+        caps.append(high)
+        if len(caps) == 2:
+            backend.config.rate_limit_rate = 0.0
+        return low
+
+    monkeypatch.setattr(app.random, "uniform", uniform)
+    response = run(client, backend)
+
+    assert response["status"] == 200
+    assert backend.calls["rate_limited"] == 2
+    assert backend.calls["run"] == 3
+    # Full jitter under an exponentially growing cap
+    assert caps == [app.RETRY_BASE_DELAY, app.RETRY_BASE_DELAY * 2]
+    stats = client.stats()
+    assert stats["rate_limited"] == 2
+    assert stats["retries"] == 2
+
+
+def test_rate_limited_run_gives_up_after_the_retry_budget(app, client):
+    backend = fake_backend(rate_limit_rate=1.0)
+    with pytest.raises(app.AgentRateLimited):
+        run(client, backend)
+    assert backend.calls["run"] == app.RETRY_ATTEMPTS
+
+
+def test_failed_run_is_not_retried(app, client):
+    backend = fake_backend(error_rate=1.0)
+    with pytest.raises(RuntimeError, match="HTTP 503"):
+        run(client, backend)
+    assert backend.calls["run"] == 1
+    assert client.stats()["retries"] == 0
+
+
+def test_open_breaker_routes_questions_to_the_sql_fallback(app, client):
+    backend = fake_backend(error_rate=1.0)
+    app.st.session_state.session = FakeCortexSession(FakeSnowflakeConfig(time_scale=0.001, seed=7))
+
+    with backend.installed():
+        for _ in range(app.CIRCUIT_FAILURE_THRESHOLD):
+            result = app.call_agent(QUESTION)
+            assert not result["success"]
+        assert client.breaker.current() == "open"
+        runs = backend.calls["run"]
+
+        result = app.call_agent(QUESTION)
+        streamed = app.call_agent_streaming(QUESTION)
+
+    assert backend.calls["run"] == runs
+    for answer in (result, streamed):
+        assert answer["success"]
+        assert answer["circuit_open"]
+        assert answer["response"]
+
+
+def test_failed_stream_falls_back_to_sql_and_counts_one_failure(app, client):
+    backend = fake_backend(error_rate=1.0)
+    app.st.session_state.session = FakeCortexSession(FakeSnowflakeConfig(time_scale=0.001, seed=7))
+
+    with backend.installed():
+        result = app.call_agent_streaming(QUESTION)
+
+    assert result["success"]
+    assert "HTTP 503" in result["agent_error"]
+    assert not result.get("circuit_open")
+    assert list(client.breaker._outcomes) == [False]
+
+
+def test_stream_is_read_from_the_buffered_event_array(app, client):
+    backend = fake_backend()
+    events = []
+
+    with backend.installed():
+        result = app.call_agent_streaming(QUESTION, on_event=lambda event, data, text: events.append(event))
+
+    assert result["success"]
+    assert result["response"].startswith("Based on the claims processing data")
+    assert result["thread_id"]
+    assert [tool["type"] for tool in result["tools_used"]] == ["cortex_analyst_text_to_sql"]
+    assert "response.text.delta" in events
+    assert list(client.breaker._outcomes) == [True]
+    assert client.stats()["stream"] == 1
@@ -0,0 +1,86 @@
+"""KPI fast path: which questions are answered from the rollups, and with what."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from tools.local_session import LocalSession, build_local_session, load_dimensions, load_facts
+
+KPI_QUESTIONS = Path(__file__).resolve().parents[1] / "benchmarks" / "data" / "kpi_questions.jsonl"
+
+
+def load_questions():
+    with open(KPI_QUESTIONS) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+ROUTED = [item for item in load_questions() if item["route"] is not None]
+FALL_THROUGH = [item["question"] for item in load_questions() if item["route"] is None]
+
+
+@pytest.fixture(scope="module")
+def session():
+    return build_local_session(5_000, seed=42)
+
+
+@pytest.mark.parametrize("item", ROUTED, ids=lambda item: item["question"])
+def test_kpi_question_routes_to_its_rollup(app, item):
+    route = app.route_kpi_question(item["question"])
+    assert route is not None
+    assert {"metric": route["metric"], "dimension": route["dimension"]} == item["route"]
+
+
+@pytest.mark.parametrize("question", FALL_THROUGH)
+def test_other_questions_fall_through_to_the_agent(app, session, question):
+    assert app.route_kpi_question(question) is None
+    assert app.answer_kpi_question(question, session) is None
+
+
+def test_sort_order_and_limit(app):
+    assert app.route_kpi_question("Top 3 payers by denial rate") == {
+        "metric": "denial_rate", "dimension": "payer", "descending": True, "limit": 3
+    }
+    route = app.route_kpi_question("Which providers have the lowest clean claim rate?")
+    assert not route["descending"]
+    assert route["limit"] == app.KPI_RESULT_LIMIT
+
+
+def test_routed_answer_matches_the_fact_tables(app, session):
+    result = app.answer_kpi_question("Which payers have the highest denial rates?", session)
+
+    assert result["success"]
+    assert result["usage"]["total_tokens"] == 0
+    assert result["fast_path"]["table"] == app.KPI_METRICS["denial_rate"]["table"]
+    assert result["fast_path"]["rows"] > 0
+
+    expected = {
+        row["LABEL"]: row["VALUE"] for row in session.sql("""
+            SELECT p.payer_name AS label,
+                   ROUND(COUNT(CASE WHEN c.denial_flag THEN 1 END) * 100.0 / COUNT(*), 1) AS value
+            FROM claims_fact c JOIN payers_dim p ON p.payer_key = c.payer_key
+            GROUP BY 1
+        """).collect()
+    }
+    rows = session.sql(app.kpi_query(app.route_kpi_question("Which payers have the highest denial rates?"))).collect()
+    values = [row["VALUE"] for row in rows]
+    assert values == sorted(values, reverse=True)
+    for row in rows:
+        assert row["VALUE"] == pytest.approx(expected[row["LABEL"]], abs=0.051)
+        assert f"| {row['LABEL']} | {row['VALUE']:,.1f}% |" in result["response"]
+
+
+def test_overall_metric_is_one_line(app, session):
+    result = app.answer_kpi_question("What's our clean claim rate?", session)
+    assert result["fast_path"]["rows"] == 1
+    assert result["response"].startswith(f"**{app.KPI_METRICS['clean_claim_rate']['label']}**: ")
+    assert "across 5,000 claims" in result["response"]
+
+
+def test_missing_rollups_leave_the_question_to_the_agent(app):
+    session = LocalSession()
+    load_dimensions(session)
+    load_facts(session, 500)
+
+    assert app.route_kpi_question("Which payers have the highest denial rates?") is not None
+    assert app.answer_kpi_question("Which payers have the highest denial rates?", session) is None
@@ -0,0 +1,91 @@
+"""REFRESH_KPI_ROLLUPS(): the signed-delta MERGE must agree with a full recompute."""
+
+import pytest
+
+from tools.local_session import (
+    ROLLUP_TABLES, LocalSession, load_dimensions, load_facts, merge_kpi_deltas, refresh_kpi_rollups,
+    track_fact_changes,
+)
+
+
+@pytest.fixture
+def session():
+    session = LocalSession()
+    load_dimensions(session)
+    load_facts(session, 3_000, seed=42)
+    track_fact_changes(session)
+    return session
+
+
+def snapshot(session):
+    """Every rollup row in group order; amounts compare to the cent (float sums differ in order)."""
+    tables = {}
+    for table, columns in ROLLUP_TABLES.items():
+        rows = session.connection.execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall()
+        tables[table] = [
+            tuple(pytest.approx(value, abs=0.01) if isinstance(value, float) else value for value in row)
+            for row in sorted(rows)
+        ]
+    return tables
+
+
+def assert_matches_full_recompute(session):
+    merge_kpi_deltas(session)
+    incremental = snapshot(session)
+    refresh_kpi_rollups(session)
+    assert incremental == snapshot(session)
+    assert all(incremental.values())
+
+
+def test_initial_rows_load_the_rollups(session):
+    assert_matches_full_recompute(session)
+
+
+def test_inserts_updates_and_deletes_are_merged(session):
+    merge_kpi_deltas(session)
+
+    load_facts(session, 1_000, seed=7)
+    assert_matches_full_recompute(session)
+
+    # Updates that flip flags, change amounts and move claims between groups
+    session.connection.execute("""
+        UPDATE claims_fact
+        SET denial_flag = 1 - denial_flag, clean_claim_flag = 1 - clean_claim_flag,
+            paid_amount = ROUND(paid_amount * 0.5, 2), days_to_payment = NULL
+        WHERE rowid % 7 = 0
+    """)
+    session.connection.execute("""
+        UPDATE claims_fact SET payer_key = 1 + payer_key % 5, submission_date = '2025-01-15'
+        WHERE rowid % 11 = 0
+    """)
+    session.connection.execute("""
+        UPDATE denials_fact SET appeal_outcome = 'Approved', recovered_amount = denied_amount
+        WHERE rowid % 5 = 0
+    """)
+    assert_matches_full_recompute(session)
+
+    session.connection.execute("DELETE FROM claims_fact WHERE rowid % 3 = 0")
+    session.connection.execute("DELETE FROM denials_fact WHERE rowid % 4 = 0")
+    assert_matches_full_recompute(session)
+
+
+def test_groups_with_every_row_deleted_are_dropped(session):
+    merge_kpi_deltas(session)
+    payer_key, = session.connection.execute("SELECT payer_key FROM claims_fact LIMIT 1").fetchone()
+
+    session.connection.execute("DELETE FROM claims_fact WHERE payer_key = ?", (payer_key,))
+    session.connection.execute("DELETE FROM denials_fact WHERE payer_key = ?", (payer_key,))
+    assert_matches_full_recompute(session)
+    assert not session.connection.execute(
+        "SELECT COUNT(*) FROM claims_kpi_rollup WHERE payer_key = ?", (payer_key,)).fetchone()[0]
+
+
+def test_changes_cancelling_out_leave_the_rollups_unchanged(session):
+    merge_kpi_deltas(session)
+    before = snapshot(session)
+
+    session.connection.execute("UPDATE claims_fact SET denial_flag = 1 - denial_flag WHERE rowid % 2 = 0")
+    session.connection.execute("UPDATE claims_fact SET denial_flag = 1 - denial_flag WHERE rowid % 2 = 0")
+    merge_kpi_deltas(session)
+    assert snapshot(session) == before
+    assert not session.connection.execute("SELECT COUNT(*) FROM claims_fact_kpi_stream").fetchone()[0]
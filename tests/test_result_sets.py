@@ -0,0 +1,128 @@
+"""Paged result sets: ResultSetStore over the local stand-in session."""
+
+import pytest
+
+import tools.local_session
+from tools.local_session import build_local_session
+
+CLAIMS = 3_000
+PAGE_ROWS = 70
+SQL = "SELECT claim_id, payer_key, charge_amount FROM claims_fact ORDER BY claim_id"
+
+
+@pytest.fixture(scope="module")
+def session():
+    return build_local_session(CLAIMS, seed=42)
+
+
+@pytest.fixture
+def expected(session):
+    return session.sql(SQL).to_pandas()
+
+
+@pytest.fixture
+def store(app, monkeypatch):
+    # Batches that don't line up with pages
+    monkeypatch.setattr(tools.local_session, "BATCH_ROWS", 250)
+    return app.ResultSetStore(max_rows=10_000, max_readers=2)
+
+
+def handle(result_id="claims", sql=SQL, rows=None):
+    return {"result_id": result_id, "sql": sql, "query_id": None, "rows": rows, "page_rows": PAGE_ROWS}
+
+
+def assert_page(frame, expected, number):
+    rows = expected.iloc[number * PAGE_ROWS:(number + 1) * PAGE_ROWS].reset_index(drop=True)
+    assert frame.reset_index(drop=True).equals(rows)
+
+
+def test_paging_forward_returns_every_row_and_the_total(session, store, expected):
+    result = handle()
+    pages = -(-CLAIMS // PAGE_ROWS)
+
+    for number in range(pages):
+        assert result["rows"] is None
+        assert_page(store.page(session, result, number), expected, number)
+    assert result["rows"] == CLAIMS
+    assert store.page(session, result, pages).empty
+
+    stats = store.stats()
+    assert stats["queries"] == 1
+    assert stats["batch_pages"] == pages
+    assert stats["scan_pages"] == 1  # Only the page past the end
+
+
+def test_jumps_and_revisits_read_the_query_result(session, store, expected):
+    result = handle()
+    assert_page(store.page(session, result, 0), expected, 0)
+    assert_page(store.page(session, result, 30), expected, 30)
+    assert_page(store.page(session, result, 1), expected, 1)
+    assert_page(store.page(session, result, 0), expected, 0)
+
+    last = CLAIMS // PAGE_ROWS
+    assert len(store.page(session, result, last)) == CLAIMS % PAGE_ROWS
+    assert result["rows"] == CLAIMS
+
+    stats = store.stats()
+    assert stats["queries"] == 1
+    assert stats["cache_hits"] == 1
+    assert stats["scan_pages"] == 2
+
+
+def test_expired_result_runs_the_select_again(session, store, expected):
+    result = handle()
+    store.page(session, result, 0)
+    first_query = result["query_id"]
+    session.results.pop(first_query)  # RESULT_SCAN no longer finds it
+
+    assert_page(store.page(session, result, 5), expected, 5)
+    assert result["query_id"] != first_query
+    assert store.stats()["queries"] == 2
+
+
+def test_sql_that_is_not_a_single_select_is_never_run(app, session, store):
+    before = session.sql("SELECT COUNT(*) AS n FROM claims_fact").collect()[0]["N"]
+
+    for sql in ("DELETE FROM claims_fact", f"{SQL}; DELETE FROM claims_fact",
+                "INSERT INTO claims_fact SELECT * FROM claims_fact", "CALL REFRESH_KPI_ROLLUPS()"):
+        with pytest.raises(ValueError, match="not a single SELECT"):
+            store.page(session, handle("bad", sql), 0)
+
+    assert session.sql("SELECT COUNT(*) AS n FROM claims_fact").collect()[0]["N"] == before
+    assert store.stats()["queries"] == 0
+    assert store.stats()["locks"] == 0
+
+
+@pytest.mark.parametrize("sql, read_only", [
+    (SQL, True),
+    ("-- latest first\nWITH d AS (SELECT * FROM denials_fact) SELECT * FROM d;", True),
+    ("SELECT 'a; DELETE FROM claims_fact' AS note", True),
+    ("(SELECT 1) UNION ALL (SELECT 2)", True),
+    ("SELECT last_update_date FROM claims_fact", True),
+    ("DELETE FROM claims_fact", False),
+    ("SELECT 1; DROP TABLE claims_fact", False),
+    ("CREATE TABLE t AS SELECT * FROM claims_fact", False),
+    ("CALL refresh_kpi_rollups()", False),
+    ("", False),
+    (None, False),
+])
+def test_is_read_only_sql(app, sql, read_only):
+    assert app.is_read_only_sql(sql) is read_only
+
+
+def test_only_read_only_analyst_sql_becomes_a_result_set(app):
+    def answer(sql):
+        return {
+            "success": True,
+            "response": "Denied claims:\n\n| CLAIM_ID |\n|---|\n" + "| CLM1 |\n" * 40,
+            "tools_used": [{"type": "cortex_analyst_text_to_sql", "name": "analyst", "sql": sql, "rows": 40}],
+        }
+
+    result = app.attach_result_set(answer(SQL))
+    assert result["result_set"]["sql"] == SQL
+    assert result["result_set"]["rows"] == 40
+    assert "| CLM1 |" not in result["response"]
+
+    refused = app.attach_result_set(answer("DELETE FROM claims_fact"))
+    assert "result_set" not in refused
+    assert "| CLM1 |" in refused["response"]
@@ -0,0 +1,88 @@
+"""scrape_healthcare_pages (setup/06_rcm_agent_setup.sql) against a local bulletin site."""
+
+import pytest
+
+from benchmarks.bench_scrape_pages import BulletinSite, run_batch, start_site
+from tools.sql_udf_loader import exec_udf
+
+SQL_FILE = "06_rcm_agent_setup.sql"
+
+
+@pytest.fixture(scope="module")
+def udtf():
+    return exec_udf(SQL_FILE, "scrape_healthcare_pages")
+
+
+def serve(pages, page_kb):
+    site = BulletinSite(pages=pages, page_kb=page_kb, latency=0.0, seed=7)
+    server, base_url = start_site(site)
+    site.urls = [f"{base_url}/bulletin/{index}" for index in range(site.pages)]
+    return site, server
+
+
+@pytest.fixture
+def site():
+    site, server = serve(pages=6, page_kb=64)
+    yield site
+    server.shutdown()
+
+
+@pytest.fixture
+def large_page():
+    site, server = serve(pages=1, page_kb=2048)
+    yield site
+    server.shutdown()
+
+
+def test_conditional_get_reuses_the_cached_row(udtf, site):
+    cold = run_batch(udtf["ScrapeHealthcarePages"], [(url, None, None, 2000) for url in site.urls])
+    assert [row[1] for row in cold] == ["fetched"] * site.pages
+    assert all(row[3] == site.etag(index) and row[4] == site.last_modified(index) for index, row in enumerate(cold))
+
+    site.update(0.5)
+    changed = {index for index in range(site.pages) if site.versions[index] > 1}
+    site.reset_counters()
+    warm = run_batch(udtf["ScrapeHealthcarePages"], [(url, etag, last_modified, 2000)
+                                                    for url, _, _, etag, last_modified, *_ in cold])
+
+    assert site.counters["not_modified"] == site.pages - len(changed)
+    for index, (row, previous) in enumerate(zip(warm, cold)):
+        url, status, http_status, etag, last_modified, content, error, _ = row
+        assert url == previous[0]
+        assert error is None
+        if index in changed:
+            assert (status, http_status, etag) == ("fetched", 200, site.etag(index))
+            assert f"rev {site.versions[index]}" in content
+        else:
+            # refresh_healthcare_pages keeps the stored content and validators for these
+            assert (status, http_status, content) == ("not_modified", 304, None)
+            assert (etag, last_modified) == previous[3:5]
+
+
+def test_text_is_truncated_at_max_chars_and_the_download_stops(udtf, large_page):
+    rows = run_batch(udtf["ScrapeHealthcarePages"], [(large_page.urls[0], None, None, 500)])
+    content = rows[0][5]
+    served = large_page.counters["bytes"]
+
+    assert rows[0][1] == "fetched"
+    assert len(content) == 500
+    assert content.startswith("Payer Bulletin 0 (rev 1)")
+    assert "<" not in content and "window.analytics" not in content
+    scrape_one = exec_udf(SQL_FILE, "scrape_healthcare_data")["scrape_healthcare_data"]
+    assert content == scrape_one(large_page.urls[0])[:500]
+    # The client stopped reading long before the end of the 2 MB page
+    assert served < len(large_page.bodies[0]) / 4
+
+
+def test_text_matches_the_scalar_scraper(udtf, site):
+    scrape_one = exec_udf(SQL_FILE, "scrape_healthcare_data")["scrape_healthcare_data"]
+    rows = run_batch(udtf["ScrapeHealthcarePages"], [(url, None, None, 10000) for url in site.urls])
+    assert [row[5] for row in rows] == [scrape_one(url) for url in site.urls]
+
+
+def test_missing_page_is_an_error_row(udtf, site):
+    url = site.urls[0].rsplit("/", 1)[0] + "/missing"
+    row, = run_batch(udtf["ScrapeHealthcarePages"], [(url, '"old"', None, None)])
+    assert row[1:4] == ("error", 404, '"old"')
+    assert row[5] is None
+    assert row[6].startswith("Error scraping healthcare data: 404")
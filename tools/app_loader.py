@@ -0,0 +1,41 @@
+"""
+Load setup/08_streamlit_app.py as an importable module.
+
+The app's main file name starts with a digit, so benchmarks and tools load
+it by path instead of importing it. setup/ goes on sys.path first, as
+`streamlit run` does for the main file's directory, so the modules shipped
+next to it (rcm_document_index.py) import. Loading runs the module body (page
+config, constants) but not main().
+"""
+
+import importlib.util
+import logging
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+APP_PATH = REPO_ROOT / "setup" / "08_streamlit_app.py"
+
+
+def load_app(module_name: str = "rcm_streamlit_app"):
+    """Import the Streamlit app module from setup/08_streamlit_app.py."""
+    if str(APP_PATH.parent) not in sys.path:
+        sys.path.insert(0, str(APP_PATH.parent))
+    spec = importlib.util.spec_from_file_location(module_name, APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def silence_bare_mode_warnings():
+    """
+    Mute Streamlit's "missing ScriptRunContext" warnings.
+
+    Calling app functions from worker threads outside `streamlit run` logs one
+    per st.* access, which drowns benchmark output.
+    """
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+    # The AppTest harness resets log levels on every run
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
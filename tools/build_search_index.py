@@ -0,0 +1,79 @@
+"""
+RCM Intelligence Hub - Local Search Index Builder
+
+Builds the memory-mapped BM25 index the app's SQL fallback reads when
+RCM_LOCAL_INDEX points at it. Documents are split with CHUNK_RCM_DOCUMENT
+(executed from setup/05_rcm_cortex_search.sql), so rows match
+rcm_document_chunks.
+
+Sources are the documents inserted by 02_rcm_documents_setup.sql plus any
+change files from tools/ingest_documents.py. With --update, the existing
+index is loaded and only the change files are applied: upserts replace a
+path's chunks, deletes remove them.
+
+Usage:
+    python tools/build_search_index.py --documents data/documents/rcm_document_changes.csv
+    python tools/build_search_index.py --update --documents data/documents/rcm_document_changes.csv
+    RCM_LOCAL_INDEX=data/search_index.bm25 streamlit run setup/08_streamlit_app.py
+"""
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.app_loader import load_app, silence_bare_mode_warnings
+from tools.document_corpus import load_document_changes, load_setup_documents
+from tools.sql_udf_loader import exec_udf
+
+
+def chunk_rows(documents, chunker):
+    """rcm_document_chunks rows for (document_path, document_title, document_type, content) tuples."""
+    return [{"relative_path": path, "chunk_ordinal": ordinal, "title": title, "content": chunk}
+            for path, title, _, content in documents
+            for ordinal, _, chunk, _ in chunker().process(content)]
+
+
+def deleted_paths(path):
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row["document_path"] for row in csv.DictReader(f) if row["change_type"] == "delete"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", nargs="*", default=[], help="ingest_documents.py change files")
+    parser.add_argument("--index", type=Path, default=Path("data/search_index.bm25"))
+    parser.add_argument("--update", action="store_true", help="Apply the change files to the existing index")
+    args = parser.parse_args()
+
+    app = load_app()
+    silence_bare_mode_warnings()
+    chunker = exec_udf("05_rcm_cortex_search.sql", "CHUNK_RCM_DOCUMENT")["ChunkRcmDocument"]
+    started = time.perf_counter()
+
+    if args.update:
+        index = app.DocumentIndex.load(str(args.index))
+        documents = []
+    else:
+        index = app.DocumentIndex()
+        documents = load_setup_documents()
+    deletes = 0
+    for path in args.documents:
+        documents.extend(load_document_changes(path))
+        deletes += sum(index.delete(document_path) for document_path in deleted_paths(path))
+    rows = chunk_rows(documents, chunker)
+    index.add(rows)
+
+    args.index.parent.mkdir(parents=True, exist_ok=True)
+    index.save(str(args.index))
+    print(f"Indexed {len(rows)} chunks from {len(documents)} documents, removed {deletes} chunks; "
+          f"{len(index)} chunks in {args.index} ({args.index.stat().st_size / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Load the rcm_document_content corpus outside Snowflake.
+
+Two sources, both yielding (document_path, document_title, document_type,
+content) tuples:
+- the hand-written documents inserted by setup/02_rcm_documents_setup.sql,
+  parsed from its INSERT literals
+- change files written by tools/ingest_documents.py (upserts only)
+"""
+
+import csv
+import re
+import sys
+
+from tools.sql_udf_loader import SETUP_DIR
+
+DOCUMENTS_SQL = "02_rcm_documents_setup.sql"
+_LITERAL = r"'((?:[^']|'')*)'"
+_ROW_PATTERN = re.compile(r"\(" + r",\s*".join([_LITERAL] * 4) + r"\)", re.DOTALL)
+
+
+def load_setup_documents():
+    """Rows of the INSERT INTO rcm_document_content statements in 02."""
+    sql = (SETUP_DIR / DOCUMENTS_SQL).read_text()
+    return [tuple(value.replace("''", "'") for value in row)
+            for row in _ROW_PATTERN.findall(sql) if row[0].startswith("/")]
+
+
+def load_document_changes(path):
+    """Upserted rows from an ingest_documents.py change file."""
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["document_path"], row["document_title"], row["document_type"], row["content"])
+                for row in csv.DictReader(f) if row["change_type"] == "upsert"]
@@ -0,0 +1,338 @@
+"""
+RCM Intelligence Hub - Fake Cortex Agent Endpoint
+
+Local stand-in for the Cortex Agent REST API so the Streamlit app's streaming
+path can be exercised and timed without a Snowflake account.
+
+Serves:
+- GET  .../agents/<name>          -> {"name": "<name>"} (the app's warm-up ping)
+- POST .../agents/<name>/threads  -> {"thread_id": "..."}
+- POST .../agents/<name>:run      -> SSE stream when the body has "stream": true,
+                                     otherwise a single JSON response in the
+                                     shape call_agent() expects
+
+The SSE stream follows the agent :run event names (response.status,
+response.tool_use, response.tool_result, response.text.delta, response,
+metadata) with configurable planning, tool and per-token delays. Cortex
+Analyst tool results carry the generated SQL as JSON content, and claim-level
+list questions get an answer with a long markdown table, so the app's result
+set mode can run the SQL against tools/local_session.py.
+
+Usage:
+    python tools/fake_agent_server.py --port 8765
+    CORTEX_AGENT_HOST=http://127.0.0.1:8765 streamlit run setup/08_streamlit_app.py
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned answers keyed by the tool the fake agent "routes" to
+ANALYST_ANSWER = (
+    "Based on the claims processing data, **Medicaid (Illinois)** has the highest "
+    "denial rate at 18.4%, followed by **Self-Pay** at 16.9% and **Humana** at 15.2%. "
+    "CO-16 (missing information) and CO-50 (non-covered service) account for most of "
+    "the Medicaid denials. I recommend prioritizing front-end eligibility checks and "
+    "documentation review for these payers."
+)
+SEARCH_ANSWER = (
+    "Per the **Denial Management Policy** (/finance/Denial_Management_Policy.md), "
+    "first level appeals must be filed within 30 days, second level appeals within "
+    "60 days, and external reviews within 180 days. Review the CARC code, gather "
+    "supporting documentation, and track the appeal status in ServiceNow."
+)
+
+CLAIM_LIST_ROWS = 40
+CLAIM_LIST_ANSWER = (
+    "Here are the denied claims for **Medicaid (Illinois)**, most recent first:\n\n"
+    "| CLAIM_ID | SUBMISSION_DATE | PROVIDER_NAME | CHARGE_AMOUNT | PAID_AMOUNT | CLAIM_STATUS |\n"
+    "|---|---|---|---|---|---|\n"
+    + "".join(
+        f"| CLM{9_000_000 - i:010d} | 2025-12-{31 - i % 28:02d} | Northwestern Memorial Hospital "
+        f"| {1250 + 37 * i:.2f} | 0.00 | Denied |\n"
+        for i in range(CLAIM_LIST_ROWS)
+    )
+    + "\nMost were denied for missing information (CO-16); resubmitting with complete "
+    "documentation is the fastest recovery path."
+)
+
+# SQL the fake Cortex Analyst reports for each answer
+ANALYST_SQL = (
+    "SELECT p.payer_name, ROUND(COUNT(CASE WHEN c.denial_flag THEN 1 END) * 100.0 / COUNT(*), 1) AS denial_rate\n"
+    "FROM RCM_AI_DEMO.RCM_SCHEMA.claims_fact c\n"
+    "JOIN RCM_AI_DEMO.RCM_SCHEMA.payers_dim p ON c.payer_key = p.payer_key\n"
+    "GROUP BY p.payer_name\n"
+    "ORDER BY denial_rate DESC"
+)
+CLAIM_LIST_SQL = (
+    "SELECT c.claim_id, c.submission_date, pr.provider_name, c.charge_amount, c.paid_amount, c.claim_status\n"
+    "FROM RCM_AI_DEMO.RCM_SCHEMA.claims_fact c\n"
+    "JOIN RCM_AI_DEMO.RCM_SCHEMA.payers_dim p ON c.payer_key = p.payer_key\n"
+    "JOIN RCM_AI_DEMO.RCM_SCHEMA.healthcare_providers_dim pr ON c.provider_key = pr.provider_key\n"
+    "WHERE p.payer_name = 'Medicaid (Illinois)' AND c.denial_flag\n"
+    "ORDER BY c.submission_date DESC, c.claim_id DESC"
+)
+
+SEARCH_KEYWORDS = ("how do i", "how to", "policy", "procedure", "find", "guideline", "requirement", "hipaa")
+CLAIM_LIST_KEYWORDS = ("list ", "claim-level", "denied claims for", "every claim")
+
+
+class FakeAgentConfig:
+    """Latency profile for the fake agent endpoint (all values in seconds)."""
+
+    def __init__(self, planning_delay=0.3, tool_delay=0.5, token_delay=0.02, tokens_per_delta=3):
+        self.planning_delay = planning_delay
+        self.tool_delay = tool_delay
+        self.token_delay = token_delay
+        self.tokens_per_delta = tokens_per_delta
+
+
+def route_query(query: str):
+    """Pick the tool the fake agent pretends to call, mirroring the orchestration rules."""
+    query_lower = query.lower()
+    if any(keyword in query_lower for keyword in SEARCH_KEYWORDS):
+        return {
+            "type": "cortex_search",
+            "name": "Search RCM Financial Documents",
+            "answer": SEARCH_ANSWER
+        }
+    if any(keyword in query_lower for keyword in CLAIM_LIST_KEYWORDS):
+        return {
+            "type": "cortex_analyst_text_to_sql",
+            "name": "Analyze Claims Processing Data",
+            "answer": CLAIM_LIST_ANSWER,
+            "sql": CLAIM_LIST_SQL
+        }
+    return {
+        "type": "cortex_analyst_text_to_sql",
+        "name": "Analyze Claims Processing Data",
+        "answer": ANALYST_ANSWER,
+        "sql": ANALYST_SQL
+    }
+
+
+def tool_result_content(tool):
+    """JSON content of a tool result: the generated SQL for Cortex Analyst, else nothing."""
+    return [{"type": "json", "json": {"sql": tool["sql"]}}] if tool.get("sql") else []
+
+
+def build_events(query: str, thread_id: str = None):
+    """
+    Build the (event, data, delay_kind) sequence for one :run call.
+
+    delay_kind is "planning", "tool", "token" or None and is resolved against a
+    FakeAgentConfig by the server before each event is written.
+    """
+    tool = route_query(query)
+    tool_use_id = f"toolu_{uuid.uuid4().hex[:12]}"
+    words = tool["answer"].split(" ")
+    prompt_tokens = 1200 + len(query) // 4
+    completion_tokens = len(words)
+
+    events = [
+        ("response.status", {"status": "planning", "message": "Planning the next steps"}, "planning"),
+        ("response.tool_use", {
+            "content_index": 0,
+            "tool_use_id": tool_use_id,
+            "type": tool["type"],
+            "name": tool["name"],
+            "input": {"query": query}
+        }, None),
+        ("response.status", {"status": "executing_tool", "message": f"Running {tool['name']}"}, "tool"),
+        ("response.tool_result", {
+            "content_index": 1,
+            "tool_use_id": tool_use_id,
+            "type": tool["type"],
+            "name": tool["name"],
+            "status": "success",
+            "content": tool_result_content(tool)
+        }, None),
+        ("response.status", {"status": "proceeding_to_answer", "message": "Generating the response"}, None),
+    ]
+
+    return events, words, {
+        "model": "auto",
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        },
+        "thread_id": thread_id or str(uuid.uuid4()),
+        "tool": tool,
+        "tool_use_id": tool_use_id
+    }
+
+
+def message_content(final):
+    """Content items of a blocking :run answer: the tool call, its result, then the text."""
+    tool = final["tool"]
+    return [
+        {"type": "tool_use", "tool_use": {
+            "tool_use_id": final["tool_use_id"], "type": tool["type"], "name": tool["name"]
+        }},
+        {"type": "tool_results", "tool_results": {
+            "tool_use_id": final["tool_use_id"], "name": tool["name"], "status": "success",
+            "content": tool_result_content(tool)
+        }},
+        {"type": "text", "text": tool["answer"]},
+    ]
+
+
+def stream_events(events, words, final, tokens_per_delta=3):
+    """
+    The whole (event, data, delay_kind) stream of a :run call: the events from
+    build_events(), the answer as text deltas of tokens_per_delta words, then
+    the aggregated response, the thread metadata and the [DONE] marker.
+    """
+    yield from events
+
+    step = max(tokens_per_delta, 1)
+    for index in range(0, len(words), step):
+        text = " ".join(words[index:index + step])
+        if index + step < len(words):
+            text += " "
+        yield "response.text.delta", {"content_index": 2, "text": text}, "token"
+
+    yield "response", {
+        "role": "assistant",
+        "model": final["model"],
+        "usage": final["usage"],
+        "content": [{"type": "text", "text": final["tool"]["answer"]}]
+    }, None
+    yield "metadata", {"metadata": {"thread_id": final["thread_id"], "role": "assistant"}}, None
+    yield "done", "[DONE]", None
+
+
+class FakeAgentHandler(BaseHTTPRequestHandler):
+    """Request handler implementing the thread and :run endpoints."""
+
+    protocol_version = "HTTP/1.1"
+    config = FakeAgentConfig()
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b"{}"
+        try:
+            return json.loads(body or b"{}")
+        except ValueError:
+            return {}
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_event(self, event, data):
+        payload = data if isinstance(data, str) else json.dumps(data)
+        chunk = f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+        # Chunked transfer encoding so the client sees each event immediately
+        self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+        self.wfile.flush()
+
+    def _sleep(self, delay_kind):
+        delay = {
+            "planning": self.config.planning_delay,
+            "tool": self.config.tool_delay,
+            "token": self.config.token_delay,
+        }.get(delay_kind, 0)
+        if delay:
+            time.sleep(delay)
+
+    def do_GET(self):
+        if "/agents/" not in self.path:
+            self._send_json({"message": f"Unknown endpoint {self.path}"}, status=404)
+            return
+        self._send_json({"name": self.path.rstrip("/").rsplit("/", 1)[-1]})
+
+    def do_POST(self):
+        if self.path.endswith("/threads"):
+            self._send_json({"thread_id": str(uuid.uuid4())})
+            return
+
+        if not self.path.endswith(":run"):
+            self._send_json({"message": f"Unknown endpoint {self.path}"}, status=404)
+            return
+
+        payload = self._read_json()
+        query = payload.get("query", "")
+        events, words, final = build_events(query, payload.get("thread_id"))
+
+        if not payload.get("stream"):
+            # Blocking mode: pay every delay up front, answer once
+            time.sleep(self.config.planning_delay + self.config.tool_delay
+                       + self.config.token_delay * len(words) / max(self.config.tokens_per_delta, 1))
+            self._send_json({
+                "data": {
+                    "message": {"content": message_content(final)},
+                    "model": final["model"],
+                    "usage": final["usage"],
+                    "thread_id": final["thread_id"]
+                }
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            for event, data, delay_kind in stream_events(events, words, final, self.config.tokens_per_delta):
+                self._sleep(delay_kind)
+                self._write_event(event, data)
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-stream
+            pass
+
+
+def start_fake_agent_server(host: str = "127.0.0.1", port: int = 0, config: FakeAgentConfig = None):
+    """
+    Start the fake agent endpoint on a daemon thread.
+
+    Returns (server, base_url). Pass port=0 to bind an ephemeral port; call
+    server.shutdown() when done.
+    """
+    handler = type("ConfiguredFakeAgentHandler", (FakeAgentHandler,), {
+        "config": config or FakeAgentConfig()
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Cortex Agent SSE endpoint for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--planning-delay", type=float, default=0.3, help="Seconds before the first event")
+    parser.add_argument("--tool-delay", type=float, default=0.5, help="Seconds spent 'running' the tool")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between text deltas")
+    args = parser.parse_args()
+
+    config = FakeAgentConfig(args.planning_delay, args.tool_delay, args.token_delay)
+    handler = type("ConfiguredFakeAgentHandler", (FakeAgentHandler,), {"config": config})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Fake Cortex Agent listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+RCM Intelligence Hub - Fake _snowflake Backend
+
+Offline stand-in for the _snowflake module Streamlit in Snowflake provides,
+so create_thread() and call_agent() can be load-tested without an account.
+Only send_snow_api_request() is implemented: thread creation, :run calls
+(answered with the same canned routing as tools/fake_agent_server.py;
+"stream": true gets the event stream buffered as a JSON array, the way SiS
+returns it) and GET on the agent's path (its description, the app's warm-up
+ping).
+
+Latency and failures are drawn from configurable distributions:
+- latency: "fixed", "uniform" or "lognormal" (median/sigma), separately for
+  thread creation and :run calls
+- failures: error_rate (request raises), timeout_rate (request blocks for
+  the caller's timeout, then raises TimeoutError), empty_rate (no 'data' in
+  the response), rate_limit_rate (answered at once with HTTP 429)
+- tail latency: slow_rate of :run calls take slow_factor times longer; a
+  call slower than the caller's timeout (real seconds, after time_scale)
+  blocks for the timeout and raises TimeoutError, as a real client would
+- flaky thread creation: thread_error_rate of /threads calls raise
+- outages: (start, end) windows in simulated seconds since the backend was
+  created, during which every call fails with HTTP 503 (outage_mode
+  "error") or hangs until the caller's timeout ("hang")
+- capacity: maximum concurrent :run calls; extra calls queue, which is how a
+  saturated agent service shows up at the client
+- warehouse: a FakeWarehouse that :run calls run on (Cortex Analyst's SQL);
+  after auto_suspend idle seconds the next call waits for it to resume
+
+With a seed, every call draws from its own generator, seeded by the seed,
+the kind of call, its request (e.g. the question) and how many times that
+request has been seen. The same seed and requests then give the same
+latencies and failures however concurrent callers are scheduled.
+
+FakeCortexSession stands in for the Snowpark session on the SQL fallback
+path: SNOWFLAKE.CORTEX.COMPLETE statements, with collect() and
+collect_nowait(). Each statement pays a round trip, plus compilation the
+first time its text is seen; the prompts in a statement complete in
+parallel, up to `capacity` at a time. Here error_rate fails a whole
+statement. Bulk INSERT ... FLATTEN statements (the app's span export) cost
+one round trip and keep the bound rows in inserted_rows.
+
+Usage:
+    backend = FakeSnowflakeBackend(FakeSnowflakeConfig(run_median=2.0, error_rate=0.02))
+    with backend.installed():
+        result = app.call_agent("Which payers have the highest denial rates?")
+
+    session = FakeCortexSession(FakeSnowflakeConfig(run_median=1.0))
+    results = app.submit_completions(session, questions).results()
+"""
+
+import contextlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.fake_agent_server import build_events, message_content, stream_events
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+# Prompt interpolated into a COMPLETE statement (no bound parameters)
+INLINE_PROMPT_PATTERN = re.compile(r"'content':\s*'((?:[^']|'')*)'")
+
+
+class FakeSnowflakeConfig:
+    """Latency (seconds) and failure profile for the fake backend."""
+
+    def __init__(self, distribution="lognormal", run_median=1.5, run_sigma=0.4,
+                 thread_median=0.15, thread_sigma=0.3, error_rate=0.0, timeout_rate=0.0,
+                 empty_rate=0.0, capacity=None, time_scale=1.0, seed=None, slow_rate=0.0,
+                 slow_factor=10.0, thread_error_rate=0.0, outages=(), outage_mode="error",
+                 rate_limit_rate=0.0):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"distribution must be one of {LATENCY_DISTRIBUTIONS}")
+        if outage_mode not in ("error", "hang"):
+            raise ValueError("outage_mode must be 'error' or 'hang'")
+        self.distribution = distribution
+        self.run_median = run_median
+        self.run_sigma = run_sigma
+        self.thread_median = thread_median
+        self.thread_sigma = thread_sigma
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.empty_rate = empty_rate
+        self.capacity = capacity
+        self.time_scale = time_scale  # Shrinks every sleep, e.g. 0.01 for CI
+        self.seed = seed
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.thread_error_rate = thread_error_rate
+        self.outages = tuple(outages)
+        self.outage_mode = outage_mode
+        self.rate_limit_rate = rate_limit_rate
+
+
+class FakeWarehouse:
+    """
+    A warehouse with AUTO_SUSPEND / AUTO_RESUME.
+
+    use() returns at once while the warehouse is running; after auto_suspend
+    idle seconds (or before the first use) the caller waits resume_seconds,
+    and concurrent callers wait for the same resume.
+    """
+
+    def __init__(self, resume_seconds=2.0, auto_suspend=300.0, time_scale=1.0):
+        self.resume_seconds = resume_seconds
+        self.auto_suspend = auto_suspend
+        self.time_scale = time_scale
+        self._lock = threading.Lock()
+        self._last_used = None
+        self.resumes = 0
+
+    def use(self) -> float:
+        """Wait until the warehouse is running; returns the seconds waited."""
+        started = time.perf_counter()
+        with self._lock:
+            now = time.perf_counter()
+            if self._last_used is None or now - self._last_used > self.auto_suspend * self.time_scale:
+                time.sleep(self.resume_seconds * self.time_scale)
+                self.resumes += 1
+            self._last_used = time.perf_counter()
+        return time.perf_counter() - started
+
+
+class FakeSnowflakeBackend:
+    """Thread-safe fake for _snowflake.send_snow_api_request."""
+
+    def __init__(self, config: FakeSnowflakeConfig = None, warehouse: FakeWarehouse = None):
+        self.config = config or FakeSnowflakeConfig()
+        self.warehouse = warehouse
+        self._occurrences = {}
+        self._rng_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.config.capacity) if self.config.capacity else None
+        self._counter_lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.calls = {"threads": 0, "run": 0, "errors": 0, "timeouts": 0, "empty": 0,
+                      "slow": 0, "thread_errors": 0, "outage": 0, "describe": 0, "rate_limited": 0}
+        self.issued_threads = set()
+
+    def _count(self, key):
+        with self._counter_lock:
+            self.calls[key] += 1
+
+    def _rng_for(self, kind, key=""):
+        """Generator for one call, independent of the order concurrent calls arrive in."""
+        with self._rng_lock:
+            occurrence = self._occurrences[kind, key] = self._occurrences.get((kind, key), 0) + 1
+        if self.config.seed is None:
+            return random.Random()
+        return random.Random(f"{self.config.seed}:{kind}:{key}:{occurrence}")
+
+    def _sample_latency(self, rng, median, sigma):
+        if self.config.distribution == "fixed":
+            return median
+        if self.config.distribution == "uniform":
+            # Same median, spread of +/- sigma * median
+            return max(0.0, rng.uniform(median * (1 - sigma), median * (1 + sigma)))
+        return rng.lognormvariate(math.log(median), sigma)
+
+    def _sample_outcome(self, rng):
+        draw = rng.random()
+        if draw < self.config.error_rate:
+            return "error"
+        draw -= self.config.error_rate
+        if draw < self.config.timeout_rate:
+            return "timeout"
+        draw -= self.config.timeout_rate
+        if draw < self.config.empty_rate:
+            return "empty"
+        draw -= self.config.empty_rate
+        if draw < self.config.rate_limit_rate:
+            return "rate_limited"
+        return "ok"
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds * self.config.time_scale)
+
+    def _draw(self, rng, rate) -> bool:
+        return bool(rate) and rng.random() < rate
+
+    def simulated_time(self) -> float:
+        """Simulated seconds since the backend was created."""
+        return (time.perf_counter() - self._started) / self.config.time_scale
+
+    def _check_outage(self, timeout):
+        """Fail the call if it lands in an outage window."""
+        now = self.simulated_time()
+        for start, end in self.config.outages:
+            if start <= now < end:
+                self._count("outage")
+                if self.config.outage_mode == "hang":
+                    time.sleep(timeout if timeout is not None else (end - now) * self.config.time_scale)
+                    raise TimeoutError(f"Agent request timed out after {timeout}s")
+                raise RuntimeError("Agent service returned HTTP 503")
+
+    def _wait(self, latency, timeout):
+        """Sleep for latency, or raise TimeoutError once the caller's timeout passes."""
+        if timeout is not None and latency * self.config.time_scale > timeout:
+            self._count("timeouts")
+            time.sleep(timeout)
+            raise TimeoutError(f"Agent request timed out after {timeout}s")
+        self._sleep(latency)
+
+    def send_snow_api_request(self, method, url, headers=None, params=None, body=None,
+                              request_guid=None, timeout=None, **kwargs):
+        """Answer thread creation and :run calls the way call_agent() expects."""
+        if method == "GET":
+            # Describe the agent: costs about as much as creating a thread
+            self._count("describe")
+            self._check_outage(timeout)
+            rng = self._rng_for("describe")
+            self._wait(self._sample_latency(rng, self.config.thread_median, self.config.thread_sigma), timeout)
+            return {"status": 200, "content": json.dumps({"name": url.rsplit("/", 1)[-1]})}
+
+        if url.endswith("/threads"):
+            self._count("threads")
+            self._check_outage(timeout)
+            rng = self._rng_for("threads")
+            self._wait(self._sample_latency(rng, self.config.thread_median, self.config.thread_sigma), timeout)
+            if self._draw(rng, self.config.thread_error_rate):
+                self._count("thread_errors")
+                raise RuntimeError("Agent service returned HTTP 503")
+            thread_id = str(uuid.uuid4())
+            with self._counter_lock:
+                self.issued_threads.add(thread_id)
+            return {"status": 200, "data": {"thread_id": thread_id}}
+
+        if not url.endswith(":run"):
+            return {"status": 404, "content": json.dumps({"message": f"Unknown endpoint {url}"})}
+
+        self._count("run")
+        payload = json.loads(body or "{}")
+        rng = self._rng_for("run", payload.get("query", ""))
+        outcome = self._sample_outcome(rng)
+        if outcome == "rate_limited":
+            self._count("rate_limited")
+            return {"status": 429, "content": json.dumps({"message": "Too many requests"})}
+        latency = self._sample_latency(rng, self.config.run_median, self.config.run_sigma)
+        if self._draw(rng, self.config.slow_rate):
+            self._count("slow")
+            latency *= self.config.slow_factor
+
+        with self._slots if self._slots else contextlib.nullcontext():
+            self._check_outage(timeout)
+            if self.warehouse is not None:
+                self.warehouse.use()
+            if outcome == "timeout":
+                self._count("timeouts")
+                self._sleep(timeout or latency)
+                raise TimeoutError(f"Agent request timed out after {timeout}s")
+
+            self._wait(latency, timeout)
+            if outcome == "error":
+                self._count("errors")
+                raise RuntimeError("Agent service returned HTTP 503")
+            if outcome == "empty":
+                self._count("empty")
+                return {"status": 200}
+
+        events, words, final = build_events(payload.get("query", ""), payload.get("thread_id"))
+        if payload.get("stream"):
+            return {"status": 200, "content": json.dumps([
+                {"event": event, "data": data} for event, data, _ in stream_events(events, words, final)
+            ])}
+        return {
+            "status": 200,
+            "data": {
+                "message": {"content": message_content(final)},
+                "model": final["model"],
+                "usage": final["usage"],
+                "thread_id": final["thread_id"]
+            }
+        }
+
+    def as_module(self):
+        """Module object exposing this backend as _snowflake."""
+        module = types.ModuleType("_snowflake")
+        module.send_snow_api_request = self.send_snow_api_request
+        return module
+
+    @contextlib.contextmanager
+    def installed(self):
+        """Make `import _snowflake` resolve to this backend for the duration of the block."""
+        previous = sys.modules.get("_snowflake")
+        sys.modules["_snowflake"] = self.as_module()
+        try:
+            yield self
+        finally:
+            if previous is None:
+                sys.modules.pop("_snowflake", None)
+            else:
+                sys.modules["_snowflake"] = previous
+
+
+class FakeAsyncJob:
+    """The part of snowflake.snowpark.AsyncJob the app uses."""
+
+    def __init__(self, future):
+        self._future = future
+
+    def is_done(self) -> bool:
+        return self._future.done()
+
+    def result(self):
+        return self._future.result()
+
+
+class FakeCortexDataFrame:
+    def __init__(self, session, query: str, params=None):
+        self._session = session
+        self._query = query
+        self._params = params
+
+    def collect(self):
+        return self.collect_nowait().result()
+
+    def collect_nowait(self):
+        return FakeAsyncJob(self._session.executor.submit(self._session.execute, self._query, self._params))
+
+
+class FakeCortexSession(FakeSnowflakeBackend):
+    """
+    Fake Snowpark session answering SNOWFLAKE.CORTEX.COMPLETE statements.
+
+    Bound statements take the prompts as a JSON array (the second parameter)
+    and return one (PROMPT_INDEX, RESPONSE) row per prompt; statements with
+    the prompt interpolated return a single RESPONSE row.
+    """
+
+    def __init__(self, config: FakeSnowflakeConfig = None, round_trip=0.08, compile_seconds=0.05,
+                 max_statements=32):
+        super().__init__(config)
+        self.round_trip = round_trip
+        self.compile_seconds = compile_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_statements)
+        self.statement_texts = set()
+        self.inserted_rows = []
+        self.calls.update({"statements": 0, "prompts": 0, "compiles": 0, "inserts": 0})
+
+    def sql(self, query: str, params=None):
+        return FakeCortexDataFrame(self, query, params)
+
+    def execute(self, query: str, params=None):
+        self._count("statements")
+        with self._counter_lock:
+            compile_needed = query not in self.statement_texts
+            self.statement_texts.add(query)
+        if compile_needed:
+            self._count("compiles")
+        if query.lstrip().upper().startswith("INSERT"):
+            return self._insert(params, compile_needed)
+        if params:
+            prompts = json.loads(params[1])
+        else:
+            prompts = [match.replace("''", "'") for match in INLINE_PROMPT_PATTERN.findall(query)]
+        with self._counter_lock:
+            self.calls["prompts"] += len(prompts)
+
+        # Prompts in one statement run in parallel lanes on the warehouse
+        rng = self._rng_for("statement", query if params is None else params[1])
+        latencies = [self._sample_latency(rng, self.config.run_median, self.config.run_sigma) for _ in prompts]
+        lanes = min(self.config.capacity or len(prompts), len(prompts)) or 1
+        self._sleep(self.round_trip + (self.compile_seconds if compile_needed else 0.0)
+                    + max(max(latencies, default=0.0), sum(latencies) / lanes))
+        if self._sample_outcome(rng) == "error":
+            self._count("errors")
+            raise RuntimeError("SQL compilation error: COMPLETE failed")
+
+        rows = []
+        for index, prompt in enumerate(prompts):
+            _, _, final = build_events(prompt)
+            response = json.dumps({
+                "choices": [{"message": {"content": final["tool"]["answer"]}}],
+                "model": final["model"],
+                "usage": final["usage"]
+            })
+            rows.append({"PROMPT_INDEX": index, "RESPONSE": response} if params else {"RESPONSE": response})
+        return rows
+
+    def _insert(self, params, compile_needed):
+        rows = json.loads(params[0]) if params else []
+        self._sleep(self.round_trip + (self.compile_seconds if compile_needed else 0.0))
+        if self._sample_outcome(self._rng_for("insert")) == "error":
+            self._count("errors")
+            raise RuntimeError("Insert failed: warehouse unavailable")
+        self._count("inserts")
+        with self._counter_lock:
+            self.inserted_rows.extend(rows)
+        return [{"number of rows inserted": len(rows)}]
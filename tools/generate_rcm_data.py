@@ -0,0 +1,449 @@
+"""
+RCM Intelligence Hub - Scalable Synthetic Data Generator
+
+Seeded, vectorized (NumPy) generator for the RCM fact tables at benchmark
+volumes (50M+ claims). Writes claims_fact, denials_fact, payments_fact,
+patient_encounters_fact and the matching patients_dim as chunked CSV or
+Parquet files for RCM_DATA_STAGE. Memory stays bounded by --chunk-size at
+any scale, because each claims chunk carries its own denials and payments.
+
+Unlike the GENERATOR/UNIFORM(..., RANDOM()) inserts in
+03_rcm_data_generation.sql, the output is reproducible for a given
+--seed/--chunk-size and the fields are drawn jointly:
+- a patient's insurance type (a pure function of patient_key) picks the payer
+- charges follow the procedure's standard charge; allowed and paid amounts
+  follow the payer type
+- denial odds depend on the payer and the clean-claim flag;
+  claim_status, payment_status, paid_amount, days_to_payment, denial_flag
+  and appeal_flag all follow from one outcome draw
+- denials, payments and appeal recoveries are derived from their claim
+
+Dimension keys match the rows inserted by 01_rcm_data_setup.sql and
+03_rcm_data_generation.sql. CSV output matches the CSV_FORMAT file format
+(header row, YYYY-MM-DD dates, empty string for NULL), column order follows
+the CREATE TABLE statements, and the files load with the COPY INTO commands
+at the end of 03_rcm_data_generation.sql.
+
+Usage:
+    python tools/generate_rcm_data.py --claims 50000000 --out data/rcm --format csv --compress
+    python tools/generate_rcm_data.py --claims 1000000 --format parquet --seed 7
+"""
+
+import argparse
+import gzip
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    # Much faster CSV writer than pandas, and required for Parquet
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+# Dimension attributes from 01_rcm_data_setup.sql / 03_rcm_data_generation.sql
+PROVIDER_COUNT = 15
+SPECIALTY_COUNT = 20
+REGION_COUNT = 10
+EMPLOYEE_COUNT = 20
+DIAGNOSIS_COUNT = 20
+
+# payer_key -> (payer_type, market_share, avg_days_to_pay, base denial rate)
+PAYERS = {
+    1: ("Commercial", 28.5, 18.2, 0.11),
+    2: ("Commercial", 22.1, 16.8, 0.12),
+    3: ("Commercial", 12.3, 19.5, 0.13),
+    4: ("Government", 35.2, 14.2, 0.09),
+    5: ("Government", 18.9, 45.3, 0.19),
+    6: ("Commercial", 8.7, 17.9, 0.12),
+    7: ("Commercial", 6.2, 20.1, 0.15),
+    8: ("Government", 2.1, 25.8, 0.10),
+    9: ("Self-Pay", 4.8, 120.5, 0.17),
+    10: ("Other", 1.2, 35.7, 0.14),
+}
+# insurance_type -> payer keys a patient of that type is billed to
+INSURANCE_PAYERS = {
+    "Commercial": [1, 2, 3, 6, 7, 10],
+    "Medicare": [4, 8],
+    "Medicaid": [5],
+    "Self-Pay": [9],
+}
+INSURANCE_TYPES = ["Commercial", "Medicare", "Medicaid", "Self-Pay"]
+INSURANCE_WEIGHTS = [0.45, 0.25, 0.15, 0.15]
+# Share of the charge a payer type allows, and the patient's share of that
+ALLOWED_RATIO = {"Commercial": 0.58, "Government": 0.42, "Self-Pay": 0.35, "Other": 0.50}
+PATIENT_SHARE = {"Commercial": 0.18, "Government": 0.08, "Self-Pay": 1.0, "Other": 0.05}
+
+# procedure_key -> standard_charge
+PROCEDURE_CHARGES = np.array([150.0, 220.0, 350.0, 280.0, 4500.0, 12500.0, 2800.0, 1200.0, 1800.0, 2200.0,
+                              450.0, 120.0, 850.0, 85.0, 8500.0, 480.0, 720.0, 280.0, 200.0, 3200.0])
+# Visit-level procedures are far more common than surgeries
+PROCEDURE_WEIGHTS = np.array([14, 12, 6, 6, 2, 1, 2, 3, 3, 3, 3, 8, 4, 9, 1, 6, 3, 5, 6, 1], dtype=float)
+
+# denial_reason_key -> (appealable, historical appeal success rate %)
+DENIAL_REASONS = np.array([
+    (1, 78.5), (1, 65.2), (1, 42.8), (0, 95.1), (1, 72.3), (1, 38.9), (1, 55.7), (0, 15.2),
+    (0, 0.0), (0, 0.0), (1, 35.4), (1, 68.9), (0, 12.1), (1, 28.7), (1, 51.2)
+])
+DENIAL_REASON_WEIGHTS = np.array([18, 9, 8, 6, 7, 6, 4, 3, 5, 4, 4, 7, 10, 5, 4], dtype=float)
+# appeal_key by level: First Level 1-3, Second Level 4-6, External Review 7-9 (Pending/Approved/Denied)
+APPEAL_LEVEL_OFFSET = np.array([1, 4, 7])
+
+AGE_GROUPS = ["0-17", "18-34", "35-54", "55-64", "65+"]
+REGIONS = ["Urban Chicago", "Suburban Chicago", "Northern Illinois", "Other Illinois"]
+PROPENSITY = ["High", "Medium", "Low"]
+PAYMENT_METHODS = ["EFT", "Check", "Credit Card", "Cash"]
+ENCOUNTER_TYPES = ["Outpatient", "Inpatient", "Emergency", "Surgery"]
+AGING_BUCKETS = np.array(["0-30", "31-60", "61-90", "91-120", "120+"])
+
+CLAIMS_COLUMNS = ["claim_id", "provider_key", "payer_key", "patient_key", "procedure_key", "diagnosis_key",
+                  "specialty_key", "region_key", "employee_key", "submission_date", "service_date",
+                  "charge_amount", "allowed_amount", "paid_amount", "patient_responsibility", "days_to_payment",
+                  "clean_claim_flag", "denial_flag", "appeal_flag", "claim_status", "payment_status"]
+DENIALS_COLUMNS = ["denial_id", "claim_id", "provider_key", "payer_key", "denial_reason_key", "appeal_key",
+                   "employee_key", "denial_date", "appeal_date", "resolution_date", "denied_amount",
+                   "recovered_amount", "days_to_appeal", "days_to_resolution", "denial_status", "appeal_outcome"]
+PAYMENTS_COLUMNS = ["payment_id", "claim_id", "provider_key", "payer_key", "patient_key", "employee_key",
+                    "payment_date", "posting_date", "payment_amount", "payment_method", "payment_type",
+                    "aging_bucket", "collection_effort_count"]
+ENCOUNTERS_COLUMNS = ["encounter_id", "provider_key", "patient_key", "specialty_key", "region_key",
+                      "encounter_date", "encounter_type", "length_of_stay", "procedures_count", "total_charges",
+                      "expected_reimbursement", "readmission_flag", "patient_satisfaction_score"]
+PATIENTS_COLUMNS = ["patient_key", "age_group", "gender", "insurance_type", "geographic_region",
+                    "payment_propensity"]
+
+# Stream ids so every table/chunk gets an independent, reproducible RNG
+STREAM_CLAIMS, STREAM_PATIENTS, STREAM_ENCOUNTERS = 1, 2, 3
+
+
+def chunk_rng(seed: int, stream: int, chunk_index: int):
+    return np.random.default_rng([seed, stream, chunk_index])
+
+
+def key_uniform(keys, seed: int, salt: int):
+    """Deterministic U[0,1) per key (splitmix64), so patient attributes can be recomputed anywhere."""
+    with np.errstate(over="ignore"):
+        z = keys.astype(np.uint64) + np.uint64(seed * 0x9E3779B97F4A7C15 + salt * 0xBF58476D1CE4E5B9 & 0xFFFFFFFFFFFFFFFF)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def patient_insurance(patient_keys, seed: int):
+    """Index into INSURANCE_TYPES for each patient_key."""
+    return np.searchsorted(np.cumsum(INSURANCE_WEIGHTS), key_uniform(patient_keys, seed, 1), side="right")
+
+
+def patient_propensity(patient_keys, seed: int):
+    """Index into PROPENSITY for each patient_key."""
+    return np.searchsorted([0.35, 0.70], key_uniform(patient_keys, seed, 2), side="right")
+
+
+def prefixed_ids(prefix: str, start: int, count: int):
+    return np.char.add(prefix, np.char.zfill(np.arange(start, start + count).astype(str), 10))
+
+
+def money(values):
+    return np.round(values, 2)
+
+
+def masked(values, mask, dtype=None):
+    """Column that is NULL where mask is False."""
+    return pd.Series(values, dtype=dtype).where(mask)
+
+
+def generate_patients(start_key: int, count: int, seed: int, chunk_index: int):
+    rng = chunk_rng(seed, STREAM_PATIENTS, chunk_index)
+    keys = np.arange(start_key, start_key + count)
+    insurance = patient_insurance(keys, seed)
+    # Medicare patients skew 65+, Medicaid skews young
+    age = rng.choice(len(AGE_GROUPS), count, p=[0.15, 0.20, 0.25, 0.20, 0.20])
+    age = np.where(insurance == 1, np.where(rng.random(count) < 0.85, 4, age), age)
+    age = np.where((insurance == 2) & (rng.random(count) < 0.4), 0, age)
+    return pd.DataFrame({
+        "patient_key": keys,
+        "age_group": np.array(AGE_GROUPS)[age],
+        "gender": np.where(rng.random(count) < 0.52, "Female", "Male"),
+        "insurance_type": np.array(INSURANCE_TYPES)[insurance],
+        "geographic_region": np.array(REGIONS)[rng.choice(len(REGIONS), count, p=[0.40, 0.25, 0.20, 0.15])],
+        "payment_propensity": np.array(PROPENSITY)[patient_propensity(keys, seed)],
+    }, columns=PATIENTS_COLUMNS)
+
+
+def generate_claims_chunk(start: int, count: int, patients: int, as_of: np.datetime64, seed: int,
+                          chunk_index: int):
+    """One chunk of claims plus the denials and payments that belong to those claims."""
+    rng = chunk_rng(seed, STREAM_CLAIMS, chunk_index)
+    claim_ids = prefixed_ids("CLM", start + 1, count)
+
+    patient_key = rng.integers(1, patients + 1, count)
+    insurance = patient_insurance(patient_key, seed)
+    payer_key = np.empty(count, dtype=np.int64)
+    for index, insurance_type in enumerate(INSURANCE_TYPES):
+        rows = np.flatnonzero(insurance == index)
+        options = INSURANCE_PAYERS[insurance_type]
+        weights = np.array([PAYERS[key][1] for key in options])
+        payer_key[rows] = rng.choice(options, rows.size, p=weights / weights.sum())
+
+    payer_type = np.array([PAYERS[key][0] for key in range(1, 11)])[payer_key - 1]
+    payer_days = np.array([PAYERS[key][2] for key in range(1, 11)])[payer_key - 1]
+    payer_denial = np.array([PAYERS[key][3] for key in range(1, 11)])[payer_key - 1]
+
+    procedure_key = rng.choice(len(PROCEDURE_CHARGES), count, p=PROCEDURE_WEIGHTS / PROCEDURE_WEIGHTS.sum()) + 1
+    charge = money(PROCEDURE_CHARGES[procedure_key - 1] * rng.lognormal(0.0, 0.25, count))
+    allowed_ratio = np.select([payer_type == kind for kind in ALLOWED_RATIO], list(ALLOWED_RATIO.values()))
+    allowed = money(np.minimum(charge, charge * allowed_ratio * rng.normal(1.0, 0.08, count).clip(0.6, 1.4)))
+    patient_share = np.select([payer_type == kind for kind in PATIENT_SHARE], list(PATIENT_SHARE.values()))
+    patient_responsibility = money(allowed * patient_share * rng.uniform(0.5, 1.0, count))
+
+    service_date = as_of - rng.integers(5, 760, count).astype("timedelta64[D]")
+    submission_date = service_date + rng.gamma(2.0, 3.0, count).astype(int).astype("timedelta64[D]")
+    submission_date = np.minimum(submission_date, as_of)
+
+    # One outcome draw drives status, flags and payment fields together
+    clean = rng.random(count) < 0.78
+    denial_odds = np.where(clean, payer_denial * 0.6, payer_denial * 2.4)
+    recent = (as_of - submission_date).astype(int) < 21
+    outcome = rng.random(count)
+    denied = ~recent & (outcome < denial_odds)
+    appealed = denied & (rng.random(count) < 0.55)
+    pending = recent & (outcome < 0.6)
+    paid = ~denied & ~pending
+    partial = paid & (rng.random(count) < 0.12)
+
+    insurer_due = allowed - np.where(payer_type == "Self-Pay", 0.0, patient_responsibility)
+    paid_amount = money(np.where(paid, np.where(partial, insurer_due * rng.uniform(0.5, 0.95, count), insurer_due), 0.0))
+    days_to_payment = np.where(paid, np.maximum(1, rng.gamma(4.0, payer_days / 4.0)).astype(int), -1)
+
+    claim_status = np.select([appealed, denied, pending], ["Appealed", "Denied", "Pending"], "Paid")
+    payment_status = np.select([denied, pending, partial], ["Denied", "Pending", "Partial"], "Full")
+
+    claims = pd.DataFrame({
+        "claim_id": claim_ids,
+        "provider_key": rng.integers(1, PROVIDER_COUNT + 1, count),
+        "payer_key": payer_key,
+        "patient_key": patient_key,
+        "procedure_key": procedure_key,
+        "diagnosis_key": rng.integers(1, DIAGNOSIS_COUNT + 1, count),
+        "specialty_key": rng.integers(1, SPECIALTY_COUNT + 1, count),
+        "region_key": rng.integers(1, REGION_COUNT + 1, count),
+        "employee_key": rng.integers(1, EMPLOYEE_COUNT + 1, count),
+        "submission_date": submission_date,
+        "service_date": service_date,
+        "charge_amount": charge,
+        "allowed_amount": allowed,
+        "paid_amount": paid_amount,
+        "patient_responsibility": patient_responsibility,
+        "days_to_payment": masked(days_to_payment, paid, "Int64"),
+        "clean_claim_flag": clean,
+        "denial_flag": denied,
+        "appeal_flag": appealed,
+        "claim_status": claim_status,
+        "payment_status": payment_status,
+    }, columns=CLAIMS_COLUMNS)
+
+    denials = generate_denials(rng, claims, denied, appealed, start, as_of)
+    payments = generate_payments(rng, claims, paid, days_to_payment, patient_responsibility, seed, start, as_of)
+    return claims, denials, payments
+
+
+def generate_denials(rng, claims, denied, appealed, start: int, as_of: np.datetime64):
+    rows = np.flatnonzero(denied)
+    count = rows.size
+    is_appealed = appealed[rows]
+    reason_key = rng.choice(len(DENIAL_REASONS), count, p=DENIAL_REASON_WEIGHTS / DENIAL_REASON_WEIGHTS.sum()) + 1
+    appealable, success_rate = DENIAL_REASONS[reason_key - 1].T
+    is_appealed &= appealable.astype(bool)
+
+    submission = claims["submission_date"].to_numpy()[rows]
+    denial_date = np.minimum(submission + rng.integers(7, 30, count).astype("timedelta64[D]"), as_of)
+    days_to_appeal = rng.integers(3, 28, count)
+    appeal_date = denial_date + days_to_appeal.astype("timedelta64[D]")
+    days_to_resolution = days_to_appeal + rng.gamma(3.0, 12.0, count).astype(int)
+    resolved = is_appealed & (denial_date + days_to_resolution.astype("timedelta64[D]") <= as_of)
+
+    # Appeals succeed at the denial reason's historical rate
+    draw = rng.random(count)
+    approved = resolved & (draw < success_rate / 100 * 0.8)
+    partially = resolved & ~approved & (draw < success_rate / 100)
+    denied_amount = claims["charge_amount"].to_numpy()[rows]
+    allowed = claims["allowed_amount"].to_numpy()[rows]
+    recovered = money(np.select([approved, partially], [allowed, allowed * rng.uniform(0.3, 0.8, count)], 0.0))
+
+    level = np.where(resolved, rng.choice(3, count, p=[0.75, 0.2, 0.05]), 0)
+    outcome_offset = np.select([approved | partially, resolved], [1, 2], 0)  # Pending / Approved / Denied
+    appeal_key = masked(APPEAL_LEVEL_OFFSET[level] + outcome_offset, is_appealed, "Int64")
+
+    return pd.DataFrame({
+        "denial_id": prefixed_ids("DEN", start + 1, count) if count else np.array([], dtype=str),
+        "claim_id": claims["claim_id"].to_numpy()[rows],
+        "provider_key": claims["provider_key"].to_numpy()[rows],
+        "payer_key": claims["payer_key"].to_numpy()[rows],
+        "denial_reason_key": reason_key,
+        "appeal_key": appeal_key,
+        "employee_key": rng.integers(1, EMPLOYEE_COUNT + 1, count),
+        "denial_date": denial_date,
+        "appeal_date": masked(appeal_date, is_appealed),
+        "resolution_date": masked(denial_date + days_to_resolution.astype("timedelta64[D]"), resolved),
+        "denied_amount": denied_amount,
+        "recovered_amount": recovered,
+        "days_to_appeal": masked(days_to_appeal, is_appealed, "Int64"),
+        "days_to_resolution": masked(days_to_resolution, resolved, "Int64"),
+        "denial_status": np.select([resolved, is_appealed], ["Resolved", "Under Review"], "Open"),
+        "appeal_outcome": masked(np.select([approved, partially], ["Approved", "Partial"], "Denied"), resolved),
+    }, columns=DENIALS_COLUMNS)
+
+
+def generate_payments(rng, claims, paid, days_to_payment, patient_responsibility, seed: int, start: int,
+                      as_of: np.datetime64):
+    """One insurance payment per paid claim plus a patient payment when the patient pays their share."""
+    insurance_rows = np.flatnonzero(paid & (claims["paid_amount"].to_numpy() > 0))
+    patient_keys = claims["patient_key"].to_numpy()
+    # High-propensity patients pay more often
+    pay_odds = np.array([0.85, 0.6, 0.3])[patient_propensity(patient_keys, seed)]
+    patient_rows = np.flatnonzero(paid & (patient_responsibility > 0) & (rng.random(len(claims)) < pay_odds))
+
+    submission = claims["submission_date"].to_numpy()
+    insurance_dates = submission[insurance_rows] + days_to_payment[insurance_rows].astype("timedelta64[D]")
+    patient_days = days_to_payment[patient_rows] + rng.gamma(2.0, 20.0, patient_rows.size).astype(int)
+    patient_dates = submission[patient_rows] + patient_days.astype("timedelta64[D]")
+
+    rows = np.concatenate([insurance_rows, patient_rows])
+    days = np.concatenate([days_to_payment[insurance_rows], patient_days])
+    payment_date = np.minimum(np.concatenate([insurance_dates, patient_dates]), as_of)
+    count = rows.size
+    amount = np.concatenate([claims["paid_amount"].to_numpy()[insurance_rows],
+                             money(patient_responsibility[patient_rows] * rng.uniform(0.5, 1.0, patient_rows.size))])
+    is_patient = np.arange(count) >= insurance_rows.size
+    method = np.where(is_patient, rng.choice(4, count, p=[0.1, 0.25, 0.5, 0.15]),
+                      rng.choice(2, count, p=[0.85, 0.15]))
+    aging = AGING_BUCKETS[np.searchsorted([30, 60, 90, 120], days, side="left")]
+
+    return pd.DataFrame({
+        "payment_id": prefixed_ids("PAY", 2 * start + 1, count) if count else np.array([], dtype=str),
+        "claim_id": claims["claim_id"].to_numpy()[rows],
+        "provider_key": claims["provider_key"].to_numpy()[rows],
+        "payer_key": claims["payer_key"].to_numpy()[rows],
+        "patient_key": patient_keys[rows],
+        "employee_key": rng.integers(1, EMPLOYEE_COUNT + 1, count),
+        "payment_date": payment_date,
+        "posting_date": np.minimum(payment_date + rng.integers(0, 4, count).astype("timedelta64[D]"), as_of),
+        "payment_amount": amount,
+        "payment_method": np.array(PAYMENT_METHODS)[method],
+        "payment_type": np.where(is_patient, "Patient", "Insurance"),
+        "aging_bucket": aging,
+        "collection_effort_count": rng.poisson(np.minimum(days, 240) / 30.0) * is_patient,
+    }, columns=PAYMENTS_COLUMNS)
+
+
+def generate_encounters(start: int, count: int, patients: int, as_of: np.datetime64, seed: int, chunk_index: int):
+    rng = chunk_rng(seed, STREAM_ENCOUNTERS, chunk_index)
+    encounter_type = rng.choice(len(ENCOUNTER_TYPES), count, p=[0.70, 0.10, 0.15, 0.05])
+    inpatient = encounter_type == 1
+    length_of_stay = np.where(inpatient, 1 + rng.gamma(2.0, 2.2, count).astype(int), 0)
+    procedures_count = 1 + rng.poisson(np.select([inpatient, encounter_type == 3], [4.0, 2.0], 0.6))
+    base_charge = np.select([inpatient, encounter_type == 3, encounter_type == 2], [9000.0, 7000.0, 1800.0], 350.0)
+    total_charges = money(base_charge * rng.lognormal(0.0, 0.35, count) * (1 + length_of_stay * 0.6))
+    return pd.DataFrame({
+        "encounter_id": prefixed_ids("ENC", start + 1, count),
+        "provider_key": rng.integers(1, PROVIDER_COUNT + 1, count),
+        "patient_key": rng.integers(1, patients + 1, count),
+        "specialty_key": rng.integers(1, SPECIALTY_COUNT + 1, count),
+        "region_key": rng.integers(1, REGION_COUNT + 1, count),
+        "encounter_date": as_of - rng.integers(1, 760, count).astype("timedelta64[D]"),
+        "encounter_type": np.array(ENCOUNTER_TYPES)[encounter_type],
+        "length_of_stay": masked(length_of_stay, inpatient, "Int64"),
+        "procedures_count": procedures_count,
+        "total_charges": total_charges,
+        "expected_reimbursement": money(total_charges * rng.uniform(0.35, 0.6, count)),
+        # Longer stays readmit more often
+        "readmission_flag": rng.random(count) < np.where(inpatient, 0.08 + 0.01 * length_of_stay, 0.01),
+        "patient_satisfaction_score": np.round(np.clip(rng.normal(4.1, 0.5, count) - 0.05 * length_of_stay, 1, 5), 2),
+    }, columns=ENCOUNTERS_COLUMNS)
+
+
+class ChunkWriter:
+    """Writes one file per table per chunk under out/<table>/."""
+
+    def __init__(self, out: Path, file_format: str, compress: bool):
+        self.out = out
+        self.file_format = file_format
+        self.compress = compress
+        self.rows = {}
+        self.files = 0
+
+    def write(self, table: str, frame: pd.DataFrame, chunk_index: int):
+        directory = self.out / table
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.file_format == "parquet":
+            frame.to_parquet(directory / f"{table}_{chunk_index:05d}.parquet", index=False)
+        else:
+            path = directory / f"{table}_{chunk_index:05d}{'.csv.gz' if self.compress else '.csv'}"
+            if pa is not None:
+                table_data = pa.Table.from_pandas(frame, preserve_index=False)
+                # DATE columns as YYYY-MM-DD, not timestamps
+                table_data = table_data.cast(pa.schema([
+                    field.with_type(pa.date32()) if pa.types.is_timestamp(field.type) else field
+                    for field in table_data.schema
+                ]))
+                # Fast gzip level; output size is dominated by repetitive text anyway
+                with gzip.open(path, "wb", compresslevel=1) if self.compress else open(path, "wb") as sink:
+                    pa_csv.write_csv(table_data, sink)
+            else:
+                frame.to_csv(path, index=False, na_rep="", date_format="%Y-%m-%d", float_format="%.2f",
+                             compression="gzip" if self.compress else None)
+        self.rows[table] = self.rows.get(table, 0) + len(frame)
+        self.files += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=1_000_000, help="Total claims_fact rows")
+    parser.add_argument("--patients", type=int, default=None, help="patients_dim rows (default: claims / 10)")
+    parser.add_argument("--encounter-ratio", type=float, default=0.4, help="Encounters per claim")
+    parser.add_argument("--chunk-size", type=int, default=500_000, help="Claims per chunk (bounds memory, ~1 GB at the default)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", default="2025-12-31", help="Latest date in the data (YYYY-MM-DD)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--compress", action="store_true", help="gzip CSV files")
+    parser.add_argument("--out", type=Path, default=Path("data/rcm"))
+    args = parser.parse_args()
+    if args.format == "parquet" and pa is None:
+        parser.error("--format parquet requires pyarrow")
+
+    patients = args.patients or max(args.claims // 10, 1)
+    encounters = int(args.claims * args.encounter_ratio)
+    as_of = np.datetime64(args.as_of, "D")
+    writer = ChunkWriter(args.out, args.format, args.compress)
+    started = time.perf_counter()
+
+    for chunk_index, start in enumerate(range(0, patients, args.chunk_size)):
+        count = min(args.chunk_size, patients - start)
+        writer.write("patients_dim", generate_patients(start + 1, count, args.seed, chunk_index), chunk_index)
+
+    for chunk_index, start in enumerate(range(0, args.claims, args.chunk_size)):
+        count = min(args.chunk_size, args.claims - start)
+        claims, denials, payments = generate_claims_chunk(start, count, patients, as_of, args.seed, chunk_index)
+        writer.write("claims_fact", claims, chunk_index)
+        writer.write("denials_fact", denials, chunk_index)
+        writer.write("payments_fact", payments, chunk_index)
+        print(f"  claims {start + count:,}/{args.claims:,}  ({time.perf_counter() - started:.1f}s)", flush=True)
+
+    for chunk_index, start in enumerate(range(0, encounters, args.chunk_size)):
+        count = min(args.chunk_size, encounters - start)
+        writer.write("patient_encounters_fact",
+                     generate_encounters(start, count, patients, as_of, args.seed, chunk_index), chunk_index)
+
+    elapsed = time.perf_counter() - started
+    total_rows = sum(writer.rows.values())
+    print(f"Wrote {writer.files} files to {args.out} in {elapsed:.1f}s ({total_rows / elapsed:,.0f} rows/s)")
+    for table, rows in writer.rows.items():
+        print(f"  {table:<26}{rows:>14,}")
+
+
+if __name__ == "__main__":
+    main()
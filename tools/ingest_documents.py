@@ -0,0 +1,259 @@
+"""
+RCM Intelligence Hub - Incremental Document Ingestion
+
+Extracts text from the PDF, DOCX, PPTX and Markdown files under
+unstructured_docs/ (or any folder of payer contracts and policies) and
+writes rcm_document_content rows for the search services. Parsing runs in a
+process pool; a SHA-256 manifest of every file's content means a re-run only
+re-parses files that were added or changed, and emits deletes for files that
+are gone.
+
+Rows follow the conventions rcm_parsed_content and the search services in
+05_rcm_cortex_search.sql depend on: document_path is '/<category>/...' with
+the category as the first folder (relative_path LIKE '/finance/%'), and
+document_type is derived from that category. Files directly in the root
+folder (README.md, DOCUMENT_INVENTORY.md) have no category and are skipped.
+
+Each run writes the changes as one CSV matching CSV_FORMAT
+(document_path, document_title, document_type, content, content_hash,
+change_type) for the MERGE at the end of 02_rcm_documents_setup.sql, then
+updates the manifest. Load each change file before the next run; --full
+re-emits every document.
+
+DOCX and PPTX are read with the standard library. PDF text needs pypdf;
+without it PDFs are reported as skipped.
+
+Usage:
+    python tools/ingest_documents.py --source unstructured_docs --out data/documents
+    python tools/ingest_documents.py --source contracts/ --workers 16 --full
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from xml.etree import ElementTree
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".pptx", ".md", ".txt")
+CHANGE_COLUMNS = ["document_path", "document_title", "document_type", "content", "content_hash", "change_type"]
+MANIFEST_NAME = "manifest.json"
+CHANGES_NAME = "rcm_document_changes.csv"
+TITLE_MAX_LENGTH = 200  # rcm_document_content.document_title VARCHAR(200)
+
+# First folder under the source root -> document_type, as in 02_rcm_documents_setup.sql
+DOCUMENT_TYPES = {
+    "finance": "Financial Policy",
+    "operations": "Operations Manual",
+    "compliance": "Compliance Document",
+    "strategy": "Strategic Document",
+    "hr": "HR Document",
+    "marketing": "Marketing Document",
+    "sales": "Sales Document",
+}
+CONTRACT_FOLDERS = {"vendor_contracts": "Vendor Contract", "amendments": "Contract Amendment"}
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DRAWING_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+CORE_TITLE = "{http://purl.org/dc/elements/1.1/}title"
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def document_path(path: Path, root: Path) -> str:
+    return "/" + path.relative_to(root).as_posix()
+
+
+def document_type(doc_path: str) -> str:
+    folders = doc_path.strip("/").split("/")[:-1]
+    for folder in reversed(folders):
+        if folder in CONTRACT_FOLDERS:
+            return CONTRACT_FOLDERS[folder]
+    return DOCUMENT_TYPES.get(folders[0], f"{folders[0].replace('_', ' ').title()} Document")
+
+
+def default_title(path: Path) -> str:
+    return re.sub(r"[_\s]+", " ", path.stem).strip()
+
+
+def core_title(archive: zipfile.ZipFile):
+    """dc:title from an Office file's docProps/core.xml, if set."""
+    try:
+        title = ElementTree.fromstring(archive.read("docProps/core.xml")).findtext(CORE_TITLE)
+    except (KeyError, ElementTree.ParseError):
+        return None
+    return title.strip() if title and title.strip() else None
+
+
+def extract_docx(path: Path):
+    with zipfile.ZipFile(path) as archive:
+        body = ElementTree.fromstring(archive.read("word/document.xml"))
+        title = core_title(archive)
+    paragraphs = []
+    for paragraph in body.iter(f"{WORD_NS}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{WORD_NS}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{WORD_NS}tab":
+                parts.append("\t")
+            elif node.tag in (f"{WORD_NS}br", f"{WORD_NS}cr"):
+                parts.append("\n")
+        text = "".join(parts).strip()
+        if text:
+            paragraphs.append(text)
+    return title, "\n".join(paragraphs)
+
+
+def extract_pptx(path: Path):
+    slide_name = re.compile(r"ppt/slides/slide(\d+)\.xml$")
+    with zipfile.ZipFile(path) as archive:
+        slides = sorted((int(match.group(1)), name) for name in archive.namelist()
+                        if (match := slide_name.match(name)))
+        title = core_title(archive)
+        pages = []
+        for number, name in slides:
+            root = ElementTree.fromstring(archive.read(name))
+            lines = ["".join(node.text or "" for node in paragraph.iter(f"{DRAWING_NS}t")).strip()
+                     for paragraph in root.iter(f"{DRAWING_NS}p")]
+            lines = [line for line in lines if line]
+            if lines:
+                pages.append(f"Slide {number}\n" + "\n".join(lines))
+    return title, "\n\n".join(pages)
+
+
+def extract_pdf(path: Path):
+    reader = PdfReader(path)
+    title = reader.metadata.title if reader.metadata else None
+    pages = [(page.extract_text() or "").strip() for page in reader.pages]
+    return (title.strip() if title and title.strip() else None), "\n\n".join(page for page in pages if page)
+
+
+def extract_text_file(path: Path):
+    text = path.read_text(encoding="utf-8", errors="replace")
+    heading = re.search(r"^#\s+(.+)$", text, re.MULTILINE) if path.suffix == ".md" else None
+    return (heading.group(1).strip() if heading else None), text.strip()
+
+
+EXTRACTORS = {".docx": extract_docx, ".pptx": extract_pptx, ".pdf": extract_pdf,
+              ".md": extract_text_file, ".txt": extract_text_file}
+
+
+def parse_document(job):
+    """Process-pool worker: (path, doc_path, content_hash) -> row dict or error."""
+    path, doc_path, content_hash = job
+    try:
+        title, content = EXTRACTORS[path.suffix.lower()](path)
+    except Exception as e:
+        return {"document_path": doc_path, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "document_path": doc_path,
+        "document_title": (title or default_title(path))[:TITLE_MAX_LENGTH],
+        "document_type": document_type(doc_path),
+        "content": content,
+        "content_hash": content_hash,
+        "change_type": "upsert",
+    }
+
+
+def scan(root: Path):
+    """(path, document_path) for every supported file below a category folder."""
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            path = Path(directory) / name
+            if path.parent != root and path.suffix.lower() in SUPPORTED_EXTENSIONS:
+                yield path, document_path(path, root)
+
+
+def load_manifest(path: Path):
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", type=Path, default=Path("unstructured_docs"), help="Root folder of documents")
+    parser.add_argument("--out", type=Path, default=Path("data/documents"), help="Change file and manifest folder")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parser processes")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-parse every file")
+    args = parser.parse_args()
+
+    source = args.source.resolve()
+    manifest_path = args.out / MANIFEST_NAME
+    previous = {} if args.full else load_manifest(manifest_path)
+    manifest = {}
+    jobs = []
+    skipped = {"unchanged": 0, "unsupported": 0, "failed": 0}
+    parse_bytes = 0
+    started = time.perf_counter()
+
+    for path, doc_path in scan(source):
+        if path.suffix.lower() == ".pdf" and PdfReader is None:
+            skipped["unsupported"] += 1
+            continue
+        content_hash = file_hash(path)
+        manifest[doc_path] = content_hash
+        if previous.get(doc_path) == content_hash:
+            skipped["unchanged"] += 1
+        else:
+            jobs.append((path, doc_path, content_hash))
+            parse_bytes += path.stat().st_size
+    # Files no longer on disk; PDFs skipped for lack of pypdf are not deletions
+    deleted = [doc_path for doc_path in previous
+               if doc_path not in manifest and not (doc_path.lower().endswith(".pdf") and PdfReader is None)]
+    scanned = time.perf_counter() - started
+
+    rows = []
+    workers = min(args.workers, len(jobs))
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            for result in pool.map(parse_document, jobs, chunksize=chunksize):
+                if "error" in result:
+                    skipped["failed"] += 1
+                    # Keep the last good hash (if any) so the file is retried next run
+                    if result["document_path"] in previous:
+                        manifest[result["document_path"]] = previous[result["document_path"]]
+                    else:
+                        manifest.pop(result["document_path"])
+                    print(f"  failed {result['document_path']}: {result['error']}")
+                else:
+                    rows.append(result)
+    rows.extend({column: "" for column in CHANGE_COLUMNS} | {"document_path": doc_path, "change_type": "delete"}
+                for doc_path in deleted)
+    parsed = time.perf_counter() - started - scanned
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    with open(args.out / CHANGES_NAME, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CHANGE_COLUMNS, quoting=csv.QUOTE_ALL, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    manifest_path.write_text(json.dumps(dict(sorted(manifest.items())), indent=1))
+
+    elapsed = time.perf_counter() - started
+    upserts = len(rows) - len(deleted)
+    print(f"Scanned {len(manifest) + skipped['unsupported'] + skipped['failed']} files in {scanned:.2f}s, "
+          f"parsed {upserts} in {parsed:.2f}s with {workers} workers "
+          f"({upserts / parsed if parsed else 0:.1f} files/s, {parse_bytes / 1e6 / parsed if parsed else 0:.1f} MB/s)")
+    print(f"Skipped: {skipped['unchanged']} unchanged, {skipped['unsupported']} unsupported"
+          f"{' (install pypdf for PDFs)' if skipped['unsupported'] else ''}, {skipped['failed']} failed")
+    print(f"Wrote {upserts} upserts and {len(deleted)} deletes to {args.out / CHANGES_NAME} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+RCM Intelligence Hub - Local Stand-in Session
+
+SQLite-backed stand-in for the Snowpark session, so the app's SQL paths
+(the KPI fast path first) can run without an account. session.sql(query)
+supports collect(), to_pandas(), to_pandas_batches() and collect_nowait();
+rows come back keyed by upper-case column name like Snowpark Rows, and
+RCM_AI_DEMO.RCM_SCHEMA. qualifiers are dropped from queries.
+
+collect_nowait() runs the query into a temp table and returns a job with a
+query_id, so TABLE(RESULT_SCAN('<query_id>')) reads the result again like it
+does in Snowflake.
+
+The database is filled from the repo itself:
+- dimension rows from the INSERT ... VALUES statements in
+  01_rcm_data_setup.sql and 03_rcm_data_generation.sql
+- claims_fact and denials_fact from tools/generate_rcm_data.py
+- the KPI rollups by refresh_kpi_rollups(), a full-rebuild SQLite version
+  of REFRESH_KPI_ROLLUPS() in 04_rcm_semantic_views.sql
+
+For the incremental path, track_fact_changes() adds change tables that stand
+in for the fact table streams, and merge_kpi_deltas() runs the procedure's
+own MERGE statements over them, translated to SQLite.
+
+Usage:
+    session = build_local_session(claims=200_000)
+    app.answer_kpi_question("Which payers have the highest denial rates?", session)
+"""
+
+import itertools
+import re
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from tools.generate_rcm_data import generate_claims_chunk
+from tools.sql_udf_loader import SETUP_DIR
+
+DIMENSION_SQL = ("01_rcm_data_setup.sql", "03_rcm_data_generation.sql")
+ROLLUP_SQL = "04_rcm_semantic_views.sql"
+QUALIFIER_PATTERN = re.compile(r"\bRCM_AI_DEMO\.RCM_SCHEMA\.", re.IGNORECASE)
+_CREATE_TABLE = re.compile(r"CREATE OR REPLACE TABLE (\w+) \((.*?)\n\);", re.DOTALL)
+_INSERT_VALUES = re.compile(r"INSERT INTO (\w+) VALUES(.*?);\n", re.DOTALL)
+_TOKEN = re.compile(r"'((?:[^']|'')*)'|--[^\n]*|([(),])|([^\s,()]+)")
+_KEYWORDS = {"TRUE": 1, "FALSE": 0, "NULL": None}
+RESULT_SCAN_PATTERN = re.compile(r"TABLE\(\s*RESULT_SCAN\(\s*'([^']*)'\s*\)\s*\)", re.IGNORECASE)
+# Rows per to_pandas_batches() frame, about one Arrow result chunk
+BATCH_ROWS = 50_000
+
+_STREAM = re.compile(r"CREATE OR REPLACE STREAM (\w+) ON TABLE (\w+)")
+_MERGE = re.compile(
+    r"MERGE INTO (\w+) r\s+USING \((.*?)\n    \) d\s+ON (.*?)\s+WHEN MATCHED THEN UPDATE SET(.*?)"
+    r"\s+WHEN NOT MATCHED THEN INSERT VALUES \((.*?)\);",
+    re.DOTALL,
+)
+_DELETE_EMPTY_GROUPS = re.compile(r"DELETE FROM \w+_kpi_rollup WHERE \w+ = 0")
+# Snowflake functions in REFRESH_KPI_ROLLUPS() and their SQLite equivalents
+SNOWFLAKE_TO_SQLITE = (
+    (re.compile(r"DATE_TRUNC\('month', (\w+)\)"), r"substr(\1, 1, 7) || '-01'"),
+    (re.compile(r"\bIFF\("), "IIF("),
+    (re.compile(r"EQUAL_NULL\(([\w.]+), ([\w.]+)\)"), r"\1 IS \2"),
+    (re.compile(r"METADATA\$ACTION"), "metadata_action"),
+)
+
+# SQLite version of REFRESH_KPI_ROLLUPS(), over the whole fact tables
+KPI_ROLLUP_SQL = (
+    "DELETE FROM claims_kpi_rollup",
+    """
+    INSERT INTO claims_kpi_rollup
+    SELECT substr(submission_date, 1, 7) || '-01', provider_key, payer_key,
+           COUNT(*), SUM(clean_claim_flag), SUM(denial_flag), SUM(appeal_flag),
+           SUM(charge_amount), SUM(paid_amount), COUNT(days_to_payment), COALESCE(SUM(days_to_payment), 0)
+    FROM claims_fact
+    GROUP BY 1, 2, 3
+    """,
+    "DELETE FROM denials_kpi_rollup",
+    """
+    INSERT INTO denials_kpi_rollup
+    SELECT substr(denial_date, 1, 7) || '-01', provider_key, payer_key, denial_reason_key,
+           COUNT(*), COUNT(days_to_appeal), COUNT(CASE WHEN appeal_outcome IN ('Approved', 'Partial') THEN 1 END),
+           SUM(denied_amount), SUM(recovered_amount)
+    FROM denials_fact
+    GROUP BY 1, 2, 3, 4
+    """,
+)
+ROLLUP_TABLES = {
+    "claims_kpi_rollup": ("submission_month", "provider_key", "payer_key", "total_claims", "clean_claims",
+                          "denied_claims", "appealed_claims", "total_charges", "total_paid", "paid_claims",
+                          "days_to_payment_total"),
+    "denials_kpi_rollup": ("denial_month", "provider_key", "payer_key", "denial_reason_key", "total_denials",
+                           "appealed_denials", "successful_appeals", "denied_amount", "recovered_amount"),
+}
+
+
+class Row(dict):
+    """Result row readable as row["COLUMN"] or row.COLUMN."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class LocalDataFrame:
+    def __init__(self, session, query: str, params=None):
+        self._session = session
+        self._query = RESULT_SCAN_PATTERN.sub(session.result_table, QUALIFIER_PATTERN.sub("", query))
+        self._params = params or ()
+
+    def _execute(self):
+        self._session.queries += 1
+        cursor = self._session.connection.cursor()
+        cursor.execute(self._query, self._params)
+        return cursor, [column[0].upper() for column in cursor.description or ()]
+
+    def collect(self):
+        with self._session.lock:
+            cursor, names = self._execute()
+            return [Row(zip(names, values)) for values in cursor.fetchall()]
+
+    def to_pandas(self):
+        with self._session.lock:
+            cursor, names = self._execute()
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=names)
+
+    def to_pandas_batches(self):
+        """Yield the result as DataFrames of up to BATCH_ROWS rows, fetched as they are read."""
+        with self._session.lock:
+            cursor, names = self._execute()
+        while True:
+            with self._session.lock:
+                rows = cursor.fetchmany(BATCH_ROWS)
+            if not rows:
+                return
+            yield pd.DataFrame.from_records(rows, columns=names)
+
+    def collect_nowait(self):
+        """Run the query to completion into a temp table; the job reads it back."""
+        with self._session.lock:
+            query_id = f"01local-{next(self._session.query_ids):08d}"
+            table = f"result_{query_id.replace('-', '_')}"
+            self._session.queries += 1
+            self._session.connection.execute(f"CREATE TEMP TABLE {table} AS {self._query}", self._params)
+            self._session.results[query_id] = table
+        return LocalAsyncJob(self._session, query_id)
+
+
+class LocalAsyncJob:
+    """The part of snowflake.snowpark.AsyncJob the app uses."""
+
+    def __init__(self, session, query_id: str):
+        self._session = session
+        self.query_id = query_id
+
+    def is_done(self):
+        return True
+
+    def result(self, result_type: str = "row"):
+        frame = self._session.sql(f"SELECT * FROM TABLE(RESULT_SCAN('{self.query_id}'))")
+        if result_type == "pandas_batches":
+            return frame.to_pandas_batches()
+        if result_type == "pandas":
+            return frame.to_pandas()
+        return frame.collect()
+
+
+class LocalSession:
+    """The part of snowflake.snowpark.Session the app uses, over SQLite."""
+
+    def __init__(self, path: str = ":memory:"):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.query_ids = itertools.count(1)
+        self.results = {}  # query_id -> temp table holding its rows
+
+    def sql(self, query: str, params=None):
+        return LocalDataFrame(self, query, params)
+
+    def result_table(self, match):
+        """Temp table behind TABLE(RESULT_SCAN('<query_id>'))."""
+        if match.group(1) not in self.results:
+            raise sqlite3.OperationalError(f"Statement {match.group(1)} not found")
+        return self.results[match.group(1)]
+
+
+def parse_values(text: str):
+    """Rows of a VALUES list as tuples of Python values."""
+    rows, row = [], None
+    for match in _TOKEN.finditer(text):
+        string, punctuation, literal = match.groups()
+        if punctuation == "(":
+            row = []
+        elif punctuation == ")":
+            rows.append(tuple(row))
+        elif punctuation == "," or match.group().startswith("--"):
+            continue
+        elif string is not None:
+            row.append(string.replace("''", "'"))
+        elif literal.upper() in _KEYWORDS:
+            row.append(_KEYWORDS[literal.upper()])
+        else:
+            row.append(float(literal) if "." in literal else int(literal))
+    return rows
+
+
+def load_dimensions(session: LocalSession):
+    """Create the *_dim tables and insert the rows the setup scripts insert."""
+    for name in DIMENSION_SQL:
+        sql = (SETUP_DIR / name).read_text()
+        for table, body in _CREATE_TABLE.findall(sql):
+            if table.endswith("_dim"):
+                columns = [line.split()[0] for line in body.strip().splitlines()
+                           if line.strip() and not line.strip().startswith(("--", "FOREIGN", "PRIMARY"))]
+                session.connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+        for table, values in _INSERT_VALUES.findall(sql):
+            rows = parse_values(values)
+            placeholders = ", ".join("?" * len(rows[0]))
+            session.connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+
+def load_facts(session: LocalSession, claims: int, seed: int = 42, as_of: str = "2025-12-31",
+               chunk_size: int = 500_000):
+    """Append generated claims_fact and denials_fact rows."""
+    patients = max(claims // 10, 1)
+    for chunk_index, start in enumerate(range(0, claims, chunk_size)):
+        count = min(chunk_size, claims - start)
+        claims_frame, denials_frame, _ = generate_claims_chunk(
+            start, count, patients, np.datetime64(as_of, "D"), seed, chunk_index)
+        for table, frame in (("claims_fact", claims_frame), ("denials_fact", denials_frame)):
+            for column in frame.columns:
+                if column.endswith("_date"):
+                    frame[column] = frame[column].dt.strftime("%Y-%m-%d")
+            frame.to_sql(table, session.connection, if_exists="append", index=False)
+
+
+def refresh_kpi_rollups(session: LocalSession):
+    """Rebuild claims_kpi_rollup and denials_kpi_rollup from the fact tables."""
+    for table, columns in ROLLUP_TABLES.items():
+        session.connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+    for statement in KPI_ROLLUP_SQL:
+        session.connection.execute(statement)
+    session.connection.commit()
+
+
+def to_sqlite(sql: str) -> str:
+    for pattern, replacement in SNOWFLAKE_TO_SQLITE:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def track_fact_changes(session: LocalSession):
+    """
+    Create change tables standing in for the fact table streams.
+
+    Each starts with the fact table's current rows as inserts
+    (SHOW_INITIAL_ROWS); triggers then append every insert, delete and
+    update (the old row deleted, the new one inserted) with its
+    METADATA$ACTION, as a stream shows them.
+    """
+    sql = (SETUP_DIR / ROLLUP_SQL).read_text()
+    for stream, table in _STREAM.findall(sql):
+        columns = [row[1] for row in session.connection.execute(f"PRAGMA table_info({table})")]
+        session.connection.execute(
+            f"CREATE TABLE {stream} AS SELECT *, 'INSERT' AS metadata_action FROM {table}")
+        for event, images in (("INSERT", (("NEW", "INSERT"),)), ("DELETE", (("OLD", "DELETE"),)),
+                              ("UPDATE", (("OLD", "DELETE"), ("NEW", "INSERT")))):
+            appends = " ".join(
+                f"INSERT INTO {stream} SELECT {', '.join(f'{image}.{column}' for column in columns)}, '{action}';"
+                for image, action in images
+            )
+            session.connection.execute(
+                f"CREATE TRIGGER {stream}_{event.lower()} AFTER {event} ON {table} BEGIN {appends} END")
+    session.connection.commit()
+
+
+def merge_kpi_deltas(session: LocalSession):
+    """
+    Apply pending fact changes the way REFRESH_KPI_ROLLUPS() does.
+
+    Each MERGE in 04_rcm_semantic_views.sql runs as an UPDATE ... FROM of the
+    matched groups and an INSERT of the rest, with its delta query and SET
+    list translated to SQLite; then groups left with no rows are deleted and
+    the change tables emptied, as the MERGE consumes its stream.
+    """
+    sql = (SETUP_DIR / ROLLUP_SQL).read_text()
+    for table, columns in ROLLUP_TABLES.items():
+        session.connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+    for table, delta, condition, assignments, values in _MERGE.findall(sql):
+        delta, condition = to_sqlite(delta), to_sqlite(condition)
+        session.connection.execute(
+            f"UPDATE {table} AS r SET {assignments.strip()} FROM ({delta}) AS d WHERE {condition}")
+        session.connection.execute(
+            f"INSERT INTO {table} SELECT {values.strip()} FROM ({delta}) AS d "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table} r WHERE {condition})")
+    for statement in _DELETE_EMPTY_GROUPS.findall(sql):
+        session.connection.execute(statement)
+    for stream, _ in _STREAM.findall(sql):
+        session.connection.execute(f"DELETE FROM {stream}")
+    session.connection.commit()
+
+
+def build_local_session(claims: int = 100_000, seed: int = 42, path: str = ":memory:") -> LocalSession:
+    """Stand-in session with dimensions, generated facts and KPI rollups loaded."""
+    session = LocalSession(path)
+    load_dimensions(session)
+    load_facts(session, claims, seed)
+    refresh_kpi_rollups(session)
+    return session
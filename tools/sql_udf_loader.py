@@ -0,0 +1,65 @@
+"""
+Load the Python body of a UDF/procedure defined in a setup/*.sql script.
+
+The SQL scripts are the source of truth for in-database Python. Benchmarks
+extract the handler source from the CREATE statement and execute it locally,
+so what they measure is exactly what gets deployed.
+"""
+
+import re
+import sys
+import types
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SETUP_DIR = REPO_ROOT / "setup"
+
+
+def load_udf_source(sql_file: str, object_name: str) -> str:
+    """
+    Return the $$-quoted Python body of CREATE ... FUNCTION/PROCEDURE object_name.
+
+    sql_file is relative to setup/ (e.g. "07_rcm_native_agent_production.sql").
+    """
+    sql = (SETUP_DIR / sql_file).read_text()
+    pattern = re.compile(
+        r"CREATE\s+OR\s+REPLACE\s+(?:FUNCTION|PROCEDURE)\s+" + re.escape(object_name) + r"\s*\("
+        r"[^$]*?LANGUAGE\s+PYTHON[^$]*?\$\$(.*?)\$\$",
+        re.IGNORECASE | re.DOTALL
+    )
+    match = pattern.search(sql)
+    if not match:
+        raise ValueError(f"No Python UDF named {object_name} in {sql_file}")
+    return match.group(1)
+
+
+def _install_vectorized_shim():
+    """
+    Provide _snowflake.vectorized outside Snowflake.
+
+    The decorator only tells the UDF server to pass pandas batches; locally the
+    handler is called with a DataFrame directly, so a passthrough is enough.
+    """
+    if "_snowflake" in sys.modules:
+        return
+    module = types.ModuleType("_snowflake")
+    module.vectorized = lambda **options: (lambda func: func)
+    sys.modules["_snowflake"] = module
+
+
+def exec_udf(sql_file: str, object_name: str, import_directory: str = None) -> dict:
+    """
+    Execute a UDF body and return its module namespace.
+
+    import_directory stands in for the UDF's IMPORTS directory
+    (sys._xoptions["snowflake_import_directory"]) during module load.
+    Vectorized handlers can be called directly with a pandas DataFrame.
+    """
+    source = load_udf_source(sql_file, object_name)
+    if "_snowflake" in source:
+        _install_vectorized_shim()
+    namespace = {"__name__": f"udf_{object_name.lower()}"}
+    if import_directory is not None:
+        sys._xoptions["snowflake_import_directory"] = str(import_directory)
+    exec(compile(source, f"{sql_file}:{object_name}", "exec"), namespace)
+    return namespace